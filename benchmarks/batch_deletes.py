@@ -0,0 +1,91 @@
+"""
+Compares ways of deleting images of many products from the storage:
+one delete_objects call with all keys (what deleting many products did, S3 rejects it above 1000 keys),
+one delete_objects call per product in a loop (what deleting variations did) and
+AsyncS3Client.delete_many_objects (batches of 1000 keys at most sent concurrently, failed keys retried).
+Requests go to a local S3 stand-in with simulated latency, a share of the keys fails with InternalError.
+
+Run from the project root:
+    python -m benchmarks.batch_deletes --products 500 --images-per-product 4 --failure-rate 0.01
+"""
+import argparse
+import asyncio
+import time
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from benchmarks import _env  # noqa: F401
+from benchmarks.stand_ins.s3 import running_fake_s3
+from src.core.file_storage.async_s3_client import AsyncS3Client, S3DeleteError
+
+BUCKET_NAME = "benchmark-bucket"
+
+
+def fill_bucket(server, keys: list) -> None:
+    for key in keys:
+        server.objects[f"/{BUCKET_NAME}/{key}"] = (b"image", "image/jpeg")
+
+
+def count_left(server, keys: list) -> int:
+    return sum(f"/{BUCKET_NAME}/{key}" in server.objects for key in keys)
+
+
+async def single_call(s3: AsyncS3Client, product_keys: list) -> str:
+    try:
+        await s3.delete_objects(BUCKET_NAME, [{"Key": key} for keys in product_keys for key in keys])
+    except ClientError as e:
+        return e.response["Error"]["Code"]
+    return "ok"
+
+
+async def call_per_product(s3: AsyncS3Client, product_keys: list) -> str:
+    for keys in product_keys:
+        await s3.delete_objects(BUCKET_NAME, [{"Key": key} for key in keys])
+    return "ok"
+
+
+async def batched(s3: AsyncS3Client, product_keys: list) -> str:
+    try:
+        await s3.delete_many_objects(BUCKET_NAME, [key for keys in product_keys for key in keys],
+                                     max_retries=3, retry_delay=0.05)
+    except S3DeleteError as e:
+        return f"{len(e.errors)} key(s) failed"
+    return "ok"
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--images-per-product", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=20, help="Simulated latency of each S3 request")
+    parser.add_argument("--failure-rate", type=float, default=0.01, help="Share of keys that fail to be deleted")
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    product_keys = [[f"products/{product}_{number}.jpg" for number in range(args.images_per_product)]
+                    for product in range(args.products)]
+    keys = [key for keys in product_keys for key in keys]
+    print(f"products: {args.products}, keys: {len(keys)}, latency: {args.latency_ms} ms, "
+          f"failure rate: {args.failure_rate}, concurrency: {args.concurrency}")
+
+    with running_fake_s3(latency=args.latency_ms / 1000, delete_failure_rate=args.failure_rate) as server:
+        client = boto3.client("s3", endpoint_url=server.endpoint_url, aws_access_key_id="benchmark",
+                              aws_secret_access_key="benchmark", region_name="us-east-1",
+                              config=Config(max_pool_connections=args.concurrency))
+        s3 = AsyncS3Client(client, max_concurrency=args.concurrency)
+        for name, delete in (("single call", single_call), ("call per product", call_per_product),
+                             ("batched, concurrent", batched)):
+            fill_bucket(server, keys)
+            requests_before = server.requests
+            started = time.perf_counter()
+            result = await delete(s3, product_keys)
+            elapsed = time.perf_counter() - started
+            print(f"{name:20s}: {elapsed * 1000:9.1f} ms  {server.requests - requests_before:5d} request(s)  "
+                  f"{count_left(server, keys):6d} key(s) left  ({result})")
+        s3.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
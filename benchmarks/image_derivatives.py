@@ -0,0 +1,85 @@
+"""
+Measures the derivative pipeline (resized progressive JPEG and WebP copies of each product image)
+on a process pool of different sizes, like create_image_derivatives runs it.
+Reports images/sec and images/sec per core, so the worker count of the pool can be sized for the host.
+Images are synthetic photos (noise over gradients), so the encoders can't compress them too well.
+
+Run from the project root:
+    python -m benchmarks.image_derivatives --images 100 --width 2000 --height 1500
+"""
+import argparse
+import io
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageDraw
+
+from benchmarks import _env  # noqa: F401
+from src.core.image_intake.derivatives import make_image_derivatives
+
+
+def make_photo(width: int, height: int, seed: int) -> bytes:
+    rng = random.Random(seed)
+    image = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    draw = ImageDraw.Draw(image)
+    for _ in range(30):
+        x, y = rng.randrange(width), rng.randrange(height)
+        radius = rng.randrange(20, max(21, min(width, height) // 3))
+        draw.ellipse((x - radius, y - radius, x + radius, y + radius),
+                     fill=(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    noise = Image.effect_noise((width, height), 40).convert("RGB")
+    image = Image.blend(image, noise, 0.2)
+
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def run(bodies: list, widths: list, quality: int, worker_count: int) -> float:
+    with ProcessPoolExecutor(max_workers=worker_count, mp_context=multiprocessing.get_context("spawn")) as executor:
+        # Workers are started before the measurement, the app's pool lives as long as the app
+        list(executor.map(make_image_derivatives, bodies[:worker_count], [widths] * worker_count))
+
+        started = time.perf_counter()
+        results = list(executor.map(make_image_derivatives, bodies, [widths] * len(bodies), [quality] * len(bodies)))
+        elapsed = time.perf_counter() - started
+
+    assert all(len(derivatives) == len(widths) * 2 for derivatives in results)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=100)
+    parser.add_argument("--width", type=int, default=2000, help="Width of the original images")
+    parser.add_argument("--height", type=int, default=1500, help="Height of the original images")
+    parser.add_argument("--widths", default="160,480,960", help="Widths of the derivatives")
+    parser.add_argument("--quality", type=int, default=80)
+    parser.add_argument("--workers", default=None,
+                        help="Comma-separated worker counts, powers of two up to the CPU count by default")
+    args = parser.parse_args()
+
+    widths = [int(width) for width in args.widths.split(",")]
+    cpu_count = os.cpu_count() or 1
+    if args.workers:
+        worker_counts = [int(count) for count in args.workers.split(",")]
+    else:
+        worker_counts = sorted({*(2 ** power for power in range(cpu_count.bit_length()) if 2 ** power <= cpu_count),
+                                cpu_count})
+
+    bodies = [make_photo(args.width, args.height, seed) for seed in range(args.images)]
+    print(f"images: {args.images}, original: {args.width}x{args.height} "
+          f"({sum(map(len, bodies)) // len(bodies) // 1024} KB on average), derivatives: {widths} x jpg/webp, "
+          f"quality: {args.quality}, CPUs: {cpu_count}")
+    for worker_count in worker_counts:
+        elapsed = run(bodies, widths, args.quality, worker_count)
+        images_per_second = args.images / elapsed
+        print(f"{worker_count:3d} worker(s): {images_per_second:8.1f} images/sec  "
+              f"{images_per_second / min(worker_count, cpu_count):7.1f} images/sec per core")
+
+
+if __name__ == "__main__":
+    main()
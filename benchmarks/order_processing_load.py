@@ -0,0 +1,146 @@
+"""
+Floods the order processing consumer with synthetic reserve / release orders for a handful of hot products
+and reports orders/sec and latency (from delivery to acknowledgement) with and without batching.
+Batch size 1 means the consumer callback without batching.
+
+Broker deliveries come from an in-memory stand-in that respects the prefetch count.
+MongoDB is simulated too: each transaction costs a few round trips and holds the documents it changes,
+so concurrent transactions on the same hot product wait for each other as write conflicts would make them do.
+
+Run from the project root:
+    python -m benchmarks.order_processing_load --orders 5000 --batch-sizes 1 8 32
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from bson import ObjectId
+
+from benchmarks import _env  # noqa: F401
+from benchmarks.stand_ins.amqp import FakeBroker, FakeDeliveryQueue
+from src.core.message_broker.encoders import json_encode, decode_message, JSON_CONTENT_TYPE
+from src.param_classes.orders.order_processing_message import OrderProcessingMessage
+from src.services.orders.replication.order_batcher import OrderProcessingBatcher
+from src.services.orders.replication.order_processing import RESERVE_ROUTING_KEY, RELEASE_ROUTING_KEY
+
+STOCK_CHANGE_SIGNS = {RESERVE_ROUTING_KEY: -1, RELEASE_ROUTING_KEY: 1}
+
+
+class FakeStockDatabase:
+    """
+    Stock of products with a simulated cost of the transaction used by OrderProcessingHandler.process_batch.
+    """
+    def __init__(self, product_ids: List[ObjectId], round_trip: float, initial_stock: int):
+        self.round_trip = round_trip
+        self.stock: Dict[ObjectId, int] = {product_id: initial_stock for product_id in product_ids}
+        self._document_locks = {product_id: asyncio.Lock() for product_id in product_ids}
+        self.transactions = 0
+
+    async def process_batch(self, messages: List[OrderProcessingMessage]) -> None:
+        stock_changes: Dict[ObjectId, int] = defaultdict(int)
+        for message in messages:
+            for product in message.data["products"]:
+                stock_changes[ObjectId(product["product_id"])] += \
+                    STOCK_CHANGE_SIGNS[message.routing_key] * product["quantity"]
+
+        # start transaction + find processed ids + insert processed ids
+        await asyncio.sleep(self.round_trip * 3)
+        # Documents are locked in the same order by every transaction, so there are no deadlocks
+        locks = [self._document_locks[product_id] for product_id in sorted(stock_changes)]
+        for lock in locks:
+            await lock.acquire()
+        try:
+            # bulk write + commit
+            await asyncio.sleep(self.round_trip * 2)
+            for product_id, stock_change in stock_changes.items():
+                self.stock[product_id] += stock_change
+        finally:
+            for lock in locks:
+                lock.release()
+        self.transactions += 1
+
+
+def build_orders(count: int, product_ids: List[ObjectId], max_items: int, release_ratio: float) -> List[tuple]:
+    orders = []
+    for _ in range(count):
+        routing_key = RELEASE_ROUTING_KEY if random.random() < release_ratio else RESERVE_ROUTING_KEY
+        products = [{"product_id": str(product_id), "quantity": random.randint(1, 3)}
+                    for product_id in random.sample(product_ids, random.randint(1, max_items))]
+        orders.append((routing_key, json_encode({"products": products}), str(ObjectId())))
+    return orders
+
+
+async def run(orders: List[tuple], product_ids: List[ObjectId], batch_size: int, args) -> dict:
+    broker = FakeBroker(round_trip=args.round_trip_ms / 1000)
+    queue = FakeDeliveryQueue(broker, prefetch_count=args.prefetch)
+    database = FakeStockDatabase(product_ids, round_trip=args.db_round_trip_ms / 1000, initial_stock=10 ** 9)
+    if batch_size > 1:
+        batcher = OrderProcessingBatcher(max_size=batch_size, window_seconds=args.window_ms / 1000,
+                                         process_batch=database.process_batch)
+        callback = batcher.add
+    else:
+        # The consumer callback without batching: one transaction per message
+        async def callback(message):
+            data = decode_message(message.body, message.content_type, message.content_encoding)
+            await database.process_batch([OrderProcessingMessage(message.routing_key, data, message.message_id)])
+            await message.ack()
+
+    delivered_at = {}
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    for routing_key, body, message_id in orders:
+        await queue.deliver(callback, routing_key, body, message_id=message_id,
+                            content_type=JSON_CONTENT_TYPE)
+        delivered_at[message_id] = loop.time()
+    await queue.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(acked_at - delivered_at[message.message_id] for message, acked_at in queue.acked)
+    return {
+        "orders_per_second": len(orders) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        "transactions": database.transactions,
+        "acked": len(queue.acked),
+        "rejected": len(queue.rejected),
+        "stock": database.stock,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--products", type=int, default=5, help="Count of hot products in the flash sale")
+    parser.add_argument("--max-items", type=int, default=3, help="Max count of products in one order")
+    parser.add_argument("--release-ratio", type=float, default=0.1, help="Share of release messages")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--window-ms", type=float, default=10)
+    parser.add_argument("--prefetch", type=int, default=32)
+    parser.add_argument("--round-trip-ms", type=float, default=0.2, help="Simulated broker round trip")
+    parser.add_argument("--db-round-trip-ms", type=float, default=1, help="Simulated MongoDB round trip")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    product_ids = [ObjectId() for _ in range(args.products)]
+    orders = build_orders(args.orders, product_ids, min(args.max_items, args.products), args.release_ratio)
+
+    print(f"orders: {args.orders}, hot products: {args.products}, prefetch: {args.prefetch}, "
+          f"window: {args.window_ms} ms")
+    final_stocks = []
+    for batch_size in args.batch_sizes:
+        result = await run(orders, product_ids, batch_size, args)
+        final_stocks.append(result["stock"])
+        print(f"batch size {batch_size:4d}: {result['orders_per_second']:9.0f} orders/sec  "
+              f"p50 {result['p50_ms']:7.2f} ms  p99 {result['p99_ms']:7.2f} ms  "
+              f"transactions {result['transactions']:6d}  acked {result['acked']}  rejected {result['rejected']}")
+
+    # Merging $inc deltas must not change the result
+    assert all(stock == final_stocks[0] for stock in final_stocks), "Final stock differs between batch sizes"
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,75 @@
+"""
+Runs OrphanedImageCollector over a bucket with many product images (each one with its derivatives),
+some of them referenced by products. Reports listed objects/sec, the stats of the collection
+and peak memory allocated by Python, which stays flat as the count of objects grows,
+since the bucket is listed and checked page by page.
+S3 is a local stand-in with simulated latency, db lookups are in-memory stand-ins.
+
+Run from the project root:
+    python -m benchmarks.orphaned_images --images 5000 --referenced 0.8
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+import tracemalloc
+from datetime import timedelta
+
+from benchmarks import _env  # noqa: F401
+from benchmarks.stand_ins.mongo import FakeImageBlobRepository, FakeImageReferenceRepository
+from benchmarks.stand_ins.s3 import running_fake_s3
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=5000, help="Count of original product images")
+    parser.add_argument("--referenced", type=float, default=0.8, help="Share of the images used by products")
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=5, help="Simulated latency of each S3 request")
+    args = parser.parse_args()
+
+    with running_fake_s3(latency=args.latency_ms / 1000) as server:
+        # The collector uses the shared S3 client, so the stand-in is set before it's created
+        os.environ["S3_ENDPOINT_URL"] = server.endpoint_url
+        os.environ.setdefault("AWS_ACCESS_KEY_ID", "benchmark")
+        os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark")
+        from src.config.settings import CDN_HOST_NAME, IMAGE_DERIVATIVE_WIDTHS, S3_BUCKET_NAME
+        from src.core.image_intake.derivatives import DERIVATIVE_EXTENSIONS
+        from src.services.create_image_name import create_derivative_key
+        from src.services.orphaned_images.orphaned_image_collector import OrphanedImageCollector
+
+        referenced_urls = set()
+        for index in range(args.images):
+            key = f"products/{index:024x}_0_{random.getrandbits(32):08x}.jpg"
+            keys = [key, *(create_derivative_key(key, width, extension)
+                           for width in IMAGE_DERIVATIVE_WIDTHS for extension in DERIVATIVE_EXTENSIONS)]
+            for derivative_key in keys:
+                server.objects[f"/{S3_BUCKET_NAME}/{derivative_key}"] = (b"", "image/jpeg")
+            if random.random() < args.referenced:
+                referenced_urls.add(f"{CDN_HOST_NAME}/{key}")
+        total_objects = len(server.objects)
+
+        reference_repo = FakeImageReferenceRepository({"products": referenced_urls})
+        collector = OrphanedImageCollector(grace_period=timedelta(0), page_size=args.page_size,
+                                           progress_interval=10 ** 9, on_progress=lambda stats: None,
+                                           reference_repo=reference_repo, blob_repo=FakeImageBlobRepository())
+        tracemalloc.start()
+        started = time.perf_counter()
+        stats = await collector.collect(["products"])
+        elapsed = time.perf_counter() - started
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(f"objects: {total_objects}, referenced images: {len(referenced_urls)} of {args.images}, "
+              f"page size: {args.page_size}, latency: {args.latency_ms} ms")
+        print(f"{total_objects / elapsed:8.1f} objects/sec, {reference_repo.lookups} db lookups, "
+              f"peak memory {peak_memory / 1024 / 1024:.1f} MB")
+        print(stats)
+        # Only orphaned images and their derivatives were deleted
+        assert len(server.objects) == len(referenced_urls) * (1 + len(IMAGE_DERIVATIVE_WIDTHS) *
+                                                              len(DERIVATIVE_EXTENSIONS))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
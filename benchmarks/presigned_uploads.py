@@ -0,0 +1,79 @@
+"""
+Runs direct-to-storage image uploads against a local S3 stand-in, the way the admin frontend does them:
+the app signs presigned POST forms, clients upload images straight to the storage
+and the app checks the uploaded objects with HEAD requests on commit.
+Image bytes never pass through the app, it only signs forms and checks metadata.
+Also checks that the storage rejects images that don't meet conditions of the form.
+The stand-in runs in the same process as the clients, so absolute numbers are bounded by the GIL.
+
+Run from the project root:
+    python -m benchmarks.presigned_uploads --uploads 200 --latency-ms 20
+"""
+import argparse
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks import _env  # noqa: F401
+from benchmarks.stand_ins.s3 import running_fake_s3
+
+
+def upload_with_form(upload: dict, body: bytes, content_type: str = "image/jpeg") -> int:
+    fields = {**upload["fields"], "Content-Type": content_type}
+    response = requests.post(upload["url"], data=fields, files={"file": ("image.jpg", body, content_type)})
+    return response.status_code
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uploads", type=int, default=200)
+    parser.add_argument("--image-kb", type=int, default=200, help="Size of each uploaded image")
+    parser.add_argument("--latency-ms", type=float, default=20, help="Simulated latency of each S3 request")
+    parser.add_argument("--clients", type=int, default=16, help="Count of clients uploading at the same time")
+    args = parser.parse_args()
+
+    with running_fake_s3(latency=args.latency_ms / 1000) as server:
+        # The storage URL is known once the stand-in is started, so the app modules are imported afterwards
+        os.environ["S3_ENDPOINT_URL"] = server.endpoint_url
+        os.environ.setdefault("AWS_ACCESS_KEY_ID", "benchmark")
+        os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark")
+        os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+        from src.services.presigned_image_uploads import create_image_upload, check_uploaded_images
+
+        keys = [f"products/benchmark_{index}.jpg" for index in range(args.uploads)]
+        body = b"\xff\xd8\xff\xe0" + os.urandom(args.image_kb * 1024)
+        print(f"uploads: {args.uploads}, image size: {args.image_kb} KB, latency: {args.latency_ms} ms, "
+              f"clients: {args.clients}")
+
+        started = time.perf_counter()
+        uploads = await asyncio.gather(*(create_image_upload(key) for key in keys))
+        elapsed = time.perf_counter() - started
+        print(f"sign forms (app)      : {args.uploads / elapsed:8.1f} forms/sec")
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.clients) as clients:
+            statuses = list(clients.map(upload_with_form, uploads, [body] * args.uploads))
+        elapsed = time.perf_counter() - started
+        assert all(status == 204 for status in statuses), statuses
+        print(f"upload (clients)      : {args.uploads / elapsed:8.1f} uploads/sec, "
+              f"{args.uploads * len(body) / elapsed / 1024 ** 2:.1f} MB/sec, 0 bytes through the app")
+
+        started = time.perf_counter()
+        errors = await check_uploaded_images(keys)
+        elapsed = time.perf_counter() - started
+        assert not errors, errors
+        print(f"commit checks (app)   : {args.uploads / elapsed:8.1f} HEAD/sec")
+
+        rejected_upload, = await asyncio.gather(create_image_upload("products/rejected.jpg"))
+        too_large = upload_with_form(rejected_upload, b"\xff\xd8\xff" + bytes(1024 ** 2 + 1))
+        wrong_type = upload_with_form(rejected_upload, b"\x89PNG", content_type="image/png")
+        missing = await check_uploaded_images(["products/rejected.jpg"])
+        print(f"rejected by storage   : too large -> {too_large}, wrong type -> {wrong_type}, "
+              f"commit -> {missing[0]}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
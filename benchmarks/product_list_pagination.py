@@ -0,0 +1,140 @@
+"""
+Compares pages of the admin product list at different depths:
+the previous pipeline (variations looked up for every product before $skip, sorted after $limit),
+the offset pipeline (sorted, skipped and limited before the lookup) and the cursor pipeline (seek on the index).
+Reports milliseconds per page.
+
+Needs a running MongoDB, the synthetic catalog is inserted into a separate database
+(products without variations and parents with variations) and kept for the next runs.
+
+Run from the project root:
+    python -m benchmarks.product_list_pagination --products 1000000 --pages 1 100 1000 10000 50000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import motor.motor_asyncio
+from bson import Decimal128, ObjectId
+
+from benchmarks import _env  # noqa: F401
+from src.aggregation_queries.products.product_list import (
+    get_product_list_pipeline,
+    get_product_list_after_pipeline,
+    get_variations_of_page_stages,
+)
+from src.apps.products.repository import ProductAdminRepository
+
+PROJECTION = ProductAdminRepository._product_list_projection
+
+
+def get_previous_pipeline(page: int, page_size: int) -> list:
+    # Pipeline of the product list before the cursor was added, without the count
+    return [
+        {"$match": {"$or": [{"parent": True}, {"parent_id": None}]}},
+        *get_variations_of_page_stages(PROJECTION),
+        {"$skip": (page - 1) * page_size},
+        {"$limit": page_size},
+        {"$sort": {"created_at": 1}},
+    ]
+
+
+def make_product(created_at: datetime, parent: bool = False, parent_id: ObjectId = None) -> dict:
+    return {
+        "_id": ObjectId(),
+        "name": f"Product {created_at.timestamp()}",
+        "price": Decimal128(Decimal("19.99")),
+        "tax_rate": Decimal128(Decimal("0.2")),
+        "for_sale": not parent,
+        "parent": parent,
+        "parent_id": parent_id,
+        "sku": str(ObjectId()),
+        "created_at": created_at,
+        "modified_at": created_at,
+    }
+
+
+async def seed(collection, product_count: int, parent_share: float, variation_count: int) -> None:
+    if await collection.estimated_document_count() >= product_count:
+        return
+    await collection.drop()
+    started_at = datetime(2020, 1, 1)
+    batch = []
+    parent_every = round(1 / parent_share) if parent_share else 0
+    for index in range(product_count):
+        # Several products share created_at, like products created by one request
+        created_at = started_at + timedelta(milliseconds=index // 3)
+        if parent_every and index % parent_every == 0:
+            parent = make_product(created_at, parent=True)
+            batch.append(parent)
+            batch.extend(make_product(created_at, parent_id=parent["_id"]) for _ in range(variation_count))
+        else:
+            batch.append(make_product(created_at))
+        if len(batch) >= 10000:
+            await collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await collection.insert_many(batch, ordered=False)
+
+
+async def measure(collection, pipeline: list, repeats: int) -> float:
+    durations = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        await collection.aggregate(pipeline, allowDiskUse=True).to_list(length=None)
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations) * 1000
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=1000000, help="Count of top-level products")
+    parser.add_argument("--parent-share", type=float, default=0.1, help="Share of the products with variations")
+    parser.add_argument("--variations", type=int, default=3, help="Count of variations of each parent")
+    parser.add_argument("--page-size", type=int, default=10)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 100, 1000, 10000, 50000])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--skip-previous", action="store_true",
+                        help="Don't measure the previous pipeline, it joins the whole catalog on every page")
+    parser.add_argument("--mongodb-url", default="mongodb://localhost:27017")
+    parser.add_argument("--database", default="benchmark_product_list")
+    args = parser.parse_args()
+
+    client = motor.motor_asyncio.AsyncIOMotorClient(args.mongodb_url)
+    # The lookup of variations refers to the "products" collection of the same database
+    collection = client[args.database].products
+    started = time.perf_counter()
+    await seed(collection, args.products, args.parent_share, args.variations)
+    await collection.create_index([("parent_id", 1), ("created_at", 1), ("_id", 1)])
+    print(f"catalog: {await collection.estimated_document_count()} documents "
+          f"(ready in {time.perf_counter() - started:.1f} s), page size: {args.page_size}")
+
+    for page in args.pages:
+        skipped = (page - 1) * args.page_size
+        # Cursor of the page is the last product of the previous page, it's found outside the measurement
+        previous_products = await collection.find({"parent_id": None}, {"created_at": 1}) \
+            .sort([("created_at", 1), ("_id", 1)]).skip(skipped - 1).limit(1).to_list(length=1) if skipped else []
+        if skipped and not previous_products:
+            print(f"page {page:6d}: beyond the catalog")
+            continue
+        after = (previous_products[0]["created_at"], previous_products[0]["_id"]) if previous_products else None
+
+        results = []
+        if not args.skip_previous:
+            results.append(("previous", await measure(collection, get_previous_pipeline(page, args.page_size),
+                                                      args.repeats)))
+        results.append(("offset", await measure(collection, get_product_list_pipeline(page, args.page_size,
+                                                                                      PROJECTION), args.repeats)))
+        results.append(("cursor", await measure(collection, get_product_list_after_pipeline(after, args.page_size + 1,
+                                                                                            PROJECTION),
+                                                args.repeats)))
+        print(f"page {page:6d}: " + "  ".join(f"{name} {duration:9.1f} ms" for name, duration in results))
+
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
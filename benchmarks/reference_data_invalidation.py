@@ -0,0 +1,124 @@
+"""
+Shows how long other app instances serve stale reference data after a write, with and without the invalidation bus.
+Several instances with their own ReferenceDataCache share an in-memory catalog of facets. One instance updates
+a facet and invalidates its cache, the others read the facets until they see the update.
+Without the bus they see it once their copies expire (--ttl-seconds).
+Pub/sub is replaced with an in-memory stand-in, pass --redis-url to use a running Redis instead.
+
+Run from the project root:
+    python -m benchmarks.reference_data_invalidation --instances 4 --writes 50
+    python -m benchmarks.reference_data_invalidation --redis-url redis://localhost:6379/0
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from bson import ObjectId
+
+from benchmarks import _env  # noqa: F401
+from benchmarks.stand_ins.pubsub import FakePubSub
+from src.core.cache_invalidation.buses import create_reference_data_bus
+from src.core.cache_invalidation.channels import RedisInvalidationChannel
+from src.services.reference_data_cache import ReferenceDataCache
+
+CATEGORY_ID = ObjectId()
+
+
+class FakeReferenceRepository:
+    """
+    Collection shared by all instances, each read is one simulated db round trip.
+    """
+    def __init__(self, documents: list, read_latency: float):
+        self.documents = documents
+        self.read_latency = read_latency
+        self.reads = 0
+
+    async def get_list(self, *args, **kwargs) -> list:
+        self.reads += 1
+        await asyncio.sleep(self.read_latency)
+        return [dict(document) for document in self.documents]
+
+    get_facet_list = get_facet_type_list = get_variation_theme_list = get_category_list = get_list
+
+
+async def wait_for_version(cache: ReferenceDataCache, version: int, timeout: float, poll_interval: float) -> float:
+    """
+    :return: Milliseconds until the instance served the facet of the version, or the timeout.
+    """
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        facets = await cache.get_facets_of_category(CATEGORY_ID)
+        if facets[0]["version"] >= version:
+            break
+        await asyncio.sleep(poll_interval)
+    return (time.perf_counter() - started) * 1000
+
+
+async def run(with_bus: bool, args) -> dict:
+    facets = FakeReferenceRepository([{"_id": ObjectId(), "categories": ["*"], "version": 0}],
+                                     args.read_latency_ms / 1000)
+    empty = FakeReferenceRepository([], args.read_latency_ms / 1000)
+    caches = [ReferenceDataCache(facets, empty, empty, empty, ttl_seconds=args.ttl_seconds)
+              for _ in range(args.instances)]
+
+    buses = []
+    if with_bus:
+        pubsub = FakePubSub(latency=args.latency_ms / 1000)
+        for cache in caches:
+            channel = (RedisInvalidationChannel(args.redis_url, args.channel) if args.redis_url
+                       else pubsub.channel())
+            buses.append(create_reference_data_bus(channel, cache))
+        for bus in buses:
+            await bus.start()
+
+    # Warm up copies of all instances
+    await asyncio.gather(*(cache.get_facets_of_category(CATEGORY_ID) for cache in caches))
+
+    writer, readers = caches[0], caches[1:]
+    stale_ms = []
+    for version in range(1, args.writes + 1):
+        facets.documents[0]["version"] = version
+        writer.invalidate("facets")
+        stale_ms.extend(await asyncio.gather(*(
+            wait_for_version(cache, version, args.ttl_seconds * 2, args.poll_interval_ms / 1000)
+            for cache in readers
+        )))
+
+    lags = [bus.stats.as_dict() for bus in buses[1:]]
+    for bus in buses:
+        await bus.stop()
+
+    return {
+        "stale_mean_ms": statistics.mean(stale_ms),
+        "stale_max_ms": max(stale_ms),
+        "bus_lag_mean_ms": statistics.mean(lag["mean_lag_ms"] for lag in lags) if lags else None,
+        "bus_lag_max_ms": max(lag["max_lag_ms"] for lag in lags) if lags else None,
+        "db_reads": facets.reads,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--instances", type=int, default=4)
+    parser.add_argument("--writes", type=int, default=20)
+    parser.add_argument("--ttl-seconds", type=float, default=1)
+    parser.add_argument("--latency-ms", type=float, default=0.5, help="Simulated pub/sub delivery latency")
+    parser.add_argument("--read-latency-ms", type=float, default=1, help="Simulated db round trip")
+    parser.add_argument("--poll-interval-ms", type=float, default=1)
+    parser.add_argument("--redis-url", help="Use a running Redis instead of the in-memory stand-in")
+    parser.add_argument("--channel", default="benchmarks.reference_data_invalidation")
+    args = parser.parse_args()
+
+    print(f"{'bus':>5} {'stale mean ms':>14} {'stale max ms':>13} {'lag mean ms':>12} {'lag max ms':>11} "
+          f"{'db reads':>9}")
+    for with_bus in (False, True):
+        result = await run(with_bus, args)
+        lag_mean = f"{result['bus_lag_mean_ms']:.2f}" if with_bus else "-"
+        lag_max = f"{result['bus_lag_max_ms']:.2f}" if with_bus else "-"
+        print(f"{'yes' if with_bus else 'no':>5} {result['stale_mean_ms']:>14.1f} {result['stale_max_ms']:>13.1f} "
+              f"{lag_mean:>12} {lag_max:>11} {result['db_reads']:>9}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+"""
+Compares the pydantic-based ProductReplicationPreparer path (parse_obj -> .dict() -> convert_type x2 -> json.dumps)
+with the schema projection + single-pass JSON encoder for products with many variations.
+
+Run from the project root:
+    python -m benchmarks.replication_serializer --variations 1000 --repeat 20
+"""
+import argparse
+import asyncio
+import json
+import time
+from decimal import Decimal
+
+from bson import ObjectId, Decimal128
+
+from benchmarks import _env  # noqa: F401
+from src.core.message_broker.encoders import json_encode
+from src.services.create_image_name import create_product_image_name
+from src.services.products.replication.product_replication_preparer import ProductReplicationPreparer
+from src.utils import convert_type
+
+
+def build_variations(count: int, attrs_per_variation: int) -> list[dict]:
+    """
+    Builds variations in the same shape as create_variations_replica returns them.
+    """
+    parent_id = ObjectId()
+    variations = []
+    for i in range(count):
+        product_id = ObjectId()
+        variations.append({
+            "_id": product_id,
+            "parent_id": parent_id,
+            "name": f"Benchmark product variation {i}",
+            "price": Decimal128(f"{10 + i % 90}.99"),
+            "discount_rate": None,
+            "tax_rate": Decimal128("0.20"),
+            "stock": 100 + i,
+            "max_order_qty": 10,
+            "sku": f"BENCH-{i:06d}",
+            "for_sale": True,
+            "same_images": False,
+            "is_filterable": True,
+            "category": ObjectId(),
+            "search_terms": ["benchmark", "product"],
+            "attrs": [{"code": f"attr_{j}", "name": f"Attribute {j}", "value": f"value {j}",
+                       "type": "string", "unit": None, "optional": False} for j in range(attrs_per_variation)],
+            "image": create_product_image_name(product_id),
+        })
+
+    return variations
+
+
+async def legacy_path(variations: list[dict]) -> bytes:
+    prepared_data = await ProductReplicationPreparer.prepare_data_of_created_variations(variations)
+    prepared_data = [convert_type(variation.dict(), ObjectId, str) for variation in prepared_data]
+    prepared_data = [convert_type(variation, Decimal, str) for variation in prepared_data]
+    return json.dumps(prepared_data).encode()
+
+
+async def fast_path(variations: list[dict]) -> bytes:
+    prepared_data = ProductReplicationPreparer.project_data_of_created_variations(variations)
+    return json_encode(prepared_data)
+
+
+async def measure(path, variations: list[dict], repeat: int) -> tuple[float, int]:
+    body = await path(variations)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        await path(variations)
+    return (time.perf_counter() - started) / repeat, len(body)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--variations", type=int, default=1000)
+    parser.add_argument("--attrs", type=int, default=15, help="Attributes per variation")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    variations = build_variations(args.variations, args.attrs)
+    legacy_seconds, legacy_size = await measure(legacy_path, variations, args.repeat)
+    fast_seconds, fast_size = await measure(fast_path, variations, args.repeat)
+
+    print(f"variations: {args.variations}, attrs per variation: {args.attrs}, repeat: {args.repeat}")
+    print(f"preparer + convert_type: {legacy_seconds * 1000:8.2f} ms/message  ({legacy_size} bytes)")
+    print(f"projection + json_encode: {fast_seconds * 1000:8.2f} ms/message  ({fast_size} bytes)")
+    print(f"speedup: {legacy_seconds / fast_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
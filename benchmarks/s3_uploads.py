@@ -0,0 +1,120 @@
+"""
+Compares the old S3 path (a new boto3 client per call and a blocking upload on the event loop)
+with the shared AsyncS3Client (one pooled client, calls run in a thread pool with a concurrency limit).
+Uploads go to a local S3 stand-in with simulated latency. Besides uploads/sec it reports how long
+the event loop was blocked: a probe task sleeps for 1 ms in a loop and everything above that is lag.
+
+Run from the project root:
+    python -m benchmarks.s3_uploads --uploads 200 --latency-ms 20 --concurrency 16
+"""
+import argparse
+import asyncio
+import io
+import os
+import time
+
+import boto3
+from botocore.config import Config
+
+from benchmarks import _env  # noqa: F401
+from benchmarks.stand_ins.s3 import running_fake_s3
+from src.core.file_storage.async_s3_client import AsyncS3Client
+
+BUCKET_NAME = "benchmark-bucket"
+PROBE_INTERVAL = 0.001
+
+
+class EventLoopLagProbe:
+    def __init__(self):
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+        self._last_tick = 0.0
+        self._task = None
+
+    def _add_lag(self, now: float) -> None:
+        lag = max(0.0, now - self._last_tick - PROBE_INTERVAL)
+        self.max_lag = max(self.max_lag, lag)
+        self.total_lag += lag
+        self._last_tick = now
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(PROBE_INTERVAL)
+            self._add_lag(loop.time())
+
+    async def __aenter__(self):
+        self._last_tick = asyncio.get_running_loop().time()
+        self._task = asyncio.create_task(self._run())
+        # Let the probe start before the measured code
+        await asyncio.sleep(0)
+        return self
+
+    async def __aexit__(self, *exc):
+        # The loop could be blocked until the very end, the probe hasn't seen that lag yet
+        self._add_lag(asyncio.get_running_loop().time())
+        self._task.cancel()
+
+
+def new_client(endpoint_url: str, max_pool_connections: int = 10):
+    return boto3.client("s3", endpoint_url=endpoint_url, aws_access_key_id="benchmark",
+                        aws_secret_access_key="benchmark", region_name="us-east-1",
+                        config=Config(max_pool_connections=max_pool_connections))
+
+
+async def client_per_call(endpoint_url: str, bodies: list, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def upload_one(index: int, body: bytes):
+        async with semaphore:
+            # Exactly what upload_file_to_s3 did before: new client, blocking upload on the event loop
+            s3 = new_client(endpoint_url)
+            s3.upload_fileobj(io.BytesIO(body), BUCKET_NAME, f"products/{index}.jpg",
+                              ExtraArgs={"ContentType": "image/jpeg"})
+
+    started = time.perf_counter()
+    await asyncio.gather(*(upload_one(index, body) for index, body in enumerate(bodies)))
+    return time.perf_counter() - started
+
+
+async def shared_async_client(s3: AsyncS3Client, bodies: list) -> float:
+    started = time.perf_counter()
+    await asyncio.gather(*(s3.put_object(BUCKET_NAME, f"products/{index}.jpg", body, content_type="image/jpeg")
+                           for index, body in enumerate(bodies)))
+    return time.perf_counter() - started
+
+
+def report(name: str, uploads: int, elapsed: float, probe: EventLoopLagProbe) -> None:
+    print(f"{name:26s}: {uploads / elapsed:8.1f} uploads/sec  "
+          f"loop blocked {probe.total_lag * 1000:8.1f} ms total, {probe.max_lag * 1000:7.1f} ms max")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uploads", type=int, default=200)
+    parser.add_argument("--image-kb", type=int, default=200, help="Size of each uploaded image")
+    parser.add_argument("--latency-ms", type=float, default=20, help="Simulated latency of each S3 request")
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    bodies = [os.urandom(args.image_kb * 1024) for _ in range(args.uploads)]
+    with running_fake_s3(latency=args.latency_ms / 1000) as server:
+        print(f"uploads: {args.uploads}, image size: {args.image_kb} KB, latency: {args.latency_ms} ms, "
+              f"concurrency: {args.concurrency}")
+        async with EventLoopLagProbe() as probe:
+            elapsed = await client_per_call(server.endpoint_url, bodies, args.concurrency)
+        report("client per call, blocking", args.uploads, elapsed, probe)
+
+        # The shared client is created once at startup, like get_async_s3_client does
+        s3 = AsyncS3Client(new_client(server.endpoint_url, max_pool_connections=args.concurrency),
+                           max_concurrency=args.concurrency)
+        async with EventLoopLagProbe() as probe:
+            elapsed = await shared_async_client(s3, bodies)
+        report("shared AsyncS3Client", args.uploads, elapsed, probe)
+        s3.close()
+
+        assert len(server.objects) == args.uploads
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,158 @@
+"""
+In-memory stand-in for the parts of aio_pika used by the service.
+Each broker round trip is simulated with asyncio.sleep, so connect-per-message
+and pooled publishing can be compared without a running RabbitMQ.
+"""
+import asyncio
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import aio_pika
+
+
+class FakeBroker:
+    def __init__(self, round_trip: float = 0.0005, handshake: float = 0.005):
+        """
+        :param round_trip: Simulated latency of one AMQP method (channel.open, exchange.declare, confirm).
+        :param handshake: Simulated latency of TCP + AMQP connection handshake.
+        """
+        self.round_trip = round_trip
+        self.handshake = handshake
+        self.published: List[Tuple[str, bytes]] = []
+        self.opened_connections = 0
+        self.opened_channels = 0
+
+
+class FakeExchange:
+    def __init__(self, broker: FakeBroker, name: str):
+        self._broker = broker
+        self.name = name
+
+    async def publish(self, message, routing_key: str, **kwargs):
+        await asyncio.sleep(self._broker.round_trip)
+        self._broker.published.append((routing_key, message.body))
+
+
+class FakeQueue:
+    def __init__(self, broker: FakeBroker, name: str):
+        self._broker = broker
+        self.name = name
+
+    async def bind(self, exchange, routing_key: str = None, **kwargs):
+        await asyncio.sleep(self._broker.round_trip)
+
+    async def consume(self, callback, **kwargs):
+        await asyncio.sleep(self._broker.round_trip)
+
+
+class FakeChannel:
+    def __init__(self, broker: FakeBroker):
+        self._broker = broker
+        self.is_closed = False
+
+    async def declare_exchange(self, name: str, exchange_type=None, **kwargs):
+        await asyncio.sleep(self._broker.round_trip)
+        return FakeExchange(self._broker, name)
+
+    async def declare_queue(self, name: str = '', **kwargs):
+        await asyncio.sleep(self._broker.round_trip)
+        return FakeQueue(self._broker, name or "amq.gen-fake")
+
+    async def set_qos(self, **kwargs):
+        await asyncio.sleep(self._broker.round_trip)
+
+    async def close(self):
+        self.is_closed = True
+
+
+class FakeConnection:
+    def __init__(self, broker: FakeBroker):
+        self._broker = broker
+        self.is_closed = False
+
+    async def channel(self, **kwargs):
+        await asyncio.sleep(self._broker.round_trip)
+        self._broker.opened_channels += 1
+        return FakeChannel(self._broker)
+
+    async def close(self):
+        self.is_closed = True
+
+
+class FakeIncomingMessage:
+    """
+    Delivered message with the attributes and ack / reject methods used by the consumers.
+    """
+    def __init__(self, queue: "FakeDeliveryQueue", delivery_tag: int, routing_key: str, body: bytes,
+                 message_id: Optional[str] = None, content_type: Optional[str] = None,
+                 content_encoding: Optional[str] = None):
+        self._queue = queue
+        self.delivery_tag = delivery_tag
+        self.routing_key = routing_key
+        self.body = body
+        self.message_id = message_id
+        self.content_type = content_type
+        self.content_encoding = content_encoding
+
+    async def ack(self, multiple: bool = False):
+        await self._queue.settle(self, multiple=multiple, acked=True)
+
+    async def reject(self, requeue: bool = False):
+        await self._queue.settle(self, multiple=False, acked=False)
+
+
+class FakeDeliveryQueue:
+    """
+    Queue that delivers messages to the consumer callback, each in its own task as aio_pika does,
+    keeping at most prefetch_count messages unacknowledged.
+    Records when each message was acknowledged or rejected.
+    """
+    def __init__(self, broker: FakeBroker, prefetch_count: int):
+        self._broker = broker
+        self._prefetch = asyncio.Semaphore(prefetch_count)
+        self._unacked: Dict[int, FakeIncomingMessage] = {}
+        self._next_delivery_tag = 1
+        self.acked: List[Tuple[FakeIncomingMessage, float]] = []
+        self.rejected: List[Tuple[FakeIncomingMessage, float]] = []
+        self._tasks = set()
+
+    async def deliver(self, callback: Callable, routing_key: str, body: bytes, **properties: Any):
+        await self._prefetch.acquire()
+        message = FakeIncomingMessage(self, self._next_delivery_tag, routing_key, body, **properties)
+        self._next_delivery_tag += 1
+        self._unacked[message.delivery_tag] = message
+        task = asyncio.create_task(callback(message))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def settle(self, message: FakeIncomingMessage, multiple: bool, acked: bool):
+        await asyncio.sleep(self._broker.round_trip)
+        now = asyncio.get_running_loop().time()
+        tags = [tag for tag in self._unacked if tag <= message.delivery_tag] if multiple else [message.delivery_tag]
+        for tag in tags:
+            settled_message = self._unacked.pop(tag)
+            (self.acked if acked else self.rejected).append((settled_message, now))
+            self._prefetch.release()
+
+    async def join(self):
+        while self._unacked or self._tasks:
+            await asyncio.sleep(0.001)
+
+
+@contextmanager
+def patched_aio_pika(broker: FakeBroker):
+    """
+    Replaces aio_pika.connect_robust with a function that connects to the fake broker.
+    """
+    original_connect_robust = aio_pika.connect_robust
+
+    async def connect_robust(*args, **kwargs):
+        await asyncio.sleep(broker.handshake)
+        broker.opened_connections += 1
+        return FakeConnection(broker)
+
+    aio_pika.connect_robust = connect_robust
+    try:
+        yield broker
+    finally:
+        aio_pika.connect_robust = original_connect_robust
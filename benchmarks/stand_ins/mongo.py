@@ -0,0 +1,202 @@
+"""
+In-memory stand-ins for MongoDB repositories.
+Writes to the same document are serialized and each of them takes write_latency seconds,
+which is how document-level write contention limits the throughput of a hot document.
+"""
+import asyncio
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError, OperationFailure, PyMongoError
+
+
+class FakeStockShardRepository:
+    """
+    Implements the methods of StockShardRepository used by ShardedStockCounter.
+    """
+    def __init__(self, write_latency: float = 0.001, read_latency: float = 0.0005):
+        self.write_latency = write_latency
+        self.read_latency = read_latency
+        self.shards: Dict[Tuple[ObjectId, int], int] = {}
+        self._document_locks: Dict[Tuple[ObjectId, int], asyncio.Lock] = defaultdict(asyncio.Lock)
+        self.writes = 0
+
+    async def create_shards(self, product_id: ObjectId, stock: int, shard_count: int, **kwargs):
+        base_stock, remainder = divmod(stock, shard_count)
+        for shard in range(shard_count):
+            self.shards[(product_id, shard)] = base_stock + (1 if shard < remainder else 0)
+
+    async def get_shards(self, product_id: ObjectId, **kwargs) -> List[dict]:
+        await asyncio.sleep(self.read_latency)
+        return [{"shard": shard, "stock": stock} for (shard_product_id, shard), stock in sorted(self.shards.items())
+                if shard_product_id == product_id]
+
+    async def decrement_shard(self, product_id: ObjectId, shard: int, quantity: int, **kwargs) -> bool:
+        key = (product_id, shard)
+        async with self._document_locks[key]:
+            await asyncio.sleep(self.write_latency)
+            self.writes += 1
+            if self.shards.get(key, 0) < quantity:
+                return False
+            self.shards[key] -= quantity
+            return True
+
+    async def increment_shard(self, product_id: ObjectId, shard: int, quantity: int, **kwargs) -> None:
+        key = (product_id, shard)
+        async with self._document_locks[key]:
+            await asyncio.sleep(self.write_latency)
+            self.writes += 1
+            self.shards[key] += quantity
+
+    async def get_total_stock(self, product_ids: List[ObjectId], **kwargs) -> Dict[ObjectId, int]:
+        await asyncio.sleep(self.read_latency)
+        totals: Dict[ObjectId, int] = defaultdict(int)
+        for (product_id, shard), stock in self.shards.items():
+            if product_id in product_ids:
+                totals[product_id] += stock
+        return dict(totals)
+
+
+class FakeImageReferenceRepository:
+    """
+    Implements the methods of ImageReferenceRepository used by OrphanedImageCollector.
+    Each lookup takes read_latency seconds, like an indexed $in query.
+    """
+    def __init__(self, referenced_urls: Dict[str, set], read_latency: float = 0.001):
+        """
+        :param referenced_urls: URLs referenced by the documents of each collection.
+        """
+        self.referenced_urls = referenced_urls
+        self.read_latency = read_latency
+        self.lookups = 0
+
+    async def find_referenced_urls(self, collection_name: str, image_urls: List[str]) -> set:
+        await asyncio.sleep(self.read_latency)
+        self.lookups += 1
+        return self.referenced_urls.get(collection_name, set()).intersection(image_urls)
+
+    async def ensure_indexes(self) -> None:
+        pass
+
+
+class FakeImageBlobRepository:
+    """
+    Implements the methods of ImageBlobRepository used by OrphanedImageCollector.
+    """
+    def __init__(self, recently_acquired_keys: set = frozenset(), read_latency: float = 0.001):
+        """
+        :param recently_acquired_keys: Keys of the blobs acquired within the grace period.
+        """
+        self.recently_acquired_keys = set(recently_acquired_keys)
+        self.read_latency = read_latency
+
+    async def delete_unused(self, keys: List[str], acquired_before) -> List[str]:
+        await asyncio.sleep(self.read_latency)
+        return [key for key in keys if key in self.recently_acquired_keys]
+
+
+class FakeSession:
+    """
+    Session whose with_transaction behaves like the driver's one: writes staged by the callback (See on_commit)
+    are applied only if it succeeds, the callback is retried on errors labeled TransientTransactionError.
+    """
+    def __init__(self, client: "FakeClient"):
+        self.client = client
+        self._staged_writes: List[Callable[[], None]] = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    def on_commit(self, write: Callable[[], None]) -> None:
+        self._staged_writes.append(write)
+
+    async def with_transaction(self, callback: Callable[["FakeSession"], Awaitable]):
+        while True:
+            self._staged_writes = []
+            try:
+                result = await callback(self)
+            except PyMongoError as e:
+                self.client.aborted += 1
+                if e.has_error_label("TransientTransactionError"):
+                    continue
+                raise
+            except Exception:
+                self.client.aborted += 1
+                raise
+
+            for write in self._staged_writes:
+                write()
+            self.client.committed += 1
+            return result
+
+
+class FakeClient:
+    def __init__(self):
+        self.committed = 0
+        self.aborted = 0
+
+    async def start_session(self) -> FakeSession:
+        return FakeSession(self)
+
+
+class FakeProcessedMessageRepository:
+    """
+    Implements ProcessedMessageRepository, marks are applied when the transaction of the session commits.
+    """
+    def __init__(self, processed_ids: set = frozenset(), processed_concurrently: set = frozenset()):
+        """
+        :param processed_ids: Identifiers of the processed messages.
+        :param processed_concurrently: Identifiers of the messages marked by another consumer after they were checked,
+                                       get_processed_ids doesn't return them, but marking them fails.
+        """
+        self.processed_ids = set(processed_ids)
+        self.processed_concurrently = set(processed_concurrently)
+
+    async def get_processed_ids(self, message_ids: List[str], **kwargs) -> set:
+        return self.processed_ids.intersection(message_ids)
+
+    async def mark_as_processed(self, message_id: str, routing_key: str, session: FakeSession) -> None:
+        await self.mark_many_as_processed([{"message_id": message_id, "routing_key": routing_key}], session=session)
+
+    async def mark_many_as_processed(self, messages: List[dict], session: FakeSession) -> None:
+        message_ids = [message["message_id"] for message in messages]
+        if self.processed_ids.union(self.processed_concurrently).intersection(message_ids):
+            raise DuplicateKeyError("E11000 duplicate key error collection: processed_messages")
+        session.on_commit(lambda: self.processed_ids.update(message_ids))
+
+
+class FakeIndexCollection:
+    def __init__(self, database: "FakeIndexDatabase"):
+        self._database = database
+        self.indexes: Dict[str, dict] = {"_id_": {"key": [("_id", 1)]}}
+
+    async def index_information(self) -> Dict[str, dict]:
+        return dict(self.indexes)
+
+    async def create_indexes(self, models: list) -> None:
+        for model in models:
+            document = dict(model.document)
+            name = document["name"]
+            if name in self._database.failing_index_names:
+                raise OperationFailure(f"Index build failed: {name}")
+            document["key"] = list(document["key"].items())
+            self.indexes[name] = document
+
+
+class FakeIndexDatabase:
+    """
+    Database with only the index methods used by ensure_indexes, builds of the failing indexes raise OperationFailure.
+    """
+    def __init__(self, failing_index_names: set = frozenset()):
+        self.failing_index_names = set(failing_index_names)
+        self.collections: Dict[str, FakeIndexCollection] = defaultdict(lambda: FakeIndexCollection(self))
+
+    def __getitem__(self, collection_name: str) -> FakeIndexCollection:
+        return self.collections[collection_name]
+
+    async def command(self, *args, **kwargs) -> dict:
+        return {"ok": 1}
@@ -0,0 +1,53 @@
+"""
+In-memory stand-in for the Redis pub/sub channel of the cache invalidation bus.
+Channels created from the same FakePubSub share messages, so several app instances can be simulated
+in one process. Delivery latency is simulated with asyncio.sleep.
+"""
+import asyncio
+from typing import Set
+
+
+class FakePubSub:
+    def __init__(self, latency: float = 0.0005):
+        """
+        :param latency: Simulated latency between publishing of the message and delivering it to subscribers.
+        """
+        self.latency = latency
+        self.published = 0
+        self._queues: Set[asyncio.Queue] = set()
+
+    def channel(self) -> "FakeInvalidationChannel":
+        return FakeInvalidationChannel(self)
+
+    async def deliver(self, message: str) -> None:
+        await asyncio.sleep(self.latency)
+        for queue in list(self._queues):
+            queue.put_nowait(message)
+
+
+class FakeInvalidationSubscription:
+    def __init__(self, pubsub: FakePubSub):
+        self._pubsub = pubsub
+        self._queue = asyncio.Queue()
+        pubsub._queues.add(self._queue)
+
+    async def get_message(self) -> str:
+        return await self._queue.get()
+
+    async def close(self) -> None:
+        self._pubsub._queues.discard(self._queue)
+
+
+class FakeInvalidationChannel:
+    def __init__(self, pubsub: FakePubSub):
+        self._pubsub = pubsub
+
+    async def publish(self, message: str) -> None:
+        self._pubsub.published += 1
+        await self._pubsub.deliver(message)
+
+    async def subscribe(self) -> FakeInvalidationSubscription:
+        return FakeInvalidationSubscription(self._pubsub)
+
+    async def close(self) -> None:
+        pass
@@ -0,0 +1,199 @@
+"""
+Local S3 stand-in: an HTTP server that accepts the requests boto3 sends for
+put_object, upload_fileobj, head_object, delete_object, delete_objects and list_objects_v2,
+and uploads with presigned POST forms.
+Objects are kept in memory. Each request sleeps for the configured latency,
+as a request to a remote storage would wait for the network.
+Signatures aren't verified, but conditions of the presigned POST policy (content type, size) are enforced.
+Like S3, delete_objects rejects more than 1000 keys, and a share of the keys can be set to fail
+with InternalError (delete_failure_rate) to exercise retries of partial failures.
+"""
+import base64
+import json
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import datetime, timezone
+from typing import Dict, Tuple
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+
+_DELETE_KEY_PATTERN = re.compile(rb"<Key>(.*?)</Key>")
+_MAX_DELETE_KEYS = 1000
+
+
+class FakeS3Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency: float = 0.01, delete_failure_rate: float = 0):
+        self.latency = latency
+        self.delete_failure_rate = delete_failure_rate
+        # Objects by their paths ("/bucket/key"), each object is its body and content type
+        self.objects: Dict[str, Tuple[bytes, str]] = {}
+        # Modification times of the objects by their paths, objects without it were modified when the server started
+        self.modified_at: Dict[str, float] = {}
+        self.started_at = time.time()
+        self.requests = 0
+        self._lock = threading.Lock()
+        super().__init__(("127.0.0.1", 0), _FakeS3RequestHandler)
+
+    @property
+    def endpoint_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _FakeS3RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: FakeS3Server
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _respond(self, status: int, body: bytes = b"", headers: Dict[str, str] = None):
+        time.sleep(self.server.latency)
+        with self.server._lock:
+            self.server.requests += 1
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_PUT(self):
+        body = self._read_body()
+        with self.server._lock:
+            self.server.objects[urlparse(self.path).path] = (body, self.headers.get("Content-Type", ""))
+            self.server.modified_at[urlparse(self.path).path] = time.time()
+        self._respond(200, headers={"ETag": '"fake-etag"'})
+
+    def do_HEAD(self):
+        with self.server._lock:
+            stored_object = self.server.objects.get(urlparse(self.path).path)
+        if stored_object is None:
+            self._respond(404)
+            return
+
+        body, content_type = stored_object
+        time.sleep(self.server.latency)
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Content-Type", content_type)
+        self.send_header("ETag", '"fake-etag"')
+        self.end_headers()
+
+    def _upload_with_form(self, body: bytes):
+        """
+        Upload with the presigned POST form: fields of the form, then the file.
+        """
+        message = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body
+        )
+        fields = {part.get_param("name", header="content-disposition"): part.get_payload(decode=True)
+                  for part in message.iter_parts()}
+        file = fields.pop("file", None)
+        fields = {name.lower(): value.decode() for name, value in fields.items()}
+        if file is None or "key" not in fields:
+            self._respond(400, b"<Error><Code>InvalidArgument</Code></Error>")
+            return
+
+        policy = json.loads(base64.b64decode(fields.get("policy", "e30=")))
+        for condition in policy.get("conditions", []):
+            if isinstance(condition, list) and condition[0] == "content-length-range":
+                if not condition[1] <= len(file) <= condition[2]:
+                    self._respond(400, b"<Error><Code>EntityTooLarge</Code></Error>")
+                    return
+            elif isinstance(condition, dict):
+                for name, value in condition.items():
+                    if name.lower() != "bucket" and fields.get(name.lower()) != value:
+                        self._respond(403, b"<Error><Code>AccessDenied</Code></Error>")
+                        return
+
+        bucket_path = urlparse(self.path).path.rstrip("/")
+        with self.server._lock:
+            self.server.objects[f"{bucket_path}/{fields['key']}"] = (file, fields.get("content-type", ""))
+            self.server.modified_at[f"{bucket_path}/{fields['key']}"] = time.time()
+        self._respond(204)
+
+    def do_GET(self):
+        """
+        list_objects_v2: GET /bucket?list-type=2&prefix=...&max-keys=...&continuation-token=...
+        Continuation token is the last listed key, keys are listed in lexicographical order like in S3.
+        """
+        url = urlparse(self.path)
+        query = {name: values[0] for name, values in parse_qs(url.query).items()}
+        bucket_path = url.path.rstrip("/")
+        prefix = f"{bucket_path}/{query.get('prefix', '')}"
+        start_after = f"{bucket_path}/{query['continuation-token']}" if "continuation-token" in query else ""
+        max_keys = int(query.get("max-keys", 1000))
+        with self.server._lock:
+            paths = sorted(path for path in self.server.objects if path.startswith(prefix) and path > start_after)
+            listed = [(path, len(self.server.objects[path][0]), self.server.modified_at.get(path, self.server.started_at))
+                      for path in paths[:max_keys]]
+
+        contents = "".join(
+            f"<Contents><Key>{escape(path[len(bucket_path) + 1:])}</Key>"
+            f"<LastModified>{datetime.fromtimestamp(modified_at, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')}"
+            f"</LastModified><Size>{size}</Size></Contents>"
+            for path, size, modified_at in listed
+        )
+        truncated = len(paths) > max_keys
+        token = f"<NextContinuationToken>{escape(listed[-1][0][len(bucket_path) + 1:])}</NextContinuationToken>" \
+            if truncated else ""
+        self._respond(200, f'<?xml version="1.0" encoding="UTF-8"?><ListBucketResult>'
+                           f'<KeyCount>{len(listed)}</KeyCount><IsTruncated>{str(truncated).lower()}</IsTruncated>'
+                           f'{token}{contents}</ListBucketResult>'.encode(), {"Content-Type": "application/xml"})
+
+    def do_DELETE(self):
+        with self.server._lock:
+            self.server.objects.pop(urlparse(self.path).path, None)
+        self._respond(204)
+
+    def do_POST(self):
+        body = self._read_body()
+        if self.headers.get("Content-Type", "").startswith("multipart/form-data"):
+            self._upload_with_form(body)
+            return
+
+        # delete_objects: POST /bucket?delete with the list of keys in XML
+        bucket_path = urlparse(self.path).path.rstrip("/")
+        keys = [key.decode() for key in _DELETE_KEY_PATTERN.findall(body)]
+        if len(keys) > _MAX_DELETE_KEYS:
+            self._respond(400, b'<?xml version="1.0" encoding="UTF-8"?><Error><Code>MalformedXML</Code>'
+                               b'<Message>The XML you provided was not well-formed</Message></Error>',
+                          {"Content-Type": "application/xml"})
+            return
+
+        failed_keys = {key for key in keys if random.random() < self.server.delete_failure_rate}
+        with self.server._lock:
+            for key in keys:
+                if key not in failed_keys:
+                    self.server.objects.pop(f"{bucket_path}/{key}", None)
+        quiet = b"<Quiet>true</Quiet>" in body
+        deleted = "" if quiet else "".join(f"<Deleted><Key>{key}</Key></Deleted>" for key in keys
+                                           if key not in failed_keys)
+        errors = "".join(f"<Error><Key>{key}</Key><Code>InternalError</Code>"
+                         f"<Message>We encountered an internal error. Please try again.</Message></Error>"
+                         for key in failed_keys)
+        self._respond(200, f'<?xml version="1.0" encoding="UTF-8"?><DeleteResult>{deleted}{errors}</DeleteResult>'
+                      .encode(), {"Content-Type": "application/xml"})
+
+
+@contextmanager
+def running_fake_s3(latency: float = 0.01, delete_failure_rate: float = 0):
+    server = FakeS3Server(latency, delete_failure_rate)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,80 @@
+"""
+Shows how splitting stock of a hot product across shards changes reservation throughput.
+Concurrent workers reserve the same product with ShardedStockCounter until its stock runs out.
+MongoDB is replaced with an in-memory stand-in that serializes writes to the same document.
+With 1 shard every reservation waits for the previous one, as with the single "stock" field.
+
+Run from the project root:
+    python -m benchmarks.stock_shard_contention --stock 2000 --workers 64 --shard-counts 1 2 4 8 16
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from bson import ObjectId
+
+from benchmarks import _env  # noqa: F401
+from benchmarks.stand_ins.mongo import FakeStockShardRepository
+from src.services.products.sharded_stock_counter import ShardedStockCounter
+
+
+async def run(shard_count: int, args) -> dict:
+    shard_repo = FakeStockShardRepository(write_latency=args.write_latency_ms / 1000,
+                                          read_latency=args.read_latency_ms / 1000)
+    # Product repository isn't used to reserve stock
+    stock_counter = ShardedStockCounter(product_repo=None, shard_repo=shard_repo)
+    product_id = ObjectId()
+    await shard_repo.create_shards(product_id, args.stock, shard_count)
+
+    reserved = 0
+    rejected = 0
+
+    async def worker():
+        nonlocal reserved, rejected
+        # Each worker stops after the first rejection, since stock is (almost) over
+        while True:
+            quantity = random.randint(1, args.max_quantity)
+            if await stock_counter.reserve(product_id, quantity, shard_count):
+                reserved += quantity
+            else:
+                rejected += 1
+                return
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.workers)))
+    elapsed = time.perf_counter() - started
+
+    remaining = (await shard_repo.get_total_stock([product_id]))[product_id]
+    assert reserved + remaining == args.stock, "Stock was oversold or lost"
+    return {
+        "reserved_per_second": reserved / elapsed,
+        "elapsed": elapsed,
+        "reserved": reserved,
+        "remaining": remaining,
+        "writes": shard_repo.writes,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stock", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=64, help="Count of concurrent reservations")
+    parser.add_argument("--max-quantity", type=int, default=3)
+    parser.add_argument("--shard-counts", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--write-latency-ms", type=float, default=1, help="Time one document write holds the lock")
+    parser.add_argument("--read-latency-ms", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"stock: {args.stock}, workers: {args.workers}, write latency: {args.write_latency_ms} ms")
+    for shard_count in args.shard_counts:
+        random.seed(args.seed)
+        result = await run(shard_count, args)
+        print(f"shards {shard_count:3d}: {result['reserved_per_second']:9.0f} units/sec  "
+              f"{result['elapsed']:6.2f} s  reserved {result['reserved']}  remaining {result['remaining']}  "
+              f"writes {result['writes']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,45 +1,34 @@
 def get_category_list_pipeline(page: int, page_size: int):
+    # Categories are counted separately (See DocumentCounter), parents are looked up only for the page
     pipeline = [
         {
-            "$facet": {
-                "result": [
-                    {
-                        "$lookup": {
-                            "from": "categories",
-                            "localField": "parent_id",
-                            "foreignField": "_id",
-                            "as": "parent"
-                        }
-                    },
-                    {
-                        "$unwind": {"path": "$parent", "preserveNullAndEmptyArrays": True}
-                    },
-                    {
-                        "$addFields": {
-                            "parent_name": {
-                                "$ifNull": ["$parent.name", "No parent"]
-                            }
-                        }
-                    },
-                    {
-                        "$project": {
-                            "parent": 0,
-                        }
-                    },
-                    {
-                        "$skip": (page - 1) * page_size
-                    },
-                    {
-                        "$limit": page_size
-                    }
-                ],
-                "total_count": [
-                    {"$count": "total"}
-                ]
+            "$skip": (page - 1) * page_size
+        },
+        {
+            "$limit": page_size
+        },
+        {
+            "$lookup": {
+                "from": "categories",
+                "localField": "parent_id",
+                "foreignField": "_id",
+                "as": "parent"
+            }
+        },
+        {
+            "$unwind": {"path": "$parent", "preserveNullAndEmptyArrays": True}
+        },
+        {
+            "$addFields": {
+                "parent_name": {
+                    "$ifNull": ["$parent.name", "No parent"]
+                }
             }
         },
         {
-            "$unwind": "$total_count",
+            "$project": {
+                "parent": 0,
+            }
         },
     ]
 
@@ -1,50 +1,41 @@
+def get_deal_list_filter_stages(filters: dict) -> list:
+    return [{"$match": filters}] if filters else []
+
+
 def get_deal_list_pipeline(filters: dict, page: int, page_size: int):
+    # Deals are counted separately with the filter stages (See DocumentCounter), parents are looked up only for the page
     pipeline = [
+        *get_deal_list_filter_stages(filters),
+        {
+            "$skip": (page - 1) * page_size
+        },
+        {
+            "$limit": page_size
+        },
+        {
+            "$lookup": {
+                "from": "deals",
+                "localField": "parent_id",
+                "foreignField": "_id",
+                "as": "parent"
+            }
+        },
         {
-            "$match": filters,
+            "$unwind": {"path": "$parent", "preserveNullAndEmptyArrays": True}
         },
         {
-            "$facet": {
-                "result": [
-                    {
-                        "$lookup": {
-                            "from": "deals",
-                            "localField": "parent_id",
-                            "foreignField": "_id",
-                            "as": "parent"
-                        }
-                    },
-                    {
-                        "$unwind": {"path": "$parent", "preserveNullAndEmptyArrays": True}
-                    },
-                    {
-                        "$addFields": {
-                            "parent_name": {
-                                "$ifNull": ["$parent.name", "No parent"]
-                            }
-                        }
-                    },
-                    {
-                        "$project": {
-                            "name": 1,
-                            "is_parent": 1,
-                            "parent_name": 1,
-                        }
-                    },
-                    {
-                        "$skip": (page - 1) * page_size
-                    },
-                    {
-                        "$limit": page_size
-                    }
-                ],
-                "total_count": [
-                    {"$count": "total"}
-                ]
-            },
+            "$addFields": {
+                "parent_name": {
+                    "$ifNull": ["$parent.name", "No parent"]
+                }
+            }
         },
         {
-            "$unwind": "$total_count",
+            "$project": {
+                "name": 1,
+                "is_parent": 1,
+                "parent_name": 1,
+            }
         },
     ]
 
@@ -1,23 +1,12 @@
 def get_event_list_pipeline(page: int, page_size: int):
+    # Events are counted separately (See DocumentCounter)
     pipeline = [
         {
-            "$facet": {
-                "result": [
-                    {
-                        "$skip": (page - 1) * page_size
-                    },
-                    {
-                        "$limit": page_size
-                    }
-                ],
-                "total_count": [
-                    {"$count": "total"}
-                ]
-            },
+            "$skip": (page - 1) * page_size
         },
         {
-            "$unwind": "$total_count",
+            "$limit": page_size
         },
     ]
 
-    return pipeline
\ No newline at end of file
+    return pipeline
@@ -1,33 +1,22 @@
+def get_facet_list_filter_stages(filters: dict) -> list:
+    return [{"$match": filters}] if filters else []
+
+
 def get_facet_list_pipeline(filters: dict, page: int, page_size: int):
+    # Facets are counted separately with the filter stages (See DocumentCounter)
     pipeline = [
+        *get_facet_list_filter_stages(filters),
         {
-            "$match": {
-                **filters
-            }
+            "$skip": (page - 1) * page_size
         },
         {
-            "$facet": {
-                "result": [
-                    {
-                        "$project": {
-                            "values": 0,
-                            "categories": 0
-                        }
-                    },
-                    {
-                        "$skip": (page - 1) * page_size
-                    },
-                    {
-                        "$limit": page_size
-                    }
-                ],
-                "total_count": [
-                    {"$count": "total"}
-                ]
-            },
+            "$limit": page_size
         },
         {
-            "$unwind": "$total_count",
+            "$project": {
+                "values": 0,
+                "categories": 0
+            }
         },
     ]
 
@@ -1,77 +1,89 @@
-def get_product_list_pipeline(page: int, page_size: int, product_projection: dict):
-    pipeline = [
-        {
-            # Match the documents that have either parent: True or parent_id: null
-            "$match": {
-                "$or": [
-                    {"parent": True},
-                    {"parent_id": None}
-                ]
-            }
-        },
+from datetime import datetime
+from typing import Optional, Tuple
+
+from bson import ObjectId
+
+# Top-level products (parents and products without variations) have no parent_id.
+# Lists are sorted by (created_at, _id), so the index on (parent_id, created_at, _id) serves both the sort and the seek
+PRODUCT_LIST_SORT = {"created_at": 1, "_id": 1}
+
+
+def get_variations_of_page_stages(product_projection: dict) -> list:
+    """
+    Stages that look up variations and compute tax for the products of the page.
+    They must follow $limit, so variations are joined only for the products that are returned.
+    """
+    return [
         {
-            # Process a multiple pipelines within a single stage on the same set of data
-            "$facet": {
-                # List of products
-                "items": [
-                    {
-                        # Lookup the documents that have the same parent_id as the _id of the parent document
-                        "$lookup": {
-                            "from": "products",
-                            "localField": "_id",
-                            "foreignField": "parent_id",
-                            "pipeline": [
-                                {
-                                    "$project": {
-                                        **product_projection,
-                                        # Add a tax field, for each joined product
-                                        "tax": {"$round": [{"$multiply": ["$price", "$tax_rate"]}, 2]}
-                                    }
-                                },
-                                {
-                                    "$sort": {"created_at": 1, "price": 1}
-                                }
-                            ],
-                            "as": "variations"
-                        }
-                    },
+            # Lookup the documents that have the same parent_id as the _id of the parent document
+            "$lookup": {
+                "from": "products",
+                "localField": "_id",
+                "foreignField": "parent_id",
+                "pipeline": [
                     {
                         "$project": {
-                            # Compute tax in amount money (Product price * tax rate)
-                            "tax": {"$round": [{"$multiply": ["$price", "$tax_rate"]}, 2]},
                             **product_projection,
-                            "variations": 1,
+                            # Add a tax field, for each joined product
+                            "tax": {"$round": [{"$multiply": ["$price", "$tax_rate"]}, 2]}
                         }
                     },
                     {
-                        "$skip": (page - 1) * page_size
-                    },
-                    {
-                        "$limit": page_size
-                    },
-                    {
-                        "$sort": {"created_at": 1}
+                        "$sort": {"created_at": 1, "price": 1}
                     }
                 ],
-                # count of documents
-                "total_count": [
-                    {"$count": "count"}
-                ]
+                "as": "variations"
             }
         },
-        {
-            # Deconstruct a total_count array to a single value
-            "$unwind": "$total_count"
-        },
         {
             "$project": {
-                "items": 1,
-                # get a count of products
-                "count": "$total_count.count"
+                # Compute tax in amount money (Product price * tax rate)
+                "tax": {"$round": [{"$multiply": ["$price", "$tax_rate"]}, 2]},
+                **product_projection,
+                "variations": 1,
             }
-        }
+        },
     ]
 
+
+# Parent products and products without variations, products are counted with these stages (See DocumentCounter)
+PRODUCT_LIST_FILTER_STAGES = [{"$match": {"parent_id": None}}]
+
+
+def get_product_list_pipeline(page: int, page_size: int, product_projection: dict):
+    pipeline = [
+        *PRODUCT_LIST_FILTER_STAGES,
+        {"$sort": PRODUCT_LIST_SORT},
+        {"$skip": (page - 1) * page_size},
+        {"$limit": page_size},
+        *get_variations_of_page_stages(product_projection),
+    ]
+
+    return pipeline
+
+
+def get_product_list_after_pipeline(after: Optional[Tuple[datetime, ObjectId]], limit: int,
+                                    product_projection: dict):
+    """
+    Keyset pagination: seeks past the last product of the previous page instead of skipping products,
+    so every page costs the same, however deep it is. Products aren't counted.
+    :param after: created_at and _id of the last product of the previous page. If None, the first page is returned.
+    :param limit: Count of products to return.
+    """
+    match = dict(PRODUCT_LIST_FILTER_STAGES[0]["$match"])
+    if after:
+        created_at, product_id = after
+        match["$or"] = [
+            {"created_at": {"$gt": created_at}},
+            {"created_at": created_at, "_id": {"$gt": product_id}},
+        ]
+
+    pipeline = [
+        {"$match": match},
+        {"$sort": PRODUCT_LIST_SORT},
+        {"$limit": limit},
+        *get_variations_of_page_stages(product_projection),
+    ]
     return pipeline
 
 
@@ -1,39 +1,31 @@
 from src.config.settings import ATLAS_SEARCH_INDEX_NAME_SEARCH_TERMS
 
 
-def get_search_terms_list_pipeline(page: int, page_size: int, name: str):
-    pipeline = []
+def get_search_terms_list_filter_stages(name: str) -> list:
+    if not name:
+        return []
+
+    return [{
+        "$search": {
+            "index": ATLAS_SEARCH_INDEX_NAME_SEARCH_TERMS,
+            "autocomplete": {
+                "query": name,
+                "path": "name",
+            },
+        }
+    }]
 
-    if name:
-        pipeline.append({
-            "$search": {
-                "index": ATLAS_SEARCH_INDEX_NAME_SEARCH_TERMS,
-                "autocomplete": {
-                    "query": name,
-                    "path": "name",
-                },
-            }
-        })
 
-    pipeline.extend([
+def get_search_terms_list_pipeline(page: int, page_size: int, name: str):
+    # Search terms are counted separately with the filter stages (See DocumentCounter)
+    pipeline = [
+        *get_search_terms_list_filter_stages(name),
         {
-            "$facet": {
-                "result": [
-                    {
-                        "$skip": (page - 1) * page_size
-                    },
-                    {
-                        "$limit": page_size
-                    }
-                ],
-                "total_count": [
-                    {"$count": "total"}
-                ]
-            }
+            "$skip": (page - 1) * page_size
         },
         {
-            "$unwind": "$total_count",
+            "$limit": page_size
         },
-    ])
+    ]
 
     return pipeline
@@ -1,27 +1,16 @@
+def get_synonym_list_filter_stages(filters: dict) -> list:
+    return [{"$match": filters}] if filters else []
+
+
 def get_synonym_list_pipeline(page: int, page_size: int, filters: dict):
+    # Synonyms are counted separately with the filter stages (See DocumentCounter)
     pipeline = [
+        *get_synonym_list_filter_stages(filters),
         {
-            "$match": {
-                **filters
-            }
+            "$skip": (page - 1) * page_size
         },
         {
-            "$facet": {
-                "result": [
-                    {
-                        "$skip": (page - 1) * page_size
-                    },
-                    {
-                        "$limit": page_size
-                    }
-                ],
-                "total_count": [
-                    {"$count": "total"}
-                ]
-            },
-        },
-        {
-            "$unwind": "$total_count",
+            "$limit": page_size
         },
     ]
-    return pipeline
\ No newline at end of file
+    return pipeline
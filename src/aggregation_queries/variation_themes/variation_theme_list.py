@@ -1,29 +1,18 @@
 def get_variation_theme_list_pipeline(page: int, page_size: int):
+    # Variation themes are counted separately (See DocumentCounter)
     pipeline = [
         {
-            "$facet": {
-                "result": [
-                    {
-                        "$project": {
-                            "_id": 1,
-                            "name": 1
-                        }
-                    },
-                    {
-                        "$skip": (page - 1) * page_size
-                    },
-                    {
-                        "$limit": page_size
-                    }
-                ],
-                "total_count": [
-                    {"$count": "total"}
-                ]
-            }
+            "$skip": (page - 1) * page_size
+        },
+        {
+            "$limit": page_size
         },
         {
-            "$unwind": "$total_count",
+            "$project": {
+                "_id": 1,
+                "name": 1
+            }
         },
     ]
 
-    return pipeline
\ No newline at end of file
+    return pipeline
@@ -1,7 +1,9 @@
+import asyncio
 from pymongo.results import InsertOneResult, UpdateResult, DeleteResult
 from typing import Optional
 
 from src.config.database import db
+from src.repositories.document_counter import document_counter
 from src.aggregation_queries.categories.category_list import get_category_list_pipeline
 
 
@@ -41,8 +43,11 @@ class CategoryRepository:
             :param page - page number.
         """
         pipeline = get_category_list_pipeline(page, page_size)
-        categories = await db.categories.aggregate(pipeline).to_list(length=None)
-        return categories[0] if categories else {}
+        categories, (count, exact_count) = await asyncio.gather(
+            db.categories.aggregate(pipeline).to_list(length=None),
+            document_counter.count("categories"),
+        )
+        return {"result": categories, "total_count": {"total": count}, "exact_count": exact_count}
 
     async def get_one_category(self, filters: dict, projection: Optional[dict] = None, **kwargs) -> dict:
         """
@@ -67,6 +72,7 @@ class CategoryRepository:
             raise ValueError("No data provided")
 
         created_category = await db.categories.insert_one(data, **kwargs)
+        document_counter.invalidate("categories")
         return created_category
 
     async def update_category(self, filters: dict, data_to_update: dict, **kwargs) -> UpdateResult:
@@ -77,6 +83,7 @@ class CategoryRepository:
         :param kwargs: Other parameters for update such as session for transaction etc.
         """
         updated_category = await db.categories.update_one(filter=filters, update=data_to_update, **kwargs)
+        document_counter.invalidate("categories")
         return updated_category
 
     async def delete_category(self, filters: dict, **kwargs) -> DeleteResult:
@@ -86,4 +93,5 @@ class CategoryRepository:
         :param kwargs: Other parameters for delete such as session for transaction etc.
         """
         deleted_category = await db.categories.delete_one(filter=filters, **kwargs)
+        document_counter.invalidate("categories")
         return deleted_category
@@ -41,6 +41,7 @@ class CategoryWithParentName(Category):
 class CategoryAdminPanelListResponse(BaseModel):
     result: List[CategoryWithParentName]
     page_count: int
+    exact_count: bool
 
     class Config:
         allow_population_by_field_name = True
@@ -4,6 +4,7 @@ from fastapi.exceptions import HTTPException
 from bson import ObjectId
 from .utils import CategoryTree
 from .repository import CategoryRepository
+from src.services.reference_data_cache import reference_data_cache
 
 
 class CategoryService:
@@ -52,6 +53,7 @@ class CategoryService:
             result = {
                 "result": [],
                 "page_count": 1,
+                "exact_count": True,
             }
             return result
 
@@ -60,6 +62,7 @@ class CategoryService:
         result = {
             "result": categories.get("result"),
             "page_count": ceil(category_count / page_size), # Calculating count of pages
+            "exact_count": categories.get("exact_count"),
         }
 
         return result
@@ -110,6 +113,7 @@ class CategoryService:
             new_category_data = {**data_to_update}
 
         await self.repository.update_category({"_id": category_id}, {"$set": new_category_data})
+        reference_data_cache.invalidate("categories")
 
     async def create_category(self, data: dict):
         # get the parent ID
@@ -121,6 +125,7 @@ class CategoryService:
             raise HTTPException(status_code=404, detail="Parent not found")
         # insert category
         created_category = await self.repository.create_category({**data, **category_attrs})
+        reference_data_cache.invalidate("categories")
         # if category was not created, then raise HTTP 404
         if not created_category.inserted_id:
             raise HTTPException(status_code=400, detail="Category not created")
@@ -140,3 +145,4 @@ class CategoryService:
 
         # Delete a category if everything is fine
         await self.repository.delete_category({"_id": category_id})
+        reference_data_cache.invalidate("categories")
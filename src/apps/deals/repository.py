@@ -1,8 +1,10 @@
+import asyncio
 from pymongo.results import InsertOneResult, UpdateResult, DeleteResult
 from typing import Optional
 
 from src.config.database import db
-from src.aggregation_queries.deals.deal_list import get_deal_list_pipeline
+from src.repositories.document_counter import document_counter
+from src.aggregation_queries.deals.deal_list import get_deal_list_pipeline, get_deal_list_filter_stages
 
 
 class DealRepository:
@@ -45,8 +47,11 @@ class DealRepository:
             filters = {}
 
         pipeline = get_deal_list_pipeline(filters, page, page_size)
-        deals = await db.deals.aggregate(pipeline).to_list(length=None)
-        return deals[0] if deals else {}
+        deals, (count, exact_count) = await asyncio.gather(
+            db.deals.aggregate(pipeline).to_list(length=None),
+            document_counter.count("deals", get_deal_list_filter_stages(filters)),
+        )
+        return {"result": deals, "total_count": {"total": count}, "exact_count": exact_count}
 
     async def get_one_deal(self, filters: dict, projection: Optional[dict] = None, **kwargs) -> dict:
         """
@@ -74,6 +79,7 @@ class DealRepository:
             raise ValueError("No data provided")
 
         created_deal = await db.deals.insert_one(data, **kwargs)
+        document_counter.invalidate("deals")
 
         return created_deal
 
@@ -85,6 +91,7 @@ class DealRepository:
             :param kwargs: Other parameters for update such as session for transaction etc.
         """
         updated_deal = await db.deals.update_one(filter=filters, update=data_to_update, **kwargs)
+        document_counter.invalidate("deals")
         return updated_deal
 
     async def delete_deal(self, filters: dict, **kwargs) -> DeleteResult:
@@ -94,4 +101,5 @@ class DealRepository:
         :param kwargs: Other parameters for delete such as session for transaction etc.
         """
         deleted_deal = await db.deals.delete_one(filter=filters, **kwargs)
+        document_counter.invalidate("deals")
         return deleted_deal
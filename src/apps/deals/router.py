@@ -6,6 +6,9 @@ from .service import DealAdminService
 from .schemes import create, get, update
 from src.dependencies.service_dependencies.deals import get_deal_service
 from src.schemes.py_object_id import PyObjectId
+from src.core.image_intake.multipart import parse_multipart_data
+from src.core.image_intake.uploaded_image import take_uploaded_image
+from src.schemes.image_upload import ImageUploadResponse, CommittedImageResponse, CommitImageUploadRequest
 
 router = fastapi.APIRouter(
     prefix="/admin/deals",
@@ -36,6 +39,18 @@ async def create_deal(created_data: create.CreateDealSchema,
     await service.create_deal(created_data)
 
 
+@router.post("/create/multipart", status_code=fastapi.status.HTTP_201_CREATED)
+async def create_deal_multipart(data: str = fastapi.Form(...), image: fastapi.UploadFile = fastapi.File(...),
+                                service: DealAdminService = Depends(get_deal_service)):
+    """
+    The same as POST /create, but the image is sent as a binary part.
+    "data" is the JSON body of POST /create without the image.
+    """
+    created_data = parse_multipart_data(create.CreateDealSchema, data, image=image.filename)
+    created_data.image = await take_uploaded_image(image)
+    await service.create_deal(created_data)
+
+
 @router.get("/{deal_id}", response_model=get.DealDetailResponse)
 async def deal_detail(deal_id: PyObjectId, service: DealAdminService = Depends(get_deal_service)):
     result = await service.get_deal_by_id(deal_id)
@@ -48,6 +63,38 @@ async def update_deal(deal_id: PyObjectId, data_to_update: update.UpdateDealSche
     await service.update_deal(deal_id, data_to_update)
 
 
+@router.put("/{deal_id}/multipart", status_code=fastapi.status.HTTP_204_NO_CONTENT)
+async def update_deal_multipart(deal_id: PyObjectId, data: str = fastapi.Form(...),
+                                image: Optional[fastapi.UploadFile] = fastapi.File(None),
+                                service: DealAdminService = Depends(get_deal_service)):
+    """
+    The same as PUT /{deal_id}, but the new image (if any) is sent as a binary part.
+    """
+    if image is None:
+        data_to_update = parse_multipart_data(update.UpdateDealSchema, data)
+    else:
+        data_to_update = parse_multipart_data(update.UpdateDealSchema, data, image=image.filename)
+        data_to_update.image = await take_uploaded_image(image)
+    await service.update_deal(deal_id, data_to_update)
+
+
+@router.post("/{deal_id}/image-upload", response_model=ImageUploadResponse)
+async def create_deal_image_upload(deal_id: PyObjectId, service: DealAdminService = Depends(get_deal_service)):
+    """
+    Returns presigned form to upload the image of the deal straight to the storage.
+    """
+    return await service.create_image_upload(deal_id)
+
+
+@router.post("/{deal_id}/image-upload/commit", response_model=CommittedImageResponse)
+async def commit_deal_image_upload(deal_id: PyObjectId, data: CommitImageUploadRequest = fastapi.Body(...),
+                                   service: DealAdminService = Depends(get_deal_service)):
+    """
+    Checks the image uploaded with the presigned form and sets its URL to the deal.
+    """
+    return await service.commit_image_upload(deal_id, data.version)
+
+
 @router.delete("/{deal_id}", status_code=fastapi.status.HTTP_204_NO_CONTENT)
 async def delete_deal(deal_id: PyObjectId, service: DealAdminService = Depends(get_deal_service)):
     await service.delete_deal(deal_id)
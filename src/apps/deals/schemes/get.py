@@ -16,6 +16,7 @@ class DealListElement(BaseModel):
 class DealListResponse(BaseModel):
     result: List[DealListElement]
     page_count: int
+    exact_count: bool
 
     class Config:
         allow_population_by_field_name = True
@@ -15,6 +15,9 @@ from src.services.deals.upload_deal_images import upload_deal_image
 from src.services.deals.deal_validator import DealValidatorCreate, DealValidatorUpdate
 from src.services.deals.prepare_deal_data import prepare_create_deal_data, prepare_update_deal_data
 from src.services.deals.delete_deal_images import delete_deal_image
+from src.services.presigned_image_uploads import create_image_upload, check_uploaded_image, get_image_url
+from src.services.create_image_name import create_image_version, create_deal_image_key
+from src.config.settings import IMAGE_UPLOAD_EXPIRES_SECONDS
 
 
 class DealAdminService:
@@ -54,6 +57,7 @@ class DealAdminService:
             result = {
                 "result": [],
                 "page_count": 1,
+                "exact_count": True,
             }
             return result
 
@@ -62,6 +66,7 @@ class DealAdminService:
         result = {
             "result": deals.get("result"),
             "page_count": ceil(deals_count / page_size),
+            "exact_count": deals.get("exact_count"),
         }
         # return result
         return result
@@ -95,12 +100,12 @@ class DealAdminService:
         })
         convert_decimal(data_to_insert)
         inserted_deal = await self.deal_repository.create_deal(data_to_insert)
-        uploaded_image_url = await upload_deal_image(image, f"{inserted_deal.inserted_id}_0.jpg")
+        uploaded_image_url = await upload_deal_image(image, inserted_deal.inserted_id)
         await self.deal_repository.update_deal({"_id": inserted_deal.inserted_id},
                                                {"$set": {"image": uploaded_image_url}})
 
     async def update_deal(self, deal_id: ObjectId, data_to_update: UpdateDealSchema) -> None:
-        deal = await self.deal_repository.get_one_deal({"_id": deal_id}, {"is_parent": 1})
+        deal = await self.deal_repository.get_one_deal({"_id": deal_id}, {"is_parent": 1, "image": 1})
         # if there's no deal with the specified id raise HTTP 404 Not Found
         if not deal:
             raise HTTPException(status_code=404, detail="Deal not found")
@@ -111,17 +116,61 @@ class DealAdminService:
             raise HTTPException(status_code=400, detail=errors)
 
         # if there's an image value and it is not valid url
+        image_url = None
         if not is_valid_url(data_to_update.image) and data_to_update.image is not None:
-            await upload_deal_image(data_to_update.image, f"{deal_id}_0.jpg")
+            # The image is uploaded under a new name, so the link of the deal is updated
+            image_url = await upload_deal_image(data_to_update.image, deal_id)
+            # The image part of the multipart request isn't a string to validate
+            data_to_update.image = None
 
         data_to_update = prepare_update_deal_data(data_to_update, deal["is_parent"])
         data_to_update.pop("image")
+        if image_url is not None:
+            data_to_update["image"] = image_url
 
         current_date = datetime.utcnow()
         data_to_update["modified_at"] = current_date
 
         convert_decimal(data_to_update)
         await self.deal_repository.update_deal({"_id": deal_id}, {"$set": data_to_update})
+        if image_url is not None and deal.get("image"):
+            # The replaced image isn't used anymore
+            await delete_deal_image(deal["image"])
+
+    async def create_image_upload(self, deal_id: ObjectId) -> dict:
+        """
+        Returns presigned form to upload the image of the deal straight to the storage.
+        Once the image is uploaded, it should be committed with the returned version.
+        """
+        deal = await self.deal_repository.get_one_deal({"_id": deal_id}, {"_id": 1})
+        # if there's no deal with the specified id raise HTTP 404 Not Found
+        if not deal:
+            raise HTTPException(status_code=404, detail="Deal not found")
+
+        version = create_image_version()
+        upload = await create_image_upload(create_deal_image_key(deal_id, version))
+        return {"upload": upload, "version": version, "expires_in": IMAGE_UPLOAD_EXPIRES_SECONDS}
+
+    async def commit_image_upload(self, deal_id: ObjectId, version: str) -> dict:
+        """
+        Checks the image uploaded with the presigned form and sets its URL to the deal.
+        The replaced image is deleted.
+        """
+        deal = await self.deal_repository.get_one_deal({"_id": deal_id}, {"image": 1})
+        # if there's no deal with the specified id raise HTTP 404 Not Found
+        if not deal:
+            raise HTTPException(status_code=404, detail="Deal not found")
+
+        key = create_deal_image_key(deal_id, version)
+        image_errors = await check_uploaded_image(key)
+        if image_errors:
+            raise HTTPException(status_code=400, detail={"image": image_errors})
+
+        image_url = get_image_url(key)
+        await self.deal_repository.update_deal({"_id": deal_id}, {"$set": {"image": image_url}})
+        if deal.get("image") and deal["image"] != image_url:
+            await delete_deal_image(deal["image"])
+        return {"image": image_url}
 
     async def delete_deal(self, deal_id: ObjectId) -> None:
         deal = await self.deal_repository.get_one_deal({"_id": deal_id},
@@ -1,7 +1,9 @@
+import asyncio
 from typing import Optional
 from pymongo.results import InsertOneResult, UpdateResult, DeleteResult
 
 from src.config.database import db
+from src.repositories.document_counter import document_counter
 from src.aggregation_queries.events.event_list import get_event_list_pipeline
 
 
@@ -40,8 +42,11 @@ class EventRepository:
         :param page_size - number of events to return
         """
         pipeline = get_event_list_pipeline(page, page_size)
-        events = await db.events.aggregate(pipeline).to_list(length=None)
-        return events[0] if events else {}
+        events, (count, exact_count) = await asyncio.gather(
+            db.events.aggregate(pipeline).to_list(length=None),
+            document_counter.count("events"),
+        )
+        return {"result": events, "total_count": {"total": count}, "exact_count": exact_count}
 
     async def get_one_event(self, filters: dict, projection: Optional[dict] = None, **kwargs) -> dict:
         """
@@ -68,6 +73,7 @@ class EventRepository:
             raise ValueError("No data provided")
 
         created_event = await db.events.insert_one(data, **kwargs)
+        document_counter.invalidate("events")
         return created_event
 
     async def update_event(self, filters: dict, data_to_update: dict, **kwargs) -> UpdateResult:
@@ -78,6 +84,7 @@ class EventRepository:
             :param kwargs: Other parameters for update such as session for transaction etc.
         """
         updated_event = await db.events.update_one(filter=filters, update=data_to_update, **kwargs)
+        document_counter.invalidate("events")
         return updated_event
 
     async def delete_one_event(self, filters: dict, **kwargs) -> DeleteResult:
@@ -87,6 +94,7 @@ class EventRepository:
         :param kwargs: Other parameters for delete such as session for transaction etc.
         """
         deleted_event = await db.events.delete_one(filter=filters, **kwargs)
+        document_counter.invalidate("events")
         return deleted_event
 
     async def delete_many_events(self, filters: dict, **kwargs):
@@ -96,4 +104,5 @@ class EventRepository:
         :param kwargs: Other parameters for delete such as session for transaction etc.
         """
         deleted_events = await db.events.delete_many(filter=filters, **kwargs)
+        document_counter.invalidate("events")
         return deleted_events
@@ -1,3 +1,5 @@
+from typing import Optional
+
 import fastapi
 
 from src.apps.events.schemes.get import EventListResponse, EventsDetailResponse
@@ -6,6 +8,9 @@ from .schemes.update import UpdateEvent
 from .service import EventAdminService
 from src.dependencies.service_dependencies.events import get_event_service
 from src.schemes.py_object_id import PyObjectId
+from src.core.image_intake.multipart import parse_multipart_data
+from src.core.image_intake.uploaded_image import take_uploaded_image
+from src.schemes.image_upload import ImageUploadResponse, CommittedImageResponse, CommitImageUploadRequest
 
 router = fastapi.APIRouter(
     prefix='/admin/events',
@@ -32,12 +37,58 @@ async def create_event(event_data: CreateEvent,
     await service.create_event(event_data)
 
 
+@router.post('/multipart')
+async def create_event_multipart(data: str = fastapi.Form(...), image: fastapi.UploadFile = fastapi.File(...),
+                                 service: EventAdminService = fastapi.Depends(get_event_service)):
+    """
+    The same as POST /, but the image is sent as a binary part.
+    "data" is the JSON body of POST / without the image.
+    """
+    event_data = parse_multipart_data(CreateEvent, data, image=image.filename)
+    event_data.image = await take_uploaded_image(image)
+    await service.create_event(event_data)
+
+
 @router.put('/{event_id}', status_code=fastapi.status.HTTP_204_NO_CONTENT)
 async def update_event(event_id: PyObjectId, event_data: UpdateEvent = fastapi.Body(...),
                        service: EventAdminService = fastapi.Depends(get_event_service)):
     await service.update_event(event_id, event_data)
 
 
+@router.put('/{event_id}/multipart', status_code=fastapi.status.HTTP_204_NO_CONTENT)
+async def update_event_multipart(event_id: PyObjectId, data: str = fastapi.Form(...),
+                                 image: Optional[fastapi.UploadFile] = fastapi.File(None),
+                                 service: EventAdminService = fastapi.Depends(get_event_service)):
+    """
+    The same as PUT /{event_id}, but the new image (if any) is sent as a binary part.
+    """
+    if image is None:
+        event_data = parse_multipart_data(UpdateEvent, data)
+    else:
+        event_data = parse_multipart_data(UpdateEvent, data, image=image.filename)
+        event_data.image = await take_uploaded_image(image)
+    await service.update_event(event_id, event_data)
+
+
+@router.post('/{event_id}/image-upload', response_model=ImageUploadResponse)
+async def create_event_image_upload(event_id: PyObjectId,
+                                    service: EventAdminService = fastapi.Depends(get_event_service)):
+    """
+    Returns presigned form to upload the image of the event straight to the storage.
+    """
+    return await service.create_image_upload(event_id)
+
+
+@router.post('/{event_id}/image-upload/commit', response_model=CommittedImageResponse)
+async def commit_event_image_upload(event_id: PyObjectId,
+                                    data: CommitImageUploadRequest = fastapi.Body(...),
+                                    service: EventAdminService = fastapi.Depends(get_event_service)):
+    """
+    Checks the image uploaded with the presigned form and sets its URL to the event.
+    """
+    return await service.commit_image_upload(event_id, data.version)
+
+
 @router.delete('/{event_id}', status_code=fastapi.status.HTTP_204_NO_CONTENT)
 async def delete_event(event_id: PyObjectId,
                        service: EventAdminService = fastapi.Depends(get_event_service)):
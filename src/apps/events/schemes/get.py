@@ -17,6 +17,7 @@ class EventsDetailResponse(BaseModel):
 class EventListResponse(BaseModel):
     events: List[Event]
     page_count: int
+    exact_count: bool
 
     class Config:
         use_enum_values = True
@@ -12,7 +12,9 @@ from src.utils import convert_decimal, is_valid_url
 from src.services.events.upload_event_images import upload_event_image
 from src.services.events.delete_event_images import delete_event_image
 from src.services.celery_beats_operations import create_periodic_task, delete_periodic_task
-from src.config.settings import EVENT_CHECK_INTERVAL_MINUTES
+from src.services.presigned_image_uploads import create_image_upload, check_uploaded_image, get_image_url
+from src.services.create_image_name import create_image_version, create_event_image_key
+from src.config.settings import EVENT_CHECK_INTERVAL_MINUTES, IMAGE_UPLOAD_EXPIRES_SECONDS
 from src.param_classes.products.detach_from_event_params import DetachFromEventParams
 
 
@@ -37,6 +39,7 @@ class EventAdminService:
             result = {
                 "events": [],
                 "page_count": 1,
+                "exact_count": True,
             }
             return result
 
@@ -45,6 +48,7 @@ class EventAdminService:
         result = {
             "events": events.get("result"),
             "page_count": ceil(events_count / page_size),
+            "exact_count": events.get("exact_count"),
         }
 
         # return result
@@ -61,7 +65,7 @@ class EventAdminService:
         inserted_event = await self.repository.create_event(data_to_insert)
         # Upload event image to the storage
         # And add image link to the created event
-        image_url = await upload_event_image(encoded_image, f"{inserted_event.inserted_id}_0.jpg")
+        image_url = await upload_event_image(encoded_image, inserted_event.inserted_id)
         await self.repository.update_event({"_id": inserted_event.inserted_id},
                                            {"$set": {"image": image_url}})
         # create new event tracker
@@ -72,7 +76,7 @@ class EventAdminService:
                              args=(str(inserted_event.inserted_id), ))
 
     async def update_event(self, event_id: ObjectId, data_to_update: UpdateEvent):
-        event = await self.repository.get_one_event({"_id": event_id}, {"status": 1})
+        event = await self.repository.get_one_event({"_id": event_id}, {"status": 1, "image": 1})
         if not event:
             raise HTTPException(status_code=404, detail="Event not found")
 
@@ -82,11 +86,15 @@ class EventAdminService:
             raise HTTPException(status_code=400, detail=errors)
 
         # if there's an image value and it is not valid url
+        image_url = None
         if not is_valid_url(data_to_update.image) and data_to_update.image is not None:
-            await upload_event_image(data_to_update.image,f"{event['_id']}_0.jpg")
+            # The image is uploaded under a new name, so the link of the event is updated
+            image_url = await upload_event_image(data_to_update.image, event["_id"])
 
         data_to_update = data_to_update.dict(by_alias=True, exclude_none=True)
         data_to_update.pop("image", None)
+        if image_url is not None:
+            data_to_update["image"] = image_url
 
         # if an event already started or ended
         # you cannot change fields: start_date, end_date, discounted_products.
@@ -98,6 +106,42 @@ class EventAdminService:
 
         convert_decimal(data_to_update)
         await self.repository.update_event({"_id": event_id}, {"$set": data_to_update})
+        if image_url is not None and event.get("image"):
+            # The replaced image isn't used anymore
+            await delete_event_image(event["image"])
+
+    async def create_image_upload(self, event_id: ObjectId) -> dict:
+        """
+        Returns presigned form to upload the image of the event straight to the storage.
+        Once the image is uploaded, it should be committed with the returned version.
+        """
+        event = await self.repository.get_one_event({"_id": event_id}, {"_id": 1})
+        if not event:
+            raise HTTPException(status_code=404, detail="Event not found")
+
+        version = create_image_version()
+        upload = await create_image_upload(create_event_image_key(event_id, version))
+        return {"upload": upload, "version": version, "expires_in": IMAGE_UPLOAD_EXPIRES_SECONDS}
+
+    async def commit_image_upload(self, event_id: ObjectId, version: str) -> dict:
+        """
+        Checks the image uploaded with the presigned form and sets its URL to the event.
+        The replaced image is deleted.
+        """
+        event = await self.repository.get_one_event({"_id": event_id}, {"image": 1})
+        if not event:
+            raise HTTPException(status_code=404, detail="Event not found")
+
+        key = create_event_image_key(event_id, version)
+        image_errors = await check_uploaded_image(key)
+        if image_errors:
+            raise HTTPException(status_code=400, detail={"image": image_errors})
+
+        image_url = get_image_url(key)
+        await self.repository.update_event({"_id": event_id}, {"$set": {"image": image_url}})
+        if event.get("image") and event["image"] != image_url:
+            await delete_event_image(event["image"])
+        return {"image": image_url}
 
     async def delete_event(self, event_id: ObjectId):
         event = await self.repository.get_one_event({"_id": event_id},
@@ -1,8 +1,9 @@
 from .repository import FacetTypeRepository
+from src.services.reference_data_cache import reference_data_cache
 
 class FacetTypeService:
     def __init__(self, repository: FacetTypeRepository):
         self.repository = repository
 
     async def get_facet_types(self):
-        return await self.repository.get_facet_type_list()
\ No newline at end of file
+        return await reference_data_cache.get_facet_types()
\ No newline at end of file
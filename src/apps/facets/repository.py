@@ -1,8 +1,10 @@
+import asyncio
 from pymongo.results import InsertOneResult, UpdateResult, DeleteResult
 from typing import Optional
 
 from src.config.database import db
-from src.aggregation_queries.facets.facet_list import get_facet_list_pipeline
+from src.repositories.document_counter import document_counter
+from src.aggregation_queries.facets.facet_list import get_facet_list_pipeline, get_facet_list_filter_stages
 
 
 class FacetRepository:
@@ -42,8 +44,11 @@ class FacetRepository:
             :param page_size - number of facets to return
         """
         pipeline = get_facet_list_pipeline(filters, page, page_size)
-        facets = await db.facets.aggregate(pipeline).to_list(length=None)
-        return facets[0] if facets else {}
+        facets, (count, exact_count) = await asyncio.gather(
+            db.facets.aggregate(pipeline).to_list(length=None),
+            document_counter.count("facets", get_facet_list_filter_stages(filters)),
+        )
+        return {"result": facets, "total_count": {"total": count}, "exact_count": exact_count}
 
     async def get_one_facet(self, filters: dict, projection: Optional[dict] = None, **kwargs) -> dict:
         """
@@ -71,6 +76,7 @@ class FacetRepository:
             raise ValueError("No data provided")
 
         created_facet = await db.facets.insert_one(data, **kwargs)
+        document_counter.invalidate("facets")
 
         return created_facet
 
@@ -82,6 +88,7 @@ class FacetRepository:
             :param kwargs: Other parameters for update such as session for transaction etc.
         """
         updated_facet = await db.facets.update_one(filter=filters, update=data_to_update, **kwargs)
+        document_counter.invalidate("facets")
         return updated_facet
 
     async def delete_facet(self, filters: dict, **kwargs) -> DeleteResult:
@@ -91,4 +98,5 @@ class FacetRepository:
         :param kwargs: Other parameters for delete such as session for transaction etc.
         """
         deleted_facet = await db.facets.delete_one(filter=filters, **kwargs)
+        document_counter.invalidate("facets")
         return deleted_facet
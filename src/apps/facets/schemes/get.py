@@ -39,6 +39,7 @@ class FacetList(BaseModel):
     """Model represents list of facets and shows page count"""
     result: List[FacetBase]
     page_count: int
+    exact_count: bool
 
     class Config:
         allow_population_by_field_name = True
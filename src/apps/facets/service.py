@@ -5,6 +5,7 @@ from bson import ObjectId
 from .repository import FacetRepository
 from .schemes.update import FacetUpdate
 from src.apps.products.service import ProductAdminService
+from src.services.reference_data_cache import reference_data_cache
 
 
 class FacetService:
@@ -27,6 +28,7 @@ class FacetService:
                 detail={"code": f"Facet with {data.get('code')} code already exists"}
             )
         created_facet = await self.repository.create_facet(data)
+        reference_data_cache.invalidate("facets")
 
         if not created_facet.inserted_id:
             raise HTTPException(status_code=400, detail="Facet not created")
@@ -42,6 +44,7 @@ class FacetService:
             result = {
                 "result": [],
                 "page_count": 1,
+                "exact_count": True,
             }
             return result
 
@@ -50,6 +53,7 @@ class FacetService:
         result = {
             "result": facets.get("result"),
             "page_count": ceil(facets_count / page_size),
+            "exact_count": facets.get("exact_count"),
         }
         # return result
         return result
@@ -75,6 +79,7 @@ class FacetService:
 
         # Otherwise update facets
         await self.repository.update_facet({"_id": facet_id}, {"$set": data_to_update.dict()})
+        reference_data_cache.invalidate("facets")
         await self.product_service.update_attribute_explanation(facet.get("code"),
                                                                 data_to_update.explanation)
 
@@ -85,3 +90,4 @@ class FacetService:
             raise HTTPException(status_code=404, detail="Facet not found")
         # Otherwise delete facet
         await self.repository.delete_facet({"_id": facet_id})
+        reference_data_cache.invalidate("facets")
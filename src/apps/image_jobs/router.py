@@ -0,0 +1,16 @@
+import fastapi
+
+from .schemes.get import ImageJobDetailResponse
+from .service import ImageJobService
+from src.dependencies.service_dependencies.image_jobs import get_image_job_service
+
+router = fastapi.APIRouter(
+    prefix='/admin/image-jobs',
+    tags=["Image jobs"],
+)
+
+
+@router.get('/{job_id}', response_model=ImageJobDetailResponse)
+async def get_image_job(job_id: str, service: ImageJobService = fastapi.Depends(get_image_job_service)):
+    """Returns status of the background image upload or image operations"""
+    return await service.get_image_job(job_id)
@@ -0,0 +1,23 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+class ImageJobDetailResponse(BaseModel):
+    """
+    Represents status of the background image job
+    """
+    id: str = Field(alias="_id")
+    name: str
+    # queued, running, succeeded or failed
+    status: str
+    # Count of started attempts
+    attempts: int
+    # Error of the last failed attempt
+    error: Optional[str]
+    created_at: datetime
+    modified_at: datetime
+
+    class Config:
+        allow_population_by_field_name = True
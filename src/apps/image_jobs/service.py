@@ -0,0 +1,15 @@
+from fastapi import HTTPException
+
+from src.repositories.image_job_repository import ImageJobRepository
+
+
+class ImageJobService:
+    def __init__(self, repository: ImageJobRepository):
+        self.repository = repository
+
+    async def get_image_job(self, job_id: str) -> dict:
+        job = await self.repository.get_job(job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Image job not found")
+
+        return job
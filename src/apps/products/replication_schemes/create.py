@@ -1,9 +1,10 @@
 from decimal import Decimal
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import BaseModel, Field, constr, condecimal, conint, AnyHttpUrl
 
 from src.schemes.py_object_id import PyObjectId
+from src.apps.products_base.schemes.base import ImageVariant
 
 
 class ProductCreateReplicationSchema(BaseModel):
@@ -21,3 +22,5 @@ class ProductCreateReplicationSchema(BaseModel):
     sku: constr(min_length=1)
     for_sale: bool
     image: AnyHttpUrl
+    # Resized copies of the image, None if the image has no derivatives
+    image_variants: Optional[List[ImageVariant]]
@@ -0,0 +1,19 @@
+from typing import TypedDict, List, Optional
+
+
+class ProductItemReservationResult(TypedDict):
+    product_id: str
+    quantity: int
+    reserved: bool
+    # insufficient_stock, not_found, invalid_quantity or order_rejected (reserved, but rolled back
+    # because other products of the order couldn't be reserved). None if the product is reserved
+    reason: Optional[str]
+    # Stock of the product at the moment of the failure, None if the product is reserved or doesn't exist
+    available_stock: Optional[int]
+
+
+class ProductReservationResultData(TypedDict):
+    message_id: Optional[str]
+    order_id: Optional[str]
+    reserved: bool
+    products: List[ProductItemReservationResult]
@@ -3,6 +3,7 @@ from typing import Optional, List
 from pydantic import BaseModel, constr, conint, condecimal, Field
 
 from src.schemes.py_object_id import PyObjectId
+from src.apps.products_base.schemes.base import ImageVariant
 
 
 class ProductUpdateReplicationSchemaBase(BaseModel):
@@ -28,3 +29,14 @@ class ProductIdsToDiscountsMapping(BaseModel):
     product_ids: List[PyObjectId]
     discounts: Optional[List[condecimal(max_digits=3, decimal_places=2, ge=Decimal('0'), le=Decimal('1'))]]
     event_id: PyObjectId
+
+
+class ProductImageUpdateReplicationSchema(BaseModel):
+    """
+    Represents replicated data (for other microservices) of the products whose main image was replaced.
+    Images are stored under new versioned URLs, so the replicated URL changes with each replacement.
+    """
+    product_ids: List[PyObjectId]
+    image: constr(min_length=1)
+    # Resized copies of the new image, None if the image has no derivatives
+    image_variants: Optional[List[ImageVariant]]
@@ -1,20 +1,35 @@
-from typing import Union, List, Optional
+import asyncio
+from datetime import datetime
+from typing import Union, List, Optional, Tuple
 
 from bson import ObjectId
 from pymongo.operations import UpdateOne
 
 from src.config.database import db
+from src.repositories.document_counter import document_counter
 from src.config.settings import ATLAS_SEARCH_INDEX_NAME_PRODUCTS
 from src.repositories.product_repository_base import ProductRepositoryBase
 from src.aggregation_queries.products.product_details import get_variations_lookup_pipeline, get_product_detail
 from src.aggregation_queries.products.product_list import (
+    PRODUCT_LIST_FILTER_STAGES,
     get_product_list_pipeline,
+    get_product_list_after_pipeline,
     get_search_products_pipeline_stage,
     get_search_products_main_pipeline,
 )
 
 
 class ProductAdminRepository(ProductRepositoryBase):
+    # product fields that will be returned by the db in the product list,
+    # created_at of the last product of the page is the cursor of the next page
+    _product_list_projection = {
+        "name": 1,
+        "price": 1,
+        "for_sale": 1,
+        "parent": 1,
+        "created_at": 1,
+    }
+
     async def update_image_links(self, product_ids: Union[List[ObjectId], ObjectId],
                                  images: Union[List[dict], dict],
                                  same_images: bool = False, update_linked_products: bool = False):
@@ -56,7 +71,8 @@ class ProductAdminRepository(ProductRepositoryBase):
                     ]
                 }
                 data_to_update = {"images.main": images.get("main"),
-                                  "images.secondaryImages": images.get("secondaryImages")}
+                                  "images.secondaryImages": images.get("secondaryImages"),
+                                  "images.derivatives": images.get("derivatives")}
                 await self.update_many_products(filters, {"$set": data_to_update})
             else:
                 filters = {"_id": product_ids}
@@ -87,16 +103,28 @@ class ProductAdminRepository(ProductRepositoryBase):
         :param page_size: count of items per page.
         :return: Products, their variations and count of products.
         """
-        # product fields that will be returned by the db
-        product_projection = {
-            "name": 1,
-            "price": 1,
-            "for_sale": 1,
-            "parent": 1
-        }
-        pipeline = get_product_list_pipeline(page, page_size, product_projection)
-        product_list = await db.products.aggregate(pipeline=pipeline).to_list(length=None)
-        return product_list[0] if product_list else {}
+        pipeline = get_product_list_pipeline(page, page_size, self._product_list_projection)
+        products, (count, exact_count) = await asyncio.gather(
+            db.products.aggregate(pipeline=pipeline).to_list(length=None),
+            self.count_product_list(),
+        )
+        return {"items": products, "count": count, "exact_count": exact_count}
+
+    async def count_product_list(self) -> Tuple[int, bool]:
+        """
+        :return: Count of parent products and products without variations and whether the count is exact.
+        """
+        return await document_counter.count("products", PRODUCT_LIST_FILTER_STAGES)
+
+    async def get_products_with_variations_after(self, after: Optional[Tuple[datetime, ObjectId]],
+                                                 limit: int) -> List[dict]:
+        """
+        :param after: created_at and _id of the last product of the previous page. If None, the first page is returned.
+        :param limit: count of items to return.
+        :return: Products and their variations, products aren't counted.
+        """
+        pipeline = get_product_list_after_pipeline(after, limit, self._product_list_projection)
+        return await db.products.aggregate(pipeline=pipeline).to_list(length=None)
 
     async def search_products_by_name(self, name: str, filters: Optional[dict] = None,
                                       projection: Optional[dict] = None,
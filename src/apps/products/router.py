@@ -1,13 +1,22 @@
+from typing import List, Optional
+
 import fastapi
-from fastapi import Body, Depends
+from fastapi import Body, Depends, File, Form, UploadFile
 
 from src.schemes.py_object_id import PyObjectId
 from .schemes import create
+from .schemes.clone import CloneProductRequest
 from .schemes import get
 from .schemes import update
 from .schemes.delete import DeleteProductRequest
+from .schemes import image_uploads
 from .service import ProductAdminService
 from src.dependencies.service_dependencies.products import get_product_service
+from src.core.image_intake.multipart import ImageParts, parse_multipart_data
+from src.services.products.product_image_parts import (
+    attach_image_parts_to_created_product,
+    attach_image_parts_to_updated_product,
+)
 
 router = fastapi.APIRouter(
     prefix="/admin/products",
@@ -25,11 +34,30 @@ async def product_create(product: create.CreateProduct = Body(...),
                          service: ProductAdminService = Depends(get_product_service)):
     return await service.create_product(product)
 
+@router.post("/create/multipart", status_code=fastapi.status.HTTP_201_CREATED,
+             response_model=create.CreateProductResponse)
+async def product_create_multipart(data: str = Form(...), files: List[UploadFile] = File([]),
+                                   service: ProductAdminService = Depends(get_product_service)):
+    """
+    The same as POST /create, but images are sent as binary parts instead of base64 strings.
+    "data" is the JSON body of POST /create, its image fields refer to the parts as "file:<filename>".
+    """
+    product = parse_multipart_data(create.CreateProduct, data)
+    attach_image_parts_to_created_product(product, await ImageParts.collect(files))
+    return await service.create_product(product)
+
 @router.get("/", response_model=get.ProductListResponse)
 async def product_list(page: int = fastapi.Query(1, ge=1, ),
                        page_size: int = fastapi.Query(10, ge=1),
+                       cursor: Optional[str] = None,
                        service: ProductAdminService = Depends(get_product_service)):
-    return await service.get_product_list(page, page_size)
+    """
+    Products are paginated by the page number or by the cursor.
+    Pass next_cursor of the previous page as the cursor (or an empty cursor for the first page)
+    to get the next page without skipping the previous products, deep pages cost as much as the first one.
+    Cursor pages aren't counted, their page_count, items_count and exact_count are null.
+    """
+    return await service.get_product_list(page, page_size, cursor)
 
 @router.get("/search", response_model=get.ProductSearchResponse)
 async def product_search_by_name(name: str = "", page: int = fastapi.Query(1, ge=1, ),
@@ -47,6 +75,52 @@ async def product_update(product_id: PyObjectId, data_to_update: update.UpdatePr
                          service: ProductAdminService = Depends(get_product_service)):
     return await service.update_product(product_id, data_to_update)
 
+@router.put("/{product_id}/multipart", response_model=update.UpdateProductResponse)
+async def product_update_multipart(product_id: PyObjectId, data: str = Form(...),
+                                   files: List[UploadFile] = File([]),
+                                   service: ProductAdminService = Depends(get_product_service)):
+    """
+    The same as PUT /{product_id}, but images are sent as binary parts instead of base64 strings.
+    "data" is the JSON body of PUT /{product_id}, its image fields refer to the parts as "file:<filename>".
+    """
+    data_to_update = parse_multipart_data(update.UpdateProduct, data)
+    attach_image_parts_to_updated_product(data_to_update, await ImageParts.collect(files))
+    return await service.update_product(product_id, data_to_update)
+
+@router.post("/{product_id}/image-uploads", response_model=image_uploads.ProductImageUploadsResponse)
+async def product_image_uploads_create(product_id: PyObjectId,
+                                       data: image_uploads.ProductImageUploadsRequest = Body(...),
+                                       service: ProductAdminService = Depends(get_product_service)):
+    """
+    Returns presigned forms to upload images of the product straight to the storage.
+    The uploaded images replace all images of the product once they are committed.
+    """
+    return await service.create_image_uploads(product_id, data.secondary_image_count)
+
+@router.post("/{product_id}/image-uploads/commit", response_model=image_uploads.CommittedProductImagesResponse)
+async def product_image_uploads_commit(product_id: PyObjectId,
+                                       data: image_uploads.CommitProductImageUploadsRequest = Body(...),
+                                       service: ProductAdminService = Depends(get_product_service)):
+    """Checks the images uploaded with the presigned forms and sets their URLs to the product"""
+    return await service.commit_image_uploads(product_id, data.secondary_image_count, data.version)
+
+@router.post("/{product_id}/clone", status_code=fastapi.status.HTTP_201_CREATED,
+             response_model=create.CreateProductResponse)
+async def product_clone(product_id: PyObjectId, data: CloneProductRequest = Body(...),
+                        service: ProductAdminService = Depends(get_product_service)):
+    """
+    Copies the product and its variations with new SKUs.
+    Images are copied within the storage, so the response doesn't wait for them to be uploaded again.
+    """
+    return await service.clone_product(product_id, data)
+
+@router.put("/{product_id}/stock-shards", status_code=fastapi.status.HTTP_204_NO_CONTENT)
+async def product_stock_shards_update(product_id: PyObjectId,
+                                      data: update.UpdateStockShardsRequest = Body(...),
+                                      service: ProductAdminService = Depends(get_product_service)):
+    """Splits stock of the hot product across several counters to reduce write contention"""
+    await service.update_stock_shards(product_id, data.shard_count)
+
 @router.delete("/{product_id}", status_code=fastapi.status.HTTP_204_NO_CONTENT)
 async def product_delete(product_id: PyObjectId, service: ProductAdminService = Depends(get_product_service)):
     await service.delete_one_product(product_id)
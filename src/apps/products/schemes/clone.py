@@ -0,0 +1,21 @@
+from typing import Dict, Optional
+
+from pydantic import BaseModel, constr, root_validator
+
+
+class CloneProductRequest(BaseModel):
+    """
+    Represents new SKUs of the cloned product and its variations.
+    Each SKU is taken from skus, SKUs that aren't there get sku_suffix appended.
+    """
+    # Appended to the SKUs of the source products, e.g. "-2" turns "TSHIRT-RED" into "TSHIRT-RED-2"
+    sku_suffix: Optional[constr(min_length=1)]
+    # New SKUs by the SKUs of the source products
+    skus: Dict[constr(min_length=1), constr(min_length=1)] = {}
+
+    @root_validator(skip_on_failure=True)
+    def skus_validator(cls, values):
+        if not values.get("sku_suffix") and not values.get("skus"):
+            raise ValueError("Specify sku_suffix or skus")
+
+        return values
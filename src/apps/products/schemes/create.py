@@ -116,6 +116,9 @@ class CreateProductResponse(BaseModel):
     product_id: PyObjectId
     # List of IDs of the inserted product variations
     variation_ids: Optional[List[PyObjectId]]
+    # Jobs that upload images of the products (See GET /admin/image-jobs/{job_id}),
+    # empty if images were uploaded within the request
+    image_job_ids: List[str] = []
 
     class Config:
         allow_population_by_field_name = True
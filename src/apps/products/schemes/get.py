@@ -41,8 +41,13 @@ class ProductListResponse(BaseModel):
     Response model that returns list of products and other information such as item count, page count etc.
     """
     products: List[ProductAdmin]
-    page_count: int
-    items_count: int
+    # Counts are None for the cursor pages, they aren't counted
+    page_count: Optional[int]
+    items_count: Optional[int]
+    # False if the count is estimated
+    exact_count: Optional[bool]
+    # Cursor of the next page or None if it's the last page
+    next_cursor: Optional[str]
 
     class Config:
         allow_population_by_field_name = True
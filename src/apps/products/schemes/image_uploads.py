@@ -0,0 +1,32 @@
+from typing import List
+
+from pydantic import BaseModel, conint
+
+from src.apps.products_base.schemes.base import Images
+from src.schemes.image_upload import ImageUpload, ImageVersion
+
+
+class ProductImageUploadsRequest(BaseModel):
+    """
+    Represents images of the product uploaded straight to the storage.
+    The uploaded images replace all images of the product.
+    """
+    secondary_image_count: conint(ge=0, le=20) = 0
+
+
+class CommitProductImageUploadsRequest(ProductImageUploadsRequest):
+    # Version returned with the presigned forms
+    version: ImageVersion
+
+
+class ProductImageUploadsResponse(BaseModel):
+    main: ImageUpload
+    secondaryImages: List[ImageUpload]
+    # Version of the image keys, send it to commit the uploads
+    version: str
+    # Count of seconds the forms are valid
+    expires_in: int
+
+
+class CommittedProductImagesResponse(BaseModel):
+    images: Images
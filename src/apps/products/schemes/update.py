@@ -1,6 +1,6 @@
 from typing import List, Optional, TypedDict, Union
 from bson import ObjectId
-from pydantic import BaseModel, Field, validator, constr
+from pydantic import BaseModel, Field, validator, constr, conint
 
 from src.apps.products_base.schemes.base import Attr, BaseAttrs, ProductVariation
 from .create import ImagesCreateProduct
@@ -119,8 +119,18 @@ class UpdateProductResponse(BaseModel):
     # a list of identifiers of updated and inserted products
     updated_variation_ids: Optional[List[PyObjectId]]
     inserted_variation_ids: Optional[List[PyObjectId]]
+    # Jobs that update images of the products (See GET /admin/image-jobs/{job_id})
+    image_job_ids: List[str] = []
 
     class Config:
         allow_population_by_field_name = True
         arbitrary_types_allowed = True
         json_encoders = {ObjectId: str}
+
+
+class UpdateStockShardsRequest(BaseModel):
+    """
+    Represents a request body for splitting stock of the product across several shards
+    """
+    # 0 moves stock back to the product
+    shard_count: conint(ge=0, le=64)
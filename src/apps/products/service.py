@@ -1,5 +1,6 @@
+import asyncio
 from math import ceil
-from typing import List, Dict, Union, Any
+from typing import List, Dict, Union, Any, Optional, Tuple
 from pymongo.operations import UpdateOne
 from bson import ObjectId
 from fastapi import HTTPException
@@ -8,19 +9,32 @@ from src.apps.categories.repository import CategoryRepository
 from src.apps.facet_types.repository import FacetTypeRepository
 from src.apps.facets.repository import FacetRepository
 from src.utils import convert_decimal
+from src.config import settings
+from src.config.database import client
 from src.apps.variaton_themes.repository import VariationThemeRepository
 from .replication_schemes.order_processing.base import ProductItem
+from .replication_schemes.order_processing.product_reservation_result import ProductReservationResultData
 from .repository import ProductAdminRepository
+from .schemes.clone import CloneProductRequest
 from .schemes.create import CreateProduct
 from .schemes.get import ProductSearchFilters
 from .schemes.update import UpdateProduct
 from src.param_classes.products.attach_to_event_params import AttachToEventParams
 from src.param_classes.products.detach_from_event_params import DetachFromEventParams
 from src.services.products.validators import ProductValidatorCreate, ProductValidatorUpdate
+from src.services.products.product_crud.product_cloner import ProductCloner
 from src.services.products.product_crud.product_creator import ProductCreator
 from src.services.products.product_crud.product_modifier import ProductModifier
 from src.services.products.product_crud.product_remover import ProductRemover
+from src.services.products.stock_reservation_engine import StockReservationEngine
+from src.services.products.sharded_stock_counter import ShardedStockCounter
+from src.repositories.stock_shard_repository import StockShardRepository
 from src.services.products.filters.filter_creator import ProductsFilterCreatorAdmin
+from src.services.products.product_list_cursor import encode_product_list_cursor, decode_product_list_cursor
+from src.services.products.image_operation_manager import ImageOperationManager
+from src.services.reference_data_cache import reference_data_cache
+from src.services.create_image_name import create_image_version, create_product_image_key
+from src.services.presigned_image_uploads import create_image_upload, check_uploaded_images, get_image_url
 from src.services.products.replication.replicate_products import (
     replicate_product_attachment_to_event,
     replicate_product_detachment_from_event,
@@ -37,39 +51,25 @@ class ProductAdminService:
         self.variation_theme_repo = variation_theme_repo
         self.facet_type_repo = facet_type_repo
 
+    @staticmethod
+    async def _get_facet_types_except_list(projection: Optional[dict] = None) -> List[dict]:
+        return [facet_type for facet_type in await reference_data_cache.get_facet_types(projection)
+                if facet_type.get("value") != "list"]
+
     async def get_product_creation_essentials(self, category_id: ObjectId) -> Dict:
         """
         Returns essential data for product creation
         """
-        category = await self.category_repo.get_one_category({"_id": category_id},
-                                                             {"tree_id": 0, "parent_id": 0})
+        category = await reference_data_cache.get_category(category_id, {"tree_id": 0, "parent_id": 0})
         if not category:
             raise HTTPException(status_code=404, detail="Category with the specified id doesn't exist")
         # Get all facets that belong to the specified category or all categories
-        facets = await self.facet_repo.get_facet_list(
-            {"$or": [
-                {"categories": category_id},
-                {"categories": "*"}
-            ],
-            },
-            {
-                "categories": 0
-            }
-        )
+        facets = await reference_data_cache.get_facets_of_category(category_id, {"categories": 0})
         # Get all variation_themes that belong to the specified category or all categories
-        variation_themes = await self.variation_theme_repo.get_variation_theme_list(
-            {
-                "$or": [
-                    {"categories": category_id},
-                    {"categories": "*"}
-                ]
-            },
-            {
-                "categories": 0
-            }
-        )
+        variation_themes = await reference_data_cache.get_variation_themes_of_category(category_id,
+                                                                                       {"categories": 0})
         # get all facet types except the list
-        facet_types = await self.facet_type_repo.get_facet_type_list({"value": {"$ne": "list"}})
+        facet_types = await self._get_facet_types_except_list()
 
         return {
             "facets": facets,
@@ -83,7 +83,7 @@ class ProductAdminService:
         Creates product with the specified data if there are no errors.
         :param data: CreateProduct model containing product data.
         """
-        category = await self.category_repo.get_one_category({"_id": data.category}, {"_id": 1})
+        category = await reference_data_cache.get_category(data.category, {"_id": 1})
         if not category:
             raise HTTPException(status_code=400, detail="Invalid category specified")
 
@@ -96,7 +96,45 @@ class ProductAdminService:
         # convert all decimal fields into decimal128
         validated_data = convert_decimal(validated_data)
         product_creator = ProductCreator(self.product_repo)
-        product_id, variation_ids = await product_creator.create_product(validated_data)
+        product_id, variation_ids, image_job_ids = await product_creator.create_product(validated_data)
+        return {"product_id": product_id, "variation_ids": variation_ids, "image_job_ids": image_job_ids}
+
+    async def clone_product(self, product_id: ObjectId,
+                            data: CloneProductRequest) -> Dict[str, Union[ObjectId, List[ObjectId]]]:
+        """
+        Creates a copy of the product and its variations with new SKUs.
+        Images are copied on the storage side, they are never downloaded or uploaded again.
+        """
+        product = await self.product_repo.get_one_product({"_id": product_id})
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        if product.get("parent_id") is not None:
+            raise HTTPException(status_code=400, detail="Variation can be cloned only with its parent product")
+
+        products = [product]
+        if product.get("parent"):
+            products.extend(await self.product_repo.get_product_list({"parent_id": product_id}))
+
+        new_skus = {}
+        missing_skus = []
+        for item in products:
+            new_sku = data.skus.get(item["sku"]) or (f"{item['sku']}{data.sku_suffix}" if data.sku_suffix else None)
+            if new_sku is None:
+                missing_skus.append(item["sku"])
+            new_skus[item["_id"]] = new_sku
+        if missing_skus:
+            raise HTTPException(status_code=400, detail=f"New SKUs of {', '.join(missing_skus)} aren't specified")
+        if len(set(new_skus.values())) != len(new_skus):
+            raise HTTPException(status_code=400, detail="SKU must be unique for each variation")
+        existing_products = await self.product_repo.get_product_list({"sku": {"$in": list(new_skus.values())}},
+                                                                    {"_id": 0, "sku": 1})
+        if existing_products:
+            existing_skus = ", ".join(existing_product["sku"] for existing_product in existing_products)
+            raise HTTPException(status_code=400, detail={"existed_skus": f"SKUs: {existing_skus} already exist!"})
+
+        product_cloner = ProductCloner(self.product_repo,
+                                       ShardedStockCounter(self.product_repo, StockShardRepository()))
+        product_id, variation_ids = await product_cloner.clone_product(products, new_skus)
         return {"product_id": product_id, "variation_ids": variation_ids}
 
     async def update_product(self, product_id: ObjectId,
@@ -124,35 +162,160 @@ class ProductAdminService:
         # convert all decimal fields into decimal128
         validated_data = convert_decimal(validated_data)
 
-        product_modifier = ProductModifier(self.product_repo)
-        result = await product_modifier.update_product(product_id, validated_data, parent)
-        return result
+        product_modifier = ProductModifier(self.product_repo,
+                                           ShardedStockCounter(self.product_repo, StockShardRepository()))
+        return await product_modifier.update_product(product_id, validated_data, parent)
+
+    async def update_stock_shards(self, product_id: ObjectId, shard_count: int) -> None:
+        """
+        Splits stock of the product across the specified count of shards,
+        so concurrent reservations of the product don't contend for one document.
+        :param product_id: Identifier of the product without variations or variation.
+        :param shard_count: Count of shards. If it's 0, stock of the product is not sharded anymore.
+        """
+        product = await self.product_repo.get_one_product({"_id": product_id}, {"parent": 1, "stock_shard_count": 1})
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        if product.get("parent"):
+            raise HTTPException(status_code=400, detail="Parent products don't have their own stock")
+        if shard_count and not settings.STOCK_SHARDING_ENABLED:
+            raise HTTPException(status_code=400, detail="Stock sharding is disabled")
+
+        stock_counter = ShardedStockCounter(self.product_repo, StockShardRepository())
+        if shard_count:
+            await stock_counter.shard_stock(product_id, shard_count)
+        elif product.get("stock_shard_count"):
+            await stock_counter.unshard_stock(product_id)
+
+    async def _get_product_with_own_images(self, product_id: ObjectId) -> dict:
+        """
+        Returns the product if its images can be replaced with the images uploaded straight to the storage.
+        """
+        product = await self.product_repo.get_one_product({"_id": product_id},
+                                                          {"parent": 1, "parent_id": 1, "same_images": 1, "images": 1})
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        if (product.get("images") or {}).get("sourceProductId") is not None:
+            raise HTTPException(status_code=400, detail="Product uses images of another product")
+        if product.get("parent") and not product.get("same_images"):
+            raise HTTPException(status_code=400, detail="Variations of the product have their own images")
+        if product.get("parent_id") is not None and product.get("same_images"):
+            raise HTTPException(status_code=400, detail="Variation has the same images as its parent product")
+
+        return product
+
+    @staticmethod
+    def _get_image_keys(product_id: ObjectId, secondary_image_count: int, version: str) -> List[str]:
+        # The main image is number 0, secondary images are numbered from 1
+        return [create_product_image_key(product_id, number, version) for number in range(secondary_image_count + 1)]
+
+    async def create_image_uploads(self, product_id: ObjectId, secondary_image_count: int) -> Dict:
+        """
+        Returns presigned forms to upload images of the product straight to the storage.
+        Once images are uploaded, they should be committed with the returned version (See commit_image_uploads).
+        :param secondary_image_count: Count of the secondary images, the main image is always uploaded.
+        """
+        await self._get_product_with_own_images(product_id)
+        version = create_image_version()
+        uploads = await asyncio.gather(*(create_image_upload(key)
+                                         for key in self._get_image_keys(product_id, secondary_image_count, version)))
+        return {
+            "main": uploads[0],
+            "secondaryImages": uploads[1:],
+            "version": version,
+            "expires_in": settings.IMAGE_UPLOAD_EXPIRES_SECONDS,
+        }
+
+    async def commit_image_uploads(self, product_id: ObjectId, secondary_image_count: int, version: str) -> Dict:
+        """
+        Checks the images uploaded straight to the storage and sets their URLs to the product.
+        If the product is a parent with the same images, URLs are set to its variations as well.
+        If variations of the parent use images of the product, their URLs are updated too.
+        Replaced images of the product are deleted.
+        """
+        product = await self._get_product_with_own_images(product_id)
+        keys = self._get_image_keys(product_id, secondary_image_count, version)
+        errors = await check_uploaded_images(keys)
+        if errors:
+            raise HTTPException(status_code=400, detail={"images": {
+                "main": errors.get(0),
+                "secondaryImages": {index - 1: image_errors for index, image_errors in errors.items() if index},
+            }})
+
+        images = {
+            "main": get_image_url(keys[0]),
+            "secondaryImages": [get_image_url(key) for key in keys[1:]] or None,
+            "sourceProductId": None,
+        }
+        image_operation_manager = ImageOperationManager(product_id, product.get("images") or {}, {},
+                                                        self.product_repo)
+        if product.get("parent"):
+            variations = await self.product_repo.get_product_list({"parent_id": product_id}, {"_id": 1})
+            await image_operation_manager.set_images_multiple_products(
+                images, [variation["_id"] for variation in variations],
+            )
+        else:
+            await image_operation_manager.set_images_one_product(
+                images, update_linked_products=product.get("parent_id") is not None,
+            )
+        return {"images": images}
 
-    async def get_product_list(self, page: int, page_size: int) -> Dict:
+    async def get_product_list(self, page: int, page_size: int, cursor: Optional[str] = None) -> Dict:
         """
-        :param page: Page number.
+        :param page: Page number, ignored if the cursor is specified.
         :param page_size: Number of products per page.
+        :param cursor: next_cursor of the previous page or an empty string for the first page.
+                       If it's specified, products are paginated with the cursor instead of the page number.
         :return: A list of products, their variations and total product count on specified page.
+                 Counts are None if the cursor is specified.
         """
+        if cursor is not None:
+            return await self._get_product_list_after(cursor, page_size)
+
         product_list = await self.product_repo.get_products_with_variations(page, page_size)
-        if not product_list:
+        products = product_list.get("items")
+        if not products:
             # If there are no products, then
             # return empty list, page count 0, items count 0
             return {
                 "products": [],
                 "page_count": 1,
                 "items_count": 0,
+                "exact_count": True,
+                "next_cursor": None,
             }
         # otherwise, return product list, product count, page count from query
         products_count = product_list.get("count")
 
         result = {
-            "products": product_list.get("items", []),
+            "products": products,
             "page_count": ceil(products_count / page_size),
             "items_count": products_count,
+            "exact_count": product_list.get("exact_count"),
+            # Client can switch to the cursor from any page
+            "next_cursor": encode_product_list_cursor(products[-1])
+            if page * page_size < products_count else None,
         }
         return result
 
+    async def _get_product_list_after(self, cursor: str, page_size: int) -> Dict:
+        try:
+            after = decode_product_list_cursor(cursor) if cursor else None
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+        # One more product is fetched to know whether there's the next page.
+        # Products aren't counted, so the page costs the same however big the catalog is
+        products = await self.product_repo.get_products_with_variations_after(after, page_size + 1)
+        next_cursor = encode_product_list_cursor(products[page_size - 1]) if len(products) > page_size else None
+        return {
+            "products": products[:page_size],
+            "page_count": None,
+            "items_count": None,
+            "exact_count": None,
+            "next_cursor": next_cursor,
+        }
+
     async def get_product_by_id(self, product_id: ObjectId) -> Dict[str, Any]:
         """
         Returns product with the specified id if it exists and product variations if they are exist.
@@ -164,21 +327,22 @@ class ProductAdminService:
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
 
+        # Stock of the products with sharded stock is the sum of their shards
+        products_with_stock = [product, *(product.get("variations") or [])]
+        total_stock = await ShardedStockCounter(self.product_repo, StockShardRepository()) \
+            .get_total_stock([item["_id"] for item in products_with_stock if "_id" in item])
+        for item in products_with_stock:
+            if item.get("_id") in total_stock:
+                item["stock"] = total_stock[item["_id"]]
+
         # get facets where code equals to one from product["attr_codes"] list
         # OR category is equal to product.category or equal to "*"
-        facets = await self.facet_repo.get_facet_list(
-            {"$or": [
-                # {"code": {"$in": product.pop("attr_codes", [])}},
-                {"categories": {"$in": [product.get("category"), "*"]}}
-            ]
-            },
-        )
+        facets = await reference_data_cache.get_facets_of_category(product.get("category"))
         # get category where _id equals to product's category field.
-        category = await self.category_repo.get_one_category({"_id": product.get("category")},
-                                                             {"_id": 0, "name": 1, "groups": 1})
+        category = await reference_data_cache.get_category(product.get("category"),
+                                                           {"_id": 0, "name": 1, "groups": 1})
         # get facet types
-        facet_types = await self.facet_type_repo.get_facet_type_list({"value": {"$ne": "list"}},
-                                                                     {"_id": 0, })
+        facet_types = await self._get_facet_types_except_list({"_id": 0})
         if product.get("parent"):
             # get variation theme
             variation_theme = dict(product.get("variation_theme"))
@@ -269,54 +433,71 @@ class ProductAdminService:
                                                    "discount_rate": discount,
                                                    "event_id": params.event_id,
                                                }}))
-        updated_products = await self.product_repo.update_many_products_bulk(update_operations)
-        await replicate_product_attachment_to_event(params)
+        async with (await client.start_session() as session):
+            async with session.start_transaction():
+                updated_products = await self.product_repo.update_many_products_bulk(update_operations,
+                                                                                     session=session)
+                await replicate_product_attachment_to_event(params, session=session)
         return updated_products.modified_count
 
     async def detach_from_event(self, params: DetachFromEventParams) -> int:
         """
         Detaches products from a specific event and removes discounts.
         """
-        updated_products = await self.product_repo.update_many_products({"event_id": params.event_id},
-                                                                        {"$set": {
-                                                                            "discount_rate": None,
-                                                                            "event_id": None,
-                                                                        }})
-        await replicate_product_detachment_from_event(params)
+        async with (await client.start_session() as session):
+            async with session.start_transaction():
+                updated_products = await self.product_repo.update_many_products({"event_id": params.event_id},
+                                                                                {"$set": {
+                                                                                    "discount_rate": None,
+                                                                                    "event_id": None,
+                                                                                }},
+                                                                                session=session)
+                await replicate_product_detachment_from_event(params, session=session)
         return updated_products.modified_count
 
-    async def reserve_for_order(self, products: List[ProductItem]) -> int:
+    async def reserve_for_orders(self, orders: List[Tuple[List[ProductItem], Optional[str], Optional[str]]],
+                                 session=None) -> List[ProductReservationResultData]:
         """
-        Reserves ordered products
+        Reserves all products of each order or none of them, stock never goes negative.
+        Each product is decremented once for all orders that contain it, if it has enough stock for them.
+        :param orders: Ordered products, identifiers of the message and of the order for each order.
+        :param session: Session of the transaction that marks the messages as processed.
+        :return: Results of the reservations in the order of the list.
         """
-        operations = []
+        return await StockReservationEngine(self.product_repo).reserve_many(orders, session)
 
-        for product in products:
-            operation = UpdateOne(
-                {"_id": ObjectId(product["product_id"])},
-                {"$inc": {
-                    "stock": -product["quantity"]
-                }}
-            )
-            operations.append(operation)
-
-        updated_products = await self.product_repo.update_many_products_bulk(operations)
-        return updated_products.modified_count
-
-    async def release_from_order(self, products: List[ProductItem]) -> int:
+    async def release_from_order(self, products: List[ProductItem], session=None) -> int:
         """
         Returns ordered products from the order reservation
+        :param products: Ordered products and their quantity.
+        :param session: Session to release products inside the transaction.
         """
-        operations = []
-
+        stock_changes: Dict[ObjectId, int] = {}
         for product in products:
-            operation = UpdateOne(
-                {"_id": ObjectId(product["product_id"])},
-                {"$inc": {
-                    "stock": product["quantity"]
-                }}
-            )
-            operations.append(operation)
+            product_id = ObjectId(product["product_id"])
+            stock_changes[product_id] = stock_changes.get(product_id, 0) + product["quantity"]
 
-        updated_products = await self.product_repo.update_many_products_bulk(operations)
-        return updated_products.modified_count
+        return await self.apply_stock_changes(stock_changes, session=session)
+
+    async def apply_stock_changes(self, stock_changes: Dict[ObjectId, int], session=None) -> int:
+        """
+        Changes stock of many products with one bulk write.
+        Stock of the products with sharded stock is changed in one of their shards.
+        :param stock_changes: Mapping of product ids to the amounts added to their stock.
+        :param session: Session to change stock inside the transaction.
+        """
+        stock_changes = {product_id: stock_change for product_id, stock_change in stock_changes.items()
+                         if stock_change}
+        stock_counter = ShardedStockCounter(self.product_repo, StockShardRepository())
+        shard_counts = await stock_counter.get_shard_counts(list(stock_changes))
+        for product_id, shard_count in shard_counts.items():
+            await stock_counter.release(product_id, stock_changes.pop(product_id), shard_count, session=session)
+
+        operations = [UpdateOne({"_id": product_id}, {"$inc": {"stock": stock_change}})
+                      for product_id, stock_change in stock_changes.items()]
+        if not operations:
+            return len(shard_counts)
+
+        updated_products = await self.product_repo.update_many_products_bulk(operations, ordered=False,
+                                                                            session=session)
+        return updated_products.modified_count + len(shard_counts)
@@ -62,6 +62,22 @@ class Attr(BaseModel):
     explanation: Optional[str]
 
 
+class ImageVariant(BaseModel):
+    """Represents a resized copy (derivative) of the product image"""
+    # Width of the copy in pixels
+    width: int
+    # Format of the copy (jpg, webp)
+    format: str
+    url: str
+
+
+class ImageDerivatives(BaseModel):
+    """Represents resized copies of one product image"""
+    # The URL of the original image
+    source: str
+    variants: List[ImageVariant]
+
+
 class Images(BaseModel):
     """Represents product images"""
     # ID of the product from which images were copied. OPTIONAL
@@ -73,6 +89,9 @@ class Images(BaseModel):
     # List of URLs of the secondary images of the product if user gets product.
     # if user creates product this field stores list of base64 encoded images
     secondaryImages: Optional[List[str]]
+    # Resized copies of the images uploaded by the server. OPTIONAL
+    # Images uploaded before derivatives existed or uploaded directly to the storage have no derivatives
+    derivatives: Optional[List[ImageDerivatives]]
 
 
 class ProductVariation(BaseAttrs):
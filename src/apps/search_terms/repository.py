@@ -1,3 +1,4 @@
+import asyncio
 from typing import Optional
 
 from pymongo.errors import BulkWriteError
@@ -5,7 +6,11 @@ from pymongo.results import InsertOneResult, UpdateResult, DeleteResult, BulkWri
 from pymongo.operations import UpdateOne
 
 from src.config.database import db
-from src.aggregation_queries.search_terms.search_terms_list import get_search_terms_list_pipeline
+from src.repositories.document_counter import document_counter
+from src.aggregation_queries.search_terms.search_terms_list import (
+    get_search_terms_list_pipeline,
+    get_search_terms_list_filter_stages,
+)
 from src.logger import logger
 
 
@@ -46,8 +51,11 @@ class SearchTermsRepository:
             :param name: search term name.
         """
         pipeline = get_search_terms_list_pipeline(page, page_size, name)
-        search_terms = await db.search_terms.aggregate(pipeline).to_list(length=None)
-        return search_terms[0] if search_terms else {}
+        search_terms, (count, exact_count) = await asyncio.gather(
+            db.search_terms.aggregate(pipeline).to_list(length=None),
+            document_counter.count("search_terms", get_search_terms_list_filter_stages(name)),
+        )
+        return {"result": search_terms, "total_count": {"total": count}, "exact_count": exact_count}
 
     async def get_one_search_term(self, filters: dict, projection: Optional[dict] = None, **kwargs) -> dict:
         """
@@ -72,6 +80,7 @@ class SearchTermsRepository:
             raise ValueError("No data provided")
 
         created_search_term = await db.search_terms.insert_one(data, **kwargs)
+        document_counter.invalidate("search_terms")
         return created_search_term
 
     async def update_search_term(self, filters: dict, data_to_update: dict, **kwargs) -> UpdateResult:
@@ -82,6 +91,7 @@ class SearchTermsRepository:
         :param kwargs: Other parameters for update such as session for transaction etc.
         """
         updated_search_term = await db.search_terms.update_one(filter=filters, update=data_to_update, **kwargs)
+        document_counter.invalidate("search_terms")
         return updated_search_term
 
     async def update_many_search_terms(self, filters: dict, data_to_update: dict, **kwargs) -> UpdateResult:
@@ -92,6 +102,7 @@ class SearchTermsRepository:
         :param kwargs: Other parameters for update such as session for transaction etc.
         """
         updated_search_terms = await db.search_terms.update_many(filter=filters, update=data_to_update, **kwargs)
+        document_counter.invalidate("search_terms")
         return updated_search_terms
 
     async def delete_search_term(self, filters: dict, **kwargs) -> DeleteResult:
@@ -101,6 +112,7 @@ class SearchTermsRepository:
         :param kwargs: Other parameters for delete such as session for transaction etc.
         """
         deleted_search_term = await db.search_terms.delete_one(filter=filters, **kwargs)
+        document_counter.invalidate("search_terms")
         return deleted_search_term
 
     async def delete_many_search_terms(self, filters: dict, **kwargs) -> DeleteResult:
@@ -110,6 +122,7 @@ class SearchTermsRepository:
         :param kwargs: Other parameters for delete such as session for transaction etc.
         """
         deleted_many_search_terms = await db.search_terms.delete_many(filter=filters, **kwargs)
+        document_counter.invalidate("search_terms")
         return deleted_many_search_terms
 
     async def update_many_search_terms_bulk(self, operations: list[UpdateOne], **kwargs) -> BulkWriteResult:
@@ -121,6 +134,7 @@ class SearchTermsRepository:
         """
         try:
             updated_search_terms = await db.search_terms.bulk_write(operations, **kwargs)
+            document_counter.invalidate("search_terms")
             return updated_search_terms
         except BulkWriteError as bwe:
             logger.error(bwe)
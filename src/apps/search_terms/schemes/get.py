@@ -9,6 +9,7 @@ from .base import SearchTerm
 class SearchTermsListResponse(BaseModel):
     result: List[SearchTerm]
     page_count: int
+    exact_count: bool
 
     class Config:
         allow_population_by_field_name = True
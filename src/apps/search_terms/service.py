@@ -21,6 +21,7 @@ class SearchTermsAdminService:
             result = {
                 "result": [],
                 "page_count": 1,
+                "exact_count": True,
             }
             return result
 
@@ -29,6 +30,7 @@ class SearchTermsAdminService:
         result = {
             "result": search_terms.get("result"),
             "page_count": ceil(search_terms_count / page_size),  # Calculating count of pages
+            "exact_count": search_terms.get("exact_count"),
         }
 
         return result
@@ -1,8 +1,10 @@
+import asyncio
 from typing import Optional
 from pymongo.results import InsertOneResult, UpdateResult, DeleteResult
 
 from src.config.database import db
-from src.aggregation_queries.synonyms.synonym_list import get_synonym_list_pipeline
+from src.repositories.document_counter import document_counter
+from src.aggregation_queries.synonyms.synonym_list import get_synonym_list_pipeline, get_synonym_list_filter_stages
 
 
 class SynonymRepository:
@@ -45,8 +47,11 @@ class SynonymRepository:
             filters = {}
 
         pipeline = get_synonym_list_pipeline(page, page_size, filters)
-        synonyms = await db.synonyms.aggregate(pipeline).to_list(length=None)
-        return synonyms[0] if synonyms else {}
+        synonyms, (count, exact_count) = await asyncio.gather(
+            db.synonyms.aggregate(pipeline).to_list(length=None),
+            document_counter.count("synonyms", get_synonym_list_filter_stages(filters)),
+        )
+        return {"result": synonyms, "total_count": {"total": count}, "exact_count": exact_count}
 
     async def get_one_synonym(self, filters: dict, projection: Optional[dict] = None, **kwargs) -> dict:
         """
@@ -73,6 +78,7 @@ class SynonymRepository:
             raise ValueError("No data provided")
 
         created_synonym = await db.synonyms.insert_one(data, **kwargs)
+        document_counter.invalidate("synonyms")
         return created_synonym
 
     async def update_synonym(self, filters: dict, data_to_update: dict, **kwargs) -> UpdateResult:
@@ -83,6 +89,7 @@ class SynonymRepository:
             :param kwargs: Other parameters for update such as session for transaction etc.
         """
         updated_synonym = await db.synonyms.update_one(filter=filters, update=data_to_update, **kwargs)
+        document_counter.invalidate("synonyms")
         return updated_synonym
 
     async def delete_one_synonym(self, filters: dict, **kwargs) -> DeleteResult:
@@ -92,6 +99,7 @@ class SynonymRepository:
         :param kwargs: Other parameters for delete such as session for transaction etc.
         """
         deleted_synonym = await db.synonyms.delete_one(filter=filters, **kwargs)
+        document_counter.invalidate("synonyms")
         return deleted_synonym
 
     async def delete_many_synonyms(self, filters: dict, **kwargs):
@@ -101,4 +109,5 @@ class SynonymRepository:
         :param kwargs: Other parameters for delete such as session for transaction etc.
         """
         deleted_synonyms = await db.synonyms.delete_many(filter=filters, **kwargs)
+        document_counter.invalidate("synonyms")
         return deleted_synonyms
@@ -8,6 +8,7 @@ from .base import CreatedSynonym
 class SynonymListResponse(BaseModel):
     synonyms: List[CreatedSynonym]
     page_count: int
+    exact_count: bool
 
     class Config:
         use_enum_values = True
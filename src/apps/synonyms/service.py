@@ -39,6 +39,7 @@ class SynonymService:
             result = {
                 "synonyms": [],
                 "page_count": 1,
+                "exact_count": True,
             }
             return result
 
@@ -47,6 +48,7 @@ class SynonymService:
         result = {
             "synonyms": synonyms.get("result"),
             "page_count": ceil(synonyms_count / page_size),
+            "exact_count": synonyms.get("exact_count"),
         }
         # return result
         return result
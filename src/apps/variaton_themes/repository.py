@@ -1,7 +1,9 @@
+import asyncio
 from pymongo.results import InsertOneResult, UpdateResult, DeleteResult
 from typing import Optional
 
 from src.config.database import db
+from src.repositories.document_counter import document_counter
 from src.aggregation_queries.variation_themes.variation_theme_list import get_variation_theme_list_pipeline
 
 class VariationThemeRepository:
@@ -41,9 +43,11 @@ class VariationThemeRepository:
         :param page_size: Number of documents per page.
         """
         pipeline = get_variation_theme_list_pipeline(page, page_size)
-        variation_themes = await db.variation_themes.aggregate(pipeline).to_list(length=None)
-
-        return variation_themes[0] if variation_themes else {}
+        variation_themes, (count, exact_count) = await asyncio.gather(
+            db.variation_themes.aggregate(pipeline).to_list(length=None),
+            document_counter.count("variation_themes"),
+        )
+        return {"result": variation_themes, "total_count": {"total": count}, "exact_count": exact_count}
 
     async def get_one_variation_theme(self, filters: dict, projection: Optional[dict] = None, **kwargs):
         """
@@ -72,6 +76,7 @@ class VariationThemeRepository:
             raise ValueError("No data provided")
 
         created_facet = await db.variation_themes.insert_one(data, **kwargs)
+        document_counter.invalidate("variation_themes")
 
         return created_facet
 
@@ -83,6 +88,7 @@ class VariationThemeRepository:
             :param kwargs: Other parameters for update such as session for transaction etc.
         """
         updated_variation_theme = await db.variation_themes.update_one(filter=filters, update=data_to_update, **kwargs)
+        document_counter.invalidate("variation_themes")
         return updated_variation_theme
 
     async def delete_variation_theme(self, filters: dict, **kwargs) -> DeleteResult:
@@ -92,4 +98,5 @@ class VariationThemeRepository:
         :param kwargs: Other parameters for delete such as session for transaction etc.
         """
         deleted_variation_theme = await db.variation_themes.delete_one(filter=filters, **kwargs)
+        document_counter.invalidate("variation_themes")
         return deleted_variation_theme
@@ -42,6 +42,7 @@ class VariationThemeListAction(BaseModel):
 class VariationThemeResult(BaseModel):
     result: List[VariationThemeListAction]
     page_count: int
+    exact_count: bool
 
     class Config:
         allow_population_by_field_name = True
@@ -2,6 +2,7 @@ from math import ceil
 from fastapi.exceptions import HTTPException
 from .repository import VariationThemeRepository
 from src.schemes.py_object_id import PyObjectId
+from src.services.reference_data_cache import reference_data_cache
 
 class VariationThemesService:
     """
@@ -18,6 +19,7 @@ class VariationThemesService:
             result = {
                 "result": [],
                 "page_count": 1,
+                "exact_count": True,
             }
             return result
 
@@ -27,6 +29,7 @@ class VariationThemesService:
         result = {
             "result": variation_themes.get("result"),
             "page_count": ceil(var_theme_count / page_size), # Calculating count of pages
+            "exact_count": variation_themes.get("exact_count"),
         }
 
         return result
@@ -44,9 +47,11 @@ class VariationThemesService:
             raise HTTPException(status_code=404, detail="Variation theme not found")
 
         await self.repository.update_variation_theme({"_id": variation_theme_id}, {"$set": data})
+        reference_data_cache.invalidate("variation_themes")
 
     async def create_variation_theme(self, data: dict):
         created_variation_theme = await self.repository.create_variation_theme(data)
+        reference_data_cache.invalidate("variation_themes")
         if not created_variation_theme.inserted_id:
             raise HTTPException(status_code=400, detail="Variation theme not created")
 
@@ -56,3 +61,4 @@ class VariationThemesService:
             raise HTTPException(status_code=404, detail="Variation theme not found")
 
         await self.repository.delete_variation_theme({"_id": variation_theme_id})
+        reference_data_cache.invalidate("variation_themes")
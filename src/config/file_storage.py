@@ -1,8 +1,27 @@
+from functools import lru_cache
+
 from boto3 import client
 from botocore.client import BaseClient
+from botocore.config import Config
+
+from src.config.settings import (
+    AWS_ACCESS_KEY_ID,
+    AWS_SECRET_ACCESS_KEY,
+    S3_ENDPOINT_URL,
+    S3_MAX_CONCURRENCY,
+)
+from src.core.file_storage.async_s3_client import AsyncS3Client
 
-from src.config.settings import AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY
+def get_s3_client(access_key_id=AWS_ACCESS_KEY_ID, secret_access_key=AWS_SECRET_ACCESS_KEY,
+                  max_pool_connections: int = S3_MAX_CONCURRENCY) -> BaseClient:
+    s3 = client('s3', aws_access_key_id=access_key_id, aws_secret_access_key=secret_access_key,
+                endpoint_url=S3_ENDPOINT_URL, config=Config(max_pool_connections=max_pool_connections))
+    return s3
 
-def get_s3_client(access_key_id=AWS_ACCESS_KEY_ID, secret_access_key=AWS_SECRET_ACCESS_KEY) -> BaseClient:
-    s3 = client('s3', aws_access_key_id=access_key_id, aws_secret_access_key=secret_access_key)
-    return s3
\ No newline at end of file
+@lru_cache(maxsize=None)
+def get_async_s3_client() -> AsyncS3Client:
+    """
+    Returns the S3 client shared by the whole process.
+    Creating a boto3 client is expensive, and the shared one reuses connections from its pool.
+    """
+    return AsyncS3Client(get_s3_client(), max_concurrency=S3_MAX_CONCURRENCY)
@@ -15,6 +15,18 @@ AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
 # Amazon S3 config
 S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME")
 CDN_HOST_NAME= os.getenv("CDN_HOST_NAME")
+# URL of the S3 compatible storage (MinIO, LocalStack etc.). If it's empty, Amazon S3 is used
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None
+# Max count of S3 requests running at the same time, it's also the size of the connection pool
+S3_MAX_CONCURRENCY = int(os.getenv("S3_MAX_CONCURRENCY", 16))
+# Max count of keys in one batch delete request (S3 accepts 1000 at most)
+S3_DELETE_BATCH_SIZE = int(os.getenv("S3_DELETE_BATCH_SIZE", 1000))
+# How many times the keys that S3 failed to delete are retried
+S3_DELETE_MAX_RETRIES = int(os.getenv("S3_DELETE_MAX_RETRIES", 3))
+# How long presigned forms for direct image uploads are valid
+IMAGE_UPLOAD_EXPIRES_SECONDS = int(os.getenv("IMAGE_UPLOAD_EXPIRES_SECONDS", 15 * 60))
+# Cache-Control of the uploaded images. Keys of images are versioned and never overwritten, so they can be cached forever
+IMAGE_CACHE_CONTROL = os.getenv("IMAGE_CACHE_CONTROL", "public, max-age=31536000, immutable")
 
 # Celery config
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL")
@@ -28,6 +40,101 @@ AMPQ_CONNECTION_URL = os.getenv("AMPQ_CONNECTION_URL")
 PRODUCT_CRUD_EXCHANGE_TOPIC_NAME = os.getenv("PRODUCT_CRUD_EXCHANGE_TOPIC_NAME")
 ORDER_PROCESSING_EXCHANGE_TOPIC_NAME = os.getenv("ORDER_PROCESSING_EXCHANGE_TOPIC_NAME")
 
+# Name of the durable queue shared by all app instances to consume order processing messages.
+# If it's empty, each instance gets its own exclusive queue with a copy of every message
+ORDER_PROCESSING_QUEUE_NAME = os.getenv("ORDER_PROCESSING_QUEUE_NAME", "product_microservice.order_processing")
+# Exchange where order processing messages that failed to be processed are sent
+ORDER_PROCESSING_DEAD_LETTER_EXCHANGE_NAME = os.getenv("ORDER_PROCESSING_DEAD_LETTER_EXCHANGE_NAME",
+                                                       "product_microservice.order_processing.dlx")
+# Max count of unacknowledged order processing messages delivered to one app instance
+ORDER_PROCESSING_PREFETCH_COUNT = int(os.getenv("ORDER_PROCESSING_PREFETCH_COUNT", 32))
+# Max count of reserve / release messages handled with one bulk write. 1 disables batching
+ORDER_PROCESSING_BATCH_MAX_SIZE = int(os.getenv("ORDER_PROCESSING_BATCH_MAX_SIZE", 32))
+# How long (in milliseconds) the first message of the batch waits for other messages
+ORDER_PROCESSING_BATCH_WINDOW_MS = int(os.getenv("ORDER_PROCESSING_BATCH_WINDOW_MS", 10))
+# How long identifiers of the processed messages are stored to skip redelivered messages
+PROCESSED_MESSAGE_TTL_SECONDS = int(os.getenv("PROCESSED_MESSAGE_TTL_SECONDS", 7 * 24 * 60 * 60))
+
+# Whether stock of the products can be split across several shards (See PUT /admin/products/{id}/stock-shards)
+STOCK_SHARDING_ENABLED = bool(int(os.getenv("STOCK_SHARDING_ENABLED", 0)))
+
+# Content type of published messages ("application/json" or "application/bson")
+MESSAGE_CONTENT_TYPE = os.getenv("MESSAGE_CONTENT_TYPE", "application/json")
+# Published messages bigger than this size (in bytes) are compressed with zlib. 0 disables compression
+MESSAGE_COMPRESSION_THRESHOLD_BYTES = int(os.getenv("MESSAGE_COMPRESSION_THRESHOLD_BYTES", 0))
+
+# Count of channels used by the long-lived producer to publish messages
+PRODUCER_CHANNEL_POOL_SIZE = int(os.getenv("PRODUCER_CHANNEL_POOL_SIZE", 4))
+# Max count of messages waiting to be published by the long-lived producer
+PRODUCER_BUFFER_SIZE = int(os.getenv("PRODUCER_BUFFER_SIZE", 1000))
+
+# Max count of outbox messages published at once
+OUTBOX_RELAY_BATCH_SIZE = int(os.getenv("OUTBOX_RELAY_BATCH_SIZE", 100))
+# How often outbox relay checks for new messages if the outbox is empty
+OUTBOX_RELAY_POLL_INTERVAL_SECONDS = float(os.getenv("OUTBOX_RELAY_POLL_INTERVAL_SECONDS", 0.5))
+# How long one app instance can publish outbox messages without prolonging its lease
+OUTBOX_RELAY_LEASE_SECONDS = int(os.getenv("OUTBOX_RELAY_LEASE_SECONDS", 30))
+
+# Whether successive replication messages should be merged into "*.many" envelopes before publishing
+REPLICATION_COALESCING_ENABLED = bool(int(os.getenv("REPLICATION_COALESCING_ENABLED", 0)))
+# How long replication messages are buffered to be merged
+REPLICATION_COALESCING_WINDOW_SECONDS = float(os.getenv("REPLICATION_COALESCING_WINDOW_SECONDS", 2))
+# Max count of products in one envelope
+REPLICATION_COALESCING_MAX_ENVELOPE_SIZE = int(os.getenv("REPLICATION_COALESCING_MAX_ENVELOPE_SIZE", 500))
+
+# Count of image jobs (uploads and image operations of the products) handled at the same time
+IMAGE_JOB_WORKER_COUNT = int(os.getenv("IMAGE_JOB_WORKER_COUNT", 4))
+# Max count of image jobs waiting for a worker
+IMAGE_JOB_MAX_QUEUE_SIZE = int(os.getenv("IMAGE_JOB_MAX_QUEUE_SIZE", 100))
+# How long a request waits for a free slot in the full image job queue before it fails with 503
+IMAGE_JOB_ENQUEUE_TIMEOUT_SECONDS = float(os.getenv("IMAGE_JOB_ENQUEUE_TIMEOUT_SECONDS", 5))
+# How many times the failed image job is retried and the delay before the first retry
+IMAGE_JOB_MAX_RETRIES = int(os.getenv("IMAGE_JOB_MAX_RETRIES", 3))
+IMAGE_JOB_RETRY_DELAY_SECONDS = float(os.getenv("IMAGE_JOB_RETRY_DELAY_SECONDS", 1))
+# How long the app waits for queued image jobs on shutdown
+IMAGE_JOB_SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv("IMAGE_JOB_SHUTDOWN_TIMEOUT_SECONDS", 30))
+# How long statuses of image jobs are stored
+IMAGE_JOB_STATUS_TTL_SECONDS = int(os.getenv("IMAGE_JOB_STATUS_TTL_SECONDS", 24 * 60 * 60))
+
+# Count of image deletions handled at the same time. Deletions have their own queue,
+# so deleted products don't wait for image uploads
+IMAGE_DELETION_WORKER_COUNT = int(os.getenv("IMAGE_DELETION_WORKER_COUNT", 2))
+# Max count of image deletions waiting for a worker. If the queue is full, images are deleted within the request
+IMAGE_DELETION_MAX_QUEUE_SIZE = int(os.getenv("IMAGE_DELETION_MAX_QUEUE_SIZE", 1000))
+
+# Count of threads that decode and validate base64 images of incoming requests
+IMAGE_INTAKE_WORKER_COUNT = int(os.getenv("IMAGE_INTAKE_WORKER_COUNT", 4))
+# Widths (in pixels) of the resized copies (derivatives) of product images, each one is stored as JPEG and WebP.
+# Empty value disables derivatives
+IMAGE_DERIVATIVE_WIDTHS = [int(width) for width in os.getenv("IMAGE_DERIVATIVE_WIDTHS", "160,480,960").split(",")
+                           if width.strip()]
+IMAGE_DERIVATIVE_QUALITY = int(os.getenv("IMAGE_DERIVATIVE_QUALITY", 80))
+# Count of processes that make derivatives of product images
+IMAGE_DERIVATIVE_WORKER_COUNT = int(os.getenv("IMAGE_DERIVATIVE_WORKER_COUNT", os.cpu_count() or 1))
+
+# Only images modified earlier than that are deleted by the garbage collector of orphaned images,
+# so uploads that aren't committed yet are kept
+IMAGE_GC_GRACE_PERIOD_HOURS = float(os.getenv("IMAGE_GC_GRACE_PERIOD_HOURS", 24))
+# Count of objects listed and checked against the db at once (S3 lists 1000 at most)
+IMAGE_GC_PAGE_SIZE = int(os.getenv("IMAGE_GC_PAGE_SIZE", 1000))
+
+# How long counts of the paginated admin lists are memoized. Writes of this instance invalidate them at once,
+# writes of other instances are seen once they expire
+LIST_COUNT_CACHE_TTL_SECONDS = float(os.getenv("LIST_COUNT_CACHE_TTL_SECONDS", 60))
+# Max count of filters whose counts are memoized per collection
+LIST_COUNT_CACHE_MAX_FILTERS = int(os.getenv("LIST_COUNT_CACHE_MAX_FILTERS", 1000))
+
+# How long facets, facet types, variation themes and categories are kept in memory.
+# Writes of this instance drop them at once, writes of other instances are seen once they expire
+REFERENCE_DATA_CACHE_TTL_SECONDS = float(os.getenv("REFERENCE_DATA_CACHE_TTL_SECONDS", 300))
+# Redis whose pub/sub channel broadcasts writes of the reference data to other app instances right away.
+# If it's empty, invalidations aren't broadcast
+CACHE_INVALIDATION_REDIS_URL = os.getenv("CACHE_INVALIDATION_REDIS_URL") or None
+CACHE_INVALIDATION_CHANNEL_NAME = os.getenv("CACHE_INVALIDATION_CHANNEL_NAME",
+                                            "product_microservice.reference_data_invalidation")
+# How long (in seconds) the bus waits before restoring the lost subscription
+CACHE_INVALIDATION_RETRY_DELAY_SECONDS = float(os.getenv("CACHE_INVALIDATION_RETRY_DELAY_SECONDS", 1))
+
 # Microservice Keys
 USER_MICROSERVICE_KEY = os.getenv("USER_MICROSERVICE_KEY")
 JWT_SIGNING_KEY = os.getenv("JWT_SIGNING_KEY")
@@ -0,0 +1,58 @@
+from typing import Dict, Optional
+
+from src.config import settings
+from src.core.cache_invalidation.channels import RedisInvalidationChannel
+from src.core.cache_invalidation.invalidation_bus import CacheInvalidationBus
+from src.services.reference_data_cache import REFERENCE_COLLECTIONS, ReferenceDataCache, reference_data_cache
+
+# Owned by the app lifecycle (FastAPI startup/shutdown)
+_reference_data_bus: Optional[CacheInvalidationBus] = None
+
+
+def create_reference_data_bus(channel: RedisInvalidationChannel, cache: ReferenceDataCache,
+                              retry_delay: float = settings.CACHE_INVALIDATION_RETRY_DELAY_SECONDS
+                              ) -> CacheInvalidationBus:
+    """
+    Creates the bus that drops collections of the cache invalidated by other instances
+    and broadcasts collections invalidated by this one.
+    """
+    bus = CacheInvalidationBus(
+        channel,
+        REFERENCE_COLLECTIONS,
+        on_invalidate=lambda collection_names: cache.invalidate(*collection_names, broadcast=False),
+        on_gap=lambda: cache.invalidate(*REFERENCE_COLLECTIONS, broadcast=False),
+        retry_delay=retry_delay,
+    )
+    cache.add_invalidation_listener(bus.publish_nowait)
+    return bus
+
+
+async def start_reference_data_invalidation_bus() -> Optional[CacheInvalidationBus]:
+    """
+    Starts broadcasting invalidations of the reference data if the Redis of the bus is configured.
+    """
+    global _reference_data_bus
+
+    if _reference_data_bus is None and settings.CACHE_INVALIDATION_REDIS_URL:
+        channel = RedisInvalidationChannel(settings.CACHE_INVALIDATION_REDIS_URL,
+                                           settings.CACHE_INVALIDATION_CHANNEL_NAME)
+        bus = create_reference_data_bus(channel, reference_data_cache)
+        await bus.start()
+        _reference_data_bus = bus
+
+    return _reference_data_bus
+
+
+def get_reference_data_invalidation_stats() -> Dict:
+    if _reference_data_bus is None:
+        return {"enabled": False}
+    return {"enabled": True, **_reference_data_bus.stats.as_dict()}
+
+
+async def close_reference_data_invalidation_bus() -> None:
+    global _reference_data_bus
+
+    if _reference_data_bus is not None:
+        reference_data_cache.remove_invalidation_listener(_reference_data_bus.publish_nowait)
+        await _reference_data_bus.stop()
+        _reference_data_bus = None
@@ -0,0 +1,42 @@
+from typing import Optional
+
+import redis.asyncio as redis
+
+
+class RedisInvalidationSubscription:
+    def __init__(self, pubsub: redis.client.PubSub):
+        self._pubsub = pubsub
+
+    async def get_message(self) -> str:
+        """
+        Waits for the next message of the channel.
+        Raises redis.ConnectionError if the connection is lost, messages published meanwhile are lost.
+        """
+        while True:
+            message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=None)
+            if message is not None:
+                return message["data"]
+
+    async def close(self) -> None:
+        await self._pubsub.aclose()
+
+
+class RedisInvalidationChannel:
+    """
+    Redis pub/sub channel shared by all app instances.
+    Pub/sub doesn't store messages, so instances that aren't subscribed at the moment miss them.
+    """
+    def __init__(self, url: str, channel_name: str, client: Optional[redis.Redis] = None):
+        self.channel_name = channel_name
+        self._redis = client or redis.from_url(url, decode_responses=True)
+
+    async def publish(self, message: str) -> None:
+        await self._redis.publish(self.channel_name, message)
+
+    async def subscribe(self) -> RedisInvalidationSubscription:
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(self.channel_name)
+        return RedisInvalidationSubscription(pubsub)
+
+    async def close(self) -> None:
+        await self._redis.aclose()
@@ -0,0 +1,167 @@
+import asyncio
+import json
+import time
+from typing import Callable, Collection, Dict, List, Optional, Sequence
+
+from bson import ObjectId
+
+from src.core.cache_invalidation.channels import RedisInvalidationChannel, RedisInvalidationSubscription
+from src.logger import logger
+
+
+class InvalidationLagStats:
+    """
+    Lag between publishing of the invalidation by one instance and receiving it by this one.
+    It's measured with wall clocks of both instances, so it includes their clock skew.
+    """
+    def __init__(self):
+        self.received = 0
+        # Messages that were lost while the subscription was being restored
+        self.gaps = 0
+        self.last_lag_ms = 0.0
+        self.max_lag_ms = 0.0
+        self._total_lag_ms = 0.0
+
+    def record(self, lag_ms: float) -> None:
+        self.received += 1
+        self.last_lag_ms = lag_ms
+        self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+        self._total_lag_ms += lag_ms
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "received": self.received,
+            "gaps": self.gaps,
+            "last_lag_ms": round(self.last_lag_ms, 2),
+            "max_lag_ms": round(self.max_lag_ms, 2),
+            "mean_lag_ms": round(self._total_lag_ms / self.received, 2) if self.received else 0.0,
+        }
+
+
+class CacheInvalidationBus:
+    """
+    Broadcasts names of the invalidated collections to other app instances, so they drop their in-memory copies
+    right after the write instead of waiting for them to expire.
+    Delivery isn't guaranteed: if publishing fails, other instances see the write once their copies expire,
+    if the subscription is lost, on_gap is called after it's restored, since messages published meanwhile are lost.
+    """
+    def __init__(self, channel: RedisInvalidationChannel, collection_names: Collection[str],
+                 on_invalidate: Callable[[List[str]], None], on_gap: Callable[[], None], retry_delay: float = 1):
+        """
+        :param channel: Pub/sub channel shared by all instances.
+        :param collection_names: Collections the instance caches, others are ignored
+                                 (instances of another version may cache other collections).
+        :param on_invalidate: Called with names of the collections invalidated by other instances.
+        :param on_gap: Called when messages may have been lost, it should invalidate everything.
+        :param retry_delay: Delay (in seconds) before the lost subscription is restored.
+        """
+        self.channel = channel
+        self.collection_names = set(collection_names)
+        self.on_invalidate = on_invalidate
+        self.on_gap = on_gap
+        self.retry_delay = retry_delay
+        # Own messages are skipped, the instance invalidated its copies before publishing
+        self.instance_id = str(ObjectId())
+        self.stats = InvalidationLagStats()
+        self._task: Optional[asyncio.Task] = None
+        self._publishes: set = set()
+
+    async def start(self) -> None:
+        """
+        Subscribes to the channel before returning, so invalidations published after the start aren't missed.
+        If the channel is unavailable, the app starts anyway and the subscription is retried in the background.
+        """
+        try:
+            subscription = await self.channel.subscribe()
+        except Exception as e:
+            logger.error(f"Failed to subscribe to cache invalidations: {e}")
+            subscription = None
+        self._task = asyncio.create_task(self._listen(subscription))
+
+    async def _listen(self, subscription: Optional[RedisInvalidationSubscription]) -> None:
+        try:
+            while True:
+                try:
+                    if subscription is None:
+                        subscription = await self.channel.subscribe()
+                        self.stats.gaps += 1
+                        self.on_gap()
+                    message = await subscription.get_message()
+                except Exception as e:
+                    logger.error(f"Cache invalidation subscription is lost, it's restored in {self.retry_delay}s: {e}")
+                    await self._close_subscription(subscription)
+                    subscription = None
+                    await asyncio.sleep(self.retry_delay)
+                    continue
+
+                self._handle_message(message)
+        finally:
+            await self._close_subscription(subscription)
+
+    @staticmethod
+    async def _close_subscription(subscription: Optional[RedisInvalidationSubscription]) -> None:
+        if subscription is None:
+            return
+        try:
+            await subscription.close()
+        except Exception as e:
+            logger.warning(f"Failed to close cache invalidation subscription: {e}")
+
+    def _handle_message(self, raw_message: str) -> None:
+        try:
+            message = json.loads(raw_message)
+            origin, collection_names, published_at = message["origin"], message["collections"], message["published_at"]
+            if not isinstance(collection_names, list):
+                raise TypeError("collections must be a list")
+            lag_ms = max(time.time() - float(published_at), 0) * 1000
+        except (ValueError, TypeError, KeyError):
+            logger.warning(f"Skipped malformed cache invalidation: {raw_message!r}")
+            return
+
+        if origin == self.instance_id:
+            return
+        self.stats.record(lag_ms)
+        known_collection_names = [name for name in collection_names
+                                  if isinstance(name, str) and name in self.collection_names]
+        if not known_collection_names:
+            return
+
+        # The subscription must outlive failures of the handler, otherwise no later invalidation is applied
+        try:
+            self.on_invalidate(known_collection_names)
+        except Exception as e:
+            logger.error(f"Failed to apply invalidation of {', '.join(known_collection_names)}: {e}")
+
+    async def publish(self, collection_names: Sequence[str]) -> None:
+        await self.channel.publish(json.dumps({
+            "origin": self.instance_id,
+            "collections": list(collection_names),
+            "published_at": time.time(),
+        }))
+
+    async def _publish_or_log(self, collection_names: Sequence[str]) -> None:
+        try:
+            await self.publish(collection_names)
+        except Exception as e:
+            logger.error(f"Failed to broadcast invalidation of {', '.join(collection_names)}, "
+                         f"other instances see it once their copies expire: {e}")
+
+    def publish_nowait(self, collection_names: Sequence[str]) -> None:
+        """
+        Publishes in the background, so the write that invalidated the collections doesn't wait for the channel.
+        """
+        task = asyncio.create_task(self._publish_or_log(collection_names))
+        self._publishes.add(task)
+        task.add_done_callback(self._publishes.discard)
+
+    async def stop(self) -> None:
+        """
+        Waits for the pending publishes, unsubscribes and closes the channel.
+        """
+        if self._publishes:
+            await asyncio.gather(*self._publishes, return_exceptions=True)
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.channel.close()
@@ -0,0 +1,163 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, List, Optional
+
+from botocore.client import BaseClient
+from botocore.exceptions import ClientError
+
+# S3 doesn't accept more keys in one DeleteObjects request
+MAX_DELETE_BATCH_SIZE = 1000
+
+
+class S3DeleteError(Exception):
+    """
+    Raised when some objects can't be deleted after all retries.
+    """
+    def __init__(self, errors: List[dict]):
+        """
+        :param errors: Errors of the objects from the DeleteObjects responses (Key, Code, Message).
+        """
+        self.errors = errors
+        super().__init__(f"Failed to delete {len(errors)} object(s), the first error: "
+                         f"{errors[0].get('Key')} {errors[0].get('Code')} {errors[0].get('Message')}")
+
+
+class AsyncS3Client:
+    """
+    Runs blocking calls of the shared boto3 client in a thread pool, so they don't block the event loop.
+    boto3 clients are thread-safe, so one client with a connection pool is shared by all threads.
+    Count of calls running at the same time is limited by max_concurrency,
+    other calls wait for a free slot without occupying threads or connections.
+    """
+    def __init__(self, client: BaseClient, max_concurrency: int = 16):
+        """
+        :param client: boto3 S3 client. Its connection pool (max_pool_connections)
+                       should be not smaller than max_concurrency.
+        :param max_concurrency: Max count of S3 requests running at the same time.
+        """
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="s3")
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily, so the client can be created outside the event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _run(self, func: Callable, *args, **kwargs) -> Any:
+        async with self._get_semaphore():
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, functools.partial(func, *args, **kwargs),
+            )
+
+    async def put_object(self, bucket_name: str, key: str, body: bytes, content_type: str, **kwargs) -> dict:
+        """
+        Uploads the object with one request. Images are small, so multipart upload isn't needed.
+        """
+        return await self._run(self.client.put_object, Bucket=bucket_name, Key=key, Body=body,
+                               ContentType=content_type, **kwargs)
+
+    async def copy_object(self, bucket_name: str, source_key: str, key: str, **kwargs) -> dict:
+        """
+        Copies the object within the bucket on the storage side, so its body isn't downloaded.
+        """
+        return await self._run(self.client.copy_object, Bucket=bucket_name, Key=key,
+                               CopySource={"Bucket": bucket_name, "Key": source_key}, **kwargs)
+
+    async def delete_object(self, bucket_name: str, key: str, **kwargs) -> dict:
+        return await self._run(self.client.delete_object, Bucket=bucket_name, Key=key, **kwargs)
+
+    async def delete_objects(self, bucket_name: str, objects_to_delete: List[dict], **kwargs) -> dict:
+        """
+        :param objects_to_delete: List of dicts with "Key" of each object, 1000 objects at most.
+        """
+        return await self._run(self.client.delete_objects, Bucket=bucket_name,
+                               Delete={"Objects": objects_to_delete}, **kwargs)
+
+    async def _delete_batch(self, bucket_name: str, keys: List[str], max_retries: int,
+                            retry_delay: float) -> List[dict]:
+        """
+        Deletes up to MAX_DELETE_BATCH_SIZE objects. DeleteObjects succeeds even if some objects fail,
+        their errors are in the response, so only the failed keys are sent again.
+        :return: Errors of the objects that weren't deleted after all retries.
+        """
+        errors = []
+        for attempt in range(max_retries + 1):
+            if attempt:
+                await asyncio.sleep(retry_delay * 2 ** (attempt - 1))
+            # Quiet mode returns only errors, the response doesn't list every deleted key
+            response = await self._run(self.client.delete_objects, Bucket=bucket_name,
+                                       Delete={"Objects": [{"Key": key} for key in keys], "Quiet": True})
+            errors = response.get("Errors") or []
+            if not errors:
+                return []
+            keys = [error["Key"] for error in errors]
+
+        return errors
+
+    async def delete_many_objects(self, bucket_name: str, keys: List[str], batch_size: int = MAX_DELETE_BATCH_SIZE,
+                                  max_retries: int = 3, retry_delay: float = 0.5) -> int:
+        """
+        Deletes any count of objects with DeleteObjects requests of batch_size keys at most.
+        Batches are sent concurrently (up to max_concurrency), objects that failed are retried with backoff.
+        Deleting objects that don't exist isn't an error.
+        :param max_retries: How many times the failed objects of each batch are retried.
+        :param retry_delay: Delay (in seconds) before the first retry, it's doubled for each next retry.
+        :raises S3DeleteError: If some objects weren't deleted after all retries.
+        :return: Count of deleted objects.
+        """
+        keys = list(dict.fromkeys(keys))
+        batch_size = min(batch_size, MAX_DELETE_BATCH_SIZE)
+        batch_errors = await asyncio.gather(*(self._delete_batch(bucket_name, keys[index:index + batch_size],
+                                                                 max_retries, retry_delay)
+                                              for index in range(0, len(keys), batch_size)))
+        errors = [error for errors in batch_errors for error in errors]
+        if errors:
+            raise S3DeleteError(errors)
+
+        return len(keys)
+
+    async def list_object_pages(self, bucket_name: str, prefix: str,
+                                page_size: int = 1000) -> AsyncIterator[List[dict]]:
+        """
+        Lists objects under the prefix page by page with list_objects_v2,
+        so only one page is kept in memory however many objects there are.
+        :param page_size: Max count of objects in the page, S3 returns 1000 at most.
+        :return: Pages of objects, each object is a dict with Key, LastModified, Size etc.
+        """
+        continuation_token = None
+        while True:
+            kwargs = {"ContinuationToken": continuation_token} if continuation_token else {}
+            response = await self._run(self.client.list_objects_v2, Bucket=bucket_name, Prefix=prefix,
+                                       MaxKeys=page_size, **kwargs)
+            yield response.get("Contents") or []
+            if not response.get("IsTruncated"):
+                return
+            continuation_token = response["NextContinuationToken"]
+
+    async def head_object(self, bucket_name: str, key: str, **kwargs) -> Optional[dict]:
+        """
+        :return: Metadata of the object (ContentLength, ContentType etc.) or None if the object doesn't exist.
+        """
+        try:
+            return await self._run(self.client.head_object, Bucket=bucket_name, Key=key, **kwargs)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                return None
+            raise
+
+    async def generate_presigned_post(self, bucket_name: str, key: str, fields: dict, conditions: list,
+                                      expires_in: int) -> dict:
+        """
+        Signs the form to upload the object straight to the storage. The storage rejects uploads
+        that don't meet the conditions. Signing doesn't send any requests, it's just kept off the event loop.
+        :return: Dict with "url" and "fields" of the form.
+        """
+        return await self._run(self.client.generate_presigned_post, Bucket=bucket_name, Key=key, Fields=fields,
+                               Conditions=conditions, ExpiresIn=expires_in)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
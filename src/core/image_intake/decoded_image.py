@@ -0,0 +1,60 @@
+import binascii
+from typing import List
+
+from src.config.settings import ALLOWED_IMAGE_TYPE
+
+# Every JPEG file starts with the SOI marker followed by the first marker of the next segment
+JPEG_MAGIC_BYTES = b"\xff\xd8\xff"
+MAX_IMAGE_SIZE_MB = 1
+
+
+class DecodedImage:
+    """
+    Image that was received as a base64 data URL and decoded once.
+    The same bytes are validated and uploaded, so the payload isn't decoded again before upload.
+    It's immutable, so copies of the product data share it instead of copying the bytes.
+    """
+    __slots__ = ("data", "content_type", "errors")
+
+    def __init__(self, data: bytes, content_type: str, errors: List[str]):
+        self.data = data
+        self.content_type = content_type
+        self.errors = errors
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+def decode_image(image: str) -> DecodedImage:
+    """
+    Decodes the base64 data URL ("data:image/jpeg;base64,...") and validates the image.
+    Only the header is split off, the payload is passed to binascii as is,
+    because base64.b64decode would encode the whole string to bytes first.
+    Type of the image is checked by its magic bytes as well as by the declared type.
+    """
+    separator_index = image.find(",")
+    if separator_index == -1:
+        return DecodedImage(b"", "", ["Image must be a base64 encoded data URL"])
+
+    content_type = image[:separator_index].split(";")[0]
+    try:
+        data = binascii.a2b_base64(image[separator_index + 1:])
+    except (binascii.Error, ValueError):
+        return DecodedImage(b"", content_type, ["Image must be a base64 encoded data URL"])
+
+    errors = []
+    if content_type != ALLOWED_IMAGE_TYPE or not data.startswith(JPEG_MAGIC_BYTES):
+        errors.append("Only image/jpeg type allowed")
+
+    # get the file size in megabytes
+    if round(len(data) / 1024 ** 2, 2) > MAX_IMAGE_SIZE_MB:
+        errors.append("The file size exceeds 1 MB")
+
+    return DecodedImage(data, content_type, errors)
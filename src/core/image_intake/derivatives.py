@@ -0,0 +1,48 @@
+import io
+from typing import List, Sequence, Tuple
+
+from PIL import Image, ImageOps
+
+# Formats of the derivatives: (extension, Pillow format, content type)
+DERIVATIVE_FORMATS = (
+    ("jpg", "JPEG", "image/jpeg"),
+    ("webp", "WEBP", "image/webp"),
+)
+DERIVATIVE_EXTENSIONS = tuple(extension for extension, _, _ in DERIVATIVE_FORMATS)
+
+
+def make_image_derivatives(data: bytes, widths: Sequence[int],
+                           quality: int = 80) -> List[Tuple[int, str, str, bytes]]:
+    """
+    Resizes the image to each width and encodes it as progressive JPEG and WebP.
+    The image is rotated according to its EXIF orientation and EXIF (GPS, camera etc.) isn't copied
+    to the derivatives. Images narrower than the width aren't upscaled, they are only re-encoded.
+    It's CPU-bound, so it's run in the process pool (See create_image_derivatives).
+    :param data: Bytes of the original JPEG image.
+    :param widths: Widths of the derivatives in pixels.
+    :param quality: Quality of the encoded derivatives (1-95).
+    :return: Tuples of width, extension, content type and bytes of each derivative.
+    """
+    with Image.open(io.BytesIO(data)) as original:
+        # JPEG decoder can scale the image down while decoding, it's much faster than decoding the full size.
+        # Both sides are kept not less than the largest width, since the image can be rotated afterward
+        original.draft("RGB", (max(widths), max(widths)))
+        image = ImageOps.exif_transpose(original).convert("RGB")
+
+    derivatives = []
+    for width in widths:
+        if width < image.width:
+            resized_image = image.resize((width, max(1, round(image.height * width / image.width))),
+                                         Image.Resampling.LANCZOS)
+        else:
+            resized_image = image
+
+        for extension, image_format, content_type in DERIVATIVE_FORMATS:
+            buffer = io.BytesIO()
+            if image_format == "JPEG":
+                resized_image.save(buffer, image_format, quality=quality, optimize=True, progressive=True)
+            else:
+                resized_image.save(buffer, image_format, quality=quality, method=4)
+            derivatives.append((width, extension, content_type, buffer.getvalue()))
+
+    return derivatives
@@ -0,0 +1,114 @@
+import asyncio
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import BinaryIO, List, Tuple, Union
+
+from src.config.settings import (
+    IMAGE_INTAKE_WORKER_COUNT,
+    IMAGE_DERIVATIVE_WIDTHS,
+    IMAGE_DERIVATIVE_QUALITY,
+    IMAGE_DERIVATIVE_WORKER_COUNT,
+)
+from src.core.image_intake.decoded_image import DecodedImage, decode_image
+from src.core.image_intake.derivatives import make_image_derivatives
+from src.core.image_intake.uploaded_image import UploadedImage
+
+# Size of the chunks the image file is hashed by
+_HASH_CHUNK_SIZE = 64 * 1024
+
+
+@lru_cache(maxsize=None)
+def _get_intake_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=IMAGE_INTAKE_WORKER_COUNT, thread_name_prefix="image-intake")
+
+
+@lru_cache(maxsize=None)
+def _get_derivative_executor() -> ProcessPoolExecutor:
+    # Workers are spawned instead of forked, since the app process runs threads (S3 client, intake pool)
+    return ProcessPoolExecutor(max_workers=IMAGE_DERIVATIVE_WORKER_COUNT,
+                               mp_context=multiprocessing.get_context("spawn"))
+
+
+async def decode_images(images: List[Union[str, DecodedImage, UploadedImage]]
+                        ) -> List[Union[DecodedImage, UploadedImage]]:
+    """
+    Decodes and validates images in the shared pool, so decoding of large payloads doesn't block the event loop.
+    Images are decoded concurrently, images that have already been decoded or validated
+    (image parts of multipart requests) are returned as is.
+    :return: Decoded images in the same order.
+    """
+    loop = asyncio.get_running_loop()
+    decoded_images = list(images)
+    indexes_to_decode = [index for index, image in enumerate(images) if isinstance(image, str)]
+    results = await asyncio.gather(*(loop.run_in_executor(_get_intake_executor(), decode_image, images[index])
+                                     for index in indexes_to_decode))
+    for index, decoded_image in zip(indexes_to_decode, results):
+        decoded_images[index] = decoded_image
+
+    return decoded_images
+
+
+async def get_image_body(image: Union[str, DecodedImage, UploadedImage]) -> Union[bytes, BinaryIO]:
+    """
+    Returns the body to upload to the storage.
+    Images that have already been decoded during validation aren't decoded again,
+    image parts of multipart requests are uploaded straight from their files.
+    """
+    if isinstance(image, UploadedImage):
+        # The job that uploads the image could be retried, so the file is read from the start each time
+        image.file.seek(0)
+        return image.file
+
+    decoded_image, = await decode_images([image])
+    return decoded_image.data
+
+
+def _hash_image_body(body: Union[bytes, BinaryIO]) -> str:
+    if isinstance(body, bytes):
+        return hashlib.sha256(body).hexdigest()
+
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: body.read(_HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    body.seek(0)
+    return digest.hexdigest()
+
+
+async def get_image_body_and_digest(image: Union[str, DecodedImage, UploadedImage]
+                                    ) -> Tuple[Union[bytes, BinaryIO], str]:
+    """
+    Returns the body to upload to the storage (See get_image_body) and SHA-256 hash of its content.
+    The image is hashed in the shared pool, so hashing doesn't block the event loop.
+    """
+    body = await get_image_body(image)
+    digest = await asyncio.get_running_loop().run_in_executor(_get_intake_executor(), _hash_image_body, body)
+    return body, digest
+
+
+def _read_image_body(body: Union[bytes, BinaryIO]) -> bytes:
+    if isinstance(body, bytes):
+        return body
+
+    data = body.read()
+    body.seek(0)
+    return data
+
+
+async def create_image_derivatives(body: Union[bytes, BinaryIO]) -> List[Tuple[int, str, str, bytes]]:
+    """
+    Makes resized JPEG and WebP copies of the image in the process pool (See make_image_derivatives),
+    resizing and encoding are CPU-bound, so they would hold the GIL in threads.
+    :param body: Body of the image (See get_image_body).
+    :return: Tuples of width, extension, content type and bytes of each derivative.
+             Empty list if derivatives are disabled.
+    """
+    if not IMAGE_DERIVATIVE_WIDTHS:
+        return []
+
+    loop = asyncio.get_running_loop()
+    data = await loop.run_in_executor(_get_intake_executor(), _read_image_body, body)
+    derivatives = await loop.run_in_executor(_get_derivative_executor(), make_image_derivatives,
+                                             data, IMAGE_DERIVATIVE_WIDTHS, IMAGE_DERIVATIVE_QUALITY)
+    return derivatives
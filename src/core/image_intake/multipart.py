@@ -0,0 +1,70 @@
+import json
+from typing import Dict, List, Optional, Set, Type, TypeVar, Union
+
+from fastapi import HTTPException, UploadFile
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
+
+from src.core.image_intake.uploaded_image import UploadedImage, take_uploaded_image
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+# Prefix of the image field value that refers to the image part by its filename, e.g. "file:front.jpg"
+IMAGE_PART_REFERENCE_PREFIX = "file:"
+
+
+def parse_multipart_data(model: Type[ModelT], data: str, **fields) -> ModelT:
+    """
+    Parses the JSON part of the multipart request, errors are returned like errors of the JSON body.
+    :param fields: Fields that are sent as separate parts, they're added to the JSON before validation
+                   (e.g. filename of the image part, which replaces the image afterwards).
+    """
+    try:
+        obj = json.loads(data)
+    except json.JSONDecodeError as e:
+        raise RequestValidationError([{"loc": ("body", "data"), "msg": f"Invalid JSON: {e}",
+                                       "type": "value_error.jsondecode"}])
+
+    try:
+        return model.parse_obj({**obj, **fields} if isinstance(obj, dict) and fields else obj)
+    except ValidationError as e:
+        raise RequestValidationError([{**error, "loc": ("body", "data", *error["loc"])} for error in e.errors()])
+
+
+class ImageParts:
+    """
+    Image parts of the multipart request by their filenames.
+    Image fields of the JSON part refer to them as "file:<filename>". Each part can be referenced once,
+    since the same file can't be uploaded under several names at the same time.
+    """
+    def __init__(self, images: Dict[str, UploadedImage]):
+        self.images = images
+        self._referenced: Set[str] = set()
+
+    @classmethod
+    async def collect(cls, files: List[UploadFile]) -> "ImageParts":
+        images = {}
+        for file in files:
+            if not file.filename or file.filename in images:
+                raise HTTPException(status_code=400, detail="Each image part must have a unique filename")
+            images[file.filename] = await take_uploaded_image(file)
+
+        return cls(images)
+
+    def resolve(self, value: Optional[str]) -> Union[str, UploadedImage, None]:
+        """
+        :return: Image part if the value refers to it, otherwise the value as is (base64 string, URL or None).
+        """
+        if not isinstance(value, str) or not value.startswith(IMAGE_PART_REFERENCE_PREFIX):
+            return value
+
+        filename = value[len(IMAGE_PART_REFERENCE_PREFIX):]
+        if filename not in self.images:
+            raise HTTPException(status_code=400, detail=f"Image part {filename} is missing")
+        if filename in self._referenced:
+            raise HTTPException(status_code=400, detail=f"Image part {filename} is referenced more than once")
+
+        self._referenced.add(filename)
+        return self.images[filename]
+
+    def resolve_many(self, values: Optional[List[str]]) -> Optional[list]:
+        return [self.resolve(value) for value in values] if values is not None else None
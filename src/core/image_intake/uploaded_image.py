@@ -0,0 +1,59 @@
+import os
+from tempfile import SpooledTemporaryFile
+from typing import BinaryIO, List
+
+from fastapi import UploadFile
+
+from src.core.image_intake.decoded_image import JPEG_MAGIC_BYTES, MAX_IMAGE_SIZE_MB
+
+ALLOWED_IMAGE_PART_TYPE = "image/jpeg"
+
+
+class UploadedImage:
+    """
+    Image that was received as a binary part of the multipart/form-data request.
+    The part stays in the file Starlette spooled it to, and it's uploaded to the storage from that file,
+    so the image is neither decoded nor read into memory again.
+    """
+    __slots__ = ("file", "filename", "content_type", "size", "errors")
+
+    def __init__(self, file: BinaryIO, filename: str, content_type: str, size: int, errors: List[str]):
+        self.file = file
+        self.filename = filename
+        self.content_type = content_type
+        self.size = size
+        self.errors = errors
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+async def take_uploaded_image(upload_file: UploadFile) -> UploadedImage:
+    """
+    Validates the image part and takes over its file.
+    FastAPI closes files of the request once the response is sent, but images of the products are uploaded
+    by the image job queue later, so the file is detached from the UploadFile instead of being copied.
+    It's closed (and removed from the disk) when the image is garbage collected.
+    """
+    # Starlette counts the size while it spools the part
+    size = upload_file.size
+    if size is None:
+        size = upload_file.file.seek(0, os.SEEK_END)
+        await upload_file.seek(0)
+    magic_bytes = await upload_file.read(len(JPEG_MAGIC_BYTES))
+    await upload_file.seek(0)
+
+    errors = []
+    if upload_file.content_type != ALLOWED_IMAGE_PART_TYPE or magic_bytes != JPEG_MAGIC_BYTES:
+        errors.append("Only image/jpeg type allowed")
+
+    # get the file size in megabytes
+    if round(size / 1024 ** 2, 2) > MAX_IMAGE_SIZE_MB:
+        errors.append("The file size exceeds 1 MB")
+
+    file = upload_file.file
+    upload_file.file = SpooledTemporaryFile()
+    return UploadedImage(file, upload_file.filename, upload_file.content_type, size, errors)
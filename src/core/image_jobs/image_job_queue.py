@@ -0,0 +1,211 @@
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional
+
+from bson import ObjectId
+
+from src.repositories.image_job_repository import (
+    ImageJobRepository,
+    IMAGE_JOB_QUEUED,
+    IMAGE_JOB_SUCCEEDED,
+    IMAGE_JOB_FAILED,
+)
+from src.logger import logger
+
+
+class ImageJobQueueFull(Exception):
+    """
+    Raised when the job can't be queued, because the queue stays full longer than the enqueue timeout.
+    """
+
+
+class ImageJob:
+    """
+    Coroutine function with its arguments that should be run in the background.
+    """
+    def __init__(self, job_id: str, name: str, func: Callable[..., Awaitable[Any]], args: tuple, kwargs: dict):
+        self.job_id = job_id
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+
+class ImageJobReservation:
+    """
+    Slot of the queue taken before the job can be submitted, e.g. before the transaction that creates the products
+    of the job commits. Once the products are committed, submitting the job can't fail because the queue is full.
+    The slot is freed if the job isn't submitted (See release).
+    """
+    def __init__(self, queue: "ImageJobQueue"):
+        self._queue = queue
+        self._is_used = False
+
+    async def submit(self, name: str, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Optional[str]:
+        """
+        Puts the job into the reserved slot. If the queue was stopped meanwhile, the job is run immediately.
+        :return: Identifier of the job or None if the job was run immediately.
+        """
+        if self._is_used:
+            raise RuntimeError("Image job reservation has already been used")
+        self._is_used = True
+
+        if not self._queue.is_running:
+            await func(*args, **kwargs)
+            return None
+        return await self._queue._put_reserved(ImageJob(str(ObjectId()), name, func, args, kwargs))
+
+    def release(self) -> None:
+        if not self._is_used:
+            self._is_used = True
+            self._queue._release_slot()
+
+    async def __aenter__(self) -> "ImageJobReservation":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        self.release()
+
+
+class ImageJobQueue:
+    """
+    Bounded queue of image jobs handled by a fixed count of long-lived workers in the app's event loop.
+    It replaces a new process per request, so the API just hands the job off without forking.
+    Failed jobs are retried with exponential backoff, the status of each job is stored in the image_jobs collection.
+    """
+    def __init__(self, worker_count: int = 4, max_queue_size: int = 100, max_retries: int = 3,
+                 retry_delay: float = 1, enqueue_timeout: float = 5,
+                 job_repo: Optional[ImageJobRepository] = None):
+        """
+        :param worker_count: Count of jobs handled at the same time.
+        :param max_queue_size: Max count of jobs waiting for a worker.
+        :param max_retries: How many times the failed job is retried.
+        :param retry_delay: Delay (in seconds) before the first retry, it's doubled for each next retry.
+        :param enqueue_timeout: How long (in seconds) submit waits for a free slot if the queue is full.
+        :param job_repo: Repository where statuses of jobs are stored. If None, statuses aren't stored.
+        """
+        self.worker_count = worker_count
+        self.max_queue_size = max_queue_size
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.enqueue_timeout = enqueue_timeout
+        self.job_repo = job_repo
+        self._queue: Optional[asyncio.Queue] = None
+        # Free slots of the queue, they are taken by reservations and freed when workers take the jobs
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._workers: List[asyncio.Task] = []
+        self._retries: set = set()
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._workers)
+
+    def start(self):
+        # Size of the queue is limited by the slots, so retries of the accepted jobs never wait
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_queue_size)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.worker_count)]
+
+    async def _save_status(self, method: str, *args) -> None:
+        """
+        Statuses are informational, so failure to save them doesn't stop the job.
+        """
+        if self.job_repo is None:
+            return
+
+        try:
+            await getattr(self.job_repo, method)(*args)
+        except Exception as e:
+            logger.error(f"Failed to save status of image job {args[0]}: {e}")
+
+    async def reserve(self) -> ImageJobReservation:
+        """
+        Takes a slot for the job that is submitted later. If the queue is full, waits for a free slot
+        up to enqueue_timeout and raises ImageJobQueueFull.
+        """
+        if self._queue is None:
+            raise RuntimeError("Image job queue is not started")
+
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            raise ImageJobQueueFull(f"Image job queue is full ({self.max_queue_size} jobs)")
+        return ImageJobReservation(self)
+
+    def _release_slot(self) -> None:
+        if self._slots is not None:
+            self._slots.release()
+
+    async def _put_reserved(self, job: ImageJob) -> str:
+        # The status is saved before the job is queued, so a worker can't update it earlier
+        await self._save_status("create_job", job.job_id, job.name)
+        self._queue.put_nowait((job, 1))
+        return job.job_id
+
+    async def submit(self, name: str, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> str:
+        """
+        Puts the job into the queue. If the queue is full, waits for a free slot up to enqueue_timeout.
+        :param name: Name of the job, it's stored with the status.
+        :param func: Coroutine function to run.
+        :return: Identifier of the job.
+        """
+        reservation = await self.reserve()
+        return await reservation.submit(name, func, *args, **kwargs)
+
+    async def _retry_later(self, job: ImageJob, attempt: int) -> None:
+        await asyncio.sleep(self.retry_delay * 2 ** (attempt - 1))
+        # Retries don't take slots, since the job has already been accepted
+        self._queue.put_nowait((job, attempt + 1))
+
+    async def _worker(self):
+        while True:
+            job, attempt = await self._queue.get()
+            if attempt == 1:
+                self._release_slot()
+            try:
+                await self._save_status("mark_as_running", job.job_id, attempt)
+                await job.func(*job.args, **job.kwargs)
+            except Exception as e:
+                if attempt <= self.max_retries:
+                    logger.warning(f"Image job {job.job_id} ({job.name}) failed on attempt {attempt}, "
+                                   f"it will be retried: {e}")
+                    await self._save_status("mark_as_finished", job.job_id, IMAGE_JOB_QUEUED, str(e))
+                    retry = asyncio.create_task(self._retry_later(job, attempt))
+                    self._retries.add(retry)
+                    retry.add_done_callback(self._retries.discard)
+                else:
+                    logger.error(f"Image job {job.job_id} ({job.name}) failed after {attempt} attempts: {e}")
+                    await self._save_status("mark_as_finished", job.job_id, IMAGE_JOB_FAILED, str(e))
+            else:
+                await self._save_status("mark_as_finished", job.job_id, IMAGE_JOB_SUCCEEDED)
+            finally:
+                self._queue.task_done()
+
+    async def join(self) -> None:
+        """
+        Waits until all queued jobs and their retries are handled.
+        """
+        while True:
+            await self._queue.join()
+            if not self._retries:
+                return
+            await asyncio.gather(*self._retries, return_exceptions=True)
+
+    async def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Waits for the queued jobs up to timeout and stops workers.
+        Jobs that weren't handled before timeout are lost, their status stays "queued" or "running".
+        """
+        if self._queue is None:
+            return
+
+        try:
+            await asyncio.wait_for(self.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Stopped image job queue with {self._queue.qsize()} unhandled job(s)")
+
+        for task in [*self._workers, *self._retries]:
+            task.cancel()
+        await asyncio.gather(*self._workers, *self._retries, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+        self._slots = None
@@ -0,0 +1,127 @@
+from typing import Any, Awaitable, Callable, Optional, Union
+
+from src.config import settings
+from src.core.image_jobs.image_job_queue import ImageJobQueue, ImageJobQueueFull, ImageJobReservation
+from src.repositories.image_job_repository import ImageJobRepository
+from src.logger import logger
+
+# Owned by the app lifecycle (FastAPI startup/shutdown)
+_image_job_queue: Optional[ImageJobQueue] = None
+_image_deletion_queue: Optional[ImageJobQueue] = None
+
+
+async def start_image_job_queue() -> ImageJobQueue:
+    global _image_job_queue
+
+    if _image_job_queue is None or not _image_job_queue.is_running:
+        queue = ImageJobQueue(worker_count=settings.IMAGE_JOB_WORKER_COUNT,
+                              max_queue_size=settings.IMAGE_JOB_MAX_QUEUE_SIZE,
+                              max_retries=settings.IMAGE_JOB_MAX_RETRIES,
+                              retry_delay=settings.IMAGE_JOB_RETRY_DELAY_SECONDS,
+                              enqueue_timeout=settings.IMAGE_JOB_ENQUEUE_TIMEOUT_SECONDS,
+                              job_repo=ImageJobRepository())
+        queue.start()
+        _image_job_queue = queue
+
+    return _image_job_queue
+
+
+async def submit_image_job(name: str, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Optional[str]:
+    """
+    Hands the image job off to the shared queue.
+    If the queue isn't started (Celery tasks, scripts etc.), the job is run immediately.
+    :return: Identifier of the job or None if the job was run immediately.
+    """
+    if _image_job_queue is None or not _image_job_queue.is_running:
+        await func(*args, **kwargs)
+        return None
+
+    return await _image_job_queue.submit(name, func, *args, **kwargs)
+
+
+class ImmediateImageJob:
+    """
+    Reservation used when the queue isn't started, the job is run on submit.
+    """
+    async def submit(self, name: str, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> None:
+        await func(*args, **kwargs)
+
+    def release(self) -> None:
+        pass
+
+    async def __aenter__(self) -> "ImmediateImageJob":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        pass
+
+
+async def reserve_image_job() -> Union[ImageJobReservation, ImmediateImageJob]:
+    """
+    Takes a slot of the shared queue for the job that can only be submitted after the transaction commits.
+    It raises ImageJobQueueFull before anything is written, so the client can retry the request.
+    Use it as an async context manager, the slot is freed if the job isn't submitted.
+    """
+    if _image_job_queue is None or not _image_job_queue.is_running:
+        return ImmediateImageJob()
+
+    return await _image_job_queue.reserve()
+
+
+async def close_image_job_queue() -> None:
+    """
+    Waits for the queued jobs and stops the workers.
+    """
+    global _image_job_queue
+
+    if _image_job_queue is not None:
+        await _image_job_queue.stop(timeout=settings.IMAGE_JOB_SHUTDOWN_TIMEOUT_SECONDS)
+        _image_job_queue = None
+
+
+async def start_image_deletion_queue() -> ImageJobQueue:
+    """
+    Starts the queue that deletes images from the storage after the products are deleted.
+    """
+    global _image_deletion_queue
+
+    if _image_deletion_queue is None or not _image_deletion_queue.is_running:
+        queue = ImageJobQueue(worker_count=settings.IMAGE_DELETION_WORKER_COUNT,
+                              max_queue_size=settings.IMAGE_DELETION_MAX_QUEUE_SIZE,
+                              max_retries=settings.IMAGE_JOB_MAX_RETRIES,
+                              retry_delay=settings.IMAGE_JOB_RETRY_DELAY_SECONDS,
+                              enqueue_timeout=settings.IMAGE_JOB_ENQUEUE_TIMEOUT_SECONDS,
+                              job_repo=ImageJobRepository())
+        queue.start()
+        _image_deletion_queue = queue
+
+    return _image_deletion_queue
+
+
+async def submit_image_deletion(name: str, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Optional[str]:
+    """
+    Hands the deletion of images off to the deletion queue, so the request doesn't wait for the storage.
+    The job can be retried, so it must be idempotent.
+    If the queue isn't started or it's full, images are deleted immediately.
+    :return: Identifier of the job or None if the job was run immediately.
+    """
+    if _image_deletion_queue is not None and _image_deletion_queue.is_running:
+        try:
+            return await _image_deletion_queue.submit(name, func, *args, **kwargs)
+        except ImageJobQueueFull:
+            # Rows of the products are already deleted, so the request can't fail with 503
+            logger.warning(f"Image deletion queue is full, {name} is run within the request")
+
+    await func(*args, **kwargs)
+    return None
+
+
+async def close_image_deletion_queue() -> None:
+    """
+    Waits for the queued deletions and stops the workers.
+    """
+    global _image_deletion_queue
+
+    if _image_deletion_queue is not None:
+        await _image_deletion_queue.stop(timeout=settings.IMAGE_JOB_SHUTDOWN_TIMEOUT_SECONDS)
+        _image_deletion_queue = None
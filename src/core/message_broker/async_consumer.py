@@ -1,33 +1,65 @@
-from typing import Callable
+from typing import Callable, Any, Optional
 
 import aio_pika
 from aio_pika import ExchangeType, connect
 from aio_pika.abc import AbstractIncomingMessage
 
 from src.logger import logger
+from src.core.message_broker.encoders import decode_message
 
 
 class AsyncConsumer:
     """
     Class responsible for getting messages from the broker
     """
-    def __init__(self, exchange_name: str, exchange_type: str):
+    def __init__(self, exchange_name: str, exchange_type: str, queue_name: Optional[str] = None,
+                 prefetch_count: int = 0, dead_letter_exchange_name: Optional[str] = None):
+        """
+        :param exchange_name: Name of the exchange to consume messages from.
+        :param exchange_type: Type of the exchange (topic, direct and so on).
+        :param queue_name: Name of the durable queue shared by all consumers, so each message
+                           is delivered to only one of them. If None, each consumer gets an exclusive queue
+                           with its own copy of every message.
+        :param prefetch_count: Max count of unacknowledged messages delivered to the consumer. 0 means no limit.
+        :param dead_letter_exchange_name: Exchange where rejected messages of the shared queue are sent.
+        """
         self._exchange_name: str = exchange_name
         self._exchange_type: ExchangeType = ExchangeType(exchange_type)
+        self._prefetch_count = prefetch_count
+        self._dead_letter_exchange_name = dead_letter_exchange_name
         self._connection = None
         self._channel = None
         self._exchange = None
         self._queue = None
-        self._queue_name = None
+        self._queue_name = queue_name
 
     async def connect(self, connection_string: str):
         self._connection = await aio_pika.connect_robust(connection_string)
         self._channel = await self._connection.channel()
+        if self._prefetch_count:
+            await self._channel.set_qos(prefetch_count=self._prefetch_count)
         self._exchange = await self._channel.declare_exchange(self._exchange_name, self._exchange_type)
 
-        self._queue = await self._channel.declare_queue('', exclusive=True)
+        if self._queue_name:
+            self._queue = await self._declare_shared_queue()
+        else:
+            self._queue = await self._channel.declare_queue('', exclusive=True)
         self._queue_name: str = self._queue.name
 
+    async def _declare_shared_queue(self):
+        """
+        Declares the durable queue shared by all consumers and its dead letter queue.
+        """
+        arguments = {}
+        if self._dead_letter_exchange_name:
+            dead_letter_exchange = await self._channel.declare_exchange(self._dead_letter_exchange_name,
+                                                                        ExchangeType.FANOUT, durable=True)
+            dead_letter_queue = await self._channel.declare_queue(f"{self._queue_name}.dead_letter", durable=True)
+            await dead_letter_queue.bind(dead_letter_exchange)
+            arguments["x-dead-letter-exchange"] = self._dead_letter_exchange_name
+
+        return await self._channel.declare_queue(self._queue_name, durable=True, arguments=arguments)
+
     async def bind_queue(self, binding_key: str):
         await self._queue.bind(self._exchange, routing_key=binding_key)
 
@@ -37,6 +69,13 @@ class AsyncConsumer:
 
         await self._queue.consume(on_message)
 
+    @staticmethod
+    def decode_message(message: AbstractIncomingMessage) -> Any:
+        """
+        Deserializes the message body according to its content_type and content_encoding headers.
+        """
+        return decode_message(message.body, message.content_type, message.content_encoding)
+
     async def close(self):
         await self._channel.close()
         await self._connection.close()
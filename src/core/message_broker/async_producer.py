@@ -1,16 +1,20 @@
-import json
 from typing import Any
 import aio_pika
 from aio_pika import ExchangeType
-from src.config.settings import AMPQ_CONNECTION_URL
+from src.config.settings import AMPQ_CONNECTION_URL, MESSAGE_CONTENT_TYPE, MESSAGE_COMPRESSION_THRESHOLD_BYTES
+from src.core.message_broker.encoders import encode_message
 
 class AsyncProducer:
     """
     Class responsible for sending messages to the broker
     """
-    def __init__(self, exchange_name: str, exchange_type: str):
+    def __init__(self, exchange_name: str, exchange_type: str,
+                 content_type: str = MESSAGE_CONTENT_TYPE,
+                 compression_threshold: int = MESSAGE_COMPRESSION_THRESHOLD_BYTES):
         self._exchange_name: str = exchange_name
         self._exchange_type: ExchangeType = ExchangeType(exchange_type)
+        self._content_type = content_type
+        self._compression_threshold = compression_threshold
         self._connection = None
         self._channel= None
         self._exchange = None
@@ -21,9 +25,9 @@ class AsyncProducer:
         self._exchange = await self._channel.declare_exchange(self._exchange_name, self._exchange_type)
 
     async def send_message(self, routing_key: str, message: Any) -> None:
-        message_body = json.dumps(message)
+        message_body, content_encoding = encode_message(message, self._content_type, self._compression_threshold)
         await self._exchange.publish(
-            aio_pika.Message(body=message_body.encode()),
+            aio_pika.Message(body=message_body, content_type=self._content_type, content_encoding=content_encoding),
             routing_key=routing_key
         )
 
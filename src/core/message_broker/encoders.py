@@ -0,0 +1,108 @@
+import json
+import zlib
+from datetime import datetime, date
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Optional, Tuple
+
+import bson
+from bson import ObjectId, Decimal128
+from bson.codec_options import CodecOptions, TypeRegistry
+
+JSON_CONTENT_TYPE = "application/json"
+BSON_CONTENT_TYPE = "application/bson"
+SUPPORTED_CONTENT_TYPES = (JSON_CONTENT_TYPE, BSON_CONTENT_TYPE)
+
+# Value of the content_encoding header for the zlib compressed messages
+ZLIB_CONTENT_ENCODING = "deflate"
+
+
+def _bson_fallback_encoder(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return Decimal128(value)
+    return value
+
+
+# BSON supports ObjectId, Decimal128 and datetime natively, Decimal is converted to Decimal128
+_BSON_CODEC_OPTIONS = CodecOptions(type_registry=TypeRegistry(fallback_encoder=_bson_fallback_encoder))
+
+
+@lru_cache(maxsize=4096)
+def _decimal128_to_str(bid: bytes) -> str:
+    """
+    Decimal128.to_decimal is implemented in pure Python and prices, tax and discount rates repeat a lot,
+    so converted values are cached by their binary representation.
+    """
+    return str(Decimal128.from_bid(bid).to_decimal())
+
+
+def _encode_default(value: Any) -> Any:
+    """
+    Converts values that json module can't serialize.
+    It's called by the json encoder only for such values, so the message is walked once.
+    """
+    if isinstance(value, (ObjectId, Decimal)):
+        return str(value)
+    if isinstance(value, Decimal128):
+        return _decimal128_to_str(value.bid)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def json_encode(message: Any) -> bytes:
+    """
+    Serializes the message into JSON bytes in a single pass.
+    ObjectId, Decimal and Decimal128 are converted to strings, datetime is converted to ISO 8601 format.
+    """
+    return json.dumps(message, default=_encode_default, separators=(",", ":")).encode()
+
+
+def bson_encode(message: Any) -> bytes:
+    """
+    Serializes the message into BSON bytes.
+    BSON document must be a mapping, so the message is wrapped into {"data": message}.
+    """
+    return bson.encode({"data": message}, codec_options=_BSON_CODEC_OPTIONS)
+
+
+def encode_message(message: Any, content_type: str = JSON_CONTENT_TYPE,
+                   compression_threshold: Optional[int] = None) -> Tuple[bytes, Optional[str]]:
+    """
+    Serializes the message into the specified content type and compresses it if it's big enough.
+    :param message: Message body.
+    :param content_type: One of SUPPORTED_CONTENT_TYPES.
+    :param compression_threshold: Min size (in bytes) of the serialized message to compress it.
+                                  If None or 0, messages aren't compressed.
+    :return: Message bytes and value of the content_encoding header (None if the message isn't compressed).
+    """
+    if content_type == BSON_CONTENT_TYPE:
+        body = bson_encode(message)
+    elif content_type == JSON_CONTENT_TYPE:
+        body = json_encode(message)
+    else:
+        raise ValueError(f"Unsupported content type {content_type}")
+
+    if compression_threshold and len(body) >= compression_threshold:
+        return zlib.compress(body), ZLIB_CONTENT_ENCODING
+
+    return body, None
+
+
+def decode_message(body: bytes, content_type: Optional[str] = None, content_encoding: Optional[str] = None) -> Any:
+    """
+    Deserializes the message according to its content_type and content_encoding headers.
+    Messages without content_type are considered as JSON.
+    """
+    if content_encoding == ZLIB_CONTENT_ENCODING:
+        body = zlib.decompress(body)
+    elif content_encoding:
+        raise ValueError(f"Unsupported content encoding {content_encoding}")
+
+    if content_type == BSON_CONTENT_TYPE:
+        return bson.decode(body)["data"]
+    if content_type in (None, "", JSON_CONTENT_TYPE):
+        return json.loads(body)
+
+    raise ValueError(f"Unsupported content type {content_type}")
@@ -0,0 +1,153 @@
+import asyncio
+from typing import Any, Optional, List, Tuple
+
+import aio_pika
+from aio_pika import ExchangeType
+from aio_pika.pool import Pool
+
+from src.config.settings import AMPQ_CONNECTION_URL, MESSAGE_CONTENT_TYPE, MESSAGE_COMPRESSION_THRESHOLD_BYTES
+from src.core.message_broker.encoders import encode_message
+from src.logger import logger
+
+
+class PooledAsyncProducer:
+    """
+    Long-lived producer that keeps one robust connection to the broker
+    and publishes messages through a pool of channels with publisher confirms enabled.
+    Messages are put into a bounded in-memory buffer and published by background senders,
+    so callers don't pay a TCP + AMQP handshake per message.
+    """
+    def __init__(self, exchange_name: str, exchange_type: str,
+                 connection_string: str = AMPQ_CONNECTION_URL,
+                 channel_pool_size: int = 4, buffer_size: int = 1000,
+                 content_type: str = MESSAGE_CONTENT_TYPE,
+                 compression_threshold: int = MESSAGE_COMPRESSION_THRESHOLD_BYTES):
+        """
+        :param exchange_name: Name of the exchange where messages will be published.
+        :param exchange_type: Type of the exchange (topic, direct and so on).
+        :param connection_string: URL of the message broker.
+        :param channel_pool_size: Count of channels (and background senders) used for publishing.
+        :param buffer_size: Max count of buffer items (single messages or batches) waiting to be published.
+                            When the buffer is full, send_message waits until there's a free slot.
+        :param content_type: Content type of published messages (application/json or application/bson).
+        :param compression_threshold: Messages bigger than this size (in bytes) are compressed. 0 disables compression.
+        """
+        self._exchange_name: str = exchange_name
+        self._exchange_type: ExchangeType = ExchangeType(exchange_type)
+        self._connection_string = connection_string
+        self._channel_pool_size = channel_pool_size
+        self._buffer_size = buffer_size
+        self._content_type = content_type
+        self._compression_threshold = compression_threshold
+        self._connection = None
+        self._channel_pool: Optional[Pool] = None
+        self._buffer: Optional[asyncio.Queue] = None
+        self._senders: List[asyncio.Task] = []
+
+    @property
+    def is_connected(self) -> bool:
+        """
+        The robust connection stays open while it's being restored, buffered messages are published after that.
+        """
+        return self._connection is not None and not self._connection.is_closed
+
+    async def connect(self):
+        self._connection = await aio_pika.connect_robust(self._connection_string)
+        self._channel_pool = Pool(self._open_channel, max_size=self._channel_pool_size)
+        self._buffer = asyncio.Queue(maxsize=self._buffer_size)
+        self._senders = [asyncio.create_task(self._sender()) for _ in range(self._channel_pool_size)]
+
+    async def _open_channel(self):
+        return await self._connection.channel(publisher_confirms=True)
+
+    async def _sender(self):
+        """
+        Takes messages from the buffer and publishes them.
+        Each sender owns one channel from the pool for its whole lifetime,
+        so messages of one buffer item are published in the order they were added.
+        """
+        async with self._channel_pool.acquire() as channel:
+            exchange = await channel.declare_exchange(self._exchange_name, self._exchange_type)
+            while True:
+                messages, confirmation = await self._buffer.get()
+                try:
+                    # With publisher confirms enabled, publish returns when the broker acknowledged the message
+                    await asyncio.gather(*(exchange.publish(message, routing_key=routing_key)
+                                           for routing_key, message in messages))
+                    if confirmation is not None and not confirmation.done():
+                        confirmation.set_result(None)
+                except Exception as e:
+                    logger.error(f"Failed to publish {len(messages)} message(s) "
+                                 f"with routing key {messages[0][0]}: {e}")
+                    if confirmation is not None and not confirmation.done():
+                        confirmation.set_exception(e)
+                finally:
+                    self._buffer.task_done()
+
+    def _build_message(self, message: Any) -> aio_pika.Message:
+        body, content_encoding = encode_message(message, self._content_type, self._compression_threshold)
+        return aio_pika.Message(body=body, content_type=self._content_type, content_encoding=content_encoding)
+
+    async def send_message(self, routing_key: str, message: Any, wait_for_confirm: bool = False) -> None:
+        """
+        Puts the message into the send buffer.
+        :param routing_key: Routing key of the message.
+        :param message: Message body. Besides JSON types, it can contain ObjectId, Decimal, Decimal128 and datetime.
+        :param wait_for_confirm: If True, waits until the broker confirms the message.
+        """
+        await self.send_messages([(routing_key, message)], wait_for_confirm)
+
+    async def send_messages(self, messages: List[Tuple[str, Any]], wait_for_confirm: bool = False) -> None:
+        """
+        Puts the messages into the send buffer as one item,
+        so they are published through one channel in the specified order.
+        :param messages: List of (routing key, message body) pairs.
+        :param wait_for_confirm: If True, waits until the broker confirms all messages.
+        """
+        if self._buffer is None:
+            raise RuntimeError("Producer is not connected")
+
+        if not messages:
+            return
+
+        confirmation: Optional[asyncio.Future] = None
+        if wait_for_confirm:
+            confirmation = asyncio.get_running_loop().create_future()
+
+        encoded_messages = [(routing_key, self._build_message(message))
+                            for routing_key, message in messages]
+        await self._buffer.put((encoded_messages, confirmation))
+
+        if confirmation is not None:
+            await confirmation
+
+    async def flush(self) -> None:
+        """
+        Waits until all buffered messages are published.
+        """
+        if self._buffer is not None:
+            await self._buffer.join()
+
+    async def close(self, flush_timeout: Optional[float] = None) -> None:
+        """
+        :param flush_timeout: Max time (in seconds) to wait for buffered messages, the rest are dropped.
+                              None waits until all of them are published.
+        """
+        try:
+            await asyncio.wait_for(self.flush(), flush_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Dropped {self._buffer.qsize()} unpublished buffer item(s) "
+                           f"of the exchange {self._exchange_name}")
+
+        for sender in self._senders:
+            sender.cancel()
+        await asyncio.gather(*self._senders, return_exceptions=True)
+        self._senders = []
+
+        if self._channel_pool:
+            await self._channel_pool.close()
+        if self._connection:
+            await self._connection.close()
+
+        self._buffer = None
+        logger.info(f"Producer for the exchange {self._exchange_name} closed successfully")
@@ -0,0 +1,68 @@
+import asyncio
+from typing import Optional
+
+from src.config import settings
+from src.core.message_broker.pooled_producer import PooledAsyncProducer
+from src.logger import logger
+
+# Owned by the app lifecycle (FastAPI startup/shutdown, Celery worker process init/shutdown)
+_product_crud_producer: Optional[PooledAsyncProducer] = None
+_product_crud_producer_lock: Optional[asyncio.Lock] = None
+# The replaced producer has lost its connection, so its buffer may never drain
+_REPLACED_PRODUCER_FLUSH_TIMEOUT_SECONDS = 5
+
+
+async def start_product_crud_producer() -> PooledAsyncProducer:
+    """
+    Connects the shared producer for the product replication exchange if it's not connected yet.
+    """
+    global _product_crud_producer, _product_crud_producer_lock
+
+    if _product_crud_producer_lock is None:
+        _product_crud_producer_lock = asyncio.Lock()
+
+    async with _product_crud_producer_lock:
+        if _product_crud_producer is None or not _product_crud_producer.is_connected:
+            if _product_crud_producer is not None:
+                # Otherwise the senders and channels of the replaced producer leak
+                try:
+                    await _product_crud_producer.close(flush_timeout=_REPLACED_PRODUCER_FLUSH_TIMEOUT_SECONDS)
+                except Exception as e:
+                    logger.warning(f"Failed to close the disconnected product replication producer: {e}")
+                _product_crud_producer = None
+
+            producer = PooledAsyncProducer(exchange_name=settings.PRODUCT_CRUD_EXCHANGE_TOPIC_NAME,
+                                           exchange_type='topic',
+                                           channel_pool_size=settings.PRODUCER_CHANNEL_POOL_SIZE,
+                                           buffer_size=settings.PRODUCER_BUFFER_SIZE)
+            await producer.connect()
+            _product_crud_producer = producer
+
+    return _product_crud_producer
+
+
+async def get_product_crud_producer() -> PooledAsyncProducer:
+    """
+    Returns the shared producer for the product replication exchange.
+    The producer is connected lazily if the lifecycle hook didn't do it (scripts, shell etc.).
+    """
+    if _product_crud_producer is not None and _product_crud_producer.is_connected:
+        return _product_crud_producer
+
+    return await start_product_crud_producer()
+
+
+async def flush_product_crud_producer() -> None:
+    """
+    Waits until all buffered replication messages are published.
+    """
+    if _product_crud_producer is not None:
+        await _product_crud_producer.flush()
+
+
+async def close_product_crud_producer() -> None:
+    global _product_crud_producer
+
+    if _product_crud_producer is not None:
+        await _product_crud_producer.close()
+        _product_crud_producer = None
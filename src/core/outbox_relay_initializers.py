@@ -0,0 +1,19 @@
+from src.logger import logger
+from src.config import settings
+from src.core.message_broker.producers import get_product_crud_producer
+from src.repositories.outbox_repository import OutboxRepository
+from src.services.outbox.outbox_relay import OutboxRelay
+from src.services.products.replication.message_coalescer import ReplicationMessageCoalescer
+
+
+async def initialize_outbox_relay() -> OutboxRelay:
+    producer = await get_product_crud_producer()
+    coalescer = None
+    if settings.REPLICATION_COALESCING_ENABLED:
+        coalescer = ReplicationMessageCoalescer(settings.REPLICATION_COALESCING_WINDOW_SECONDS,
+                                                settings.REPLICATION_COALESCING_MAX_ENVELOPE_SIZE)
+
+    relay = OutboxRelay(OutboxRepository(), producer, coalescer=coalescer)
+    relay.start()
+    logger.info("Started Outbox Relay")
+    return relay
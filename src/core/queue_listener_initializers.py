@@ -1,5 +1,3 @@
-import json
-
 import aio_pika
 from aio_pika import ExchangeType
 
@@ -7,20 +5,35 @@ from src.logger import logger
 from src.config import settings
 from src.core.message_broker.async_consumer import AsyncConsumer
 from src.services.orders.message_handler import handle_order_processing_messages
+from src.services.orders.replication.order_batcher import OrderProcessingBatcher
 
 async def initialize_order_processing_listener() -> AsyncConsumer:
     binding_key = 'orders.products.#'
     exchange_name = settings.ORDER_PROCESSING_EXCHANGE_TOPIC_NAME
-    consumer = AsyncConsumer(exchange_name=exchange_name, exchange_type=ExchangeType.TOPIC)
+    consumer = AsyncConsumer(exchange_name=exchange_name, exchange_type=ExchangeType.TOPIC,
+                             queue_name=settings.ORDER_PROCESSING_QUEUE_NAME,
+                             prefetch_count=settings.ORDER_PROCESSING_PREFETCH_COUNT,
+                             dead_letter_exchange_name=settings.ORDER_PROCESSING_DEAD_LETTER_EXCHANGE_NAME)
 
     await consumer.connect(settings.AMPQ_CONNECTION_URL)
     await consumer.bind_queue(binding_key)
 
+    if settings.ORDER_PROCESSING_BATCH_MAX_SIZE > 1:
+        # Reserve / release messages are collected into batches and acknowledged after the batch is handled
+        batcher = OrderProcessingBatcher(max_size=settings.ORDER_PROCESSING_BATCH_MAX_SIZE,
+                                         window_seconds=settings.ORDER_PROCESSING_BATCH_WINDOW_MS / 1000)
+        await consumer.consume(batcher.add)
+        logger.info("Started Order Processing Consumer")
+        return consumer
+
     # Start consuming messages
     async def callback(message: aio_pika.abc.AbstractIncomingMessage):
-        async with message.process():
+        # The message is acknowledged after it's processed.
+        # If processing fails, the message is rejected and goes to the dead letter exchange
+        async with message.process(requeue=False):
             logger.info(f"Received message: {message.body} ---- routing key: {message.routing_key}")
-            await handle_order_processing_messages(message.routing_key, json.loads(message.body))
+            await handle_order_processing_messages(message.routing_key, consumer.decode_message(message),
+                                                   message.message_id)
 
     await consumer.consume(callback)
     logger.info("Started Order Processing Consumer")
@@ -0,0 +1,7 @@
+from src.apps.image_jobs.service import ImageJobService
+from src.repositories.image_job_repository import ImageJobRepository
+
+
+async def get_image_job_service() -> ImageJobService:
+    repository = ImageJobRepository()
+    return ImageJobService(repository)
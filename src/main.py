@@ -1,3 +1,4 @@
+import asyncio
 from collections import defaultdict
 from typing import Optional
 
@@ -17,10 +18,27 @@ from src.apps.synonyms.router import router as synonym_router
 from src.apps.events.router import router as event_admin_router
 from src.apps.deals.router import router as deal_admin_router
 from src.apps.search_terms.router import router as search_terms_admin_router
+from src.apps.image_jobs.router import router as image_job_router
 from src.core.message_broker.async_consumer import AsyncConsumer
 
 from src.config import settings
 from src.core.queue_listener_initializers import initialize_order_processing_listener
+from src.core.message_broker.producers import start_product_crud_producer, close_product_crud_producer
+from src.core.outbox_relay_initializers import initialize_outbox_relay
+from src.services.outbox.outbox_relay import OutboxRelay
+from src.repositories.indexes.reconciler import ensure_indexes, ensure_indexes_or_log
+from src.core.cache_invalidation.buses import (
+    start_reference_data_invalidation_bus,
+    close_reference_data_invalidation_bus,
+    get_reference_data_invalidation_stats,
+)
+from src.core.image_jobs.queues import (
+    start_image_job_queue,
+    close_image_job_queue,
+    start_image_deletion_queue,
+    close_image_deletion_queue,
+)
+from src.core.image_jobs.image_job_queue import ImageJobQueueFull
 
 origins = settings.ALLOWED_ORIGINS
 
@@ -28,6 +46,8 @@ app = FastAPI()
 
 # Will be initialized on app startup
 order_processing_listener: Optional[AsyncConsumer] = None
+outbox_relay: Optional[OutboxRelay] = None
+index_build_task: Optional[asyncio.Task] = None
 
 app.add_middleware(
     CORSMiddleware,
@@ -46,6 +66,7 @@ app.include_router(synonym_router)
 app.include_router(event_admin_router)
 app.include_router(deal_admin_router)
 app.include_router(search_terms_admin_router)
+app.include_router(image_job_router)
 
 
 @app.exception_handler(RequestValidationError)
@@ -64,17 +85,52 @@ async def custom_form_validation_error(_, exc):
         ),
     )
 
+@app.exception_handler(ImageJobQueueFull)
+async def image_job_queue_full(_, exc):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Too many images are being processed, try again later"},
+        headers={"Retry-After": str(int(settings.IMAGE_JOB_ENQUEUE_TIMEOUT_SECONDS) or 1)},
+    )
+
 @app.on_event("startup")
 async def initialize_app():
-    global order_processing_listener
+    global order_processing_listener, outbox_relay, index_build_task
+    # Unique indexes that upserts rely on are ensured before anything writes (See REQUIRED_INDEXES),
+    # the rest are built in the background, so the startup doesn't wait for builds on big collections
+    await ensure_indexes(required_only=True)
+    index_build_task = asyncio.create_task(ensure_indexes_or_log())
+    await start_product_crud_producer()  # Open the long-lived connection used for product replication
+    outbox_relay = await initialize_outbox_relay()  # Start publishing replication messages from the outbox
     order_processing_listener = await initialize_order_processing_listener()  # Initialize and start the listener
+    await start_image_job_queue()  # Start workers that upload product images in the background
+    await start_image_deletion_queue()  # Start workers that delete images of the deleted products
+    await start_reference_data_invalidation_bus()  # Broadcast writes of the cached reference data to other instances
 
 @app.on_event("shutdown")
 async def shutdown_event():
     if order_processing_listener:
         await order_processing_listener.close()
+    # Finish queued image uploads before the app stops
+    await close_image_job_queue()
+    # Image jobs can queue deletions of the replaced images, so deletions are finished after them
+    await close_image_deletion_queue()
+    if outbox_relay:
+        await outbox_relay.stop()
+    # Publish buffered replication messages and close the connection
+    await close_product_crud_producer()
+    await close_reference_data_invalidation_bus()
+    if index_build_task:
+        index_build_task.cancel()
+        await asyncio.gather(index_build_task, return_exceptions=True)
 
 
 @app.get("/ping")
 async def ping():
     return {"response": "pong"}
+
+
+@app.get("/metrics/cache-invalidation")
+async def cache_invalidation_metrics():
+    # Lag of the reference data invalidations received from other instances
+    return get_reference_data_invalidation_stats()
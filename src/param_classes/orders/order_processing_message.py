@@ -0,0 +1,14 @@
+from typing import Any, Optional
+
+
+class OrderProcessingMessage:
+    """
+    Decoded message from the order microservice.
+     - routing_key: Routing key of the message, it defines what to do with the products.
+     - data: Message body (See replication_schemes/order_processing).
+     - message_id: Identifier of the message used to skip redelivered messages. None if the sender didn't set it.
+    """
+    def __init__(self, routing_key: str, data: Any, message_id: Optional[str] = None):
+        self.routing_key = routing_key
+        self.data = data
+        self.message_id = message_id
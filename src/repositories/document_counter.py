@@ -0,0 +1,62 @@
+import time
+from typing import Dict, List, Optional, Tuple
+
+from bson import json_util
+
+from src.config.database import db
+from src.config.settings import LIST_COUNT_CACHE_TTL_SECONDS, LIST_COUNT_CACHE_MAX_FILTERS
+
+
+class DocumentCounter:
+    """
+    Counts documents of the paginated admin lists instead of counting them in $facet on every page.
+    Unfiltered lists are counted from the collection metadata (estimated_document_count), such counts are approximate.
+    Filtered lists are counted exactly. Both are memoized per collection and filter for ttl_seconds.
+    Repositories invalidate counts of the collection when they write to it (See invalidate),
+    writes of other instances are seen once the memoized count expires.
+    """
+    def __init__(self, ttl_seconds: float = LIST_COUNT_CACHE_TTL_SECONDS,
+                 max_filters: int = LIST_COUNT_CACHE_MAX_FILTERS):
+        """
+        :param ttl_seconds: How long the count is memoized.
+        :param max_filters: Max count of filters memoized per collection, the oldest count is dropped above it.
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_filters = max_filters
+        # Collection name -> filter -> (expires at, count, whether the count is exact)
+        self._counts: Dict[str, Dict[str, Tuple[float, int, bool]]] = {}
+
+    async def count(self, collection_name: str, stages: Optional[List[dict]] = None) -> Tuple[int, bool]:
+        """
+        :param stages: Stages of the list pipeline that filter documents ($match, $search).
+                       If there are none, the whole collection is counted.
+        :return: Count of documents and whether the count is exact.
+        """
+        key = json_util.dumps(stages or [], sort_keys=True)
+        counts = self._counts.setdefault(collection_name, {})
+        memoized = counts.get(key)
+        if memoized and memoized[0] > time.monotonic():
+            return memoized[1], memoized[2]
+
+        if stages:
+            result = await db[collection_name].aggregate([*stages, {"$count": "total"}]).to_list(length=1)
+            count, exact = (result[0]["total"] if result else 0), True
+        else:
+            count, exact = await db[collection_name].estimated_document_count(), False
+
+        # If the collection was written while it was counted, the count may be outdated, so it isn't memoized
+        if self._counts.get(collection_name) is counts:
+            counts.pop(key, None)
+            if len(counts) >= self.max_filters:
+                counts.pop(next(iter(counts)))
+            counts[key] = (time.monotonic() + self.ttl_seconds, count, exact)
+        return count, exact
+
+    def invalidate(self, collection_name: str) -> None:
+        """
+        Drops memoized counts of the collection, repositories call it after they write to the collection.
+        """
+        self._counts.pop(collection_name, None)
+
+
+document_counter = DocumentCounter()
@@ -0,0 +1,120 @@
+import asyncio
+from collections import Counter
+from datetime import datetime
+from typing import List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from pymongo.operations import UpdateOne
+
+from src.config.database import db
+
+# Count of the latest image names kept on the blob to recognize repeated acquisitions (See acquire).
+# Retries of the image job come shortly after the failed attempt, so older names aren't needed
+_MAX_ACQUIRED_BY = 1000
+
+
+class ImageBlobRepository:
+    """
+    Responsible for operations on the image_blobs collection.
+    It's the index of uploaded product images by the hash of their content (SHA-256 of the bytes),
+    so identical images are stored once. Each blob counts the references of the products to its key,
+    the object is deleted from the storage only when nothing refers to it.
+    Images uploaded before the index existed aren't indexed, each of them is used by one product.
+    """
+
+    async def acquire(self, digest: str, key: str) -> Optional[dict]:
+        """
+        Adds a reference to the image with the specified content.
+        If there's no such image, the blob is created with the specified key.
+        The key is unique for the product and position of the image, so acquiring the image for the same key again
+        (the retried image job) doesn't add another reference.
+        :param digest: Hash of the image content.
+        :param key: Key to store the image under if there's no image with the same content.
+        :return: Blob as it was before the reference was added or None if the blob was created.
+        """
+        now = datetime.utcnow()
+        filters = {"_id": digest, "acquired_by": {"$ne": key}}
+        update = {"$inc": {"ref_count": 1},
+                  # Time of the last reference tells the garbage collector that the image is about to be used
+                  "$set": {"acquired_at": now},
+                  "$push": {"acquired_by": {"$each": [key], "$slice": -_MAX_ACQUIRED_BY}},
+                  "$setOnInsert": {"key": key, "uploaded": False, "created_at": now}}
+        try:
+            return await db.image_blobs.find_one_and_update(filters, update, upsert=True,
+                                                            return_document=ReturnDocument.BEFORE)
+        except DuplicateKeyError:
+            # The blob exists, but it wasn't matched: either the key has already acquired it
+            # or the blob was created concurrently by another key
+            pass
+
+        blob = await db.image_blobs.find_one_and_update(filters, update, return_document=ReturnDocument.BEFORE)
+        return blob or await db.image_blobs.find_one({"_id": digest})
+
+    async def mark_as_uploaded(self, digest: str) -> None:
+        await db.image_blobs.update_one({"_id": digest}, {"$set": {"uploaded": True}})
+
+    async def add_references(self, keys: List[str]) -> List[str]:
+        """
+        Adds references to the images that have already been uploaded, one reference per key in the list.
+        Used when another product starts using the same images (e.g. the product is cloned).
+        :return: Keys that are indexed. Keys that aren't indexed get no references,
+                 such images must be copied, since nothing counts their references.
+        """
+        reference_counts = Counter(keys)
+        if not reference_counts:
+            return []
+
+        indexed_blobs = await db.image_blobs.find({"key": {"$in": list(reference_counts)}, "uploaded": True},
+                                                  {"key": 1}).to_list(length=None)
+        indexed_keys = [blob["key"] for blob in indexed_blobs]
+        if indexed_keys:
+            now = datetime.utcnow()
+            await db.image_blobs.bulk_write([UpdateOne({"key": key},
+                                                       {"$inc": {"ref_count": reference_counts[key]},
+                                                        "$set": {"acquired_at": now}})
+                                             for key in indexed_keys], ordered=False)
+        return indexed_keys
+
+    async def release(self, keys: List[str]) -> List[str]:
+        """
+        Removes references to the images with the specified keys, one reference per key in the list.
+        Blobs without references are deleted from the index.
+        :return: Keys that nothing refers to anymore, these objects can be deleted from the storage.
+                 Keys that aren't indexed are returned as well.
+        """
+        reference_counts = Counter(keys)
+        if not reference_counts:
+            return []
+
+        await db.image_blobs.bulk_write([UpdateOne({"key": key}, {"$inc": {"ref_count": -count}})
+                                         for key, count in reference_counts.items()], ordered=False)
+        indexed_blobs = await db.image_blobs.find({"key": {"$in": list(reference_counts)}}, {"key": 1}) \
+            .to_list(length=None)
+        indexed_keys = {blob["key"] for blob in indexed_blobs}
+
+        # Each blob is deleted only if it still has no references,
+        # so the image reused by a concurrent upload isn't deleted
+        deleted_blobs = await asyncio.gather(*(db.image_blobs.find_one_and_delete({"key": key,
+                                                                                   "ref_count": {"$lte": 0}})
+                                               for key in indexed_keys))
+        return [key for key in reference_counts if key not in indexed_keys] + \
+            [blob["key"] for blob in deleted_blobs if blob is not None]
+
+    async def delete_unused(self, keys: List[str], acquired_before: datetime) -> List[str]:
+        """
+        Deletes blobs of the images that no product refers to (See OrphanedImageCollector).
+        Blobs that were acquired later than acquired_before are kept, since a product may be about to use them.
+        :return: Keys that can't be deleted from the storage, because their blobs were kept.
+        """
+        if not keys:
+            return []
+
+        await db.image_blobs.delete_many({
+            "key": {"$in": keys},
+            "$or": [{"acquired_at": {"$lt": acquired_before}},
+                    # Blobs indexed before acquired_at was added
+                    {"acquired_at": {"$exists": False}, "created_at": {"$lt": acquired_before}}],
+        })
+        kept_blobs = await db.image_blobs.find({"key": {"$in": keys}}, {"key": 1}).to_list(length=None)
+        return [blob["key"] for blob in kept_blobs]
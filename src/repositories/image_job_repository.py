@@ -0,0 +1,49 @@
+from datetime import datetime
+from typing import Optional
+
+from src.config.database import db
+
+# Statuses of the image job
+IMAGE_JOB_QUEUED = "queued"
+IMAGE_JOB_RUNNING = "running"
+IMAGE_JOB_SUCCEEDED = "succeeded"
+IMAGE_JOB_FAILED = "failed"
+
+
+class ImageJobRepository:
+    """
+    Stores statuses of the background image jobs (uploads and image operations of the products),
+    so they can be checked from any app instance.
+    """
+
+    async def create_job(self, job_id: str, name: str) -> None:
+        now = datetime.utcnow()
+        await db.image_jobs.insert_one({
+            "_id": job_id,
+            "name": name,
+            "status": IMAGE_JOB_QUEUED,
+            "attempts": 0,
+            "error": None,
+            "created_at": now,
+            "modified_at": now,
+        })
+
+    async def mark_as_running(self, job_id: str, attempt: int) -> None:
+        await db.image_jobs.update_one(
+            {"_id": job_id},
+            {"$set": {"status": IMAGE_JOB_RUNNING, "attempts": attempt, "modified_at": datetime.utcnow()}},
+        )
+
+    async def mark_as_finished(self, job_id: str, status: str, error: Optional[str] = None) -> None:
+        """
+        :param status: IMAGE_JOB_SUCCEEDED, IMAGE_JOB_FAILED or IMAGE_JOB_QUEUED if the job will be retried.
+        :param error: Error of the last attempt.
+        """
+        await db.image_jobs.update_one(
+            {"_id": job_id},
+            {"$set": {"status": status, "error": error, "modified_at": datetime.utcnow()}},
+        )
+
+    async def get_job(self, job_id: str) -> Optional[dict]:
+        job = await db.image_jobs.find_one({"_id": job_id})
+        return job
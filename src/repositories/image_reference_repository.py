@@ -0,0 +1,38 @@
+from typing import List, Set
+
+from src.config.database import db
+from src.repositories.indexes.reconciler import ensure_indexes
+
+# Fields of the documents that store image URLs, by the collection (it's also the folder of the images)
+IMAGE_FIELDS = {
+    "products": ("images.main", "images.secondaryImages"),
+    "events": ("image",),
+    "deals": ("image",),
+}
+
+
+class ImageReferenceRepository:
+    """
+    Finds which images are referenced by products, events and deals.
+    Used by the garbage collector of the images that no document refers to.
+    """
+
+    async def find_referenced_urls(self, collection_name: str, image_urls: List[str]) -> Set[str]:
+        """
+        :param collection_name: Collection where images of the folder are referenced (See IMAGE_FIELDS).
+        :param image_urls: URLs to check, each field is looked up with one indexed $in query.
+        :return: URLs of the list that are referenced by the documents.
+        """
+        if not image_urls:
+            return set()
+
+        referenced_urls = set()
+        for field in IMAGE_FIELDS[collection_name]:
+            # distinct also returns other secondary images of the found products, they are filtered out below
+            referenced_urls.update(await db[collection_name].distinct(field, {field: {"$in": image_urls}}))
+
+        return referenced_urls.intersection(image_urls)
+
+    async def ensure_indexes(self) -> None:
+        # The garbage collector runs outside the app (Celery, CLI), so it ensures the indexes it relies on
+        await ensure_indexes(IMAGE_FIELDS)
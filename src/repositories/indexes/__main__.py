@@ -0,0 +1,79 @@
+"""
+Checks indexes of the db against the declared ones (See INDEXES in registry.py).
+  diff     Prints missing, changed and undeclared indexes, exits with 1 if any declared index is missing or changed.
+  ensure   Creates missing indexes, the same as the app does at startup.
+  explain  Seeds a scratch database, creates the declared indexes there and explains the repository queries
+           (See QUERY_SHAPES), exits with 1 if any of them scans the whole collection.
+
+Run from the project root:
+    python -m src.repositories.indexes diff
+    python -m src.repositories.indexes explain --database product_microservice_index_check
+"""
+import argparse
+import asyncio
+import sys
+
+from src.config.database import client, db
+from src.repositories.indexes.reconciler import diff_indexes, ensure_indexes, find_collection_scans
+from src.repositories.indexes.registry import INDEXES, QUERY_SHAPES
+
+
+async def print_diff() -> int:
+    exit_code = 0
+    for diff in await diff_indexes():
+        for model in diff.missing:
+            print(f"{diff.collection_name}: missing {model.document['name']}")
+        for model, existing_options in diff.changed:
+            print(f"{diff.collection_name}: {model.document['name']} has options {existing_options}")
+        for name in diff.extra:
+            print(f"{diff.collection_name}: {name} isn't declared")
+        if diff.missing or diff.changed:
+            exit_code = 1
+
+    print("Indexes differ from the declared ones" if exit_code else "All declared indexes exist")
+    return exit_code
+
+
+async def explain(database_name: str, document_count: int, keep: bool) -> int:
+    if database_name == db.name:
+        print("Explain seeds the database, use a scratch database instead of the app's one")
+        return 2
+
+    database = client[database_name]
+    try:
+        # Documents don't need the queried fields, the planner only needs the collection to be non-empty
+        for collection_name in {shape.collection_name for shape in QUERY_SHAPES}:
+            if not await database[collection_name].estimated_document_count():
+                await database[collection_name].insert_many([{"seed": number} for number in range(document_count)])
+        await ensure_indexes(INDEXES, database)
+
+        collection_scans = await find_collection_scans(database)
+        for shape, stages in collection_scans:
+            print(f"COLLSCAN in {shape.collection_name}: {shape.description} {shape.filters} ({' > '.join(stages)})")
+        print(f"{len(collection_scans)} of {len(QUERY_SHAPES)} queries scan the whole collection")
+        return 1 if collection_scans else 0
+    finally:
+        if not keep:
+            await client.drop_database(database_name)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["diff", "ensure", "explain"])
+    parser.add_argument("--database", default=f"{db.name}_index_check", help="Scratch database of explain")
+    parser.add_argument("--documents", type=int, default=100, help="Count of documents seeded into each collection")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch database of explain")
+    args = parser.parse_args()
+
+    if args.command == "diff":
+        exit_code = await print_diff()
+    elif args.command == "ensure":
+        await ensure_indexes()
+        exit_code = await print_diff()
+    else:
+        exit_code = await explain(args.database, args.documents, args.keep)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
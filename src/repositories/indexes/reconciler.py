@@ -0,0 +1,156 @@
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+
+from src.config.database import db
+from src.repositories.indexes.registry import INDEXES, QUERY_SHAPES, REQUIRED_INDEXES, QueryShape
+from src.logger import logger
+
+# Options that make indexes with the same keys different
+_COMPARED_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+
+class RequiredIndexError(Exception):
+    pass
+
+
+class CollectionIndexDiff(NamedTuple):
+    collection_name: str
+    # Declared indexes that don't exist
+    missing: List[IndexModel]
+    # Declared indexes that exist with other options, with the options of the existing index
+    changed: List[Tuple[IndexModel, dict]]
+    # Names of the existing indexes that aren't declared
+    extra: List[str]
+
+
+def _get_keys(keys) -> Tuple[Tuple[str, int], ...]:
+    # Existing indexes may store the direction as float
+    return tuple((field, int(direction)) for field, direction in keys)
+
+
+def _get_options(index: dict) -> dict:
+    return {option: index[option] for option in _COMPARED_OPTIONS if index.get(option) is not None}
+
+
+async def diff_indexes(collection_names: Optional[Iterable[str]] = None,
+                       database: AsyncIOMotorDatabase = db) -> List[CollectionIndexDiff]:
+    """
+    Compares declared indexes (See INDEXES) with the existing ones by their keys and options.
+    :param collection_names: Collections to compare, all declared collections by default.
+    """
+    diffs = []
+    for collection_name in collection_names or INDEXES:
+        existing_indexes = {_get_keys(index["key"]): (name, index)
+                            for name, index in (await database[collection_name].index_information()).items()}
+        missing, changed, declared_keys = [], [], set()
+        for model in INDEXES[collection_name]:
+            keys = _get_keys(model.document["key"].items())
+            declared_keys.add(keys)
+            if keys not in existing_indexes:
+                missing.append(model)
+            elif _get_options(existing_indexes[keys][1]) != _get_options(model.document):
+                changed.append((model, _get_options(existing_indexes[keys][1])))
+
+        extra = [name for keys, (name, _) in existing_indexes.items() if keys not in declared_keys and name != "_id_"]
+        diffs.append(CollectionIndexDiff(collection_name, missing, changed, extra))
+
+    return diffs
+
+
+def _is_required(collection_name: str, model: IndexModel) -> bool:
+    return _get_keys(model.document["key"].items()) in REQUIRED_INDEXES.get(collection_name, ())
+
+
+async def ensure_indexes(collection_names: Optional[Iterable[str]] = None,
+                         database: AsyncIOMotorDatabase = db, required_only: bool = False) -> None:
+    """
+    Creates missing indexes in the background and updates TTL of the changed TTL indexes.
+    It's idempotent, indexes that already exist aren't rebuilt.
+    Other changes (unique, sparse, partial) need the index to be dropped, so they are only logged,
+    as well as failed builds, so the app starts without the index. Required indexes (See REQUIRED_INDEXES)
+    are the exception, RequiredIndexError is raised if any of them is missing or changed afterwards.
+    :param required_only: Ensure only the required indexes.
+    """
+    if required_only and collection_names is None:
+        collection_names = REQUIRED_INDEXES
+
+    failed_required_indexes = []
+    for diff in await diff_indexes(collection_names, database):
+        collection = database[diff.collection_name]
+        for model in diff.missing:
+            if required_only and not _is_required(diff.collection_name, model):
+                continue
+            document = dict(model.document)
+            keys = list(document.pop("key").items())
+            try:
+                await collection.create_indexes([IndexModel(keys, background=True, **document)])
+            except OperationFailure as e:
+                logger.error(f"Index {document['name']} of {diff.collection_name} wasn't created: {e}")
+                if _is_required(diff.collection_name, model):
+                    failed_required_indexes.append(f"{diff.collection_name}.{document['name']}")
+
+        for model, existing_options in diff.changed:
+            if required_only and not _is_required(diff.collection_name, model):
+                continue
+            declared_options = _get_options(model.document)
+            ttl_only = ({**existing_options, "expireAfterSeconds": None} ==
+                        {**declared_options, "expireAfterSeconds": None})
+            if ttl_only and "expireAfterSeconds" in declared_options:
+                await database.command("collMod", diff.collection_name, index={
+                    "keyPattern": model.document["key"],
+                    "expireAfterSeconds": declared_options["expireAfterSeconds"],
+                })
+            else:
+                logger.error(f"Index {model.document['name']} of {diff.collection_name} has options "
+                             f"{existing_options} instead of {declared_options}, it must be rebuilt")
+                if _is_required(diff.collection_name, model):
+                    failed_required_indexes.append(f"{diff.collection_name}.{model.document['name']}")
+
+        if diff.extra and not required_only:
+            logger.warning(f"Indexes of {diff.collection_name} that aren't declared: {', '.join(diff.extra)}")
+
+    if failed_required_indexes:
+        raise RequiredIndexError(f"Required indexes are missing or changed: {', '.join(failed_required_indexes)}")
+
+
+async def ensure_indexes_or_log() -> None:
+    """
+    Ensures all declared indexes for the startup that doesn't wait for them, so failures are only logged.
+    """
+    try:
+        await ensure_indexes()
+    except Exception as e:
+        logger.error(f"Failed to ensure indexes: {e}")
+
+
+def _get_plan_stages(plan: dict) -> Iterator[str]:
+    if "stage" in plan:
+        yield plan["stage"]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from _get_plan_stages(plan[key])
+    for input_stage in plan.get("inputStages", []):
+        yield from _get_plan_stages(input_stage)
+
+
+async def find_collection_scans(database: AsyncIOMotorDatabase,
+                                shapes: List[QueryShape] = QUERY_SHAPES) -> List[Tuple[QueryShape, List[str]]]:
+    """
+    Explains the queries (See QUERY_SHAPES) and returns the ones whose winning plans scan the whole collection.
+    Collections must have documents, the planner doesn't choose an index for an empty collection.
+    :return: Query shapes that fall back to COLLSCAN with the stages of their winning plans.
+    """
+    collection_scans = []
+    for shape in shapes:
+        command = {"find": shape.collection_name, "filter": shape.filters}
+        if shape.sort:
+            command["sort"] = shape.sort
+        explanation = await database.command("explain", command, verbosity="queryPlanner")
+        stages = list(_get_plan_stages(explanation["queryPlanner"]["winningPlan"]))
+        if "COLLSCAN" in stages:
+            collection_scans.append((shape, stages))
+
+    return collection_scans
@@ -0,0 +1,113 @@
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from bson import ObjectId
+from pymongo import ASCENDING, IndexModel
+
+from src.config import settings
+
+# Indexes of each collection. They are created at startup (See ensure_indexes), names are generated by pymongo,
+# so indexes created before the registry are matched by their keys
+INDEXES: Dict[str, List[IndexModel]] = {
+    "products": [
+        # Product list (sort and seek of the top-level products) and variations of the parent
+        IndexModel([("parent_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("sku", ASCENDING)]),
+        IndexModel([("images.sourceProductId", ASCENDING)]),
+        IndexModel([("event_id", ASCENDING)]),
+        IndexModel([("attrs.code", ASCENDING)]),
+        IndexModel([("category", ASCENDING)]),
+        # Lookups of the garbage collector of orphaned images
+        IndexModel([("images.main", ASCENDING)]),
+        IndexModel([("images.secondaryImages", ASCENDING)]),
+    ],
+    "search_terms": [
+        IndexModel([("name", ASCENDING)]),
+    ],
+    "categories": [
+        IndexModel([("parent_id", ASCENDING)]),
+    ],
+    "facets": [
+        IndexModel([("code", ASCENDING)]),
+        IndexModel([("categories", ASCENDING)]),
+    ],
+    "variation_themes": [
+        IndexModel([("categories", ASCENDING)]),
+    ],
+    "events": [
+        IndexModel([("image", ASCENDING)]),
+    ],
+    "deals": [
+        IndexModel([("parent_id", ASCENDING)]),
+        IndexModel([("image", ASCENDING)]),
+    ],
+    # Uploaded product images by their content
+    "image_blobs": [
+        IndexModel([("key", ASCENDING)], unique=True),
+    ],
+    "stock_shards": [
+        IndexModel([("product_id", ASCENDING), ("shard", ASCENDING)], unique=True),
+    ],
+    # Identifiers are removed when the broker can't redeliver the message anymore
+    "processed_messages": [
+        IndexModel([("processed_at", ASCENDING)], expireAfterSeconds=settings.PROCESSED_MESSAGE_TTL_SECONDS),
+    ],
+    # Statuses of old image jobs are removed
+    "image_jobs": [
+        IndexModel([("modified_at", ASCENDING)], expireAfterSeconds=settings.IMAGE_JOB_STATUS_TTL_SECONDS),
+    ],
+}
+
+# Keys of the indexes the app can't run without, upserts rely on their unique constraints to not create duplicates.
+# They are ensured before the app starts, it fails to start if they can't be built (See ensure_indexes)
+REQUIRED_INDEXES: Dict[str, Set[Tuple[Tuple[str, int], ...]]] = {
+    "image_blobs": {(("key", ASCENDING),)},
+    "stock_shards": {(("product_id", ASCENDING), ("shard", ASCENDING))},
+}
+
+
+class QueryShape(NamedTuple):
+    """
+    Query of a repository, checked with explain so it doesn't scan the whole collection (See find_collection_scans).
+    Values don't matter, only fields and operators do.
+    """
+    collection_name: str
+    # Where the query comes from
+    description: str
+    filters: dict
+    sort: Optional[dict] = None
+
+
+_ID = ObjectId()
+
+QUERY_SHAPES: List[QueryShape] = [
+    QueryShape("products", "Product list (ProductAdminRepository.get_products_with_variations)",
+               {"parent_id": None}, {"created_at": 1, "_id": 1}),
+    QueryShape("products", "Product list with the cursor (ProductAdminRepository.get_products_with_variations_after)",
+               {"parent_id": None, "$or": [{"created_at": {"$gt": datetime(2020, 1, 1)}},
+                                           {"created_at": datetime(2020, 1, 1), "_id": {"$gt": _ID}}]},
+               {"created_at": 1, "_id": 1}),
+    QueryShape("products", "Variations of the parent", {"parent_id": _ID}),
+    QueryShape("products", "Existing SKUs (ProductValidator._check_if_skus_exist)", {"sku": {"$in": ["SKU"]}}),
+    QueryShape("products", "Products that use images of the product (ImageOperationManager)",
+               {"images.sourceProductId": _ID, "parent": False}),
+    QueryShape("products", "Products of the event", {"event_id": _ID}),
+    QueryShape("products", "Products with the attribute (ProductAdminService.update_attribute_explanation)",
+               {"attrs": {"$elemMatch": {"code": "code"}}}),
+    QueryShape("products", "Products of the category", {"category": _ID}),
+    QueryShape("products", "Referenced main images (ImageReferenceRepository)", {"images.main": {"$in": ["url"]}}),
+    QueryShape("products", "Referenced secondary images (ImageReferenceRepository)",
+               {"images.secondaryImages": {"$in": ["url"]}}),
+    QueryShape("search_terms", "Search term upserts (SearchTermsService.create_search_terms_if_not_exist)",
+               {"name": "name"}),
+    QueryShape("categories", "Children of the category", {"parent_id": _ID}),
+    QueryShape("facets", "Facet by the code", {"code": "code"}),
+    QueryShape("facets", "Facets of the category", {"$or": [{"categories": _ID}, {"categories": "*"}]}),
+    QueryShape("variation_themes", "Variation themes of the category",
+               {"$or": [{"categories": _ID}, {"categories": "*"}]}),
+    QueryShape("events", "Referenced event images (ImageReferenceRepository)", {"image": {"$in": ["url"]}}),
+    QueryShape("deals", "Child deals", {"parent_id": _ID}),
+    QueryShape("deals", "Referenced deal images (ImageReferenceRepository)", {"image": {"$in": ["url"]}}),
+    QueryShape("image_blobs", "Blobs by the keys (ImageBlobRepository)", {"key": {"$in": ["key"]}}),
+    QueryShape("stock_shards", "Shards of the products (StockShardRepository)", {"product_id": {"$in": [_ID]}}),
+]
@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+from typing import Any, List
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from pymongo.results import InsertOneResult, DeleteResult
+
+from src.config.database import db
+
+
+class OutboxRepository:
+    """
+    Responsible for operations on the outbox collection.
+    Messages are written to the outbox in the same session as the data they describe,
+    and the outbox relay publishes them to the message broker after the transaction commits.
+    """
+
+    async def add_message(self, routing_key: str, message: Any, **kwargs) -> InsertOneResult:
+        """
+        Adds a message to the outbox.
+        :param routing_key: Routing key used to publish the message.
+        :param message: JSON serializable message body.
+        :param kwargs: Other parameters for insert such as session for transaction etc.
+        """
+        document = {
+            "routing_key": routing_key,
+            "message": message,
+            "created_at": datetime.utcnow(),
+        }
+        added_message = await db.outbox.insert_one(document, **kwargs)
+        return added_message
+
+    async def get_pending_messages(self, limit: int, **kwargs) -> List[dict]:
+        """
+        Returns the oldest messages from the outbox in the order they were added.
+        :param limit: Max count of messages to return.
+        :param kwargs: Other parameters such as session for transaction etc.
+        """
+        messages = await db.outbox.find({}, **kwargs).sort("_id", 1).limit(limit).to_list(length=None)
+        return messages
+
+    async def delete_messages(self, message_ids: List[ObjectId], **kwargs) -> DeleteResult:
+        """
+        Deletes published messages from the outbox.
+        :param message_ids: Identifiers of the messages to delete.
+        :param kwargs: Other parameters for delete such as session for transaction etc.
+        """
+        deleted_messages = await db.outbox.delete_many({"_id": {"$in": message_ids}}, **kwargs)
+        return deleted_messages
+
+    async def acquire_relay_lease(self, owner: str, lease_seconds: int) -> bool:
+        """
+        Acquires or prolongs the lease that allows only one relay to publish messages at the same time,
+        so messages are published in order even if several app instances are running.
+        :param owner: Unique identifier of the relay.
+        :param lease_seconds: How long the lease is valid if it won't be prolonged.
+        :return: True if the relay holds the lease.
+        """
+        now = datetime.utcnow()
+        try:
+            lease = await db.outbox_relay_lease.find_one_and_update(
+                {"_id": "outbox_relay", "$or": [{"owner": owner}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": owner, "expires_at": now + timedelta(seconds=lease_seconds)}},
+                upsert=True, return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            # Another relay holds the lease, so upsert tried to insert a document with the same _id
+            return False
+
+        return lease is not None and lease.get("owner") == owner
+
+    async def release_relay_lease(self, owner: str) -> None:
+        await db.outbox_relay_lease.delete_one({"_id": "outbox_relay", "owner": owner})
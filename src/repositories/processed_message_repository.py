@@ -0,0 +1,55 @@
+from datetime import datetime
+from typing import List, Set
+
+from src.config.database import db
+
+
+class ProcessedMessageRepository:
+    """
+    Stores identifiers of the processed broker messages,
+    so messages redelivered by the broker are not processed twice.
+    """
+
+    async def mark_as_processed(self, message_id: str, routing_key: str, **kwargs) -> None:
+        """
+        Marks the message as processed.
+        Call it in the same transaction as the changes made by the message.
+        If the message has already been processed, it raises DuplicateKeyError and the server aborts the transaction,
+        so the error must be handled outside of it.
+        :param message_id: Identifier of the message (message_id property of the AMQP message).
+        :param routing_key: Routing key of the message.
+        :param kwargs: Other parameters for insert such as session for transaction etc.
+        """
+        await db.processed_messages.insert_one(
+            {"_id": message_id, "routing_key": routing_key, "processed_at": datetime.utcnow()}, **kwargs
+        )
+
+    async def get_processed_ids(self, message_ids: List[str], **kwargs) -> Set[str]:
+        """
+        Returns identifiers of the specified messages that have already been processed.
+        :param message_ids: Identifiers of the messages to check.
+        :param kwargs: Other parameters such as session for transaction etc.
+        """
+        if not message_ids:
+            return set()
+
+        processed_messages = await db.processed_messages.find({"_id": {"$in": message_ids}}, {"_id": 1},
+                                                              **kwargs).to_list(length=None)
+        return {processed_message["_id"] for processed_message in processed_messages}
+
+    async def mark_many_as_processed(self, messages: List[dict], **kwargs) -> None:
+        """
+        Marks messages as processed.
+        Call it in the same transaction as the changes made by the messages.
+        :param messages: List of dicts with "message_id" and "routing_key" keys.
+        :param kwargs: Other parameters for insert such as session for transaction etc.
+        """
+        if not messages:
+            return
+
+        processed_at = datetime.utcnow()
+        await db.processed_messages.insert_many(
+            [{"_id": message["message_id"], "routing_key": message["routing_key"], "processed_at": processed_at}
+             for message in messages],
+            **kwargs,
+        )
@@ -4,6 +4,7 @@ from pymongo.operations import UpdateOne
 from pymongo import ReturnDocument
 from typing import Optional, Union
 from src.config.database import db
+from src.repositories.document_counter import document_counter
 from src.logger import logger
 
 
@@ -59,6 +60,9 @@ class ProductRepositoryBase:
             raise ValueError("No data provided")
 
         created_product = await db.products.insert_one(document=data, **kwargs)
+        # Updates (stock, images, discounts) don't change which products are listed,
+        # so only inserts and deletes invalidate counts of the products
+        document_counter.invalidate("products")
         return created_product
 
     async def create_many_products(self, data: list[dict], **kwargs) -> InsertManyResult:
@@ -72,6 +76,7 @@ class ProductRepositoryBase:
             raise ValueError("No data provided")
 
         created_products = await db.products.insert_many(documents=data, **kwargs)
+        document_counter.invalidate("products")
         return created_products
 
     async def update_one_product(self, filters: dict, data_to_update: Union[list[dict], dict], **kwargs) -> UpdateResult:
@@ -117,6 +122,7 @@ class ProductRepositoryBase:
         :param kwargs: Other parameters for delete such as session for transaction etc.
         """
         deleted_product = await db.products.delete_one(filter=filters, **kwargs)
+        document_counter.invalidate("products")
         return deleted_product
 
     async def delete_many_products(self, filters: dict, **kwargs) -> DeleteResult:
@@ -126,6 +132,7 @@ class ProductRepositoryBase:
         :param kwargs: Other parameters for delete such as session for transaction etc.
         """
         deleted_product = await db.products.delete_many(filter=filters, **kwargs)
+        document_counter.invalidate("products")
         return deleted_product
 
     async def find_and_update_one_product(self, filters: dict,
@@ -171,4 +178,5 @@ class ProductRepositoryBase:
             projection = {}
 
         deleted_product = await db.products.find_one_and_delete(filter=filters, projection=projection, **kwargs)
+        document_counter.invalidate("products")
         return deleted_product
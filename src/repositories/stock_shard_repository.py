@@ -0,0 +1,96 @@
+from typing import List, Dict
+
+from bson import ObjectId
+from pymongo import ASCENDING
+from pymongo.operations import UpdateOne
+from pymongo.results import InsertManyResult, DeleteResult
+
+from src.config.database import db
+
+
+def _split_stock(stock: int, shard_count: int) -> List[int]:
+    base_stock, remainder = divmod(stock, shard_count)
+    return [base_stock + (1 if shard < remainder else 0) for shard in range(shard_count)]
+
+
+class StockShardRepository:
+    """
+    Responsible for operations on the stock_shards collection.
+    Stock of the product with sharded stock is split across several counter documents,
+    so concurrent reservations of the same product update different documents.
+    """
+
+    async def create_shards(self, product_id: ObjectId, stock: int, shard_count: int, **kwargs) -> InsertManyResult:
+        """
+        Splits stock of the product evenly across the specified count of shards.
+        :param product_id: Identifier of the product.
+        :param stock: Total stock of the product.
+        :param shard_count: Count of shards.
+        :param kwargs: Other parameters for insert such as session for transaction etc.
+        """
+        shards = [{"product_id": product_id, "shard": shard, "stock": shard_stock}
+                  for shard, shard_stock in enumerate(_split_stock(stock, shard_count))]
+        created_shards = await db.stock_shards.insert_many(shards, **kwargs)
+        return created_shards
+
+    async def replace_shards(self, product_id: ObjectId, stock: int, shard_count: int, **kwargs) -> None:
+        """
+        Splits stock of the product across the shards again, shards are rewritten in place,
+        so concurrent reservations never find the product without shards.
+        Shards above the count are deleted, missing ones are created.
+        :param kwargs: Other parameters for writes such as session for transaction etc.
+        """
+        operations = [UpdateOne({"product_id": product_id, "shard": shard}, {"$set": {"stock": shard_stock}},
+                                upsert=True)
+                      for shard, shard_stock in enumerate(_split_stock(stock, shard_count))]
+        await db.stock_shards.bulk_write(operations, ordered=False, **kwargs)
+        await db.stock_shards.delete_many({"product_id": product_id, "shard": {"$gte": shard_count}}, **kwargs)
+
+    async def delete_shards(self, product_ids: List[ObjectId], **kwargs) -> DeleteResult:
+        """
+        :param product_ids: Identifiers of the products whose shards should be deleted.
+        :param kwargs: Other parameters for delete such as session for transaction etc.
+        """
+        deleted_shards = await db.stock_shards.delete_many({"product_id": {"$in": product_ids}}, **kwargs)
+        return deleted_shards
+
+    async def get_shards(self, product_id: ObjectId, **kwargs) -> List[dict]:
+        """
+        Returns shards of the product ordered by their number.
+        :param kwargs: Other parameters such as session for transaction etc.
+        """
+        shards = await db.stock_shards.find({"product_id": product_id}, {"_id": 0, "shard": 1, "stock": 1}, **kwargs) \
+            .sort("shard", ASCENDING).to_list(length=None)
+        return shards
+
+    async def decrement_shard(self, product_id: ObjectId, shard: int, quantity: int, **kwargs) -> bool:
+        """
+        Decrements stock of the shard if it has enough stock.
+        :param kwargs: Other parameters for update such as session for transaction etc.
+        :return: True if stock of the shard was decremented.
+        """
+        decremented_shard = await db.stock_shards.update_one(
+            {"product_id": product_id, "shard": shard, "stock": {"$gte": quantity}},
+            {"$inc": {"stock": -quantity}},
+            **kwargs,
+        )
+        return decremented_shard.modified_count == 1
+
+    async def increment_shard(self, product_id: ObjectId, shard: int, quantity: int, **kwargs) -> None:
+        """
+        :param kwargs: Other parameters for update such as session for transaction etc.
+        """
+        await db.stock_shards.update_one({"product_id": product_id, "shard": shard},
+                                         {"$inc": {"stock": quantity}}, **kwargs)
+
+    async def get_total_stock(self, product_ids: List[ObjectId], **kwargs) -> Dict[ObjectId, int]:
+        """
+        Sums stock of the shards of each product.
+        :return: Mapping of product ids to their total stock. Products without shards are not included.
+        """
+        pipeline = [
+            {"$match": {"product_id": {"$in": product_ids}}},
+            {"$group": {"_id": "$product_id", "stock": {"$sum": "$stock"}}},
+        ]
+        totals = await db.stock_shards.aggregate(pipeline, **kwargs).to_list(length=None)
+        return {total["_id"]: total["stock"] for total in totals}
@@ -0,0 +1,33 @@
+from typing import Dict
+
+from pydantic import BaseModel, constr
+
+
+class ImageUpload(BaseModel):
+    """
+    Presigned form to upload the image straight to the storage.
+    Send multipart/form-data POST request to the url with all fields and the image as the "file" field (the last one).
+    """
+    key: str
+    url: str
+    fields: Dict[str, str]
+
+
+# Version of the image keys returned with the presigned forms, it's sent back to commit the uploads
+ImageVersion = constr(regex=r"^[0-9a-f]{8}$")
+
+
+class ImageUploadResponse(BaseModel):
+    upload: ImageUpload
+    # Version of the image key, send it to commit the upload
+    version: str
+    # Count of seconds the form is valid
+    expires_in: int
+
+
+class CommitImageUploadRequest(BaseModel):
+    version: ImageVersion
+
+
+class CommittedImageResponse(BaseModel):
+    image: str
@@ -1,7 +1,99 @@
+import secrets
+from typing import List, Optional
+from urllib.parse import urlparse
+
 from bson import ObjectId
 
-from src.config.settings import CDN_HOST_NAME
+from src.config.settings import CDN_HOST_NAME, IMAGE_DERIVATIVE_WIDTHS
+from src.core.image_intake.derivatives import DERIVATIVE_EXTENSIONS
+
+
+def create_image_version() -> str:
+    """
+    Images are never overwritten, each upload gets a new version in its key.
+    So the CDN can cache images forever, since the content of the key never changes.
+    """
+    return secrets.token_hex(4)
+
+
+def create_image_key(folder: str, _id: ObjectId, image_number: int = 0, version: Optional[str] = None,
+                     extension: str = 'jpg') -> str:
+    """
+    :param folder: Folder of the image (products, events, deals).
+    :param version: Version of the image. Keys without version are used by images uploaded before versioning.
+    """
+    if version is None:
+        return f"{folder}/{_id}_{image_number}.{extension}"
+    return f"{folder}/{_id}_{image_number}_{version}.{extension}"
+
+
+def create_product_image_key(product_id: ObjectId, image_number: int = 0, version: Optional[str] = None,
+                             extension: str = 'jpg') -> str:
+    return create_image_key("products", product_id, image_number, version, extension)
+
+
+def create_event_image_key(event_id: ObjectId, version: Optional[str] = None, extension: str = 'jpg') -> str:
+    return create_image_key("events", event_id, 0, version, extension)
+
+
+def create_deal_image_key(deal_id: ObjectId, version: Optional[str] = None, extension: str = 'jpg') -> str:
+    return create_image_key("deals", deal_id, 0, version, extension)
+
+
+def create_image_url(key: str) -> str:
+    return f"{CDN_HOST_NAME}/{key}"
+
+
+def create_product_image_name(product_id: ObjectId, image_number: int = 0, version: Optional[str] = None,
+                              extension: str = 'jpg') -> str:
+    return create_image_url(create_product_image_key(product_id, image_number, version, extension))
+
+
+def get_image_key(image_url: str) -> str:
+    """
+    Extracts the key of the image in the storage from its URL.
+    """
+    return urlparse(image_url).path[1:]
+
+
+def create_derivative_key(key: str, width: int, extension: str) -> str:
+    """
+    Derivatives (resized copies) are stored next to the original image:
+    products/{product_id}_{number}_{version}_w{width}.{extension}
+    """
+    return f"{key.rsplit('.', 1)[0]}_w{width}.{extension}"
+
+
+def describe_image_variants(image_url: str) -> Optional[List[dict]]:
+    """
+    :return: Width, format and URL of each derivative of the image or None if derivatives are disabled.
+    """
+    if not IMAGE_DERIVATIVE_WIDTHS:
+        return None
+
+    key = get_image_key(image_url)
+    return [{"width": width, "format": extension, "url": create_image_url(create_derivative_key(key, width, extension))}
+            for width in IMAGE_DERIVATIVE_WIDTHS for extension in DERIVATIVE_EXTENSIONS]
+
+
+def describe_image_derivatives(image_urls: List[str]) -> Optional[List[dict]]:
+    """
+    Forms "derivatives" field of the product images for the images uploaded with derivatives.
+    :return: Derivatives of each image or None if derivatives are disabled.
+    """
+    if not IMAGE_DERIVATIVE_WIDTHS:
+        return None
+
+    return [{"source": image_url, "variants": describe_image_variants(image_url)} for image_url in image_urls]
+
 
+def find_image_variants(images: Optional[dict], image_url: Optional[str]) -> Optional[List[dict]]:
+    """
+    :param images: Images of the product.
+    :return: Derivatives of the image or None if the image has no derivatives.
+    """
+    for derivatives in (images or {}).get("derivatives") or []:
+        if derivatives.get("source") == image_url:
+            return derivatives.get("variants")
 
-def create_product_image_name(product_id: ObjectId, image_number: int = 0, extension: str = 'jpg'):
-    return f"{CDN_HOST_NAME}/products/{product_id}_{image_number}.{extension}"
+    return None
@@ -1,20 +1,23 @@
-import io
+from typing import Optional
 
-from src.config.settings import S3_BUCKET_NAME, CDN_HOST_NAME
+from bson import ObjectId
+
+from src.config.settings import S3_BUCKET_NAME
 from src.services.upload_images import upload_file_to_s3
-from src.utils import get_image_from_base64
+from src.services.create_image_name import create_image_version, create_deal_image_key, create_image_url
+from src.core.image_intake.image_intake import get_image_body
 
-async def upload_deal_image(image: str, image_name: str):
+async def upload_deal_image(image: str, deal_id: ObjectId, version: Optional[str] = None):
     """
-    :param image: image encoded in base64 string
-    :param image_name: image name (with extension) without folder
+    Uploads the image under a new versioned key, so the replaced image is never overwritten.
+    :param image: image encoded in base64 string or image part of the multipart request
+    :param deal_id: identifier of the deal, used to form the image name
+    :param version: version of the image name. If None, a new version is created
     """
-    # decode base64 string and extract image
-    new_image = await get_image_from_base64(image)
-    new_image_bytes_io = io.BytesIO(new_image)
+    # decode base64 string or take the file of the image part
+    new_image = await get_image_body(image)
 
-    full_image_name = "deals/" + image_name
-    await upload_file_to_s3(full_image_name, new_image_bytes_io, S3_BUCKET_NAME)
-    image_url = CDN_HOST_NAME + "/" + full_image_name
+    full_image_name = create_deal_image_key(deal_id, version or create_image_version())
+    await upload_file_to_s3(full_image_name, new_image, S3_BUCKET_NAME)
+    image_url = create_image_url(full_image_name)
     return image_url
-
@@ -3,4 +3,6 @@ from .celery_beats_operations import create_periodic_task
 
 def initialize_fixed_periodic_tasks():
     reset_search_count_interval = rrule(freq="WEEKLY", interval=2)
-    create_periodic_task('task_reset_search_count', 'reset_search_count', reset_search_count_interval, )
\ No newline at end of file
+    create_periodic_task('task_reset_search_count', 'reset_search_count', reset_search_count_interval, )
+    collect_orphaned_images_interval = rrule(freq="DAILY", interval=1)
+    create_periodic_task('task_collect_orphaned_images', 'collect_orphaned_images', collect_orphaned_images_interval, )
\ No newline at end of file
@@ -1,12 +1,12 @@
-from typing import Any
+from typing import Any, Optional
 
 from .replication.order_processing import OrderProcessingHandler
 
 
-async def handle_order_processing_messages(routing_key: str, message: Any) -> None:
+async def handle_order_processing_messages(routing_key: str, message: Any, message_id: Optional[str] = None) -> None:
     base_routing_key = "orders"
 
     if routing_key == base_routing_key + ".products.reserve_and_remove_cart_items":
-        return await OrderProcessingHandler.reserve_products_and_remove_cart_items(message)
+        return await OrderProcessingHandler.reserve_products_and_remove_cart_items(message, message_id, routing_key)
     elif routing_key == base_routing_key + ".products.release":
-        return await OrderProcessingHandler.release_products(message)
+        return await OrderProcessingHandler.release_products(message, message_id, routing_key)
@@ -0,0 +1,106 @@
+import asyncio
+from typing import Awaitable, Callable, List, Optional
+
+from aio_pika.abc import AbstractIncomingMessage
+
+from src.core.message_broker.encoders import decode_message
+from src.param_classes.orders.order_processing_message import OrderProcessingMessage
+from src.services.orders.message_handler import handle_order_processing_messages
+from .order_processing import OrderProcessingHandler
+from src.logger import logger
+
+
+class OrderProcessingBatcher:
+    """
+    Collects reserve / release messages from the order processing queue for a short window
+    and handles them together, so stock of each product is changed with one bulk write per batch.
+    Messages are acknowledged only after the batch is handled, messages that weren't acknowledged
+    before shutdown are redelivered by the broker and skipped if they have already been processed.
+    """
+    def __init__(self, max_size: int, window_seconds: float,
+                 process_batch: Callable[[List[OrderProcessingMessage]], Awaitable[None]]
+                 = OrderProcessingHandler.process_batch):
+        """
+        :param max_size: Max count of messages in one batch, the batch is handled immediately when it's full.
+                         Should not be greater than prefetch count of the consumer.
+        :param window_seconds: How long the first message of the batch waits for other messages.
+        :param process_batch: Coroutine function that handles the batch of decoded messages.
+        """
+        self.max_size = max_size
+        self.window_seconds = window_seconds
+        self._process_batch = process_batch
+        self._batch: List[AbstractIncomingMessage] = []
+        self._decoded_batch: List[OrderProcessingMessage] = []
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+
+    async def add(self, message: AbstractIncomingMessage) -> None:
+        """
+        Adds the incoming message to the current batch. Use it as the consumer callback.
+        """
+        try:
+            data = decode_message(message.body, message.content_type, message.content_encoding)
+        except Exception as e:
+            logger.error(f"Failed to decode order processing message {message.message_id}: {e}")
+            await message.reject(requeue=False)
+            return
+
+        self._batch.append(message)
+        self._decoded_batch.append(OrderProcessingMessage(message.routing_key, data, message.message_id))
+
+        if len(self._batch) >= self.max_size:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_after_window())
+
+    async def _flush_after_window(self):
+        await asyncio.sleep(self.window_seconds)
+        self._timer = None
+        try:
+            await self.flush()
+        except Exception as e:
+            # For example, the channel was closed, so unacknowledged messages will be redelivered
+            logger.error(f"Failed to flush the batch of order processing messages: {e}")
+
+    async def flush(self) -> None:
+        """
+        Handles the collected messages and acknowledges them.
+        """
+        async with self._lock:
+            if self._timer is not None and self._timer is not asyncio.current_task():
+                self._timer.cancel()
+            self._timer = None
+
+            # Messages added while the previous batch was handled could overflow the batch,
+            # the rest of them is handled by the next flush
+            batch, decoded_batch = self._batch[:self.max_size], self._decoded_batch[:self.max_size]
+            del self._batch[:self.max_size], self._decoded_batch[:self.max_size]
+            if not batch:
+                return
+
+            try:
+                await self._process_batch(decoded_batch)
+            except Exception as e:
+                logger.error(f"Failed to process the batch of {len(batch)} order processing messages: {e}")
+                await self._process_one_by_one(batch, decoded_batch)
+                return
+
+            # All earlier deliveries of the channel are in this batch or have already been rejected
+            await batch[-1].ack(multiple=True)
+
+    @staticmethod
+    async def _process_one_by_one(batch: List[AbstractIncomingMessage],
+                                  decoded_batch: List[OrderProcessingMessage]) -> None:
+        """
+        Handles messages of the failed batch separately,
+        so one bad message goes to the dead letter exchange instead of the whole batch.
+        """
+        for message, decoded_message in zip(batch, decoded_batch):
+            try:
+                await handle_order_processing_messages(decoded_message.routing_key, decoded_message.data,
+                                                       decoded_message.message_id)
+            except Exception as e:
+                logger.error(f"Failed to process order processing message {message.message_id}: {e}")
+                await message.reject(requeue=False)
+            else:
+                await message.ack()
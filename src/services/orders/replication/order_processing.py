@@ -1,15 +1,153 @@
+from collections import defaultdict
+from typing import Optional, List, Dict
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
 from src.apps.products.replication_schemes.order_processing.product_release import ProductReleaseData
 from src.apps.products.replication_schemes.order_processing.product_reservation import ProductReservationData
+from src.apps.products.replication_schemes.order_processing.product_reservation_result import (
+    ProductReservationResultData,
+)
+from src.apps.products.service import ProductAdminService
+from src.config.database import client
+from src.param_classes.orders.order_processing_message import OrderProcessingMessage
 from src.dependencies.service_dependencies.products import get_product_service
+from src.repositories.processed_message_repository import ProcessedMessageRepository
+from src.services.products.replication.replicate_products import send_replication_message
+from src.logger import logger
+
+RESERVE_ROUTING_KEY = "orders.products.reserve_and_remove_cart_items"
+RELEASE_ROUTING_KEY = "orders.products.release"
+# Routing key of the message with the result of the reservation, it's published for the order microservice
+RESERVATION_RESULT_ROUTING_KEY = "products.orders.reservation_result"
 
 
 class OrderProcessingHandler:
+    """
+    Handles messages from the order microservice.
+    If the message has an identifier, it's marked as processed
+    so redelivered messages don't change stock twice.
+    Products are reserved with conditional decrements (See StockReservationEngine) in the same transaction
+    as the message is marked as processed and the result of the reservation is added to the outbox.
+    """
+    @staticmethod
+    async def _reserve_orders(product_service: ProductAdminService, messages: List[OrderProcessingMessage]) -> None:
+        """
+        Reserves products of the orders, marks the messages as processed and adds the results to the outbox
+        in one transaction, so stock is never decremented by a message that isn't marked.
+        If some message has already been processed by another consumer in the meantime,
+        the transaction fails with DuplicateKeyError and nothing is reserved.
+        """
+        processed_messages = [{"message_id": message.message_id, "routing_key": message.routing_key}
+                              for message in messages if message.message_id is not None]
+
+        async def reserve(session):
+            await ProcessedMessageRepository().mark_many_as_processed(processed_messages, session=session)
+            results = await product_service.reserve_for_orders(
+                [(message.data["products"], message.message_id, message.data.get("order_id")) for message in messages],
+                session=session,
+            )
+            for result in results:
+                await send_replication_message(RESERVATION_RESULT_ROUTING_KEY, result, session=session)
+
+        # Write conflicts with concurrent reservations of the same products are retried
+        async with (await client.start_session() as session):
+            await session.with_transaction(reserve)
+
+    @staticmethod
+    async def reserve_products_and_remove_cart_items(data: ProductReservationData,
+                                                     message_id: Optional[str] = None,
+                                                     routing_key: Optional[str] = None) -> None:
+        if message_id is not None and await ProcessedMessageRepository().get_processed_ids([message_id]):
+            logger.info(f"Message {message_id} has already been processed")
+            return
+
+        product_service = await get_product_service()
+        message = OrderProcessingMessage(routing_key or RESERVE_ROUTING_KEY, data, message_id)
+        try:
+            await OrderProcessingHandler._reserve_orders(product_service, [message])
+        except DuplicateKeyError:
+            # Another consumer processed the message after the check, the transaction is already aborted
+            logger.info(f"Message {message_id} has already been processed")
+
     @staticmethod
-    async def reserve_products_and_remove_cart_items(data: ProductReleaseData) -> None:
+    async def release_products(data: ProductReleaseData,
+                               message_id: Optional[str] = None,
+                               routing_key: Optional[str] = None) -> None:
         product_service = await get_product_service()
-        await product_service.reserve_for_order(data["products"])
+        if message_id is None:
+            await product_service.release_from_order(data["products"])
+            return
+
+        processed_message_repo = ProcessedMessageRepository()
+        if await processed_message_repo.get_processed_ids([message_id]):
+            logger.info(f"Message {message_id} has already been processed")
+            return
+
+        async def release(session):
+            await processed_message_repo.mark_as_processed(message_id, routing_key, session=session)
+            await product_service.release_from_order(data["products"], session=session)
+
+        try:
+            # Transient errors (write conflicts, unknown commit results) are retried by with_transaction
+            async with (await client.start_session() as session):
+                await session.with_transaction(release)
+        except DuplicateKeyError:
+            # Another consumer processed the message after the check, the transaction is already aborted
+            logger.info(f"Message {message_id} has already been processed")
 
     @staticmethod
-    async def release_products(data: ProductReservationData) -> None:
+    async def process_batch(messages: List[OrderProcessingMessage]) -> None:
+        """
+        Handles a batch of reserve / release messages.
+        Stock changes of released and reserved products are merged, so each product is usually updated
+        once per batch no matter how many orders contain it (See StockReservationEngine.reserve_many).
+        Released products are returned to stock before the reservations,
+        then orders of the batch are reserved in one transaction.
+        Messages that have already been processed are skipped.
+        """
+        processed_message_repo = ProcessedMessageRepository()
         product_service = await get_product_service()
-        await product_service.release_from_order(data["products"])
+
+        message_ids = [message.message_id for message in messages if message.message_id is not None]
+        processed_ids = await processed_message_repo.get_processed_ids(message_ids)
+
+        releases: List[OrderProcessingMessage] = []
+        reservations: List[OrderProcessingMessage] = []
+        for message in messages:
+            if message.routing_key not in (RESERVE_ROUTING_KEY, RELEASE_ROUTING_KEY):
+                logger.warning(f"Unknown routing key of the order processing message: {message.routing_key}")
+                continue
+
+            if message.message_id is not None:
+                if message.message_id in processed_ids:
+                    logger.info(f"Message {message.message_id} has already been processed")
+                    continue
+                # The same message can be delivered twice within one batch
+                processed_ids.add(message.message_id)
+
+            (reservations if message.routing_key == RESERVE_ROUTING_KEY else releases).append(message)
+
+        if releases:
+            stock_changes: Dict[ObjectId, int] = defaultdict(int)
+            for message in releases:
+                for product in message.data["products"]:
+                    stock_changes[ObjectId(product["product_id"])] += product["quantity"]
+
+            async def release(session):
+                await processed_message_repo.mark_many_as_processed(
+                    [{"message_id": message.message_id, "routing_key": message.routing_key}
+                     for message in releases if message.message_id is not None],
+                    session=session,
+                )
+                await product_service.apply_stock_changes(stock_changes, session=session)
+
+            # Released products are hot, so write conflicts with concurrent reservations are retried
+            # instead of rejecting the whole batch
+            async with (await client.start_session() as session):
+                await session.with_transaction(release)
+
+        if reservations:
+            # If the batch fails, nothing of it is reserved, so its messages can be retried one by one
+            await OrderProcessingHandler._reserve_orders(product_service, reservations)
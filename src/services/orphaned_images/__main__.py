@@ -0,0 +1,39 @@
+"""
+Deletes images that no product, event or deal refers to (See OrphanedImageCollector).
+The same collection runs periodically as the collect_orphaned_images Celery task.
+
+Run from the project root:
+    python -m src.services.orphaned_images --dry-run
+    python -m src.services.orphaned_images --folders products --grace-hours 48
+"""
+import argparse
+import asyncio
+from datetime import timedelta
+
+from src.config.settings import IMAGE_GC_GRACE_PERIOD_HOURS, IMAGE_GC_PAGE_SIZE
+from src.repositories.image_reference_repository import IMAGE_FIELDS
+from src.services.orphaned_images.orphaned_image_collector import OrphanedImageCollector
+
+
+def print_progress(stats: dict) -> None:
+    print("  ".join(f"{name}: {value}" for name, value in stats.items()), flush=True)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--folders", nargs="+", choices=list(IMAGE_FIELDS), default=list(IMAGE_FIELDS))
+    parser.add_argument("--grace-hours", type=float, default=IMAGE_GC_GRACE_PERIOD_HOURS,
+                        help="Only objects modified earlier than that are deleted")
+    parser.add_argument("--page-size", type=int, default=IMAGE_GC_PAGE_SIZE)
+    parser.add_argument("--progress-interval", type=int, default=10, help="Pages between progress reports")
+    parser.add_argument("--dry-run", action="store_true", help="Count orphaned images without deleting them")
+    args = parser.parse_args()
+
+    collector = OrphanedImageCollector(grace_period=timedelta(hours=args.grace_hours), page_size=args.page_size,
+                                       dry_run=args.dry_run, progress_interval=args.progress_interval,
+                                       on_progress=print_progress)
+    await collector.collect(args.folders)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
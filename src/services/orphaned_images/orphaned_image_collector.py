@@ -0,0 +1,158 @@
+import asyncio
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Sequence
+
+from src.config.file_storage import get_async_s3_client
+from src.config.settings import (
+    S3_BUCKET_NAME,
+    S3_DELETE_BATCH_SIZE,
+    S3_DELETE_MAX_RETRIES,
+    IMAGE_GC_GRACE_PERIOD_HOURS,
+    IMAGE_GC_PAGE_SIZE,
+)
+from src.core.image_intake.derivatives import DERIVATIVE_EXTENSIONS
+from src.repositories.image_blob_repository import ImageBlobRepository
+from src.repositories.image_reference_repository import ImageReferenceRepository, IMAGE_FIELDS
+from src.services.create_image_name import create_image_url
+from src.logger import logger
+
+# Derivatives are stored as {key stem}_w{width}.{extension} next to the original JPEG (See create_derivative_key)
+_DERIVATIVE_KEY_PATTERN = re.compile(rf"^(?P<stem>.+)_w\d+\.(?:{'|'.join(DERIVATIVE_EXTENSIONS)})$")
+
+
+class OrphanedImageStats:
+    """
+    Progress of the garbage collection, counts of the objects by what happened to them.
+    """
+    def __init__(self):
+        self.pages = 0
+        self.listed = 0
+        # Objects modified within the grace period, they may belong to uploads that aren't finished yet
+        self.recent = 0
+        self.referenced = 0
+        # Orphaned images whose blobs were acquired within the grace period
+        self.reused = 0
+        self.orphaned = 0
+        self.deleted = 0
+        self._started_at = time.monotonic()
+
+    def as_dict(self) -> Dict[str, float]:
+        elapsed = time.monotonic() - self._started_at
+        return {
+            "pages": self.pages,
+            "listed": self.listed,
+            "recent": self.recent,
+            "referenced": self.referenced,
+            "reused": self.reused,
+            "orphaned": self.orphaned,
+            "deleted": self.deleted,
+            "elapsed_seconds": round(elapsed, 1),
+            "listed_per_second": round(self.listed / elapsed, 1) if elapsed else 0.0,
+        }
+
+
+class OrphanedImageCollector:
+    """
+    Deletes images that no product, event or deal refers to: leftovers of failed uploads, replaced images
+    and deletions that crashed halfway.
+    The bucket is listed page by page and each page is checked against the db with indexed $in lookups,
+    so memory doesn't grow with the count of objects.
+    Derivatives are deleted with their original images. Objects modified within the grace period are kept,
+    since uploads that aren't committed yet (background jobs, presigned uploads) aren't referenced either.
+    Documents are matched by URLs formed with CDN_HOST_NAME, run it with dry_run first if the host has changed.
+    """
+    def __init__(self, grace_period: timedelta = timedelta(hours=IMAGE_GC_GRACE_PERIOD_HOURS),
+                 page_size: int = IMAGE_GC_PAGE_SIZE, dry_run: bool = False, progress_interval: int = 100,
+                 on_progress: Optional[Callable[[Dict[str, float]], None]] = None,
+                 reference_repo: Optional[ImageReferenceRepository] = None,
+                 blob_repo: Optional[ImageBlobRepository] = None):
+        """
+        :param grace_period: Only objects modified earlier than that are deleted.
+        :param page_size: Count of objects listed and checked at once, S3 lists 1000 at most.
+        :param dry_run: If True, orphaned images are only counted.
+        :param progress_interval: Count of pages after which progress is reported.
+        :param on_progress: Called with the stats (See OrphanedImageStats.as_dict) every progress_interval pages
+                            and when the collection is finished. If None, progress is logged.
+        """
+        self.grace_period = grace_period
+        self.page_size = page_size
+        self.dry_run = dry_run
+        self.progress_interval = progress_interval
+        self.on_progress = on_progress or self._log_progress
+        self.reference_repo = reference_repo or ImageReferenceRepository()
+        self.blob_repo = blob_repo or ImageBlobRepository()
+        self.stats = OrphanedImageStats()
+
+    @staticmethod
+    def _log_progress(stats: Dict[str, float]) -> None:
+        logger.info(f"Orphaned image collection: {stats}")
+
+    @staticmethod
+    def _get_source_key(key: str) -> str:
+        """
+        :return: Key of the original image for the derivative or the key itself.
+        """
+        match = _DERIVATIVE_KEY_PATTERN.match(key)
+        return f"{match.group('stem')}.jpg" if match else key
+
+    async def _find_orphaned_keys(self, folder: str, keys: List[str], modified_before: datetime) -> List[str]:
+        source_keys = {key: self._get_source_key(key) for key in keys}
+        source_urls = {create_image_url(source_key) for source_key in source_keys.values()}
+        referenced_urls = await self.reference_repo.find_referenced_urls(folder, list(source_urls))
+        orphaned_keys = [key for key, source_key in source_keys.items()
+                         if create_image_url(source_key) not in referenced_urls]
+        self.stats.referenced += len(keys) - len(orphaned_keys)
+
+        # Product images are indexed by their content, an orphaned image may be reused by an upload in progress.
+        # Its blob is deleted first, so the next upload of the same content doesn't refer to the deleted object
+        if folder == "products" and not self.dry_run:
+            # Derivatives are checked by the blob of their original, it may be listed on the previous page
+            reused_keys = set(await self.blob_repo.delete_unused(
+                list({source_keys[key] for key in orphaned_keys}), modified_before,
+            ))
+            kept_count = len(orphaned_keys)
+            orphaned_keys = [key for key in orphaned_keys if source_keys[key] not in reused_keys]
+            self.stats.reused += kept_count - len(orphaned_keys)
+
+        return orphaned_keys
+
+    async def _collect_page(self, folder: str, objects: List[dict], modified_before: datetime) -> None:
+        self.stats.pages += 1
+        self.stats.listed += len(objects)
+        # S3 returns LastModified in UTC, the db stores naive UTC datetimes
+        keys = [stored_object["Key"] for stored_object in objects
+                if stored_object["LastModified"].replace(tzinfo=timezone.utc) < modified_before]
+        self.stats.recent += len(objects) - len(keys)
+
+        orphaned_keys = await self._find_orphaned_keys(folder, keys, modified_before.replace(tzinfo=None))
+        self.stats.orphaned += len(orphaned_keys)
+        if orphaned_keys and not self.dry_run:
+            self.stats.deleted += await get_async_s3_client().delete_many_objects(
+                S3_BUCKET_NAME, orphaned_keys, batch_size=S3_DELETE_BATCH_SIZE, max_retries=S3_DELETE_MAX_RETRIES,
+            )
+
+    async def collect(self, folders: Sequence[str] = tuple(IMAGE_FIELDS)) -> Dict[str, float]:
+        """
+        :param folders: Folders (prefixes) of the bucket to collect: products, events, deals.
+        :return: Stats of the collection (See OrphanedImageStats).
+        """
+        await self.reference_repo.ensure_indexes()
+        modified_before = datetime.now(timezone.utc) - self.grace_period
+        for folder in folders:
+            pages = get_async_s3_client().list_object_pages(S3_BUCKET_NAME, f"{folder}/", self.page_size)
+            # The next page is listed while the current one is checked, so at most two pages are in memory
+            next_page = asyncio.ensure_future(anext(pages, None))
+            try:
+                while (objects := await next_page) is not None:
+                    next_page = asyncio.ensure_future(anext(pages, None))
+                    await self._collect_page(folder, objects, modified_before)
+                    if self.stats.pages % self.progress_interval == 0:
+                        self.on_progress(self.stats.as_dict())
+            finally:
+                next_page.cancel()
+
+        stats = self.stats.as_dict()
+        self.on_progress(stats)
+        return stats
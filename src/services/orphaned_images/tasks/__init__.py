@@ -0,0 +1,6 @@
+from .collect_orphaned_images import collect_orphaned_images
+
+
+__all__ = [
+    'collect_orphaned_images',
+]
\ No newline at end of file
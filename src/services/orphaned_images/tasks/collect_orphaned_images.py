@@ -0,0 +1,12 @@
+from src.worker import celery
+from src.utils import async_worker
+from src.services.orphaned_images.orphaned_image_collector import OrphanedImageCollector
+from src.celery_logger import logger
+
+
+@celery.task(name='collect_orphaned_images')
+def collect_orphaned_images():
+    logger.info("Ran periodic task collect_orphaned_images")
+    stats = async_worker(OrphanedImageCollector().collect)
+    logger.info(f"Collected orphaned images: {stats}")
+    return stats
@@ -0,0 +1,86 @@
+import asyncio
+from typing import Optional
+
+from bson import ObjectId
+
+from src.config import settings
+from src.core.message_broker.pooled_producer import PooledAsyncProducer
+from src.repositories.outbox_repository import OutboxRepository
+from src.services.products.replication.message_coalescer import ReplicationMessageCoalescer
+from src.logger import logger
+
+
+class OutboxRelay:
+    """
+    Publishes messages from the outbox collection to the message broker in ordered batches.
+    Messages are deleted from the outbox only after the broker confirmed them,
+    so a message is published at least once even if the app crashes in the middle of a batch.
+    """
+    def __init__(self, outbox_repo: OutboxRepository, producer: PooledAsyncProducer,
+                 batch_size: int = settings.OUTBOX_RELAY_BATCH_SIZE,
+                 poll_interval: float = settings.OUTBOX_RELAY_POLL_INTERVAL_SECONDS,
+                 lease_seconds: int = settings.OUTBOX_RELAY_LEASE_SECONDS,
+                 coalescer: Optional[ReplicationMessageCoalescer] = None):
+        """
+        :param outbox_repo: Repository of the outbox collection.
+        :param producer: Producer used to publish messages.
+        :param batch_size: Max count of messages published at once.
+        :param poll_interval: How long (in seconds) relay waits before checking the outbox again if it is empty.
+        :param lease_seconds: How long the relay lease is valid, if the relay stops prolonging it.
+        :param coalescer: If specified, successive messages are merged into envelopes before publishing.
+        """
+        self.outbox_repo = outbox_repo
+        self.producer = producer
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.coalescer = coalescer
+        self._owner = str(ObjectId())
+        self._task: Optional[asyncio.Task] = None
+
+    async def relay_batch(self) -> int:
+        """
+        Publishes the oldest batch of messages from the outbox.
+        :return: Count of published messages.
+        """
+        messages = await self.outbox_repo.get_pending_messages(self.batch_size)
+        if not messages:
+            return 0
+
+        messages_to_publish = [(message["routing_key"], message["message"]) for message in messages]
+        if self.coalescer is not None:
+            # Wait for more messages to merge unless the batch is full or the oldest message waited enough
+            if len(messages) < self.batch_size and not self.coalescer.is_window_elapsed(messages[0]["created_at"]):
+                return 0
+
+            messages_to_publish = self.coalescer.coalesce(messages_to_publish)
+
+        await self.producer.send_messages(messages_to_publish, wait_for_confirm=True)
+        await self.outbox_repo.delete_messages([message["_id"] for message in messages])
+        return len(messages)
+
+    async def _run(self):
+        while True:
+            published_count = 0
+            try:
+                if await self.outbox_repo.acquire_relay_lease(self._owner, self.lease_seconds):
+                    published_count = await self.relay_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbox relay failed to publish messages: {e}")
+
+            # If the batch was full, there are probably more messages, so don't wait
+            if published_count < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        await self.outbox_repo.release_relay_lease(self._owner)
@@ -0,0 +1,59 @@
+import asyncio
+from typing import List, Dict
+
+from src.config.file_storage import get_async_s3_client
+from src.config.settings import S3_BUCKET_NAME, IMAGE_UPLOAD_EXPIRES_SECONDS, IMAGE_CACHE_CONTROL
+from src.core.image_intake.decoded_image import MAX_IMAGE_SIZE_MB
+from src.core.image_intake.uploaded_image import ALLOWED_IMAGE_PART_TYPE
+from src.services.create_image_name import create_image_url
+
+
+async def create_image_upload(key: str) -> Dict:
+    """
+    Signs the form (presigned POST) to upload the image with the specified key straight to the storage,
+    so the image doesn't pass through the app. The storage itself rejects images
+    that are not image/jpeg or exceed the size limit. Keys are versioned, so images are stored with long-lived
+    Cache-Control as with the uploads through the app.
+    :return: Dict with the key of the image, "url" and "fields" of the form.
+    The image is sent as the "file" field after the other fields.
+    """
+    upload = await get_async_s3_client().generate_presigned_post(
+        S3_BUCKET_NAME, key,
+        fields={"Content-Type": ALLOWED_IMAGE_PART_TYPE, "Cache-Control": IMAGE_CACHE_CONTROL},
+        conditions=[{"Content-Type": ALLOWED_IMAGE_PART_TYPE}, {"Cache-Control": IMAGE_CACHE_CONTROL},
+                    ["content-length-range", 1, MAX_IMAGE_SIZE_MB * 1024 ** 2]],
+        expires_in=IMAGE_UPLOAD_EXPIRES_SECONDS,
+    )
+    return {"key": key, **upload}
+
+
+async def check_uploaded_image(key: str) -> List[str]:
+    """
+    Checks the image uploaded with the presigned form by its metadata (HEAD request).
+    :return: Errors if the image wasn't uploaded or it's invalid, otherwise an empty list.
+    """
+    metadata = await get_async_s3_client().head_object(S3_BUCKET_NAME, key)
+    if metadata is None:
+        return ["Image was not uploaded"]
+
+    errors = []
+    if metadata.get("ContentType") != ALLOWED_IMAGE_PART_TYPE:
+        errors.append("Only image/jpeg type allowed")
+    # get the file size in megabytes
+    if round(metadata.get("ContentLength", 0) / 1024 ** 2, 2) > MAX_IMAGE_SIZE_MB:
+        errors.append("The file size exceeds 1 MB")
+
+    return errors
+
+
+async def check_uploaded_images(keys: List[str]) -> Dict[int, List[str]]:
+    """
+    Checks the uploaded images concurrently.
+    :return: Errors of the images by their indexes in the list of keys.
+    """
+    errors = await asyncio.gather(*(check_uploaded_image(key) for key in keys))
+    return {index: image_errors for index, image_errors in enumerate(errors) if image_errors}
+
+
+def get_image_url(key: str) -> str:
+    return create_image_url(key)
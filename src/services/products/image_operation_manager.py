@@ -1,17 +1,25 @@
-import multiprocessing as mp
-import io
-from typing import Optional, Tuple
+import asyncio
+import copy
+from typing import List, Optional, Tuple
 from urllib.parse import urlparse
 from bson import ObjectId
 
-from src.utils import get_image_from_base64, async_worker
-from src.services.upload_images import delete_many_files_in_s3, upload_file_to_s3
-from src.config.settings import S3_BUCKET_NAME, CDN_HOST_NAME
+from src.core.image_jobs.queues import submit_image_job
+from src.services.create_image_name import (
+    create_image_version,
+    create_product_image_key,
+    describe_image_derivatives,
+    find_image_variants,
+)
+from src.services.upload_images import delete_product_images, upload_product_image
+from src.services.products.replication.replicate_products import replicate_updated_product_images
 from src.apps.products.repository import ProductAdminRepository
 
 class ImageOperationManager:
     """
     Response for deleting, replacing, adding images to product(s)
+    Images are never overwritten: replaced images are uploaded under new versioned keys,
+    so the CDN can cache them forever. Replaced images are deleted after the links are updated in the db.
     """
     def __init__(self, product_id: ObjectId, images: dict,
                  image_operations: dict, product_repo: ProductAdminRepository):
@@ -19,15 +27,23 @@ class ImageOperationManager:
         self.images = images
         self.image_operations = image_operations
         self.product_repo = product_repo
+        self.image_version = create_image_version()
+        # URLs of the images that were replaced with the new ones
+        self.replaced_images: List[str] = []
+        # URLs of the images uploaded by the operations
+        self.uploaded_images: List[str] = []
+        # URLs of the secondary images deleted by the operations
+        self.removed_images: List[str] = []
 
     def _get_image_number(self, image_name: str) -> int:
         """
-        Extracts a number from the image name | url (Number before file extension).
+        Extracts a number from the image name | url.
+        Image names look like {product_id}_{number}_{version}.jpg, names without version are also supported.
         """
         image_path = urlparse(image_name).path[1:]
-        number_and_extension = image_path.rsplit(".", 1)
-        # Extract the number before the dot
-        image_number = int(number_and_extension[0].split("_")[-1])  # Get the last part after the underscore
+        file_name = image_path.rsplit("/", 1)[-1].rsplit(".", 1)[0]
+        # Product id doesn't contain underscores, so the number is the part after the first underscore
+        image_number = int(file_name.split("_")[1])
         return image_number
 
     @staticmethod
@@ -47,42 +63,50 @@ class ImageOperationManager:
 
         return objects_to_delete
 
-    async def _replace_image(self, new_image: str, name: str):
+    async def _replace_image(self, new_image: str, image_url: str) -> str:
         """
-        Internal helper method for replacing an existing image
-        :param new_image: base64 encoded string
-        :param name: name of the image we want to replace
+        Internal helper method for replacing an existing image.
+        The new image keeps the number of the replaced one, but gets a new version.
+        :param new_image: base64 encoded string, image decoded during validation or image part
+        :param image_url: URL of the image we want to replace
+        :return: URL of the new image
         """
-        image_bytes = await get_image_from_base64(new_image)
-        image_bytes_io = io.BytesIO(image_bytes)
-        await upload_file_to_s3(name, image_bytes_io, S3_BUCKET_NAME)
+        image_name = create_product_image_key(self.product_id, self._get_image_number(image_url),
+                                              self.image_version)
+        new_image_url = await upload_product_image(new_image, image_name)
+        self.replaced_images.append(image_url)
+        self.uploaded_images.append(new_image_url)
+        return new_image_url
 
     async def _add_image(self, new_image: str, number: int):
         """
         Internal helper method for adding an image
-        :param new_image: base64 encoded string
+        :param new_image: base64 encoded string, image decoded during validation or image part
         :param number: Number of the image to add
         """
-        image_name = f"products/{self.product_id}_{number}.jpg"
-        image_bytes = await get_image_from_base64(new_image)
-        image_bytes_io = io.BytesIO(image_bytes)
-        await upload_file_to_s3(image_name, image_bytes_io, S3_BUCKET_NAME)
-        image_url = CDN_HOST_NAME + "/" + image_name
+        image_name = create_product_image_key(self.product_id, number, self.image_version)
+        image_url = await upload_product_image(new_image, image_name)
+        self.uploaded_images.append(image_url)
         return image_url
 
     async def delete_many_images(self) -> Optional[int]:
+        """
+        Removes the secondary images from the product. They are deleted with the replaced images,
+        after the links are updated (See _delete_replaced_images).
+        :return: Count of the removed images.
+        """
         images_to_delete = self.image_operations.get("delete", [])
         if self.images.get("secondaryImages") and images_to_delete:
+            # Identical images are stored once, so the same URL can be present several times
+            self.removed_images = [image for image in self.images.get("secondaryImages")
+                                   if image in images_to_delete]
             # Remove secondary images which present in images_to_delete list
             self.images["secondaryImages"] = [image for image in self.images.get("secondaryImages")
                                               if image not in images_to_delete]
             # if secondary images array is empty the assign secondaryImages to None
             if not self.images["secondaryImages"]:
                 self.images["secondaryImages"] = None
-            objects_to_delete = self.form_a_list_of_objects_to_delete(images_to_delete)
-            response = await delete_many_files_in_s3(S3_BUCKET_NAME, objects_to_delete)
-            deleted_count = sum(1 for _ in response["Deleted"])
-            return deleted_count
+            return len(self.removed_images)
 
     async def replace_images(self) -> Tuple[int, int]:
         main_image_replaced = 0
@@ -91,15 +115,19 @@ class ImageOperationManager:
         secondary_images_replace = self.image_operations.get("replace", {}).get("secondaryImages")
 
         if main_image_replace:
-            main_image_path = urlparse(self.images.get("main")).path[1:]
-            await self._replace_image(main_image_replace, main_image_path)
+            self.images["main"] = await self._replace_image(main_image_replace, self.images.get("main"))
             main_image_replaced = 1
 
         if secondary_images_replace:
-            for secondary_image in secondary_images_replace:
-                secondary_image_path = urlparse(secondary_image.get("source")).path[1:]
-                await self._replace_image(secondary_image.get("newImg"), secondary_image_path)
-                secondary_images_replaced += 1
+            # Replace secondary images concurrently
+            new_image_urls = await asyncio.gather(*(self._replace_image(secondary_image.get("newImg"),
+                                                                        secondary_image.get("source"))
+                                                    for secondary_image in secondary_images_replace))
+            replaced_urls = {secondary_image.get("source"): new_image_url
+                             for secondary_image, new_image_url in zip(secondary_images_replace, new_image_urls)}
+            self.images["secondaryImages"] = [replaced_urls.get(image, image)
+                                              for image in self.images.get("secondaryImages") or []] or None
+            secondary_images_replaced = len(secondary_images_replace)
 
         return main_image_replaced, secondary_images_replaced
 
@@ -107,7 +135,6 @@ class ImageOperationManager:
         images_to_add = self.image_operations.get("add", [])
 
         if images_to_add:
-            image_urls = []
             secondary_images = [] if not self.images.get("secondaryImages") else self.images["secondaryImages"]
             if secondary_images:
                 last_secondary_image = secondary_images[-1]
@@ -115,53 +142,177 @@ class ImageOperationManager:
             else:
                 image_number = 0
 
-            for image in images_to_add:
-                image_url = await self._add_image(image, image_number + 1)
-                image_urls.append(image_url)
-                image_number += 1
+            # Upload new images concurrently, gather keeps their order
+            image_urls = await asyncio.gather(*(self._add_image(image, image_number + index + 1)
+                                                for index, image in enumerate(images_to_add)))
 
             secondary_images.extend(image_urls)
             self.images["secondaryImages"] = secondary_images
 
+    def _update_image_derivatives(self):
+        """
+        Keeps derivatives of the images that the product still uses and adds derivatives of the uploaded images.
+        """
+        image_urls = {self.images.get("main"), *(self.images.get("secondaryImages") or [])}
+        derivatives = [image_derivatives for image_derivatives in self.images.get("derivatives") or []
+                       if image_derivatives.get("source") in image_urls]
+        described_images = {image_derivatives["source"] for image_derivatives in derivatives}
+        new_images = [image for image in dict.fromkeys(self.uploaded_images) if image not in described_images]
+        derivatives.extend(describe_image_derivatives(new_images) or [])
+        self.images["derivatives"] = derivatives or None
+
     async def perform_operations(self):
         await self.delete_many_images()
         await self.replace_images()
         await self.add_images()
+        self._update_image_derivatives()
+
+    async def _delete_replaced_images(self):
+        """
+        Deletes the replaced and removed images. Call it after the links are updated, so no product refers to them.
+        Images that other products use as well are kept.
+        """
+        if self.replaced_images or self.removed_images:
+            await delete_product_images([*self.replaced_images, *self.removed_images])
+
+    async def _replace_copied_main_image(self, replaced_main_image: str):
+        """
+        Parent product without the same images uses the main image of the variation.
+        Main image URL of the variation has changed, so the parent gets the new one as well.
+        """
+        product = await self.product_repo.get_one_product({"_id": self.product_id}, {"parent_id": 1})
+        if product and product.get("parent_id"):
+            await self.product_repo.update_one_product(
+                {"_id": product["parent_id"], "images.main": replaced_main_image},
+                {"$set": {"images.main": self.images["main"]}},
+            )
+
+    async def _save_images_one_product(self, replaced_main_image: Optional[str], update_linked_products: bool):
+        """
+        Updates the image links in the db, replicates the new main image and deletes the replaced images.
+        :param replaced_main_image: URL of the main image before the images were changed.
+        """
+        # Replaced and removed images are deleted, so the products that use images of this product
+        # must get the new URLs as well
+        update_linked_products = update_linked_products or bool(self.replaced_images or self.removed_images)
+        await self.product_repo.update_image_links(self.product_id, self.images,
+                                                   update_linked_products=update_linked_products)
+        if self.images.get("main") != replaced_main_image:
+            await self._replace_copied_main_image(replaced_main_image)
+            # Main image is replicated, so other microservices get its new URL
+            filters = {"$or": [{"_id": self.product_id}, {"images.sourceProductId": self.product_id}]} \
+                if update_linked_products else {"_id": self.product_id}
+            products = await self.product_repo.get_product_list({**filters, "parent": False}, {"_id": 1})
+            if products:
+                await replicate_updated_product_images([product["_id"] for product in products],
+                                                       self.images["main"],
+                                                       find_image_variants(self.images, self.images["main"]))
+        await self._delete_replaced_images()
 
     async def _update_images_one_product(self, update_linked_products: bool):
         """Helper function to update images in existed product"""
+        replaced_main_image = self.images.get("main")
         await self.perform_operations()
-        await self.product_repo.update_image_links(self.product_id, self.images,
-                                                   update_linked_products=update_linked_products)
+        await self._save_images_one_product(replaced_main_image, update_linked_products)
+
+    def _copy_for_attempt(self, images: dict, image_operations: dict) -> "ImageOperationManager":
+        """
+        Image jobs are retried and operations change the state of the manager,
+        so each attempt runs on a new manager with the images and operations as they were submitted.
+        The version is kept, so the retried uploads get the same keys.
+        """
+        manager = ImageOperationManager(self.product_id, copy.deepcopy(images), copy.deepcopy(image_operations),
+                                        self.product_repo)
+        manager.image_version = self.image_version
+        return manager
 
-    async def update_images_one_product(self, update_linked_products: bool = False, another_process: bool = False):
+    async def _run_update_images_one_product(self, images: dict, image_operations: dict,
+                                             update_linked_products: bool):
+        await self._copy_for_attempt(images, image_operations)._update_images_one_product(update_linked_products)
+
+    async def update_images_one_product(self, update_linked_products: bool = False,
+                                        in_background: bool = False) -> Optional[str]:
         """
         Performs operations on images and
         Updates the image links for a single product in the database
+        :return: Identifier of the image job if operations are performed in the background
         """
-        if another_process:
-            process = mp.Process(target=async_worker, args=(self._update_images_one_product, update_linked_products))
-            process.start()
-        else:
-            await self._update_images_one_product(update_linked_products)
+        if in_background:
+            # The job runs after the request is handled, so it gets its own copy of the images
+            images, image_operations = copy.deepcopy((self.images, self.image_operations))
+            return await submit_image_job("update_images_one_product", self._run_update_images_one_product,
+                                          images, image_operations, update_linked_products)
+
+        await self._update_images_one_product(update_linked_products)
+        return None
+
+    async def _save_images_multiple_products(self, replaced_main_image: Optional[str],
+                                             variation_ids: list[ObjectId]):
+        """
+        Updates the same image links in the parent and its variations, replicates the new main image
+        and deletes the replaced images.
+        :param replaced_main_image: URL of the main image before the images were changed.
+        """
+        await self.product_repo.update_image_links([self.product_id, *variation_ids],
+                                                   self.images, same_images=True)
+        if variation_ids and self.images.get("main") != replaced_main_image:
+            # Main image is replicated, so other microservices get its new URL
+            await replicate_updated_product_images(variation_ids, self.images["main"],
+                                                   find_image_variants(self.images, self.images["main"]))
+        await self._delete_replaced_images()
 
     async def _update_images_multiple_products(self, variation_ids: list[ObjectId]):
         """Helper function to update images in product variations"""
+        replaced_main_image = self.images.get("main")
         await self.perform_operations()
-        await self.product_repo.update_image_links([self.product_id, *variation_ids],
-                                                   self.images, same_images=True)
+        await self._save_images_multiple_products(replaced_main_image, variation_ids)
+
+    async def _run_update_images_multiple_products(self, images: dict, image_operations: dict,
+                                                   variation_ids: list[ObjectId]):
+        await self._copy_for_attempt(images, image_operations)._update_images_multiple_products(variation_ids)
 
     async def update_images_multiple_products(self, variation_ids: list[ObjectId],
-                                                        another_process: bool = False):
+                                              in_background: bool = False) -> Optional[str]:
         """
         Performs operations on images and
         updates the image links for multiple products if all siblings have the same images
         USE THIS FUNCTION ONLY IF SIBLINGS HAVE THE SAME IMAGES
+        :return: Identifier of the image job if operations are performed in the background
+        """
+        if in_background:
+            # The job runs after the request is handled, so it gets its own copy of the images
+            images, image_operations = copy.deepcopy((self.images, self.image_operations))
+            return await submit_image_job("update_images_multiple_products",
+                                          self._run_update_images_multiple_products,
+                                          images, image_operations, list(variation_ids))
+
+        await self._update_images_multiple_products(variation_ids)
+        return None
+
+    def _set_new_images(self, new_images: dict) -> Optional[str]:
+        """
+        Replaces all images with the new ones, that have already been uploaded.
+        :return: URL of the replaced main image.
+        """
+        replaced_main_image = self.images.get("main")
+        self.replaced_images = [image for image in [replaced_main_image, *(self.images.get("secondaryImages") or [])]
+                                if image and image not in (new_images.get("main"),
+                                                           *(new_images.get("secondaryImages") or []))]
+        self.images = new_images
+        return replaced_main_image
+
+    async def set_images_one_product(self, new_images: dict, update_linked_products: bool = False):
+        """
+        Replaces all images of a single product with the uploaded ones and deletes the replaced images.
+        """
+        replaced_main_image = self._set_new_images(new_images)
+        await self._save_images_one_product(replaced_main_image, update_linked_products)
+
+    async def set_images_multiple_products(self, new_images: dict, variation_ids: list[ObjectId]):
+        """
+        Replaces all images of the parent and its variations with the uploaded ones
+        and deletes the replaced images.
+        USE THIS FUNCTION ONLY IF SIBLINGS HAVE THE SAME IMAGES
         """
-        if another_process:
-            # Execute image uploading in another process
-            process = mp.Process(target=async_worker,
-                                 args=(self._update_images_multiple_products, variation_ids))
-            process.start()
-        else:
-            await self._update_images_multiple_products(variation_ids)
+        replaced_main_image = self._set_new_images(new_images)
+        await self._save_images_multiple_products(replaced_main_image, variation_ids)
@@ -0,0 +1,165 @@
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+
+from src.config.database import client
+from src.apps.products.repository import ProductAdminRepository
+from src.services.create_image_name import create_image_version, create_product_image_key, find_image_variants
+from src.services.upload_images import clone_product_images, delete_product_images
+from src.services.products.replication.replicate_products import replicate_created_variations
+from src.services.products.sharded_stock_counter import ShardedStockCounter
+
+# Fields that belong to the source product only: the discount of the event and the layout of sharded stock.
+# The clone keeps the sum of the shards as its unsharded stock
+_NOT_CLONED_FIELDS = ("_id", "event_id", "stock_shard_count")
+
+
+class ProductCloner:
+    """
+    Copies the product and its variations with new SKUs.
+    Images aren't uploaded again: the clones refer to the same deduplicated images
+    or the images are copied on the storage side (See clone_product_images).
+    """
+    def __init__(self, product_repo: ProductAdminRepository, stock_counter: ShardedStockCounter):
+        """
+        :param stock_counter: Sums the shards of the source products with sharded stock.
+        """
+        self.product_repo = product_repo
+        self.stock_counter = stock_counter
+        # Images of the clones share the version, like images of the created product
+        self.image_version = create_image_version()
+        # URLs of the images the clones refer to, once per added reference or copied object,
+        # so they can be released if the clones aren't inserted
+        self._cloned_image_urls: List[str] = []
+
+    async def _clone_images(self, images: dict, clone_id: ObjectId) -> dict:
+        """
+        :param images: Own images of the source product.
+        :param clone_id: ID of the clone, copied images are named after it.
+        :return: Images of the clone.
+        """
+        image_urls = [images["main"], *(images.get("secondaryImages") or [])]
+        image_names = [create_product_image_key(clone_id, number, self.image_version)
+                       for number in range(len(image_urls))]
+        cloned_urls = await clone_product_images(image_urls, image_names)
+        self._cloned_image_urls.extend(cloned_urls)
+        # Derivatives are stored with the image, so only the clones that refer to the same images keep them
+        derivatives = [image_derivatives for image_derivatives in images.get("derivatives") or []
+                       if image_derivatives.get("source") in cloned_urls]
+        return {
+            "main": cloned_urls[0],
+            "secondaryImages": cloned_urls[1:] if images.get("secondaryImages") else None,
+            "sourceProductId": None,
+            "derivatives": derivatives or None,
+        }
+
+    async def _clone_all_images(self, products: List[dict], new_ids: Dict[ObjectId, ObjectId]) -> Dict[ObjectId, dict]:
+        """
+        Clones images of the products the same way they are shared by the source products.
+        :return: Images of the clones by the IDs of the source products.
+        """
+        parent = products[0]
+        variations = products[1:]
+        if parent.get("parent") and parent.get("same_images"):
+            # Parent and its variations have the same images
+            parent_images = await self._clone_images(parent["images"], new_ids[parent["_id"]])
+            return {product["_id"]: parent_images for product in products}
+
+        own_image_products = [product for product in (variations if parent.get("parent") else products)
+                              if (product.get("images") or {}).get("sourceProductId") is None]
+        # Images of all products are cloned before the failure is raised, so none of them is left unreleased
+        cloned_images = await asyncio.gather(*(self._clone_images(product["images"], new_ids[product["_id"]])
+                                               for product in own_image_products), return_exceptions=True)
+        errors = [images for images in cloned_images if isinstance(images, BaseException)]
+        if errors:
+            raise errors[0]
+        images_by_id = {product["_id"]: images for product, images in zip(own_image_products, cloned_images)}
+
+        for variation in variations:
+            source_product_id = (variation.get("images") or {}).get("sourceProductId")
+            if source_product_id in images_by_id:
+                images_by_id[variation["_id"]] = {**images_by_id[source_product_id],
+                                                  "sourceProductId": new_ids[source_product_id]}
+            elif source_product_id is not None:
+                # Variation uses images of the product that isn't cloned, the clone uses them too
+                images_by_id[variation["_id"]] = variation["images"]
+
+        if parent.get("parent"):
+            # Parent shows the main image of the variation it was copied from
+            source_variation = next((variation for variation in variations
+                                     if variation["images"]["main"] == parent["images"]["main"]), variations[0])
+            main_image = images_by_id[source_variation["_id"]]["main"]
+            images_by_id[parent["_id"]] = {
+                "main": main_image,
+                "secondaryImages": None,
+                "sourceProductId": None,
+                "derivatives": [image_derivatives for image_derivatives
+                                in images_by_id[source_variation["_id"]].get("derivatives") or []
+                                if image_derivatives.get("source") == main_image] or None,
+            }
+
+        return images_by_id
+
+    async def clone_product(self, products: List[dict],
+                            new_skus: Dict[ObjectId, str]) -> Tuple[ObjectId, Optional[List[ObjectId]]]:
+        """
+        Inserts clones of the products with one insert_many and replicates them with one create.many message.
+        :param products: Single product or parent product followed by its variations.
+        :param new_skus: SKUs of the clones by the IDs of the source products.
+        :return: ID of the cloned product and IDs of the cloned variations.
+        """
+        new_ids = {product["_id"]: ObjectId() for product in products}
+        sharded_stock = await self.stock_counter.get_total_stock([product["_id"] for product in products
+                                                                  if product.get("stock_shard_count")])
+        try:
+            clones = await self._insert_clones(products, new_skus, new_ids, sharded_stock)
+        except Exception:
+            # References and copies of the images are made before the insert, nothing would release them
+            await delete_product_images(self._cloned_image_urls)
+            raise
+
+        variation_ids = [clone["_id"] for clone in clones[1:]] if products[0].get("parent") else None
+        return clones[0]["_id"], variation_ids
+
+    async def _insert_clones(self, products: List[dict], new_skus: Dict[ObjectId, str],
+                             new_ids: Dict[ObjectId, ObjectId], sharded_stock: Dict[ObjectId, int]) -> List[dict]:
+        """
+        :param sharded_stock: Sums of the shards by the IDs of the source products with sharded stock.
+        :return: Inserted clones.
+        """
+        images_by_id = await self._clone_all_images(products, new_ids)
+
+        now = datetime.utcnow()
+        clones = []
+        for product in products:
+            clone = {field: value for field, value in product.items() if field not in _NOT_CLONED_FIELDS}
+            clone.update({
+                "_id": new_ids[product["_id"]],
+                "parent_id": new_ids.get(product.get("parent_id")),
+                "sku": new_skus[product["_id"]],
+                "images": images_by_id[product["_id"]],
+                "created_at": now,
+                "modified_at": now,
+            })
+            if product["_id"] in sharded_stock:
+                clone["stock"] = sharded_stock[product["_id"]]
+            if product.get("event_id"):
+                # Discount of the event isn't applied to the clone
+                clone["discount_rate"] = None
+            clones.append(clone)
+
+        # Parent product isn't replicated, other microservices sell only products without variations
+        replicated_clones = [{**clone, "image": clone["images"]["main"],
+                              "image_variants": find_image_variants(clone["images"], clone["images"]["main"])}
+                             for clone in clones if not clone.get("parent")]
+
+        async def insert(session):
+            await self.product_repo.create_many_products(clones, session=session)
+            await replicate_created_variations(replicated_clones, session=session)
+
+        async with (await client.start_session() as session):
+            await session.with_transaction(insert)
+
+        return clones
@@ -2,6 +2,7 @@ from typing import Tuple, List, Optional
 from bson import ObjectId
 
 from src.config.database import client
+from src.core.image_jobs.queues import reserve_image_job
 from src.apps.products.repository import ProductAdminRepository
 from src.apps.products.utils import set_attr_non_optional, get_var_theme_field_codes, remove_product_attrs
 from src.services.products.product_builder import ProductBuilder
@@ -12,6 +13,7 @@ from src.services.products.replication.replicate_products import (
     replicate_created_variations
 )
 from src.services.search_terms.replicate_search_terms import replicate_search_terms
+from src.services.create_image_name import create_image_version, create_product_image_name, describe_image_variants
 
 
 class ProductCreator:
@@ -21,25 +23,49 @@ class ProductCreator:
     def __init__(self, product_repo: ProductAdminRepository):
         self.product_repo = product_repo
 
-    async def _create_single_product(self, product_data: dict):
+    async def _create_single_product(self, product_data: dict) -> Tuple[ObjectId, Optional[str]]:
+        """
+        :return: Product id and identifier of the image job.
+        """
         same_images = product_data.get("same_images", True)
 
         product_builder = ProductBuilder(product_data)
+        image_version = create_image_version()
         image_upload_manager = ProductImageUploadManager(same_images,
                                                          product_data.get("images"),
-                                                         product_repo=self.product_repo)
+                                                         product_repo=self.product_repo,
+                                                         image_version=image_version)
         single_product_data = await product_builder.build_single_product()
-        # Create single product
-        inserted_single_product = await self.product_repo.create_one_product(single_product_data)
-        single_product_id = inserted_single_product.inserted_id
-        # Replicate created product
-        await replicate_single_created_product({"_id": single_product_id, **single_product_data})
-        # Upload images in another process
-        await image_upload_manager.upload_images_one_product(single_product_id, another_process=True)
-        return single_product_id
+        # The slot for the image job is taken before the product is committed,
+        # so a full queue fails the request before the product exists
+        async with await reserve_image_job() as image_job:
+            async with (await client.start_session() as session):
+                async with session.start_transaction():
+                    # Create single product
+                    inserted_single_product = await self.product_repo.create_one_product(single_product_data,
+                                                                                         session=session)
+                    single_product_id = inserted_single_product.inserted_id
+                    # Replicate created product (The message is stored in the outbox within the same transaction)
+                    # Images are uploaded later, their versioned URL is known in advance
+                    image_url = create_product_image_name(single_product_id, version=image_version)
+                    await replicate_single_created_product(
+                        {"_id": single_product_id, **single_product_data,
+                         "image": image_url, "image_variants": describe_image_variants(image_url)},
+                        session=session,
+                    )
+            # Hand image uploading off to the image job queue
+            image_job_id = await image_upload_manager.upload_images_one_product(single_product_id,
+                                                                                in_background=True,
+                                                                                image_job=image_job)
+        return single_product_id, image_job_id
 
-    async def _create_product_with_variations(self, product_data: dict,
-                                              session=None) -> Tuple[ObjectId, List[ObjectId]]:
+    async def _create_product_with_variations(
+            self, product_data: dict, session=None
+    ) -> Tuple[ObjectId, List[ObjectId], VariationManager, Optional[List[dict]]]:
+        """
+        Inserts the parent and its variations, images are uploaded by the caller after the transaction commits.
+        :return: Parent id, variation ids, the variation manager and images of the variations.
+        """
         same_images = product_data.get("same_images", True)
         product_builder = ProductBuilder(product_data)
         # Set "optional" property to False in each variations' attribute
@@ -59,17 +85,15 @@ class ProductCreator:
         variation_ids, variation_images, replicated_variations = await variation_manager.insert_variations(
             parent_id, same_images, session)
         # Replicate variations for other microservices
-        await replicate_created_variations(replicated_variations)
-
-        await variation_manager.upload_variation_images(same_images, product_data.get("images"),
-                                                        variation_ids, variation_images, update_parent_images=True)
+        await replicate_created_variations(replicated_variations, session=session)
         # return parent id and list of inserted products' ids
-        return parent_id, variation_ids
+        return parent_id, variation_ids, variation_manager, variation_images
 
-    async def create_product(self, product_data: dict) -> Tuple[ObjectId, Optional[List[ObjectId]]]:
+    async def create_product(self, product_data: dict) -> Tuple[ObjectId, Optional[List[ObjectId]], List[str]]:
         """
         Inserts product(s) to db
         :param product_data: VALIDATED product data to be inserted
+        :return: Product id, variation ids and identifiers of the image jobs that upload their images.
         """
         product_data["for_sale"] = True
         has_variations = product_data.get("has_variations", False)
@@ -77,12 +101,19 @@ class ProductCreator:
         product_data["attrs"] = await set_attr_non_optional(product_data["attrs"])
 
         if has_variations:
-            async with (await client.start_session() as session):
-                async with session.start_transaction():
-                    parent_id, variation_ids = await self._create_product_with_variations(product_data, session)
-                    await replicate_search_terms(product_data["search_terms"], session)
-                    return parent_id, variation_ids
+            async with await reserve_image_job() as image_job:
+                async with (await client.start_session() as session):
+                    async with session.start_transaction():
+                        parent_id, variation_ids, variation_manager, variation_images = \
+                            await self._create_product_with_variations(product_data, session)
+                        await replicate_search_terms(product_data["search_terms"], session)
+                # The job updates image links of the products, so it's submitted after they are committed
+                image_job_id = await variation_manager.upload_variation_images(
+                    product_data.get("same_images", True), product_data.get("images"), variation_ids,
+                    variation_images, update_parent_images=True, image_job=image_job,
+                )
+            return parent_id, variation_ids, [image_job_id] if image_job_id else []
 
-        single_product_id = await self._create_single_product(product_data)
+        single_product_id, image_job_id = await self._create_single_product(product_data)
         await replicate_search_terms(product_data["search_terms"])
-        return single_product_id, None
+        return single_product_id, None, [image_job_id] if image_job_id else []
@@ -1,6 +1,6 @@
 import copy
 from datetime import datetime
-from typing import Union, List
+from typing import Union, List, Optional
 from bson import ObjectId
 
 from src.apps.products.repository import ProductAdminRepository
@@ -14,9 +14,11 @@ from src.services.products.replication.replicate_products import (
 from src.apps.products.utils import form_data_to_update, remove_product_attrs, get_var_theme_field_codes, get_new_attrs
 from src.services.products.image_operation_manager import ImageOperationManager
 from src.services.products.product_builder import ProductBuilder
+from src.services.products.sharded_stock_counter import ShardedStockCounter
 from src.services.products.variation_manager import VariationManager
 from src.utils import different_dicts
 from src.services.search_terms.replicate_search_terms import replicate_search_terms
+from src.services.upload_images import delete_product_images
 from src.param_classes.products.update_many_products_params import UpdateManyProductsParams
 from src.param_classes.products.handle_variation_updates_params import HandleVariationUpdatesParams
 
@@ -25,8 +27,17 @@ class ProductModifier:
     """
     This class is responsible for updating the product
     """
-    def __init__(self, product_repo: ProductAdminRepository):
+    def __init__(self, product_repo: ProductAdminRepository, stock_counter: Optional[ShardedStockCounter] = None):
+        """
+        :param stock_counter: If specified, shards of the updated products are split again from the new stock.
+        """
         self.product_repo = product_repo
+        self.stock_counter = stock_counter
+
+    async def _reset_stock_shards(self, product_ids: List[ObjectId], session) -> None:
+        # Stock set by the admin replaces sharded stock, in the same transaction as the stock is set
+        if self.stock_counter is not None:
+            await self.stock_counter.reset_shards(product_ids, session=session)
 
     async def _update_product_with_variations(self, params: UpdateManyProductsParams):
         """
@@ -40,16 +51,19 @@ class ProductModifier:
                                   "attrs": params.data.get("attrs", []),
                                   "extra_attrs": params.data.get("extra_attrs", [])}
         variation_manager = VariationManager(params.parent_id, self.product_repo, ProductBuilder(variations_common_data))
+        removed_images = []
         if params.data.get("variations_to_delete", []):
-            await variation_manager.delete_variations(params.data["variations_to_delete"])
-            await replicate_variations_delete({"product_ids": params.data["variations_to_delete"], "parent_ids": []})
+            removed_images = await variation_manager.delete_variations(params.data["variations_to_delete"],
+                                                                       session=params.session)
+            await replicate_variations_delete({"product_ids": params.data["variations_to_delete"], "parent_ids": []},
+                                              session=params.session)
 
         inserted_ids = []
         if params.data.get("new_variations"):
             inserted_ids, replicated_variations = await variation_manager.handle_variation_inserts(
                 variations_common_data, same_images, params.session)
 
-            await replicate_created_variations(replicated_variations)
+            await replicate_created_variations(replicated_variations, session=params.session)
 
         field_codes = await get_var_theme_field_codes(variations_common_data.get("variation_theme", {}))
         # remove parent's attributes
@@ -74,27 +88,37 @@ class ProductModifier:
            handle_variation_updates_params
         )
         # replicate variations
-        await replicate_updated_variations(params.data.get("old_variations", []))
+        await replicate_updated_variations(params.data.get("old_variations", []), session=params.session)
 
-        return updated_variation_ids, inserted_ids
+        return updated_variation_ids, inserted_ids, removed_images, variation_manager
 
     async def update_product(self, _id: ObjectId, data: dict,
-                             parent: bool) -> dict[str, Union[ObjectId, List[ObjectId]]]:
+                             parent: bool) -> dict[str, Union[ObjectId, List[ObjectId], List[str]]]:
         """
         Updates product(s) in db
         :param _id: Product identifier.
         :param data: VALIDATED new product data
         :param parent: Whether product that will be updated is parent
+        :return: Identifiers of the updated and inserted products and of the image jobs that update their images.
         """
         new_attrs = get_new_attrs(data.get("attrs", []))
         data_to_update = form_data_to_update(data, parent)
         # get a product in the state before modifying and update it
 
-        product_before_update = await self.product_repo.find_and_update_one_product(
-            {"_id": _id}, {"$set": {**data_to_update, "modified_at": datetime.utcnow()}},
-            {"_id": 0, "name": 0, "price": 0, "stock": 0,
-             "discount_rate": 0, "tax_rate": 0, "max_order_qty": 0, "sku": 0, "external_id": 0, "modified_at": 0, },
-        )
+        async with (await client.start_session() as session):
+            async with session.start_transaction():
+                product_before_update = await self.product_repo.find_and_update_one_product(
+                    {"_id": _id}, {"$set": {**data_to_update, "modified_at": datetime.utcnow()}},
+                    {"_id": 0, "name": 0, "price": 0, "stock": 0, "discount_rate": 0, "tax_rate": 0,
+                     "max_order_qty": 0, "sku": 0, "external_id": 0, "modified_at": 0, },
+                    session=session,
+                )
+                if not parent:
+                    await self._reset_stock_shards([_id], session)
+                    # replicate an updated product
+                    # (The message is stored in the outbox within the same transaction)
+                    await replicate_single_updated_product({"_id": _id, **data_to_update}, session=session)
+
         await replicate_search_terms(data_to_update["search_terms"])
 
         images = product_before_update.pop("images", {})
@@ -107,11 +131,15 @@ class ProductModifier:
                         product_before_update=product_before_update,
                         images=images, session=session,
                     )
-                    updated_ids, inserted_ids = await self._update_product_with_variations(
-                        update_many_products_params
-                    )
-                    return {"product_id": _id, "updated_variation_ids": updated_ids,
-                            "inserted_variation_ids": inserted_ids}
+                    updated_ids, inserted_ids, removed_images, variation_manager = \
+                        await self._update_product_with_variations(update_many_products_params)
+                    await self._reset_stock_shards([variation["_id"] for variation in data.get("old_variations") or []
+                                                    if "_id" in variation], session)
+            # Images of the deleted variations are released once no committed product refers to them
+            await delete_product_images(removed_images)
+            image_job_ids = await variation_manager.submit_image_jobs()
+            return {"product_id": _id, "updated_variation_ids": updated_ids,
+                    "inserted_variation_ids": inserted_ids, "image_job_ids": image_job_ids}
 
         # update product images
         update_linked_products = (not product_before_update.get("same_images", False)
@@ -120,8 +148,8 @@ class ProductModifier:
         source_product_id = images.get("sourceProductId")
         image_operation_manager = ImageOperationManager(_id if source_product_id is None else source_product_id,
                                                         images, data.get("image_ops", {}), self.product_repo)
-        await image_operation_manager.update_images_one_product(update_linked_products, another_process=True)
-        # replicate an updated product
-        await replicate_single_updated_product({"_id": _id, **data_to_update})
+        image_job_id = await image_operation_manager.update_images_one_product(update_linked_products,
+                                                                               in_background=True)
 
-        return {"product_id": _id, "updated_variation_ids": None, "inserted_variation_ids": None}
+        return {"product_id": _id, "updated_variation_ids": None, "inserted_variation_ids": None,
+                "image_job_ids": [image_job_id] if image_job_id else []}
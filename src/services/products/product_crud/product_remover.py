@@ -1,9 +1,11 @@
+from typing import Optional
+
 from bson import ObjectId
 
-from src.config.settings import S3_BUCKET_NAME
+from src.config.database import client
 from src.apps.products.repository import ProductAdminRepository
-from src.services.products.image_operation_manager import ImageOperationManager
-from src.services.upload_images import delete_many_files_in_s3
+from src.repositories.stock_shard_repository import StockShardRepository
+from src.services.upload_images import delete_product_images
 from src.services.products.replication.replicate_products import (
     replicate_single_product_delete,
     replicate_variations_delete
@@ -11,8 +13,19 @@ from src.services.products.replication.replicate_products import (
 
 
 class ProductRemover:
-    def __init__(self, product_repo: ProductAdminRepository):
+    def __init__(self, product_repo: ProductAdminRepository, shard_repo: Optional[StockShardRepository] = None):
         self.product_repo = product_repo
+        self.shard_repo = shard_repo or StockShardRepository()
+
+    async def _delete_stock_shards(self, product_ids: list[ObjectId], parent_ids: list[ObjectId], session) -> None:
+        """
+        Deletes stock shards of the products and of the variations of the parents.
+        Call it in the transaction that deletes the products, before they are deleted.
+        """
+        variations = await self.product_repo.get_product_list(
+            {"parent_id": {"$in": parent_ids}}, {"_id": 1}, session=session) if parent_ids else []
+        await self.shard_repo.delete_shards([*product_ids, *(variation["_id"] for variation in variations)],
+                                            session=session)
 
     def _extract_images_from_dict(self, images: dict) -> list[str]:
         """Extracts main and secondary images from the given dict."""
@@ -24,10 +37,13 @@ class ProductRemover:
         return [main_image, *secondary_images]
 
     async def _delete_images(self, images_to_delete: list[str]) -> int:
-        """Deletes images from S3."""
-        objects_to_delete = ImageOperationManager.form_a_list_of_objects_to_delete(images_to_delete)
-        response = await delete_many_files_in_s3(S3_BUCKET_NAME, objects_to_delete)
-        return len(response["Deleted"])
+        """
+        Deletes images from S3. Call it after the products are deleted, so no product refers to the images.
+        Identical images are stored once, so images that other products still use are kept.
+        Objects are deleted by the image deletion queue, so the request doesn't wait for the storage.
+        """
+        deleted_count = await delete_product_images(images_to_delete)
+        return deleted_count
 
     async def delete_images_one_product(self, images: dict) -> int:
         """Deletes images for a single product."""
@@ -56,29 +72,39 @@ class ProductRemover:
         same_images = product_data.get("same_images", True)
         # if the product is the parent, then remove it and it's child products
         if product_data.get("parent", True):
+            # Images of the variations are found before the variations are deleted
+            children_images = [] if same_images else await self._get_children_images([product_data.get("_id")])
+
+            async with (await client.start_session() as session):
+                async with session.start_transaction():
+                    await self._delete_stock_shards([product_data.get("_id")], [product_data.get("_id")], session)
+                    deleted_products = await self.product_repo.delete_many_products(
+                        {"$or": [{"_id": product_data.get("_id")}, {"parent_id": product_data.get("_id")}]},
+                        session=session,
+                    )
+                    await replicate_variations_delete(
+                        {
+                            "product_ids": [product_data.get("_id"), ],
+                            "parent_ids": [product_data.get("_id"), ]
+                        },
+                        session=session,
+                    )
+
             if same_images:
                 await self.delete_images_one_product(product_data.get("images", {}))
             else:
-                children_images = await self._get_children_images([product_data.get("_id")])
                 await self.delete_images_many_products(children_images)
-
-            deleted_products = await self.product_repo.delete_many_products(
-                {"$or": [{"_id": product_data.get("_id")}, {"parent_id": product_data.get("_id")}]}
-            )
-            await replicate_variations_delete(
-                {
-                    "product_ids": [product_data.get("_id"), ],
-                    "parent_ids": [product_data.get("_id"), ]
-                }
-            )
             return deleted_products.deleted_count
 
+        async with (await client.start_session() as session):
+            async with session.start_transaction():
+                await self._delete_stock_shards([product_data.get("_id")], [], session)
+                deleted_product = await self.product_repo.delete_one_product({"_id": product_data.get("_id")},
+                                                                             session=session)
+                await replicate_single_product_delete(product_data.get("_id"), session=session)
+
         if not same_images and product_data.get("images", {}).get("sourceProductId") is None:
             await self.delete_images_one_product(product_data.get("images", {}))
-
-        deleted_product = await self.product_repo.delete_one_product({"_id": product_data.get("_id")})
-        await replicate_single_product_delete(product_data.get("_id"))
-
         return deleted_product.deleted_count
 
     async def delete_many_products(self, products: list[dict]) -> int:
@@ -97,22 +123,28 @@ class ProductRemover:
             elif not product.get("same_images", False) and product.get("images", {}).get("sourceProductId") is None:
                 images_to_delete.append(product.get("images"))
 
+        # Images of the variations are found before the variations are deleted
         if parent_ids:
             children_images = await self._get_children_images(parent_ids)
             images_to_delete.extend(children_images)
 
+        async with (await client.start_session() as session):
+            async with session.start_transaction():
+                await self._delete_stock_shards(products_ids_to_delete, parent_ids, session)
+                deleted_products = await self.product_repo.delete_many_products(
+                    {"$or": [
+                        {"_id": {"$in": products_ids_to_delete}}, {"parent_id": {"$in": parent_ids}}]
+                    },
+                    session=session,
+                )
+                await replicate_variations_delete(
+                    {
+                        "product_ids": products_ids_to_delete,
+                        "parent_ids": parent_ids,
+                    },
+                    session=session,
+                )
+
         if images_to_delete:
             await self.delete_images_many_products(images_to_delete)
-
-        deleted_products = await self.product_repo.delete_many_products(
-            {"$or": [
-                {"_id": {"$in": products_ids_to_delete}}, {"parent_id": {"$in": parent_ids}}]
-            }
-        )
-        await replicate_variations_delete(
-            {
-                "product_ids": products_ids_to_delete,
-                "parent_ids": parent_ids,
-            }
-        )
         return deleted_products.deleted_count
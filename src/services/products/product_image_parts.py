@@ -0,0 +1,37 @@
+from typing import Optional
+
+from src.apps.products.schemes.create import CreateProduct, ImagesCreateProduct
+from src.apps.products.schemes.update import UpdateProduct
+from src.core.image_intake.multipart import ImageParts
+
+
+def _attach_to_images(images: Optional[ImagesCreateProduct], image_parts: ImageParts) -> None:
+    if images is None:
+        return
+
+    images.main = image_parts.resolve(images.main)
+    images.secondaryImages = image_parts.resolve_many(images.secondaryImages)
+
+
+def attach_image_parts_to_created_product(product: CreateProduct, image_parts: ImageParts) -> None:
+    """
+    Replaces references to the image parts ("file:<filename>") in the product and its variations with the parts.
+    """
+    _attach_to_images(product.images, image_parts)
+    for variation in product.variations or []:
+        _attach_to_images(variation.images, image_parts)
+
+
+def attach_image_parts_to_updated_product(product: UpdateProduct, image_parts: ImageParts) -> None:
+    """
+    Replaces references to the image parts ("file:<filename>") in image operations and new variations with the parts.
+    """
+    if image_ops := product.image_ops:
+        image_ops.add = image_parts.resolve_many(image_ops.add)
+        if image_ops.replace is not None:
+            image_ops.replace.main = image_parts.resolve(image_ops.replace.main)
+            for secondary_image in image_ops.replace.secondaryImages or []:
+                secondary_image.newImg = image_parts.resolve(secondary_image.newImg)
+
+    for variation in product.new_variations or []:
+        _attach_to_images(variation.images, image_parts)
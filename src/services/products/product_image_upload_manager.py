@@ -1,5 +1,5 @@
-import multiprocessing as mp
-from typing import List, Optional
+import copy
+from typing import List, Optional, Tuple, Union
 
 from bson import ObjectId
 
@@ -8,16 +8,46 @@ from src.services.upload_images import (
     upload_images_many_products
 )
 from src.apps.products.repository import ProductAdminRepository
-from src.utils import async_worker
+from src.core.image_jobs.image_job_queue import ImageJobReservation
+from src.core.image_jobs.queues import ImmediateImageJob, submit_image_job
+from src.services.create_image_name import (
+    create_image_version,
+    create_product_image_name,
+    describe_image_derivatives,
+    describe_image_variants,
+)
+from src.services.products.replication.replicate_products import replicate_updated_product_images
 
 class ProductImageUploadManager:
     """
     Responsible for managing product image uploads.
     """
-    def __init__(self, same_images: bool, images: dict, product_repo: ProductAdminRepository):
+    def __init__(self, same_images: bool, images: dict, product_repo: ProductAdminRepository,
+                 image_version: Optional[str] = None):
+        """
+        :param image_version: Version of the image names. Pass the version used for the replicated image URLs,
+                              so the replicated URLs point to the uploaded images. If None, a new version is created.
+        """
         self.same_images = same_images
         self.images = images
         self.product_repo = product_repo
+        self.image_version = image_version or create_image_version()
+
+    async def _replicate_deduplicated_main_images(self, main_images: List[Tuple[ObjectId, ObjectId, str]]):
+        """
+        Replicated image URLs are formed before the upload (from the product id and the version),
+        but images with the content that has already been uploaded refer to the existing object.
+        Such products are replicated again with the actual URL of the main image.
+        :param main_images: Tuples of the product id, id of the product whose images were uploaded for it
+                            and the URL of its main image.
+        """
+        products_by_main_image = {}
+        for product_id, image_owner_id, main_image in main_images:
+            if main_image and main_image != create_product_image_name(image_owner_id, version=self.image_version):
+                products_by_main_image.setdefault(main_image, []).append(product_id)
+
+        for main_image, product_ids in products_by_main_image.items():
+            await replicate_updated_product_images(product_ids, main_image, describe_image_variants(main_image))
 
     async def _upload_images_one_product(self, single_product_id: ObjectId):
         """
@@ -25,9 +55,11 @@ class ProductImageUploadManager:
         :param single_product_id: product id
         """
         # Upload images for a single product to S3 storage
-        image_urls = await upload_images_single_product(single_product_id, self.images)
+        image_urls = await upload_images_single_product(single_product_id, self.images, self.image_version)
         # Update the same images URLs for the variations
         await self.product_repo.update_image_links(single_product_id, image_urls.get("images"))
+        await self._replicate_deduplicated_main_images([(single_product_id, single_product_id,
+                                                         image_urls["images"]["main"])])
 
     async def _upload_images_multiple_products(self, parent_id: ObjectId,
                                         variation_ids: List[ObjectId],
@@ -39,67 +71,89 @@ class ProductImageUploadManager:
         # if same_images is False
         if not self.same_images:
             # Upload product images to S3 storage
-            image_urls_list = await upload_images_many_products(variation_ids, variation_images)
+            image_urls_list = await upload_images_many_products(variation_ids, variation_images, self.image_version)
             # Update images URLs for the variations
             await self.product_repo.update_image_links(
                 [i.get("product_id") for i in image_urls_list],
                 [i.get("images") for i in image_urls_list]
             )
+            # Products that refer to the existing products were replicated with the existing URLs
+            await self._replicate_deduplicated_main_images([
+                (i["product_id"], i["images"].get("sourceProductId") or i["product_id"], i["images"].get("main"))
+                for i in image_urls_list
+                if i["images"].get("sourceProductId") is None or i["images"]["sourceProductId"] in variation_ids
+            ])
             if update_parent_images:
+                main_image = image_urls_list[0].get("images", {}).get("main")
                 image_dict = {
-                    "main": image_urls_list[0].get("images", {}).get("main"),
+                    "main": main_image,
                     "secondaryImages": None,
                     "sourceProductId": None,
+                    "derivatives": describe_image_derivatives([main_image]),
                 }
                 await self.product_repo.update_image_links(
                     parent_id, image_dict
                 )
         else:
             # Upload the same product images for all variations to S3 storage
-            image_urls = await upload_images_single_product(parent_id, self.images)
+            image_urls = await upload_images_single_product(parent_id, self.images, self.image_version)
             # Update the same images URLs for the variations
             await self.product_repo.update_image_links([parent_id, *variation_ids],
                                                        image_urls.get("images"),
                                                        same_images=True)
+            await self._replicate_deduplicated_main_images([(variation_id, parent_id, image_urls["images"]["main"])
+                                                            for variation_id in variation_ids])
 
     async def upload_images_one_product(self, single_product_id: ObjectId,
-                                           another_process: bool = True):
+                                        in_background: bool = True,
+                                        image_job: Union[ImageJobReservation, ImmediateImageJob, None] = None
+                                        ) -> Optional[str]:
         """
         Uploads images for a single product to the storage and updates image URLs in the db.
         :param single_product_id: product id
-        :param another_process: Whether image uploading should be run in another process or not
+        :param in_background: Whether image uploading should be handed off to the image job queue or not
+        :param image_job: Slot of the queue reserved for the job (See reserve_image_job).
+        :return: Identifier of the image job if images are uploaded in the background
         """
-        # if run_in_process is True
-        if another_process:
-            # Execute image uploading in another process
-            process = mp.Process(target=async_worker,
-                                 args=(self._upload_images_one_product, single_product_id))
-            process.start()
-        else:
-            # Otherwise, execute image uploading in the same process
-            await self._upload_images_one_product(single_product_id)
+        # if in_background is True
+        if in_background:
+            # The job runs after the request is handled, so it gets its own copy of the images
+            self.images = copy.deepcopy(self.images)
+            submit = image_job.submit if image_job is not None else submit_image_job
+            return await submit("upload_images_one_product", self._upload_images_one_product, single_product_id)
+
+        # Otherwise, execute image uploading right now
+        await self._upload_images_one_product(single_product_id)
+        return None
 
     async def upload_images_multiple_products(self, parent_id: ObjectId,
                                         variation_ids: List[ObjectId],
                                         variation_images: Optional[List[dict]],
                                         update_parent_images: bool = False,
-                                        another_process: bool = False):
+                                        in_background: bool = False,
+                                        image_job: Union[ImageJobReservation, ImmediateImageJob, None] = None
+                                        ) -> Optional[str]:
         """
         Uploads images for multiple products to the storage and updates image URLs in the db.
         :param parent_id: ID of the parent product
         :param variation_ids: List of variation IDs
         :param variation_images: List of images for variations
         :param update_parent_images: Do function need to update parent's image URLs
-        :param another_process: Whether image uploading should be run in another process or not
+        :param in_background: Whether image uploading should be handed off to the image job queue or not
+        :param image_job: Slot of the queue reserved for the job (See reserve_image_job).
+        :return: Identifier of the image job if images are uploaded in the background
         """
-        # if another_process is True
-        if another_process:
-            # Execute image uploading in another process
-            process = mp.Process(target=async_worker,
-                                 args=(self._upload_images_multiple_products,
-                                       parent_id, variation_ids, variation_images, update_parent_images))
-            process.start()
-        else:
-            # Otherwise, execute image uploading in the same process
-            await self._upload_images_multiple_products(parent_id, variation_ids,
-                                                        variation_images, update_parent_images)
+        # if in_background is True
+        if in_background:
+            # The job runs after the request is handled, so it gets its own copy of the images
+            self.images = copy.deepcopy(self.images)
+            submit = image_job.submit if image_job is not None else submit_image_job
+            return await submit("upload_images_multiple_products",
+                                self._upload_images_multiple_products,
+                                parent_id, list(variation_ids), copy.deepcopy(variation_images),
+                                update_parent_images)
+
+        # Otherwise, execute image uploading right now
+        await self._upload_images_multiple_products(parent_id, variation_ids,
+                                                    variation_images, update_parent_images)
+        return None
@@ -0,0 +1,29 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+
+def encode_product_list_cursor(product: dict) -> str:
+    """
+    :param product: The last product of the page, it must have created_at and _id.
+    :return: Opaque token that points past the product (See get_product_list_after_pipeline).
+    """
+    value = f"{product['created_at'].isoformat()}|{product['_id']}"
+    return base64.urlsafe_b64encode(value.encode()).decode().rstrip("=")
+
+
+def decode_product_list_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """
+    :return: created_at and _id of the product the cursor points past.
+    :raises ValueError: If the cursor wasn't returned by encode_product_list_cursor.
+    """
+    try:
+        value = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, product_id = value.split("|")
+        return datetime.fromisoformat(created_at), ObjectId(product_id)
+    except (binascii.Error, UnicodeDecodeError, InvalidId, ValueError):
+        raise ValueError("Invalid cursor")
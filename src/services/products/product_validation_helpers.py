@@ -1,18 +1,27 @@
+import asyncio
 from typing import List
 from bson.objectid import ObjectId
 from src.apps.products.utils import AttrsHandler
-from src.utils import validate_images, is_list_unique
+from src.core.image_intake.image_intake import decode_images
+from src.utils import is_list_unique
 
 
 async def validate_product_images(images, errors):
     """
     Validates product images
+    Base64 strings of the images are replaced with decoded images (DecodedImage),
+    so they are uploaded without decoding them again.
     FUNCTION DO NOT RETURN ERRORS EXPLICITLY.
     IT MUTATES ERRORS DICT PASSED TO THE FUNCTION
     """
-    main_image_errors = await validate_images(images.get("main"))
-    secondary_images = images.get("secondaryImages")
-    secondary_images_errors = await validate_images(secondary_images, many=True) if secondary_images else None
+    secondary_images = images.get("secondaryImages") or []
+    images["main"], *decoded_secondary_images = await decode_images([images.get("main"), *secondary_images])
+    if images.get("secondaryImages"):
+        images["secondaryImages"] = decoded_secondary_images
+
+    main_image_errors = images["main"].errors
+    secondary_images_errors = {index: image.errors for index, image in enumerate(decoded_secondary_images)
+                               if image.errors}
     # if there are images errors
     if main_image_errors or secondary_images_errors:
         errors["images"] = {
@@ -38,6 +47,8 @@ async def validate_product_variations(variations: List[dict], check_images: bool
 
     # list of the SKUs
     skus = []
+    # image errors of each variation whose images should be validated
+    variation_image_errors = {}
 
     for index, variation in enumerate(variations):
         skus.append(variation.get("sku"))
@@ -49,12 +60,16 @@ async def validate_product_variations(variations: List[dict], check_images: bool
 
         # get variation images
         images = variation.get("images")
-        image_errors = {}
         # if check_images is True and sourceProductId is not ObjectId or int
         if check_images and not isinstance(images.get("sourceProductId"), (int, ObjectId)):
-            # then validate images
-            await validate_product_images(images, image_errors)
+            # then images should be validated
+            variation_image_errors[index] = {}
 
+    # Validate images of all variations concurrently
+    await asyncio.gather(*(validate_product_images(variations[index].get("images"), image_errors)
+                           for index, image_errors in variation_image_errors.items()))
+
+    for index, image_errors in variation_image_errors.items():
         # if there are image errors
         if image_errors:
             # set a default value for the index if it does not exist
@@ -75,37 +90,48 @@ async def validate_product_variations(variations: List[dict], check_images: bool
 async def validate_image_ops(image_ops: dict, errors: dict):
     """
     Validate images that will be used for specified operations
+    Base64 strings of the images are replaced with decoded images (DecodedImage),
+    so they are uploaded without decoding them again.
     FUNCTION DO NOT RETURN ERRORS EXPLICITLY.
     IT MUTATES ERRORS DICT PASSED TO THE FUNCTION
     """
+    images_to_add = image_ops.get("add") or []
+    main_image = image_ops.get("replace").get("main")
+    secondary_images_to_replace = image_ops.get("replace").get("secondaryImages") or []
+
+    # Decode all images of the operations at once
+    decoded_images = await decode_images([*images_to_add,
+                                          *([main_image] if main_image else []),
+                                          *(image.get("newImg") for image in secondary_images_to_replace)])
+    decoded_images_to_add = decoded_images[:len(images_to_add)]
+    decoded_secondary_images = decoded_images[len(decoded_images) - len(secondary_images_to_replace):]
+
     # If there are images to add
-    if image_ops.get("add"):
-        # Validate list of images to add
-        images_add_errors = await validate_images(image_ops.get("add"), many=True)
+    if images_to_add:
+        image_ops["add"] = decoded_images_to_add
+        images_add_errors = {index: image.errors for index, image in enumerate(decoded_images_to_add)
+                             if image.errors}
         # IF there are errors for images to add
         if images_add_errors:
             # Then, add these errors to the error dict
             errors.setdefault("image_ops", {})["add"] = images_add_errors
 
     # if there is a new main image in replace operation
-    if image_ops.get("replace").get("main"):
-        # Validate new main image
-        main_image_errors = await validate_images(image_ops.get("replace").get("main"))
+    if main_image:
+        image_ops["replace"]["main"] = decoded_images[len(images_to_add)]
+        main_image_errors = image_ops["replace"]["main"].errors
         # IF there are errors for a new main image
         if main_image_errors:
             # Then, add these errors to the error dict
             errors.setdefault("image_ops", {}).setdefault("replace", {})["main"] = main_image_errors
 
     # if there are new secondary images in replace operation
-    if image_ops.get("replace").get("secondaryImages"):
-        # Validate new secondary images
-        for image in image_ops.get("replace").get("secondaryImages"):
-            secondary_image_errors = await validate_images(image.get("newImg"))
-            # IF there are errors for images to replace
-            if secondary_image_errors:
-                # Then, add these errors to the error dict
-                (errors.setdefault("image_ops", {}).setdefault("replace", {})
-                 .setdefault("secondaryImages", {}).update(
-                    {image.get("index", 0): secondary_image_errors}
-                ))
-
+    for image, decoded_image in zip(secondary_images_to_replace, decoded_secondary_images):
+        image["newImg"] = decoded_image
+        # IF there are errors for images to replace
+        if decoded_image.errors:
+            # Then, add these errors to the error dict
+            (errors.setdefault("image_ops", {}).setdefault("replace", {})
+             .setdefault("secondaryImages", {}).update(
+                {image.get("index", 0): decoded_image.errors}
+            ))
@@ -1,34 +1,52 @@
 from typing import List, Optional, Dict, Union
 from bson import ObjectId
 
-from src.services.create_image_name import create_product_image_name
+from src.services.create_image_name import create_product_image_name, describe_image_variants, find_image_variants
 
 
 async def create_variations_replica(product_ids: List[ObjectId],
                                     variation_data: List[Dict],
-                                    variation_image_sources: Optional[List[Union[ObjectId, int]]] = None) -> List[Dict]:
+                                    variation_image_sources: Optional[List[Union[ObjectId, int]]] = None,
+                                    image_version: Optional[str] = None,
+                                    existing_images: Optional[Dict[ObjectId, dict]] = None) -> List[Dict]:
     """
     Forms data that will be used for product replication (Replication for other microservices)
     :param product_ids: List of product identifiers
     :param variation_data: List of variation data
     :param variation_image_sources: List of variation image sources (From which product images will be copied)
+    :param image_version: Version of the images that will be uploaded for the variations
+    :param existing_images: Images of the products whose images have already been uploaded
+                            (the parent or the products that variations refer to)
 
     NOTE: count of products ids and variation data must be the same
     and if you pass variation_image_sources, it must have the same length as products ids and variation_images
     """
+    existing_images = existing_images or {}
     merged_list = []
     for i, (product_id, variation_data_item) in enumerate(zip(product_ids, variation_data)):
         merged_item = {"_id": product_id, **variation_data_item}
         if variation_data_item.get("same_images"):
-            merged_item["image"] = create_product_image_name(variation_data_item.get("parent_id"))
+            image_source = variation_data_item.get("parent_id")
+            version = image_version
         elif variation_image_sources[i] is None:
-            merged_item["image"] = create_product_image_name(product_id)
+            image_source = product_id
+            version = image_version
         elif isinstance(variation_image_sources[i], ObjectId):
-            merged_item["image"] = create_product_image_name(variation_image_sources[i])
-        elif isinstance(variation_image_sources[i], int):
-            image_source: ObjectId = product_ids[variation_image_sources[i]]
-            merged_item["image"] = create_product_image_name(image_source)
+            image_source = variation_image_sources[i]
+            version = None
+        else:
+            image_source = product_ids[variation_image_sources[i]]
+            version = image_version
+
+        images = existing_images.get(image_source)
+        if images is not None:
+            merged_item["image"] = images["main"]
+            merged_item["image_variants"] = find_image_variants(images, images["main"])
+        else:
+            merged_item["image"] = create_product_image_name(image_source, version=version)
+            # Derivatives are uploaded with the image, their URLs are formed the same way
+            merged_item["image_variants"] = describe_image_variants(merged_item["image"]) if version else None
 
         merged_list.append(merged_item)
 
-    return merged_list
\ No newline at end of file
+    return merged_list
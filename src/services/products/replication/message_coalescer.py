@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta
+from typing import Any, List, Tuple, Optional, Dict
+
+# Routing keys of the messages that can be merged into one envelope,
+# mapped to the routing key of the envelope.
+# products.crud.update.one isn't merged: it carries for_sale, which products.crud.update.many doesn't
+ENVELOPE_ROUTING_KEYS = {
+    'products.crud.create.one': 'products.crud.create.many',
+    'products.crud.create.many': 'products.crud.create.many',
+    'products.crud.update.many': 'products.crud.update.many',
+    'products.crud.delete.one': 'products.crud.delete.many',
+    'products.crud.delete.many': 'products.crud.delete.many',
+}
+
+
+class ReplicationMessageCoalescer:
+    """
+    Merges successive replication messages with the same kind of operation into one "*.many" envelope,
+    so other microservices apply one bulk write instead of N single writes.
+    Only adjacent messages are merged, so the order of operations on the same product is preserved.
+    If several updates in a row refer to the same product (object_id), the last one wins.
+    """
+    def __init__(self, window_seconds: float, max_envelope_size: int):
+        """
+        :param window_seconds: How long messages are buffered before they are published.
+        :param max_envelope_size: Max count of products in one envelope.
+        """
+        self.window_seconds = window_seconds
+        self.max_envelope_size = max_envelope_size
+
+    def is_window_elapsed(self, oldest_message_created_at: datetime) -> bool:
+        """
+        Whether the oldest buffered message waited long enough to be published.
+        """
+        return datetime.utcnow() - oldest_message_created_at >= timedelta(seconds=self.window_seconds)
+
+    def _merge_products(self, run: List[Tuple[str, Any]]) -> List[dict]:
+        """
+        Merges product data from create or update messages. The last message for the same product wins.
+        """
+        products: Dict[str, dict] = {}
+        for routing_key, message in run:
+            items = message if isinstance(message, list) else [message]
+            for item in items:
+                # Replicated products are identified by "object_id" (see replication schemes)
+                # Move the product to the end, so the envelope keeps the order of the last writes
+                # object_id can be ObjectId or string depending on whether the message was validated
+                product_id = str(item["object_id"])
+                products.pop(product_id, None)
+                products[product_id] = item
+
+        return list(products.values())
+
+    @staticmethod
+    def _merge_deletes(run: List[Tuple[str, Any]]) -> dict:
+        """
+        Merges filters from delete messages.
+        """
+        product_ids: Dict[str, None] = {}
+        parent_ids: Dict[str, None] = {}
+        for routing_key, message in run:
+            if routing_key.endswith(".one"):
+                product_ids[message["_id"]] = None
+                continue
+
+            product_ids.update(dict.fromkeys(message.get("product_ids") or []))
+            parent_ids.update(dict.fromkeys(message.get("parent_ids") or []))
+
+        return {"product_ids": list(product_ids), "parent_ids": list(parent_ids)}
+
+    def _merge_run(self, envelope_routing_key: str, run: List[Tuple[str, Any]]) -> List[Tuple[str, Any]]:
+        # Nothing to merge
+        if len(run) == 1:
+            return run
+
+        if envelope_routing_key == 'products.crud.delete.many':
+            return [(envelope_routing_key, self._merge_deletes(run))]
+
+        products = self._merge_products(run)
+        return [(envelope_routing_key, products[i:i + self.max_envelope_size])
+                for i in range(0, len(products), self.max_envelope_size)]
+
+    def coalesce(self, messages: List[Tuple[str, Any]]) -> List[Tuple[str, Any]]:
+        """
+        :param messages: List of (routing key, message) pairs in the order they must be published.
+        :return: List of (routing key, message) pairs where successive mergeable messages are replaced by envelopes.
+        """
+        coalesced = []
+        run: List[Tuple[str, Any]] = []
+        run_routing_key: Optional[str] = None
+
+        for routing_key, message in messages:
+            envelope_routing_key = ENVELOPE_ROUTING_KEYS.get(routing_key)
+            if run and envelope_routing_key == run_routing_key:
+                run.append((routing_key, message))
+                continue
+
+            if run:
+                coalesced.extend(self._merge_run(run_routing_key, run))
+                run = []
+
+            if envelope_routing_key is None:
+                # Messages such as products.attach_to_event are published as is
+                coalesced.append((routing_key, message))
+            else:
+                run = [(routing_key, message)]
+            run_routing_key = envelope_routing_key
+
+        if run:
+            coalesced.extend(self._merge_run(run_routing_key, run))
+
+        return coalesced
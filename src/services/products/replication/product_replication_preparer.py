@@ -1,11 +1,14 @@
-from typing import List
-from bson import ObjectId
+from decimal import Decimal
+from typing import List, Optional, Type
+from bson import ObjectId, Decimal128
+from pydantic import BaseModel
 
 from src.apps.products.replication_schemes.create import ProductCreateReplicationSchema
 from src.apps.products.replication_schemes.update import (
     SingleProductUpdateReplicationSchema,
     ProductUpdateReplicationSchemaBase,
     ProductIdsToDiscountsMapping,
+    ProductImageUpdateReplicationSchema,
 )
 from src.apps.products.replication_schemes.delete import DeleteProductsSchema
 from src.param_classes.products.attach_to_event_params import AttachToEventParams
@@ -13,9 +16,28 @@ from src.param_classes.products.attach_to_event_params import AttachToEventParam
 from src.services.create_image_name import create_product_image_name
 
 
+def _project(product_data: dict, schema: Type[BaseModel]) -> dict:
+    """
+    Picks the fields of the replication schema from the product data without validation.
+    Keys are the same as in schema.dict(), values are read by the field alias (e.g. "_id" for "object_id").
+    Decimals are converted to Decimal128, so the result can be stored in the outbox as is.
+    """
+    projected = {}
+    for name, field in schema.__fields__.items():
+        value = product_data.get(field.alias)
+        if isinstance(value, Decimal):
+            value = Decimal128(value)
+        projected[name] = value
+
+    return projected
+
+
 class ProductReplicationPreparer:
     """
-    Responsible for preparing product data for the replication
+    Responsible for preparing product data for the replication.
+    prepare_* methods validate the data with the replication schemes,
+    project_* methods only pick the fields of the schemes and must be used only for the data
+    that was already validated (e.g. data built from CreateProduct or UpdateProduct).
     """
 
     @staticmethod
@@ -52,6 +74,13 @@ class ProductReplicationPreparer:
 
         return prepared_variations
 
+    @staticmethod
+    async def prepare_data_of_updated_product_images(product_ids: List[ObjectId], image: str,
+                                                     image_variants: Optional[List[dict]] = None
+                                                     ) -> ProductImageUpdateReplicationSchema:
+        return ProductImageUpdateReplicationSchema.parse_obj({"product_ids": product_ids, "image": image,
+                                                              "image_variants": image_variants})
+
     @staticmethod
     async def prepare_filters_to_delete_single_product(product_id: ObjectId) -> ObjectId:
         if ObjectId.is_valid(product_id):
@@ -68,3 +97,29 @@ class ProductReplicationPreparer:
         return ProductIdsToDiscountsMapping.parse_obj({"product_ids": params.product_ids,
                                                        "discounts": params.discounts,
                                                        "event_id": params.event_id, })
+
+    @staticmethod
+    def project_data_of_created_single_product(product_data: dict) -> dict:
+        if not product_data.get("image"):
+            product_data["image"] = create_product_image_name(product_data.get("_id"))
+
+        return _project(product_data, ProductCreateReplicationSchema)
+
+    @staticmethod
+    def project_data_of_created_variations(variations: List[dict]) -> List[dict]:
+        projected_variations = []
+        for variation in variations:
+            if not variation.get("image"):
+                variation["image"] = create_product_image_name(variation.get("_id"))
+
+            projected_variations.append(_project(variation, ProductCreateReplicationSchema))
+
+        return projected_variations
+
+    @staticmethod
+    def project_data_of_updated_single_product(product_data: dict) -> dict:
+        return _project(product_data, SingleProductUpdateReplicationSchema)
+
+    @staticmethod
+    def project_data_of_updated_variations(variations: List[dict]) -> List[dict]:
+        return [_project(variation, ProductUpdateReplicationSchemaBase) for variation in variations]
@@ -0,0 +1,142 @@
+import random
+from typing import List, Dict, Tuple
+
+from bson import ObjectId
+
+from src.apps.products.repository import ProductAdminRepository
+from src.config import settings
+from src.config.database import client
+from src.repositories.stock_shard_repository import StockShardRepository
+
+
+class ShardedStockCounter:
+    """
+    Reserves and releases stock of products whose stock is split across several shards (See StockShardRepository).
+    Such products have "stock_shard_count" field, their "stock" field is not updated while stock is sharded.
+    Each reservation starts with a random shard, so concurrent reservations of a hot product
+    rarely update the same document.
+    """
+    def __init__(self, product_repo: ProductAdminRepository, shard_repo: StockShardRepository):
+        self.product_repo = product_repo
+        self.shard_repo = shard_repo
+
+    async def get_shard_counts(self, product_ids: List[ObjectId], session=None) -> Dict[ObjectId, int]:
+        """
+        :param session: Session to read the products inside the transaction.
+        :return: Mapping of ids of the products with sharded stock to their count of shards.
+                 Empty dict if stock sharding is disabled.
+        """
+        if not settings.STOCK_SHARDING_ENABLED or not product_ids:
+            return {}
+
+        products = await self.product_repo.get_product_list(
+            {"_id": {"$in": product_ids}, "stock_shard_count": {"$gt": 0}}, {"stock_shard_count": 1},
+            session=session,
+        )
+        return {product["_id"]: product["stock_shard_count"] for product in products}
+
+    async def reserve(self, product_id: ObjectId, quantity: int, shard_count: int, session=None) -> bool:
+        """
+        Reserves the quantity from one shard, shards are tried in random order.
+        If no shard has enough stock, the quantity is collected from several shards.
+        :param session: Session to reserve stock inside the transaction.
+        :return: False if the product doesn't have enough stock.
+        """
+        shards = list(range(shard_count))
+        random.shuffle(shards)
+        for shard in shards:
+            if await self.shard_repo.decrement_shard(product_id, shard, quantity, session=session):
+                return True
+
+        return await self._reserve_across_shards(product_id, quantity, session)
+
+    async def _reserve_across_shards(self, product_id: ObjectId, quantity: int, session=None) -> bool:
+        shards = await self.shard_repo.get_shards(product_id, session=session)
+        random.shuffle(shards)
+
+        taken: List[Tuple[int, int]] = []
+        remaining = quantity
+        for shard in shards:
+            amount = min(remaining, shard["stock"])
+            if amount <= 0:
+                continue
+
+            # Stock of the shard could be changed after it was read, then the shard is skipped
+            if await self.shard_repo.decrement_shard(product_id, shard["shard"], amount, session=session):
+                taken.append((shard["shard"], amount))
+                remaining -= amount
+                if remaining == 0:
+                    return True
+
+        # Return the collected stock, since the whole quantity can't be reserved
+        for shard, amount in taken:
+            await self.shard_repo.increment_shard(product_id, shard, amount, session=session)
+        return False
+
+    async def release(self, product_id: ObjectId, quantity: int, shard_count: int, session=None) -> None:
+        """
+        Returns the quantity to a random shard.
+        :param session: Session to release stock inside the transaction.
+        """
+        await self.shard_repo.increment_shard(product_id, random.randrange(shard_count), quantity, session=session)
+
+    async def get_total_stock(self, product_ids: List[ObjectId], session=None) -> Dict[ObjectId, int]:
+        """
+        :param session: Session to read the shards inside the transaction.
+        :return: Mapping of ids of the products with sharded stock to the sum of their shards.
+        """
+        if not settings.STOCK_SHARDING_ENABLED or not product_ids:
+            return {}
+
+        return await self.shard_repo.get_total_stock(product_ids, session=session)
+
+    async def shard_stock(self, product_id: ObjectId, shard_count: int) -> None:
+        """
+        Splits stock of the product across the specified count of shards.
+        If stock of the product is already sharded, shards are replaced with the new ones.
+        """
+        async with (await client.start_session() as session):
+            async with session.start_transaction():
+                product = await self.product_repo.get_one_product({"_id": product_id},
+                                                                  {"stock": 1, "stock_shard_count": 1},
+                                                                  session=session)
+                stock = product.get("stock", 0)
+                if product.get("stock_shard_count"):
+                    stock = (await self.shard_repo.get_total_stock([product_id], session=session)).get(product_id, 0)
+
+                await self.shard_repo.replace_shards(product_id, stock, shard_count, session=session)
+                # Updating the product conflicts with concurrent reservations of unsharded stock,
+                # so the transaction is aborted instead of losing them
+                await self.product_repo.update_one_product({"_id": product_id},
+                                                           {"$set": {"stock_shard_count": shard_count}},
+                                                           session=session)
+
+    async def unshard_stock(self, product_id: ObjectId) -> None:
+        """
+        Moves the sum of the shards back to the "stock" field of the product and deletes the shards.
+        """
+        async with (await client.start_session() as session):
+            async with session.start_transaction():
+                total_stock = await self.shard_repo.get_total_stock([product_id], session=session)
+                await self.product_repo.update_one_product(
+                    {"_id": product_id, "stock_shard_count": {"$exists": True}},
+                    {"$set": {"stock": total_stock.get(product_id, 0)}, "$unset": {"stock_shard_count": ""}},
+                    session=session,
+                )
+                await self.shard_repo.delete_shards([product_id], session=session)
+
+    async def reset_shards(self, product_ids: List[ObjectId], session=None) -> None:
+        """
+        Splits the "stock" field of the products with sharded stock across their shards again.
+        Call it in the transaction that sets the stock by the admin, since the new value replaces the sharded stock.
+        :param session: Session of the transaction that updated the products.
+        """
+        shard_counts = await self.get_shard_counts(product_ids, session=session)
+        if not shard_counts:
+            return
+
+        products = await self.product_repo.get_product_list({"_id": {"$in": list(shard_counts)}}, {"stock": 1},
+                                                            session=session)
+        for product in products:
+            await self.shard_repo.replace_shards(product["_id"], product.get("stock", 0),
+                                                 shard_counts[product["_id"]], session=session)
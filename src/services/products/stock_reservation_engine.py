@@ -0,0 +1,180 @@
+from collections import defaultdict
+from typing import List, Dict, Optional, Tuple
+
+from bson import ObjectId
+from pymongo.operations import UpdateOne
+
+from src.apps.products.repository import ProductAdminRepository
+from src.apps.products.replication_schemes.order_processing.base import ProductItem
+from src.apps.products.replication_schemes.order_processing.product_reservation_result import (
+    ProductItemReservationResult,
+    ProductReservationResultData,
+)
+from src.repositories.stock_shard_repository import StockShardRepository
+from src.services.products.sharded_stock_counter import ShardedStockCounter
+
+
+class StockReservationEngine:
+    """
+    Reserves ordered products all or nothing.
+    Each product is reserved with a conditional decrement ({"stock": {"$gte": quantity}}),
+    so stock never goes negative. If some product can't be reserved,
+    already reserved products of the order are returned to stock.
+    Quantities of a product ordered by several orders of a batch are reserved with one decrement,
+    orders are reserved one by one only if the product doesn't have enough stock for all of them.
+    Decrements are made in the transaction that marks the order message as processed,
+    so a redelivered message can't reserve the products again (See OrderProcessingHandler).
+    Products with sharded stock are reserved with ShardedStockCounter.
+    """
+    def __init__(self, product_repo: ProductAdminRepository, stock_counter: Optional[ShardedStockCounter] = None):
+        self.product_repo = product_repo
+        self.stock_counter = stock_counter or ShardedStockCounter(product_repo, StockShardRepository())
+
+    async def _reserve_quantity(self, product_id: ObjectId, quantity: int, shard_count: Optional[int] = None,
+                                session=None) -> bool:
+        if shard_count:
+            return await self.stock_counter.reserve(product_id, quantity, shard_count, session=session)
+
+        reserved_product = await self.product_repo.update_one_product(
+            # Stock field of the product with sharded stock is not up-to-date
+            {"_id": product_id, "stock": {"$gte": quantity}, "stock_shard_count": {"$exists": False}},
+            {"$inc": {"stock": -quantity}},
+            session=session,
+        )
+        return reserved_product.modified_count == 1
+
+    async def release(self, products: List[ProductItem], session=None) -> None:
+        """
+        Returns reserved products to stock.
+        :param session: Session to release products inside the transaction.
+        """
+        stock_changes: Dict[ObjectId, int] = {}
+        for item in products:
+            product_id = ObjectId(item["product_id"])
+            stock_changes[product_id] = stock_changes.get(product_id, 0) + item["quantity"]
+
+        shard_counts = await self.stock_counter.get_shard_counts(list(stock_changes), session=session)
+        for product_id, shard_count in shard_counts.items():
+            await self.stock_counter.release(product_id, stock_changes.pop(product_id), shard_count, session=session)
+
+        if not stock_changes:
+            return
+
+        operations = [UpdateOne({"_id": product_id}, {"$inc": {"stock": quantity}})
+                      for product_id, quantity in stock_changes.items()]
+        await self.product_repo.update_many_products_bulk(operations, ordered=False, session=session)
+
+    async def _get_available_stock(self, product_ids: List[ObjectId], session=None) -> Dict[ObjectId, int]:
+        products = await self.product_repo.get_product_list({"_id": {"$in": product_ids}}, {"stock": 1},
+                                                            session=session)
+        available_stock = {product["_id"]: product.get("stock", 0) for product in products}
+        available_stock.update(await self.stock_counter.get_total_stock(list(available_stock), session=session))
+        return available_stock
+
+    @staticmethod
+    def _build_item_result(item: ProductItem, reserved: bool, reason: Optional[str] = None,
+                           available_stock: Optional[int] = None) -> ProductItemReservationResult:
+        return {
+            "product_id": item["product_id"],
+            "quantity": item["quantity"],
+            "reserved": reserved,
+            "reason": reason,
+            "available_stock": available_stock,
+        }
+
+    async def reserve(self, products: List[ProductItem], message_id: Optional[str] = None,
+                      order_id: Optional[str] = None, session=None) -> ProductReservationResultData:
+        """
+        Reserves all ordered products or none of them.
+        :param products: Ordered products and their quantity.
+        :param message_id: Identifier of the message with the order, it's copied to the result.
+        :param order_id: Identifier of the order, it's copied to the result.
+        :param session: Session of the transaction that marks the message as processed.
+                        If the reservation fails, the transaction must be aborted.
+        :return: Result of the reservation for the whole order and for each product.
+        """
+        return (await self.reserve_many([(products, message_id, order_id)], session))[0]
+
+    async def _reserve_products(self, order_quantities: List[Dict[ObjectId, int]],
+                                session=None) -> Dict[Tuple[int, ObjectId], bool]:
+        """
+        :param order_quantities: Quantities of the products by their ids, one dict per order.
+        :return: Whether the product was reserved for the order by the index of the order and the product id.
+        """
+        total_quantities: Dict[ObjectId, int] = defaultdict(int)
+        for quantities in order_quantities:
+            for product_id, quantity in quantities.items():
+                total_quantities[product_id] += quantity
+        shard_counts = await self.stock_counter.get_shard_counts(list(total_quantities), session=session)
+
+        reserved = {}
+        # Operations of one session can't run concurrently, so products are reserved one by one
+        for product_id, total_quantity in total_quantities.items():
+            order_indexes = [index for index, quantities in enumerate(order_quantities) if product_id in quantities]
+            if await self._reserve_quantity(product_id, total_quantity, shard_counts.get(product_id), session):
+                reserved.update({(index, product_id): True for index in order_indexes})
+                continue
+
+            for index in order_indexes:
+                # The single order has already been tried with its whole quantity
+                reserved[(index, product_id)] = len(order_indexes) > 1 and await self._reserve_quantity(
+                    product_id, order_quantities[index][product_id], shard_counts.get(product_id), session,
+                )
+        return reserved
+
+    async def reserve_many(self, orders: List[Tuple[List[ProductItem], Optional[str], Optional[str]]],
+                           session=None) -> List[ProductReservationResultData]:
+        """
+        Reserves all products of each order or none of them, orders are reserved in the order of the list.
+        :param orders: Ordered products, identifiers of the message and of the order for each order.
+        :param session: Session of the transaction that marks the messages as processed.
+                        If the reservation fails, the transaction must be aborted.
+        :return: Results of the reservations in the order of the list.
+        """
+        order_quantities: List[Dict[ObjectId, int]] = []
+        for products, _, _ in orders:
+            # Items with invalid quantity aren't reserved at all
+            quantities: Dict[ObjectId, int] = defaultdict(int)
+            for item in products:
+                if item["quantity"] > 0:
+                    quantities[ObjectId(item["product_id"])] += item["quantity"]
+            order_quantities.append(quantities)
+
+        reserved = await self._reserve_products(order_quantities, session)
+        orders_reserved = [all(item["quantity"] > 0 and reserved[(index, ObjectId(item["product_id"]))]
+                               for item in products)
+                           for index, (products, _, _) in enumerate(orders)]
+
+        # Products reserved for the rejected orders are returned to stock with one release
+        await self.release([{"product_id": product_id, "quantity": quantity}
+                            for index, quantities in enumerate(order_quantities) if not orders_reserved[index]
+                            for product_id, quantity in quantities.items() if reserved[(index, product_id)]],
+                           session=session)
+
+        failed_product_ids = list({product_id for (_, product_id), product_reserved in reserved.items()
+                                   if not product_reserved})
+        available_stock = await self._get_available_stock(failed_product_ids, session) if failed_product_ids else {}
+
+        results = []
+        for index, (products, message_id, order_id) in enumerate(orders):
+            order_reserved = orders_reserved[index]
+            item_results = []
+            for item in products:
+                product_id = ObjectId(item["product_id"])
+                if item["quantity"] <= 0:
+                    item_results.append(self._build_item_result(item, False, "invalid_quantity"))
+                elif reserved[(index, product_id)]:
+                    item_results.append(self._build_item_result(item, order_reserved,
+                                                                None if order_reserved else "order_rejected"))
+                else:
+                    stock = available_stock.get(product_id)
+                    reason = "not_found" if stock is None else "insufficient_stock"
+                    item_results.append(self._build_item_result(item, False, reason, stock))
+
+            results.append({
+                "message_id": message_id,
+                "order_id": order_id,
+                "reserved": order_reserved,
+                "products": item_results,
+            })
+        return results
@@ -1,16 +1,19 @@
-from typing import List, Tuple, Optional
+import functools
+from typing import Awaitable, Callable, List, Tuple, Optional, Union
 from bson import ObjectId
 from pymongo.operations import UpdateOne
 
 from src.apps.products.repository import ProductAdminRepository
+from src.core.image_jobs.image_job_queue import ImageJobReservation
+from src.core.image_jobs.queues import ImmediateImageJob
+from src.repositories.stock_shard_repository import StockShardRepository
 from src.services.product_query_builder import ProductQueryBuilder
 from .product_image_upload_manager import ProductImageUploadManager
 from .image_operation_manager import ImageOperationManager
 from .product_builder import ProductBuilder
 from src.apps.products.utils import get_var_theme_field_codes, remove_product_attrs
 from src.services.products.replication.create_variations_replica import create_variations_replica
-from src.services.upload_images import delete_many_files_in_s3
-from src.config.settings import S3_BUCKET_NAME
+from src.services.create_image_name import create_image_version
 from ...param_classes.products.handle_variation_updates_params import HandleVariationUpdatesParams
 
 
@@ -23,20 +26,50 @@ class VariationManager:
         self.product_repo = product_repo
         self.parent_id = parent_id
         self.product_builder = product_builder
+        # Images uploaded by this manager share the version, so replicated image URLs can be formed in advance
+        self.image_version = create_image_version()
+        # Image jobs update links of the products, so they are submitted after the transaction commits
+        # (See submit_image_jobs)
+        self._pending_image_jobs: List[Callable[[], Awaitable[Optional[str]]]] = []
 
     async def upload_variation_images(self, same_images: bool, images: dict,
                                       variation_ids: List[ObjectId], variation_images: Optional[List[dict]] = None,
                                       update_parent_images: bool = False,
-                                      another_process: bool = True):
+                                      in_background: bool = True,
+                                      image_job: Union[ImageJobReservation, ImmediateImageJob, None] = None
+                                      ) -> Optional[str]:
+        """
+        :return: Identifier of the image job if images are uploaded in the background
+        """
         image_upload_manager = ProductImageUploadManager(same_images,
                                                          images,
-                                                         product_repo=self.product_repo)
-        # Upload images in another process
-        await image_upload_manager.upload_images_multiple_products(self.parent_id,
+                                                         product_repo=self.product_repo,
+                                                         image_version=self.image_version)
+        # Hand image uploading off to the image job queue
+        return await image_upload_manager.upload_images_multiple_products(self.parent_id,
                                                                    variation_ids,
                                                                    variation_images,
                                                                    update_parent_images,
-                                                                   another_process=another_process)
+                                                                   in_background=in_background,
+                                                                   image_job=image_job)
+
+    async def _get_existing_images(self, parent_id: ObjectId, same_images: bool,
+                                   image_sources: Optional[List], session=None) -> dict:
+        """
+        Image URLs are versioned, so URLs of the images that have already been uploaded can't be formed from
+        the product id. Returns images of the parent (if variations have the same images)
+        and the existing products which variations refer to.
+        """
+        product_ids = [parent_id] if same_images else \
+            [source for source in image_sources or [] if isinstance(source, ObjectId)]
+        if not product_ids:
+            return {}
+
+        products = await self.product_repo.get_product_list({"_id": {"$in": product_ids}},
+                                                            {"images.main": 1, "images.derivatives": 1},
+                                                            session=session)
+        return {product["_id"]: product["images"] for product in products
+                if (product.get("images") or {}).get("main")}
 
     async def insert_variations(self, parent_id: ObjectId,
                                 same_images: bool = False, session=None) -> (
@@ -57,7 +90,10 @@ class VariationManager:
         if not same_images:
             image_sources = [image.get('sourceProductId') for image in variation_images]
 
-        replicated_variations = await create_variations_replica(variation_ids, variation_data, image_sources)
+        replicated_variations = await create_variations_replica(
+            variation_ids, variation_data, image_sources, self.image_version,
+            await self._get_existing_images(parent_id, same_images, image_sources, session=session),
+        )
 
         return variation_ids, variation_images, replicated_variations
 
@@ -120,6 +156,7 @@ class VariationManager:
                                        session=None) -> Tuple[List[ObjectId], List[dict]]:
         """
         Handles inserting new variations into DB for EXISTED variations
+        Their images are uploaded by the job submitted with submit_image_jobs.
         """
         # Insert new variations if user provide them
         # and upload images for them
@@ -129,7 +166,8 @@ class VariationManager:
         inserted_ids, variation_images, replicated_variations = await self.insert_variations(self.parent_id,
                                                                                              same_images, session)
         if not same_images:
-            await self.upload_variation_images(False, {}, inserted_ids, variation_images)
+            self._pending_image_jobs.append(functools.partial(self.upload_variation_images,
+                                                              False, {}, inserted_ids, variation_images))
         return inserted_ids, replicated_variations
 
     async def handle_variation_updates(self, params: HandleVariationUpdatesParams):
@@ -144,20 +182,33 @@ class VariationManager:
         image_operation_manager = ImageOperationManager(self.parent_id, params.images,
                                                         params.image_ops, self.product_repo)
         if params.same_images:
-            await image_operation_manager.update_images_multiple_products([*updated_variation_ids,
-                                                                           *params.inserted_ids],
-                                                                          another_process=True)
+            self._pending_image_jobs.append(functools.partial(image_operation_manager.update_images_multiple_products,
+                                                              [*updated_variation_ids, *params.inserted_ids],
+                                                              in_background=True))
         return updated_variation_ids
 
-    async def delete_variations(self, variation_ids: List[ObjectId], session=None) -> int:
+    async def submit_image_jobs(self) -> List[str]:
+        """
+        Submits image jobs of the inserted and updated variations. Call it after the transaction commits.
+        :return: Identifiers of the jobs handed off to the image job queue.
+        """
+        pending_image_jobs, self._pending_image_jobs = self._pending_image_jobs, []
+        job_ids = [await submit() for submit in pending_image_jobs]
+        return [job_id for job_id in job_ids if job_id is not None]
+
+    async def delete_variations(self, variation_ids: List[ObjectId], session=None) -> List[str]:
         """
         :param variation_ids: List of variation identifiers
         :param session: session to have a capability to delete the variations inside the transaction.
+        :return: Own images of the deleted variations. Delete them (See delete_product_images)
+                 after the transaction commits, so the images are kept if it's aborted.
         """
         variations_to_delete_data = await self.product_repo.get_product_list({"_id": {"$in": variation_ids}},
-                                                                             {"same_images": 1, "images": 1})
-        deleted_variations = await self.product_repo.delete_many_products({"_id": {"$in": variation_ids}},
-                                                                          session=session)
+                                                                             {"same_images": 1, "images": 1},
+                                                                             session=session)
+        await self.product_repo.delete_many_products({"_id": {"$in": variation_ids}}, session=session)
+        await StockShardRepository().delete_shards(variation_ids, session=session)
+        images_to_delete = []
         for deleted_variation in variations_to_delete_data:
             if (deleted_variation.get("images", {}).get("sourceProductId") is None
                     and not deleted_variation.get("same_images", False)):
@@ -166,8 +217,6 @@ class VariationManager:
                 secondary_images = deleted_variation["images"]["secondaryImages"] \
                     if deleted_variation.get("images", {}).get("secondaryImages", []) else []
 
-                objects_to_delete = ImageOperationManager. \
-                    form_a_list_of_objects_to_delete([main_image, *secondary_images])
-                await delete_many_files_in_s3(S3_BUCKET_NAME, objects_to_delete)
+                images_to_delete.extend([main_image, *secondary_images])
 
-        return deleted_variations.deleted_count
+        return images_to_delete
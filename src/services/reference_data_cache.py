@@ -0,0 +1,148 @@
+import asyncio
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from bson import ObjectId
+
+from src.config.settings import REFERENCE_DATA_CACHE_TTL_SECONDS
+from src.apps.categories.repository import CategoryRepository
+from src.apps.facet_types.repository import FacetTypeRepository
+from src.apps.facets.repository import FacetRepository
+from src.apps.variaton_themes.repository import VariationThemeRepository
+
+# Collections of the reference data, facets and variation themes are indexed by their categories
+REFERENCE_COLLECTIONS = ("facets", "facet_types", "variation_themes", "categories")
+
+
+class _Snapshot:
+    """
+    Documents of one collection as they were loaded, with the indexes built over them.
+    """
+    def __init__(self, version: int, documents: List[dict], expires_at: float):
+        self.version = version
+        self.expires_at = expires_at
+        self.documents = documents
+        self.by_id = {document["_id"]: document for document in documents}
+        # Category ID (or "*" for all categories) -> positions of the documents in the collection order
+        self.by_category: Dict[Any, List[int]] = defaultdict(list)
+        for position, document in enumerate(documents):
+            categories = document.get("categories")
+            for category in categories if isinstance(categories, list) else [categories]:
+                self.by_category[category].append(position)
+
+    def get_of_category(self, category_id: ObjectId) -> List[dict]:
+        positions = sorted({*self.by_category.get(category_id, ()), *self.by_category.get("*", ())})
+        return [self.documents[position] for position in positions]
+
+
+def _project(document: dict, projection: Optional[dict]) -> dict:
+    """
+    Applies the projection of top-level fields the way the db does: inclusion or exclusion, _id is included by default.
+    """
+    if not projection:
+        return dict(document)
+
+    included = {field for field, value in projection.items() if value}
+    if included:
+        if projection.get("_id", 1):
+            included.add("_id")
+        return {field: value for field, value in document.items() if field in included}
+
+    excluded = {field for field, value in projection.items() if not value}
+    return {field: value for field, value in document.items() if field not in excluded}
+
+
+class ReferenceDataCache:
+    """
+    In-memory copy of facets, facet types, variation themes and categories.
+    They rarely change, but they are read every time the product form is opened.
+    Each collection is loaded whole on the first read and kept with a version. Services invalidate the collection
+    after they write to it, which bumps the version, so loads that started before the write are discarded.
+    Writes of other instances are seen once the copy expires, or right away if the instances share
+    an invalidation bus (See add_invalidation_listener).
+    """
+    def __init__(self, facet_repo: Optional[FacetRepository] = None,
+                 facet_type_repo: Optional[FacetTypeRepository] = None,
+                 variation_theme_repo: Optional[VariationThemeRepository] = None,
+                 category_repo: Optional[CategoryRepository] = None,
+                 ttl_seconds: float = REFERENCE_DATA_CACHE_TTL_SECONDS):
+        self._loaders = {
+            "facets": (facet_repo or FacetRepository()).get_facet_list,
+            "facet_types": (facet_type_repo or FacetTypeRepository()).get_facet_type_list,
+            "variation_themes": (variation_theme_repo or VariationThemeRepository()).get_variation_theme_list,
+            "categories": (category_repo or CategoryRepository()).get_category_list,
+        }
+        self.ttl_seconds = ttl_seconds
+        self._versions: Dict[str, int] = {collection_name: 0 for collection_name in REFERENCE_COLLECTIONS}
+        self._snapshots: Dict[str, _Snapshot] = {}
+        # Loads in progress, concurrent reads of a cold collection wait for the same load
+        self._loads: Dict[Tuple[str, int], asyncio.Future] = {}
+        self._invalidation_listeners: List[Callable[[Sequence[str]], None]] = []
+
+    async def _load(self, collection_name: str, version: int) -> _Snapshot:
+        documents = await self._loaders[collection_name]()
+        snapshot = _Snapshot(version, documents, time.monotonic() + self.ttl_seconds)
+        # If the collection was invalidated during the load, the loaded documents may be outdated
+        if self._versions[collection_name] == version:
+            self._snapshots[collection_name] = snapshot
+        return snapshot
+
+    async def _get_snapshot(self, collection_name: str) -> _Snapshot:
+        snapshot = self._snapshots.get(collection_name)
+        if snapshot and snapshot.expires_at > time.monotonic():
+            return snapshot
+
+        load_key = (collection_name, self._versions[collection_name])
+        if load_key not in self._loads:
+            self._loads[load_key] = asyncio.ensure_future(self._load(*load_key))
+            self._loads[load_key].add_done_callback(lambda _: self._loads.pop(load_key, None))
+        return await asyncio.shield(self._loads[load_key])
+
+    def add_invalidation_listener(self, listener: Callable[[Sequence[str]], None]) -> None:
+        """
+        :param listener: Called with names of the collections invalidated by this instance's writes.
+        """
+        self._invalidation_listeners.append(listener)
+
+    def remove_invalidation_listener(self, listener: Callable[[Sequence[str]], None]) -> None:
+        self._invalidation_listeners.remove(listener)
+
+    def invalidate(self, *collection_names: str, broadcast: bool = True) -> None:
+        """
+        Drops copies of the collections, services call it after they write to them (See REFERENCE_COLLECTIONS).
+        :param broadcast: Whether listeners are notified, it's False for invalidations received from other instances.
+        """
+        for collection_name in collection_names:
+            self._versions[collection_name] += 1
+            self._snapshots.pop(collection_name, None)
+
+        if broadcast:
+            for listener in self._invalidation_listeners:
+                listener(collection_names)
+
+    async def get_category(self, category_id: ObjectId, projection: Optional[dict] = None) -> Optional[dict]:
+        category = (await self._get_snapshot("categories")).by_id.get(category_id)
+        return _project(category, projection) if category else None
+
+    async def get_facets_of_category(self, category_id: ObjectId, projection: Optional[dict] = None) -> List[dict]:
+        """
+        :return: Facets of the category and facets of all categories ("*").
+        """
+        snapshot = await self._get_snapshot("facets")
+        return [_project(facet, projection) for facet in snapshot.get_of_category(category_id)]
+
+    async def get_variation_themes_of_category(self, category_id: ObjectId,
+                                               projection: Optional[dict] = None) -> List[dict]:
+        """
+        :return: Variation themes of the category and variation themes of all categories ("*").
+        """
+        snapshot = await self._get_snapshot("variation_themes")
+        return [_project(variation_theme, projection) for variation_theme in snapshot.get_of_category(category_id)]
+
+    async def get_facet_types(self, projection: Optional[dict] = None) -> List[dict]:
+        snapshot = await self._get_snapshot("facet_types")
+        return [_project(facet_type, projection) for facet_type in snapshot.documents]
+
+
+reference_data_cache = ReferenceDataCache()
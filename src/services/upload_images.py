@@ -1,69 +1,162 @@
+import asyncio
 import io
 from bson import ObjectId
-from typing import List
+from typing import BinaryIO, List, Optional, Union
 
-from src.config.file_storage import get_s3_client
-from src.utils import get_image_from_base64
-from src.config.settings import S3_BUCKET_NAME, CDN_HOST_NAME
+from src.config.file_storage import get_async_s3_client
+from src.core.image_intake.decoded_image import DecodedImage
+from src.core.image_intake.uploaded_image import UploadedImage
+from src.core.image_intake.image_intake import get_image_body_and_digest, create_image_derivatives
+from src.core.image_intake.derivatives import DERIVATIVE_EXTENSIONS
+from src.config.settings import (
+    S3_BUCKET_NAME,
+    S3_DELETE_BATCH_SIZE,
+    S3_DELETE_MAX_RETRIES,
+    IMAGE_CACHE_CONTROL,
+    IMAGE_DERIVATIVE_WIDTHS,
+)
+from src.core.image_jobs.queues import submit_image_deletion
+from src.repositories.image_blob_repository import ImageBlobRepository
+from src.services.create_image_name import (
+    create_image_url,
+    create_product_image_key,
+    create_derivative_key,
+    describe_image_derivatives,
+    get_image_key,
+)
 
 
-async def upload_file_to_s3(key: str, bytes_io: io.BytesIO, bucket_name: str):
+async def upload_file_to_s3(key: str, bytes_io: Union[io.BytesIO, BinaryIO, bytes], bucket_name: str,
+                            content_type: str = "image/jpeg"):
     """
     Uploads image to the amazon s3 storage.
+    The request runs in the thread pool of the shared S3 client, so it doesn't block the event loop.
+    Keys are versioned and never overwritten, so the image is uploaded with long-lived Cache-Control.
     :param key: file name.
-    :param bytes_io: file in the form of bytes.
+    :param bytes_io: file in the form of bytes or file object.
     :param bucket_name: Name of the s3 bucket.
+    :param content_type: Content type of the image.
     """
-    s3 = get_s3_client()
-    s3.upload_fileobj(bytes_io, bucket_name, key, ExtraArgs={"ContentType": "image/jpeg"})
+    await get_async_s3_client().put_object(bucket_name, key, bytes_io, content_type=content_type,
+                                           CacheControl=IMAGE_CACHE_CONTROL)
 
-async def upload_images_single_product(product_id: ObjectId, images: dict) -> dict:
+async def upload_image_with_derivatives(key: str, image_body: Union[bytes, BinaryIO]):
+    """
+    Makes resized JPEG and WebP copies of the image and uploads them next to the original image.
+    :param key: Key of the original image.
+    """
+    # Derivatives are made first, since the file of the image part can't be read by two threads at once
+    derivatives = await create_image_derivatives(image_body)
+    await asyncio.gather(
+        upload_file_to_s3(key, image_body, S3_BUCKET_NAME),
+        *(upload_file_to_s3(create_derivative_key(key, width, extension), data, S3_BUCKET_NAME,
+                            content_type=content_type)
+          for width, extension, content_type, data in derivatives),
+    )
+
+async def upload_product_image(image: Union[str, DecodedImage, UploadedImage], image_name: str) -> str:
+    """
+    Decodes the image (if it hasn't been decoded during validation) and uploads it.
+    Images are deduplicated by their content: if the same image has already been uploaded,
+    the product refers to the existing object and nothing is uploaded (See ImageBlobRepository).
+    Derivatives of the image are made and uploaded with the image (See describe_image_derivatives).
+    :param image: base64 encoded string, image decoded during validation or image part of the multipart request.
+    :param image_name: Key to store the image under if there's no image with the same content.
+    :return: URL of the uploaded image.
+    """
+    image_body, digest = await get_image_body_and_digest(image)
+    blob_repo = ImageBlobRepository()
+    blob = await blob_repo.acquire(digest, image_name)
+    key = image_name if blob is None else blob["key"]
+    # The image with the same content may be still uploading, then it's uploaded under its key once more,
+    # since the content of the key is the same, the object doesn't change
+    if blob is None or not blob.get("uploaded"):
+        await upload_image_with_derivatives(key, image_body)
+        await blob_repo.mark_as_uploaded(digest)
+    return create_image_url(key)
+
+async def clone_product_images(image_urls: List[str], image_names: List[str]) -> List[str]:
+    """
+    Makes images of the product available to another product without uploading them again.
+    Indexed images (See upload_product_image) get one more reference, so the clone uses the same objects.
+    Other images (uploaded before the index or straight to the storage) are copied on the storage side
+    in parallel, since nothing counts their references.
+    :param image_urls: URLs of the images to clone.
+    :param image_names: Keys to copy the images to, one per URL.
+    :return: URLs of the images for the clone in the same order.
+    """
+    keys = [get_image_key(image_url) for image_url in image_urls]
+    indexed_keys = set(await ImageBlobRepository().add_references(keys))
+    keys_to_copy = [(key, image_name) for key, image_name in zip(keys, image_names) if key not in indexed_keys]
+    cloned_urls = [create_image_url(key if key in indexed_keys else image_name)
+                   for key, image_name in zip(keys, image_names)]
+    copies = await asyncio.gather(*(get_async_s3_client().copy_object(S3_BUCKET_NAME, key, image_name,
+                                                                      MetadataDirective="REPLACE",
+                                                                      ContentType="image/jpeg",
+                                                                      CacheControl=IMAGE_CACHE_CONTROL)
+                                    for key, image_name in keys_to_copy), return_exceptions=True)
+    errors = [copy for copy in copies if isinstance(copy, BaseException)]
+    if errors:
+        # Added references and the copies that succeeded would never be released
+        await delete_product_images(cloned_urls)
+        raise errors[0]
+    return cloned_urls
+
+async def delete_product_images(image_urls: List[Optional[str]]) -> int:
+    """
+    Removes references of the product(s) to the images and deletes the images that nothing refers to anymore.
+    Derivatives of the deleted images are deleted as well.
+    Pass the URL once per product that stops using the image.
+    References are removed right away, objects are deleted from the storage by the image deletion queue.
+    :return: Count of deleted images.
+    """
+    keys = [get_image_key(image_url) for image_url in image_urls if image_url]
+    keys_to_delete = await ImageBlobRepository().release(keys)
+    if not keys_to_delete:
+        return 0
+
+    objects_to_delete = [{"Key": key} for key in keys_to_delete]
+    # Images uploaded before derivatives were added don't have them, deleting missing objects is not an error
+    objects_to_delete.extend({"Key": create_derivative_key(key, width, extension)} for key in keys_to_delete
+                             for width in IMAGE_DERIVATIVE_WIDTHS for extension in DERIVATIVE_EXTENSIONS)
+    # Only the storage deletion is queued: it's idempotent, so the job can be retried,
+    # while references must be removed exactly once
+    await submit_image_deletion("delete_product_images", delete_many_files_in_s3, S3_BUCKET_NAME, objects_to_delete)
+    return len(keys_to_delete)
+
+async def upload_images_single_product(product_id: ObjectId, images: dict, version: Optional[str] = None) -> dict:
     """
     Uploads images for a single product.
     Also, this function can be used to upload the same images for many products.
     :param product_id: ID of a product. Used to form an image name.
     :param images: dict that stores the main image and secondary images.
+    :param version: Version of the image names (See create_image_version).
     :return: dictionary with product_id and image URLs
     """
-    # get bytes from the base64 encoded string
-    main_image = await get_image_from_base64(images.get("main"))
+    main_image_name = create_product_image_key(product_id, 0, version)
+    secondary_images = images.get("secondaryImages") or []
+    secondary_image_names = [create_product_image_key(product_id, index + 1, version)
+                             for index in range(len(secondary_images))]
 
-    # create bytes io object for the main image
-    main_image_bytes_io = io.BytesIO(main_image)
-
-    main_image_name = f"products/{product_id}_0.jpg"
+    # upload the main image and secondary images concurrently
+    main_image_url, *uploaded_secondary_image_urls = await asyncio.gather(
+        upload_product_image(images.get("main"), main_image_name),
+        *(upload_product_image(secondary_image, secondary_image_name)
+          for secondary_image, secondary_image_name in zip(secondary_images, secondary_image_names)),
+    )
 
     # stores list of URLs of the secondary images if images.secondaryImages is not None
-    secondary_image_urls = None
-
-    # upload image to the amazon s3
-    await upload_file_to_s3(main_image_name, main_image_bytes_io, S3_BUCKET_NAME)
-
-    # URL of the uploaded main image
-    main_image_url = CDN_HOST_NAME + "/" + main_image_name
-
-    # check if there are secondary images
-    if secondary_images := images.get("secondaryImages"):
-        secondary_image_urls = []
-        for index ,secondary_image in enumerate(secondary_images):
-            secondary_image_name = f"products/{product_id}_{index + 1}.jpg"
-            # get bytes from the base64 encoded string
-            decoded_secondary_image = await get_image_from_base64(secondary_image)
-            # create bytes io object for the secondary image
-            secondary_image_bytes_io = io.BytesIO(decoded_secondary_image)
-            # upload image to the amazon s3
-            await upload_file_to_s3(secondary_image_name, secondary_image_bytes_io, S3_BUCKET_NAME)
-            # URL of the secondary image
-            secondary_image_url = CDN_HOST_NAME + "/" + secondary_image_name
-            secondary_image_urls.append(secondary_image_url)
+    secondary_image_urls = uploaded_secondary_image_urls if images.get("secondaryImages") else None
 
     return {"product_id": product_id, "images": {
         "main": main_image_url,
         "secondaryImages": secondary_image_urls,
         "sourceProductId": None,
+        "derivatives": describe_image_derivatives(list(dict.fromkeys([main_image_url,
+                                                                      *uploaded_secondary_image_urls]))),
     }}
 
-async def upload_images_many_products(product_ids: List[ObjectId], images: List[dict]):
+async def upload_images_many_products(product_ids: List[ObjectId], images: List[dict], version: Optional[str] = None):
     """
     Uploads images for many products.
     Use this function if each product has different images.
@@ -72,6 +165,7 @@ async def upload_images_many_products(product_ids: List[ObjectId], images: List[
 
     :param product_ids: List of IDs of the products.
     :param images: List of product images.
+    :param version: Version of the image names (See create_image_version).
     :return: List of image URLs.
     """
     # if there is no product ids or images or len of the product ids is not equal to the length of image
@@ -79,6 +173,22 @@ async def upload_images_many_products(product_ids: List[ObjectId], images: List[
         # then return empty list
         return []
 
+    # Indexes of the products whose images should be uploaded.
+    # Products that refer to another product of the list reuse images of that product
+    indexes_to_upload = []
+    for index, image in enumerate(images):
+        if isinstance(image.get("sourceProductId"), ObjectId):
+            continue
+        source_index = index if image.get("sourceProductId") is None else image["sourceProductId"]
+        if source_index not in indexes_to_upload:
+            indexes_to_upload.append(source_index)
+
+    # Upload images of all products concurrently
+    uploaded_image_urls = await asyncio.gather(*(upload_images_single_product(product_ids[index], images[index], version)
+                                                 for index in indexes_to_upload))
+    uploaded_image_urls = {product_ids[index]: image_urls
+                           for index, image_urls in zip(indexes_to_upload, uploaded_image_urls)}
+
     # Cache for existing image URLs
     existing_image_urls = {}
     # list of dicts that store image urls
@@ -103,9 +213,8 @@ async def upload_images_many_products(product_ids: List[ObjectId], images: List[
                     {"product_id": product_id, "images": {**source_image_urls, "sourceProductId": source_product_id}}
                 )
             else:
-                # Upload images from the actual source image dictionary
-                source_images = images[image["sourceProductId"]]  # Retrieve images from the correct source
-                source_image_urls = await upload_images_single_product(source_product_id, source_images)
+                # Images of the source product have already been uploaded
+                source_image_urls = uploaded_image_urls[source_product_id]
                 existing_image_urls[source_product_id] = source_image_urls.get("images", {})
                 image_urls_list.extend(
                     [
@@ -118,8 +227,7 @@ async def upload_images_many_products(product_ids: List[ObjectId], images: List[
             # Check for cached URLs for this product
             cached_urls = existing_image_urls.get(product_id)
             if not cached_urls:
-                # Upload images for this unique product
-                image_urls = await upload_images_single_product(product_id, image)
+                image_urls = uploaded_image_urls[product_id]
                 existing_image_urls[product_id] = image_urls.get("images")
                 image_urls_list.append({**image_urls, "product_id": product_id})
 
@@ -130,12 +238,13 @@ async def delete_one_file_in_s3(bucket_name: str, key: str, **kwargs):
     :param bucket_name: Name of the s3 bucket.
     :param key: Name of the file to delete
     """
-    s3 = get_s3_client()
-    response = s3.delete_object(Bucket=bucket_name, Key=key, **kwargs)
+    response = await get_async_s3_client().delete_object(bucket_name, key, **kwargs)
     return response
 
-async def delete_many_files_in_s3(bucket_name: str, objects_to_delete: list[dict], **kwargs):
+async def delete_many_files_in_s3(bucket_name: str, objects_to_delete: list[dict]) -> int:
     """
+    Deletes any count of files: keys are split into batches of S3_DELETE_BATCH_SIZE that are deleted concurrently,
+    keys that S3 failed to delete are retried (See AsyncS3Client.delete_many_objects).
     :param bucket_name: Name of the s3 bucket
     :param objects_to_delete: List of filenames to delete
     Example of objects_to_delete:
@@ -149,7 +258,10 @@ async def delete_many_files_in_s3(bucket_name: str, objects_to_delete: list[dict
              # Other file's metadata
         },
     ]
+    :return: Count of deleted files.
     """
-    s3 = get_s3_client()
-    response = s3.delete_objects(Bucket=bucket_name, Delete={'Objects': objects_to_delete}, **kwargs)
-    return response
+    deleted_count = await get_async_s3_client().delete_many_objects(
+        bucket_name, [object_to_delete["Key"] for object_to_delete in objects_to_delete],
+        batch_size=S3_DELETE_BATCH_SIZE, max_retries=S3_DELETE_MAX_RETRIES,
+    )
+    return deleted_count
@@ -1,62 +1,30 @@
 import asyncio
-import base64
 from decimal import Decimal
 from bson.decimal128 import Decimal128
 from typing import Union, List, Optional
 from pydantic import ValidationError
 
-from src.config.settings import ALLOWED_IMAGE_TYPE
+from src.core.image_intake.image_intake import decode_images
 from src.schemes.url_validator import UrlValidator
 
 async def validate_images(images: Union[str, List[str]], many: bool = False):
     """
     Validates one image or list of images.
+    Images are decoded in the image intake pool, see decode_images.
     :param images: one image or list of images to validate.
     :param many: Determines whether function should validate one image or many images.
     :return: errors if any
     """
-    # dict that stores image errors
-    errors = {}
-
-    def check_image_size_and_type(image: str, index):
-        """
-        A helper function that checks image size and type
-        :param image: image for check
-        :param index: index that will be assigned as key error in the dict of errors
-        """
-        # list of errors for current image
-        image_errors = []
-        # get the image
-        encoded_image = image.split(",")[1]
-        # decode the image
-        decoded_image = base64.b64decode(encoded_image)
-        # get type of the file
-        file_type = image.split(",")[0].split(";")[0]
-        # if file_type is not data:image/jpeg
-        if file_type != ALLOWED_IMAGE_TYPE:
-            image_errors.append("Only image/jpeg type allowed")
-
-        # get the file size in megabytes
-        file_size = round(len(decoded_image) / 1024 ** 2, 2)
-        # if file_size is more than 1 MB
-        if file_size > 1:
-            image_errors.append("The file size exceeds 1 MB")
-
-        # if there are errors for current images, then add these errors to the dict of errors
-        if image_errors:
-            errors[index] = image_errors
     # if many is True
     if many:
         # Then validate multiple images and return errors
-        for index, image in enumerate(images):
-            check_image_size_and_type(image, index)
-
-        return errors
+        decoded_images = await decode_images(images)
+        return {index: image.errors for index, image in enumerate(decoded_images) if image.errors}
 
     # Otherwise, validate only one image
-    check_image_size_and_type(images, 0)
-    # return image errors located in "0" key if errors dict is not empty, otherwise return None
-    return errors[0] if errors else None
+    decoded_image, = await decode_images([images])
+    # return image errors if there are any, otherwise return None
+    return decoded_image.errors or None
 
 def convert_decimal(dict_item):
     # This function iterates a dictionary looking for types of Decimal and converts them to Decimal128
@@ -120,16 +88,6 @@ def different_dicts(list1: list[dict], list2: list[dict]):
             differences.append(dict1)
     return differences
 
-async def get_image_from_base64(base64_str: str) -> bytes:
-    """
-    Returns image bytes from the base64 encoded string
-    """
-    # get the image
-    encoded_image = base64_str.split(",")[1]
-    # decode the image
-    decoded_image = base64.b64decode(encoded_image)
-    return decoded_image
-
 def async_worker(func, *args, **kwargs):
     """
     Runs asynchronous function in synchronous environment
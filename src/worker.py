@@ -7,7 +7,7 @@ celery = Celery(__name__)
 celery.conf.broker_url = os.getenv("CELERY_BROKER_URL")
 celery.conf.result_backend = os.getenv("CELERY_RESULT_BACKEND")
 
-celery.autodiscover_tasks(["src.services.events", "src.services.search_terms"])
+celery.autodiscover_tasks(["src.services.events", "src.services.search_terms", "src.services.orphaned_images"])
 
 logger = get_task_logger(__name__)
 
@@ -0,0 +1 @@
+from benchmarks import _env  # noqa: F401
@@ -0,0 +1,105 @@
+import asyncio
+import json
+import time
+
+from bson import ObjectId
+
+from benchmarks.stand_ins.pubsub import FakePubSub
+from src.core.cache_invalidation.buses import create_reference_data_bus
+from src.core.cache_invalidation.invalidation_bus import CacheInvalidationBus
+from src.services.reference_data_cache import ReferenceDataCache
+
+
+class FakeFacetRepository:
+    def __init__(self):
+        self.reads = 0
+
+    async def get_list(self, *args, **kwargs) -> list:
+        self.reads += 1
+        return [{"_id": ObjectId(), "categories": ["*"]}]
+
+    get_facet_list = get_facet_type_list = get_variation_theme_list = get_category_list = get_list
+
+
+def invalidation(collection_names) -> str:
+    return json.dumps({"origin": "another-instance", "collections": collection_names, "published_at": time.time()})
+
+
+async def settle() -> None:
+    # Lets the subscriber handle the delivered messages
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_unknown_and_malformed_invalidations_dont_stop_the_bus():
+    async def run():
+        pubsub, repo = FakePubSub(latency=0), FakeFacetRepository()
+        cache = ReferenceDataCache(repo, repo, repo, repo)
+        bus = create_reference_data_bus(pubsub.channel(), cache)
+        await bus.start()
+        await cache.get_facets_of_category(ObjectId())
+
+        publisher = pubsub.channel()
+        for message in (invalidation(["brands"]), invalidation("facets"), invalidation([["facets"]]),
+                        "not json", json.dumps({"collections": ["facets"]})):
+            await publisher.publish(message)
+        await settle()
+        await cache.get_facets_of_category(ObjectId())
+        reads_before_invalidation = repo.reads
+
+        await publisher.publish(invalidation(["brands", "facets"]))
+        await settle()
+        await cache.get_facets_of_category(ObjectId())
+
+        assert not bus._task.done()
+        await bus.stop()
+        return reads_before_invalidation, repo.reads
+
+    reads_before_invalidation, reads = asyncio.run(run())
+    assert reads_before_invalidation == 1
+    assert reads == 2
+
+
+def test_failing_handler_doesnt_stop_the_bus():
+    async def run():
+        pubsub, invalidated = FakePubSub(latency=0), []
+
+        def on_invalidate(collection_names):
+            if not invalidated:
+                invalidated.append(None)
+                raise RuntimeError("handler failed")
+            invalidated.append(collection_names)
+
+        bus = CacheInvalidationBus(pubsub.channel(), ["facets"], on_invalidate, on_gap=lambda: None)
+        await bus.start()
+        for _ in range(2):
+            await pubsub.channel().publish(invalidation(["facets"]))
+        await settle()
+        assert not bus._task.done()
+        await bus.stop()
+        return invalidated
+
+    assert asyncio.run(run()) == [None, ["facets"]]
+
+
+def test_own_invalidations_are_skipped_and_others_are_applied():
+    async def run():
+        pubsub, repo = FakePubSub(latency=0), FakeFacetRepository()
+        writer, reader = ReferenceDataCache(repo, repo, repo, repo), ReferenceDataCache(repo, repo, repo, repo)
+        buses = [create_reference_data_bus(pubsub.channel(), cache) for cache in (writer, reader)]
+        for bus in buses:
+            await bus.start()
+        await writer.get_facets_of_category(ObjectId())
+        await reader.get_facets_of_category(ObjectId())
+
+        writer.invalidate("facets")
+        await settle()
+        stats = [bus.stats.as_dict() for bus in buses]
+        for bus in buses:
+            await bus.stop()
+        return "facets" in reader._snapshots, stats
+
+    reader_has_facets, (writer_stats, reader_stats) = asyncio.run(run())
+    assert not reader_has_facets
+    assert writer_stats["received"] == 0
+    assert reader_stats["received"] == 1
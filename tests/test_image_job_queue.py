@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from src.core.image_jobs.image_job_queue import ImageJobQueue, ImageJobQueueFull
+
+
+def test_reserved_slot_is_kept_until_the_job_is_submitted():
+    async def run():
+        queue = ImageJobQueue(worker_count=1, max_queue_size=1, enqueue_timeout=0.01)
+        queue.start()
+        done, blocker = [], asyncio.Event()
+
+        async def job(name):
+            await blocker.wait()
+            done.append(name)
+
+        # The worker takes the first job, so the only slot is free again
+        await queue.submit("running", job, "running")
+        await asyncio.sleep(0)
+        reservation = await queue.reserve()
+        # Products of the reserved job are committed meanwhile, other requests fail before writing anything
+        with pytest.raises(ImageJobQueueFull):
+            await queue.submit("rejected", job, "rejected")
+
+        await reservation.submit("reserved", job, "reserved")
+        blocker.set()
+        await queue.stop(timeout=1)
+        return done
+
+    assert asyncio.run(run()) == ["running", "reserved"]
+
+
+def test_unused_reservation_frees_the_slot():
+    async def run():
+        queue = ImageJobQueue(worker_count=1, max_queue_size=1, enqueue_timeout=0.01)
+        queue.start()
+        done = []
+
+        async def job():
+            done.append(True)
+
+        # The request failed before the job was submitted
+        with pytest.raises(RuntimeError):
+            async with await queue.reserve():
+                raise RuntimeError("transaction failed")
+
+        await queue.submit("job", job)
+        await queue.stop(timeout=1)
+        return done
+
+    assert asyncio.run(run()) == [True]
+
+
+def test_reserved_job_runs_immediately_if_the_queue_is_stopped():
+    async def run():
+        queue = ImageJobQueue(worker_count=1, max_queue_size=1)
+        queue.start()
+        done = []
+
+        async def job():
+            done.append(True)
+
+        reservation = await queue.reserve()
+        await queue.stop(timeout=1)
+        job_id = await reservation.submit("job", job)
+        return job_id, done
+
+    assert asyncio.run(run()) == (None, [True])
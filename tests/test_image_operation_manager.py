@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+from src.core.image_jobs import queues
+from src.core.image_jobs.image_job_queue import ImageJobQueue
+from src.services.create_image_name import create_image_url, create_product_image_key
+from src.services.products import image_operation_manager
+from src.services.products.image_operation_manager import ImageOperationManager
+
+PRODUCT_ID = ObjectId()
+MAIN_IMAGE = create_image_url(create_product_image_key(PRODUCT_ID, 0, "old"))
+SECONDARY_IMAGE = create_image_url(create_product_image_key(PRODUCT_ID, 1, "old"))
+
+
+class FakeProductRepository:
+    def __init__(self, failed_updates: int):
+        """
+        :param failed_updates: Count of the first updates of the image links that fail.
+        """
+        self.failed_updates = failed_updates
+        self.images = None
+
+    async def update_image_links(self, product_ids, images: dict, **kwargs) -> None:
+        if self.failed_updates:
+            self.failed_updates -= 1
+            raise ConnectionError("Connection to the db is lost")
+        self.images = images
+
+    async def get_one_product(self, *args, **kwargs) -> dict:
+        return {}
+
+    async def get_product_list(self, *args, **kwargs) -> list:
+        return [{"_id": PRODUCT_ID}]
+
+
+@pytest.fixture
+def image_env(monkeypatch):
+    deleted_images, replicated_images = [], []
+
+    async def upload_product_image(image, image_name: str) -> str:
+        return create_image_url(image_name)
+
+    async def delete_product_images(image_urls: list) -> int:
+        deleted_images.extend(image_urls)
+        return len(image_urls)
+
+    async def replicate_updated_product_images(product_ids: list, main_image: str, image_variants) -> None:
+        replicated_images.append(main_image)
+
+    monkeypatch.setattr(image_operation_manager, "upload_product_image", upload_product_image)
+    monkeypatch.setattr(image_operation_manager, "delete_product_images", delete_product_images)
+    monkeypatch.setattr(image_operation_manager, "replicate_updated_product_images", replicate_updated_product_images)
+    return deleted_images, replicated_images
+
+
+def test_retried_image_job_starts_from_the_submitted_images(monkeypatch, image_env):
+    deleted_images, replicated_images = image_env
+    product_repo = FakeProductRepository(failed_updates=1)
+
+    async def run():
+        queue = ImageJobQueue(worker_count=1, retry_delay=0)
+        queue.start()
+        monkeypatch.setattr(queues, "_image_job_queue", queue)
+        manager = ImageOperationManager(PRODUCT_ID, {"main": MAIN_IMAGE, "secondaryImages": [SECONDARY_IMAGE]},
+                                        {"replace": {"main": "new main"}, "add": ["new secondary"],
+                                         "delete": [SECONDARY_IMAGE]},
+                                        product_repo)
+        await manager.update_images_one_product(in_background=True)
+        await queue.join()
+        await queue.stop(timeout=1)
+        return manager.image_version
+
+    image_version = asyncio.run(run())
+    new_main_image = create_image_url(create_product_image_key(PRODUCT_ID, 0, image_version))
+    new_secondary_image = create_image_url(create_product_image_key(PRODUCT_ID, 1, image_version))
+    assert product_repo.images["main"] == new_main_image
+    assert product_repo.images["secondaryImages"] == [new_secondary_image]
+    # Images the product uses now are kept, the replaced and removed ones are deleted once
+    assert sorted(deleted_images) == sorted([MAIN_IMAGE, SECONDARY_IMAGE])
+    assert replicated_images == [new_main_image]
@@ -0,0 +1,30 @@
+import asyncio
+
+import pytest
+
+from benchmarks.stand_ins.mongo import FakeIndexDatabase
+from src.repositories.indexes.reconciler import RequiredIndexError, ensure_indexes
+from src.repositories.indexes.registry import INDEXES, REQUIRED_INDEXES
+
+
+def test_only_required_indexes_are_built_before_the_startup():
+    database = FakeIndexDatabase()
+    asyncio.run(ensure_indexes(database=database, required_only=True))
+
+    assert set(database.collections) == set(REQUIRED_INDEXES)
+    assert set(database["image_blobs"].indexes) == {"_id_", "key_1"}
+    assert set(database["stock_shards"].indexes) == {"_id_", "product_id_1_shard_1"}
+
+
+def test_failed_build_of_a_required_index_fails_the_startup():
+    database = FakeIndexDatabase(failing_index_names={"key_1"})
+    with pytest.raises(RequiredIndexError, match="image_blobs.key_1"):
+        asyncio.run(ensure_indexes(database=database, required_only=True))
+
+
+def test_failed_build_of_an_optional_index_is_only_logged():
+    database = FakeIndexDatabase(failing_index_names={"sku_1"})
+    asyncio.run(ensure_indexes(database=database))
+
+    assert set(database.collections) == set(INDEXES)
+    assert "sku_1" not in database["products"].indexes
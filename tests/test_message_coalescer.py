@@ -0,0 +1,10 @@
+from src.services.products.replication.message_coalescer import ReplicationMessageCoalescer
+
+
+def test_single_product_update_is_published_as_is():
+    variation_update = ('products.crud.update.many', [{"object_id": "1", "name": "Variation"}])
+    single_update = ('products.crud.update.one', {"object_id": "2", "name": "Product", "for_sale": False})
+
+    coalesced = ReplicationMessageCoalescer(0, 100).coalesce([variation_update, single_update, variation_update])
+
+    assert coalesced == [variation_update, single_update, variation_update]
@@ -0,0 +1,169 @@
+import asyncio
+from collections import defaultdict
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+from benchmarks.stand_ins.mongo import FakeClient, FakeProcessedMessageRepository
+from src.services.orders.replication import order_processing
+from src.param_classes.orders.order_processing_message import OrderProcessingMessage
+from src.services.orders.replication.order_processing import (
+    OrderProcessingHandler,
+    RELEASE_ROUTING_KEY,
+    RESERVE_ROUTING_KEY,
+)
+
+PRODUCT_ID = ObjectId()
+
+
+class FakeProductService:
+    def __init__(self, write_conflicts: int = 0):
+        """
+        :param write_conflicts: Count of the first stock changes that fail with a write conflict.
+        """
+        self.stock = defaultdict(int)
+        self.write_conflicts = write_conflicts
+        # Count of the first reservation results that fail to be added to the outbox
+        self.failed_sends = 0
+        self.sent_results = []
+
+    async def apply_stock_changes(self, stock_changes: dict, session=None) -> int:
+        if self.write_conflicts:
+            self.write_conflicts -= 1
+            raise OperationFailure("WriteConflict", 112, {"errorLabels": ["TransientTransactionError"]})
+        def apply():
+            for product_id, stock_change in stock_changes.items():
+                self.stock[product_id] += stock_change
+        session.on_commit(apply)
+        return len(stock_changes)
+
+    async def reserve_for_orders(self, orders: list, session=None) -> list:
+        # Stock isn't limited, so orders are always reserved
+        await self.release_from_order([{**product, "quantity": -product["quantity"]}
+                                       for products, _, _ in orders for product in products], session=session)
+        return [{"message_id": message_id, "order_id": order_id, "reserved": True, "products": products}
+                for products, message_id, order_id in orders]
+
+    async def release_from_order(self, products: list, session=None) -> None:
+        def apply():
+            for product in products:
+                self.stock[ObjectId(product["product_id"])] += product["quantity"]
+        if session is not None:
+            session.on_commit(apply)
+        else:
+            apply()
+
+
+@pytest.fixture
+def handler_env(monkeypatch):
+    client, product_service = FakeClient(), FakeProductService()
+
+    async def get_product_service():
+        return product_service
+
+    def use_processed_message_repo(repo: FakeProcessedMessageRepository):
+        monkeypatch.setattr(order_processing, "ProcessedMessageRepository", lambda: repo)
+
+    async def send_replication_message(routing_key: str, message: dict, session=None) -> None:
+        if product_service.failed_sends:
+            product_service.failed_sends -= 1
+            raise ConnectionError("Connection to the db is lost")
+        session.on_commit(lambda: product_service.sent_results.append(message))
+
+    monkeypatch.setattr(order_processing, "client", client)
+    monkeypatch.setattr(order_processing, "get_product_service", get_product_service)
+    monkeypatch.setattr(order_processing, "send_replication_message", send_replication_message)
+    return client, product_service, use_processed_message_repo
+
+
+def release(message_id: str) -> None:
+    data = {"products": [{"product_id": str(PRODUCT_ID), "quantity": 2}]}
+    asyncio.run(OrderProcessingHandler.release_products(data, message_id, RELEASE_ROUTING_KEY))
+
+
+def test_release_is_applied_and_marked_once(handler_env):
+    client, product_service, use_processed_message_repo = handler_env
+    repo = FakeProcessedMessageRepository()
+    use_processed_message_repo(repo)
+
+    release("message-1")
+    release("message-1")
+
+    assert product_service.stock[PRODUCT_ID] == 2
+    assert repo.processed_ids == {"message-1"}
+    assert client.committed == 1
+
+
+def test_redelivered_release_is_acked_without_transaction(handler_env):
+    client, product_service, use_processed_message_repo = handler_env
+    use_processed_message_repo(FakeProcessedMessageRepository(processed_ids={"message-1"}))
+
+    release("message-1")
+
+    assert product_service.stock[PRODUCT_ID] == 0
+    assert client.committed == client.aborted == 0
+
+
+def test_release_processed_concurrently_is_acked(handler_env):
+    # Another consumer marks the message between the check and the transaction
+    client, product_service, use_processed_message_repo = handler_env
+    use_processed_message_repo(FakeProcessedMessageRepository(processed_concurrently={"message-1"}))
+
+    release("message-1")
+
+    assert product_service.stock[PRODUCT_ID] == 0
+    assert client.aborted == 1 and client.committed == 0
+
+
+def test_batch_release_is_retried_after_write_conflict(handler_env):
+    client, product_service, use_processed_message_repo = handler_env
+    product_service.write_conflicts = 2
+    repo = FakeProcessedMessageRepository()
+    use_processed_message_repo(repo)
+    messages = [
+        OrderProcessingMessage(RELEASE_ROUTING_KEY, {"products": [{"product_id": str(PRODUCT_ID), "quantity": 1}]},
+                               f"message-{number}")
+        for number in range(3)
+    ]
+
+    asyncio.run(OrderProcessingHandler.process_batch(messages))
+
+    assert product_service.stock[PRODUCT_ID] == 3
+    assert repo.processed_ids == {"message-0", "message-1", "message-2"}
+    assert client.aborted == 2 and client.committed == 1
+
+
+def reserve(message_id: str) -> None:
+    data = {"products": [{"product_id": str(PRODUCT_ID), "quantity": 2}], "order_id": "order-1"}
+    asyncio.run(OrderProcessingHandler.reserve_products_and_remove_cart_items(data, message_id, RESERVE_ROUTING_KEY))
+
+
+def test_reservation_is_rolled_back_if_its_result_isnt_saved(handler_env):
+    client, product_service, use_processed_message_repo = handler_env
+    product_service.failed_sends = 1
+    repo = FakeProcessedMessageRepository()
+    use_processed_message_repo(repo)
+
+    with pytest.raises(ConnectionError):
+        reserve("message-1")
+    assert product_service.stock[PRODUCT_ID] == 0
+    assert repo.processed_ids == set()
+
+    # The broker redelivers the message, stock is decremented once
+    reserve("message-1")
+    reserve("message-1")
+
+    assert product_service.stock[PRODUCT_ID] == -2
+    assert repo.processed_ids == {"message-1"}
+    assert [result["message_id"] for result in product_service.sent_results] == ["message-1"]
+
+
+def test_reservation_processed_concurrently_is_acked(handler_env):
+    client, product_service, use_processed_message_repo = handler_env
+    use_processed_message_repo(FakeProcessedMessageRepository(processed_concurrently={"message-1"}))
+
+    reserve("message-1")
+
+    assert product_service.stock[PRODUCT_ID] == 0
+    assert product_service.sent_results == []
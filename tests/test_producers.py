@@ -0,0 +1,39 @@
+import asyncio
+
+from benchmarks.stand_ins.amqp import FakeBroker, patched_aio_pika
+from src.core.message_broker import producers
+
+
+def test_disconnected_producer_is_closed_before_it_is_replaced(monkeypatch):
+    async def run():
+        monkeypatch.setattr(producers, "_product_crud_producer", None)
+        monkeypatch.setattr(producers, "_product_crud_producer_lock", None)
+        with patched_aio_pika(FakeBroker(round_trip=0, handshake=0)) as broker:
+            old_producer = await producers.get_product_crud_producer()
+            old_senders = list(old_producer._senders)
+            old_producer._connection.is_closed = True
+
+            new_producer = await producers.get_product_crud_producer()
+            await producers.close_product_crud_producer()
+            return broker, old_producer, old_senders, new_producer
+
+    broker, old_producer, old_senders, new_producer = asyncio.run(run())
+    assert new_producer is not old_producer
+    assert broker.opened_connections == 2
+    assert all(sender.done() for sender in old_senders)
+    assert old_producer._buffer is None
+
+
+def test_buffered_messages_are_dropped_after_the_flush_timeout(monkeypatch):
+    async def run():
+        with patched_aio_pika(FakeBroker(round_trip=0, handshake=0)):
+            producer = producers.PooledAsyncProducer("exchange", "topic", channel_pool_size=1)
+            await producer.connect()
+            # The senders can't publish while the connection is being restored
+            for sender in producer._senders:
+                sender.cancel()
+            await producer.send_message("product.created", {"_id": 1})
+            await asyncio.wait_for(producer.close(flush_timeout=0.01), 1)
+            return producer
+
+    assert asyncio.run(run())._buffer is None
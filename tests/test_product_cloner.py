@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from benchmarks.stand_ins.mongo import FakeClient
+from src.services.products.product_crud import product_cloner
+from src.services.products.product_crud.product_cloner import ProductCloner
+
+SOURCE_IMAGE_URL = "https://cdn.example.com/products/source/0.jpg"
+
+
+class FakeProductRepository:
+    def __init__(self, fail_insert: bool = False):
+        self.fail_insert = fail_insert
+        self.products = []
+
+    async def create_many_products(self, products: list, session=None) -> None:
+        if self.fail_insert:
+            raise DuplicateKeyError("E11000 duplicate key error collection: products index: sku_1")
+        session.on_commit(lambda: self.products.extend(products))
+
+
+class FakeStockCounter:
+    def __init__(self, total_stock: dict):
+        self.total_stock = total_stock
+
+    async def get_total_stock(self, product_ids: list) -> dict:
+        return {product_id: self.total_stock[product_id] for product_id in product_ids}
+
+
+@pytest.fixture
+def cloner_env(monkeypatch):
+    referenced_urls, released_urls = [], []
+
+    async def clone_product_images(image_urls, image_names):
+        referenced_urls.extend(image_urls)
+        return list(image_urls)
+
+    async def delete_product_images(image_urls):
+        released_urls.extend(image_urls)
+        return 0
+
+    async def replicate_created_variations(products, session=None):
+        pass
+
+    monkeypatch.setattr(product_cloner, "client", FakeClient())
+    monkeypatch.setattr(product_cloner, "clone_product_images", clone_product_images)
+    monkeypatch.setattr(product_cloner, "delete_product_images", delete_product_images)
+    monkeypatch.setattr(product_cloner, "replicate_created_variations", replicate_created_variations)
+    return referenced_urls, released_urls
+
+
+def make_product(**fields) -> dict:
+    return {"_id": ObjectId(), "sku": "sku", "stock": 0, "images": {"main": SOURCE_IMAGE_URL}, **fields}
+
+
+def test_references_of_the_images_are_released_if_the_clone_isnt_inserted(cloner_env):
+    referenced_urls, released_urls = cloner_env
+    product = make_product()
+    cloner = ProductCloner(FakeProductRepository(fail_insert=True), FakeStockCounter({}))
+
+    with pytest.raises(DuplicateKeyError):
+        asyncio.run(cloner.clone_product([product], {product["_id"]: "sku-copy"}))
+
+    assert released_urls == referenced_urls == [SOURCE_IMAGE_URL]
+
+
+def test_clone_of_the_product_with_sharded_stock_gets_the_sum_of_the_shards(cloner_env):
+    _, released_urls = cloner_env
+    product = make_product(stock=3, stock_shard_count=4)
+    product_repo = FakeProductRepository()
+    cloner = ProductCloner(product_repo, FakeStockCounter({product["_id"]: 17}))
+
+    clone_id, _ = asyncio.run(cloner.clone_product([product], {product["_id"]: "sku-copy"}))
+
+    assert product_repo.products[0]["_id"] == clone_id
+    assert product_repo.products[0]["stock"] == 17
+    assert "stock_shard_count" not in product_repo.products[0]
+    assert released_urls == []
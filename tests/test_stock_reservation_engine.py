@@ -0,0 +1,87 @@
+import asyncio
+
+from bson import ObjectId
+
+from src.services.products.stock_reservation_engine import StockReservationEngine
+
+HOT_PRODUCT_ID, OTHER_PRODUCT_ID = ObjectId(), ObjectId()
+
+
+class UpdateResult:
+    def __init__(self, modified_count: int):
+        self.modified_count = modified_count
+
+
+class FakeProductRepository:
+    def __init__(self, stock: dict):
+        self.stock = dict(stock)
+        self.writes = 0
+
+    async def update_one_product(self, filters: dict, data_to_update: dict, **kwargs) -> UpdateResult:
+        self.writes += 1
+        quantity = -data_to_update["$inc"]["stock"]
+        if self.stock.get(filters["_id"], 0) < quantity:
+            return UpdateResult(0)
+        self.stock[filters["_id"]] -= quantity
+        return UpdateResult(1)
+
+    async def update_many_products_bulk(self, operations: list, **kwargs) -> None:
+        self.writes += 1
+        for operation in operations:
+            self.stock[operation._filter["_id"]] += operation._doc["$inc"]["stock"]
+
+    async def get_product_list(self, filters: dict, projection: dict, **kwargs) -> list:
+        return [{"_id": product_id, "stock": self.stock[product_id]} for product_id in filters["_id"]["$in"]
+                if product_id in self.stock]
+
+
+class FakeStockCounter:
+    """
+    None of the products has sharded stock.
+    """
+    async def get_shard_counts(self, product_ids: list, session=None) -> dict:
+        return {}
+
+    async def get_total_stock(self, product_ids: list, session=None) -> dict:
+        return {}
+
+
+def order(*items) -> tuple:
+    return [{"product_id": str(product_id), "quantity": quantity} for product_id, quantity in items], None, None
+
+
+def reserve_many(product_repo: FakeProductRepository, orders: list) -> list:
+    engine = StockReservationEngine(product_repo, FakeStockCounter())
+    return asyncio.run(engine.reserve_many(orders))
+
+
+def test_hot_product_is_decremented_once_for_the_batch():
+    product_repo = FakeProductRepository({HOT_PRODUCT_ID: 10})
+
+    results = reserve_many(product_repo, [order((HOT_PRODUCT_ID, 2)) for _ in range(4)])
+
+    assert [result["reserved"] for result in results] == [True] * 4
+    assert product_repo.stock[HOT_PRODUCT_ID] == 2
+    assert product_repo.writes == 1
+
+
+def test_orders_are_reserved_one_by_one_if_stock_isnt_enough_for_the_batch():
+    product_repo = FakeProductRepository({HOT_PRODUCT_ID: 5})
+
+    results = reserve_many(product_repo, [order((HOT_PRODUCT_ID, 2)) for _ in range(3)])
+
+    assert [result["reserved"] for result in results] == [True, True, False]
+    assert results[2]["products"][0]["reason"] == "insufficient_stock"
+    assert results[2]["products"][0]["available_stock"] == 1
+    assert product_repo.stock[HOT_PRODUCT_ID] == 1
+
+
+def test_products_of_the_rejected_order_are_returned_to_stock():
+    product_repo = FakeProductRepository({HOT_PRODUCT_ID: 10, OTHER_PRODUCT_ID: 0})
+
+    rejected, reserved = reserve_many(product_repo, [order((HOT_PRODUCT_ID, 2), (OTHER_PRODUCT_ID, 1)),
+                                                     order((HOT_PRODUCT_ID, 3))])
+
+    assert not rejected["reserved"] and reserved["reserved"]
+    assert [item["reason"] for item in rejected["products"]] == ["order_rejected", "insufficient_stock"]
+    assert product_repo.stock == {HOT_PRODUCT_ID: 7, OTHER_PRODUCT_ID: 0}